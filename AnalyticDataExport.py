@@ -23,15 +23,13 @@ import wx
 import os
 import Dialogs
 import Library
-import Document
-import Episode
 import Collection
 import Quote
 import Clip
 import DBInterface
 import FilterDialog
+import KeywordIndex
 import TransanaConstants
-import TransanaExceptions
 import TransanaGlobal
 import Misc
 # import Python's codecs module to make reading and writing UTF-8 text files 
@@ -154,6 +152,8 @@ class AnalyticDataExport(Dialogs.GenForm):
         clipLookup = {}
         # The Keyword List is the list of Keywords to be sent to the Filter Dialog
         keywordList = []
+        # The Keyword Set is used to assemble the unique Keywords to be sent to the Filter Dialog
+        keywordSet = set()
         # Show a WAIT cursor.  Assembling the data can take noticable time in some cases.
         TransanaGlobal.menuWindow.SetCursor(wx.StockCursor(wx.CURSOR_WAIT))
 
@@ -164,53 +164,33 @@ class AnalyticDataExport(Dialogs.GenForm):
 
             # obtain a list of all Documents in the Library
             tempDocumentList = DBInterface.list_of_documents(tempLibrary.number)
-            # initialize the temporary Quote List
-            tempQuoteList = []
             # iterate through the Document List ...
             for documentRecord in tempDocumentList:
-                # ... and add each Document's Quotes to the Temporary Quote list
-                tempQuoteList += DBInterface.list_of_quotes_by_document(documentRecord[0])
-                # Add the Document data to the Filter Dialog's Document List
+                # ... and add the Document data to the Filter Dialog's Document List
                 documentList.append((documentRecord[1], tempLibrary.id, True))
+            # Get all the Quotes created from the Library's Documents in a single query
+            tempQuoteList = DBInterface.list_of_quotes_by_library(tempLibrary.number)
             # For all the Quotes ...
-            for quoteRecord in tempQuoteList:
+            for (quoteNo, quoteName, collNo, sourceDocNo) in tempQuoteList:
                 # ... add the Quote to the Quote List for filtering ...
-                quoteList.append((quoteRecord['QuoteID'], quoteRecord['CollectNum'], True))
-                # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number ...
-                quoteLookup[(quoteRecord['QuoteID'], quoteRecord['CollectNum'])] = quoteRecord['QuoteNum']
-                # ... now get all the keywords for this Quote ...
-                quoteKeywordList = DBInterface.list_of_keywords(Quote = quoteRecord['QuoteNum'])
-                # ... and iterate through the list of Quote keywords.
-                for quoteKeyword in quoteKeywordList:
-                    # If the keyword isn't already in the Keyword List ...
-                    if (quoteKeyword[0], quoteKeyword[1], True) not in keywordList:
-                        # ... add the keyword to the keyword list for filtering.
-                        keywordList.append((quoteKeyword[0], quoteKeyword[1], True))
+                quoteList.append((quoteName, collNo, True))
+                # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number.
+                quoteLookup[(quoteName, collNo)] = quoteNo
 
             # obtain a list of all Episodes in that Library
             tempEpisodeList = DBInterface.list_of_episodes_for_series(tempLibrary.id)
-            # initialize the temporary clip List
-            tempClipList = []
             # iterate through the Episode List ...
             for episodeRecord in tempEpisodeList:
-                # ... and add each Episode's Clips to the Temporary clip list
-                tempClipList += DBInterface.list_of_clips_by_episode(episodeRecord[0])
-                # Add the Episode data to the Filter Dialog's Episode List
+                # ... and add the Episode data to the Filter Dialog's Episode List
                 episodeList.append((episodeRecord[1], tempLibrary.id, True))
+            # Get all the Clips created from the Library's Episodes in a single query
+            tempClipList = DBInterface.list_of_clips_by_library(tempLibrary.number)
             # For all the Clips ...
-            for clipRecord in tempClipList:
+            for (clipNo, clipName, collNo) in tempClipList:
                 # ... add the Clip to the Clip List for filtering ...
-                clipList.append((clipRecord['ClipID'], clipRecord['CollectNum'], True))
-                # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number ...
-                clipLookup[(clipRecord['ClipID'], clipRecord['CollectNum'])] = clipRecord['ClipNum']
-                # ... now get all the keywords for this Clip ...
-                clipKeywordList = DBInterface.list_of_keywords(Clip = clipRecord['ClipNum'])
-                # ... and iterate through the list of clip keywords.
-                for clipKeyword in clipKeywordList:
-                    # If the keyword isn't already in the Keyword List ...
-                    if (clipKeyword[0], clipKeyword[1], True) not in keywordList:
-                        # ... add the keyword to the keyword list for filtering.
-                        keywordList.append((clipKeyword[0], clipKeyword[1], True))
+                clipList.append((clipName, collNo, True))
+                # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number.
+                clipLookup[(clipName, collNo)] = clipNo
             
         # If we have a Document Number, we set up the Document Analytic Data Export
         elif self.documentNum <> 0:
@@ -220,16 +200,8 @@ class AnalyticDataExport(Dialogs.GenForm):
             for quoteRecord in tempQuoteList:
                 # ... add the Quote to the Quote List for filtering ...
                 quoteList.append((quoteRecord['QuoteID'], quoteRecord['CollectNum'], True))
-                # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number ...
+                # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number.
                 quoteLookup[(quoteRecord['QuoteID'], quoteRecord['CollectNum'])] = quoteRecord['QuoteNum']
-                # ... now get all the keywords for this Quote ...
-                quoteKeywordList = DBInterface.list_of_keywords(Quote = quoteRecord['QuoteNum'])
-                # ... and iterate through the list of Quote keywords.
-                for quoteKeyword in quoteKeywordList:
-                    # If the keyword isn't already in the Keyword List ...
-                    if (quoteKeyword[0], quoteKeyword[1], True) not in keywordList:
-                        # ... add the keyword to the keyword list for filtering.
-                        keywordList.append((quoteKeyword[0], quoteKeyword[1], True))
 
         # If we have an Episode Number, we set up the Episode Analytic Data Export
         elif self.episodeNum <> 0:
@@ -239,16 +211,8 @@ class AnalyticDataExport(Dialogs.GenForm):
             for clipRecord in tempClipList:
                 # ... add the Clip to the Clip List for filtering ...
                 clipList.append((clipRecord['ClipID'], clipRecord['CollectNum'], True))
-                # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number ...
+                # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number.
                 clipLookup[(clipRecord['ClipID'], clipRecord['CollectNum'])] = clipRecord['ClipNum']
-                # ... now get all the keywords for this Clip ...
-                clipKeywordList = DBInterface.list_of_keywords(Clip = clipRecord['ClipNum'])
-                # ... and iterate through the list of clip keywords.
-                for clipKeyword in clipKeywordList:
-                    # If the keyword isn't already in the Keyword List ...
-                    if (clipKeyword[0], clipKeyword[1], True) not in keywordList:
-                        # ... add the keyword to the keyword list for filtering.
-                        keywordList.append((clipKeyword[0], clipKeyword[1], True))
 
         # If we don't have Library Number, Document Number, or Episode number, but DO have a Collection Number, we set
         # up the Clips for the Collection specified.  If we have neither, it's the GLOBAL Analytic Data Export,
@@ -256,54 +220,37 @@ class AnalyticDataExport(Dialogs.GenForm):
         else:
             # If we have a specific collection specified ...
             if self.collectionNum <> 0:
-                # ... load the specified collection.  We need its data.
-                tempCollection = Collection.Collection(self.collectionNum)
-                # Put the selected Collection's data into the Collection List as a starting place.
-                tempCollectionList = [(tempCollection.number, tempCollection.id, tempCollection.parent)]
+                # ... get the numbers of the specified collection and all its nested collections, expanded from a single query
+                collectionNums = [collRec[0] for collRec in DBInterface.list_of_collection_subtree(self.collectionNum)]
             # If we don't have any selected collection ...
             else:
-                # ... then we should initialise the Collection List with data for all top-level collections, with parent = 0
-                tempCollectionList = DBInterface.list_of_collections()
-            # Iterate through the Collection List as long as it has entries
-            while len(tempCollectionList) > 0:
-                # Get the list of Quotes for the current Collection
-                tempQuoteList = DBInterface.list_of_quotes_by_collectionnum(tempCollectionList[0][0])
-                # For all the Quotes ...
-                for (quoteNo, quoteName, collNo, sourceDocNo) in tempQuoteList:
-                    # ... add the Quote to the Quote List for filtering ...
-                    quoteList.append((quoteName, collNo, True))
-                    # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number ...
-                    quoteLookup[(quoteName, collNo)] = quoteNo
-                    # ... now get all the keywords for this Quote ...
-                    quoteKeywordList = DBInterface.list_of_keywords(Quote = quoteNo)
-                    # ... and iterate through the list of Quote keywords.
-                    for quoteKeyword in quoteKeywordList:
-                        # If the keyword isn't already in the Keyword List ...
-                        if (quoteKeyword[0], quoteKeyword[1], True) not in keywordList:
-                            # ... add the keyword to the keyword list for filtering.
-                            keywordList.append((quoteKeyword[0], quoteKeyword[1], True))
-
-                # Get the list of Clips for the current Collection
-                tempClipList = DBInterface.list_of_clips_by_collection(tempCollectionList[0][1], tempCollectionList[0][2])
-                # For all the Clips ...
-                for (clipNo, clipName, collNo) in tempClipList:
-                    # ... add the Clip to the Clip List for filtering ...
-                    clipList.append((clipName, collNo, True))
-                    # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number ...
-                    clipLookup[(clipName, collNo)] = clipNo
-                    # ... now get all the keywords for this Clip ...
-                    clipKeywordList = DBInterface.list_of_keywords(Clip = clipNo)
-                    # ... and iterate through the list of clip keywords.
-                    for clipKeyword in clipKeywordList:
-                        # If the keyword isn't already in the Keyword List ...
-                        if (clipKeyword[0], clipKeyword[1], True) not in keywordList:
-                            # ... add the keyword to the keyword list for filtering.
-                            keywordList.append((clipKeyword[0], clipKeyword[1], True))
-
-                # Get the nested collections for the current collection and add them to the Collection List
-                tempCollectionList += DBInterface.list_of_collections(tempCollectionList[0][0])
-                # Remove the current Collection from the list.  We're done with it.
-                del(tempCollectionList[0])
+                # ... then we want ALL collections, and don't need to restrict the queries below at all
+                collectionNums = None
+            # Get the Quotes for all the Collections in a single query
+            tempQuoteList = DBInterface.list_of_quotes_by_collectionnums(collectionNums)
+            # For all the Quotes ...
+            for (quoteNo, quoteName, collNo, sourceDocNo) in tempQuoteList:
+                # ... add the Quote to the Quote List for filtering ...
+                quoteList.append((quoteName, collNo, True))
+                # ... retain a pointer to the Quote Number keyed to the Quote ID and Collection Number.
+                quoteLookup[(quoteName, collNo)] = quoteNo
+
+            # Get the Clips for all the Collections in a single query
+            tempClipList = DBInterface.list_of_clips_by_collectionnums(collectionNums)
+            # For all the Clips ...
+            for (clipNo, clipName, collNo) in tempClipList:
+                # ... add the Clip to the Clip List for filtering ...
+                clipList.append((clipName, collNo, True))
+                # ... retain a pointer to the Clip Number keyed to the Clip ID and Collection Number.
+                clipLookup[(clipName, collNo)] = clipNo
+
+        # Gather the unique keywords applied to the Quotes and Clips in the report
+        for quoteNum in quoteLookup.values():
+            keywordSet.update(KeywordIndex.KeywordsForObject('Quote', quoteNum))
+        for clipNum in clipLookup.values():
+            keywordSet.update(KeywordIndex.KeywordsForObject('Clip', clipNum))
+        # Build the Keyword List for filtering from the Keyword Set
+        keywordList = [(kwg, kw, True) for (kwg, kw) in keywordSet]
 
         # Put the Quote List in alphabetical order in preparation for Filtering..
         quoteList.sort()
@@ -452,44 +399,76 @@ class AnalyticDataExport(Dialogs.GenForm):
             # Open the output file for writing.
             f = codecs.open(fs, 'w', 'utf8')    # file(fs, 'w')
 
+            # Build the list of keywords the user has left "checked" in the filter dialog
+            checkedKeywords = [(keyword[0], keyword[1]) for keyword in keywordList if keyword[2]]
+            # Collection Node Strings are shared by many rows.  Cache them so each is only loaded from the database once.
+            collectionCache = {}
+
+            def GetCollectionNodeString(collectionNum):
+                """ Get a Collection's Node String, using the cache if possible """
+                if not collectionCache.has_key(collectionNum):
+                    collectionCache[collectionNum] = Collection.Collection(collectionNum).GetNodeString()
+                return collectionCache[collectionNum]
+
+            def IsIncluded(rec, collectionNum):
+                """ See if the user has left a Quote or Clip "checked" in the filter dialog.  Also, if we are using a
+                    collection report, either Nested Data should be requested OR the item should be from the main
+                    collection if it is to be included in the report. """
+                return rec[2] and ((collectionNum == 0) or (showNested) or (rec[1] == collectionNum))
+
+            # Load all the Quotes and Clips to be exported, without their text, in a few queries rather than
+            # several queries per item
+            quotes = Quote.Quote.load_many([quoteLookup[quoteRec[0], quoteRec[1]] for quoteRec in quoteList if IsIncluded(quoteRec, self.collectionNum)], skipText=True)
+            clips = Clip.Clip.load_many([clipLookup[clipRec[0], clipRec[1]] for clipRec in clipList if IsIncluded(clipRec, self.collectionNum)], skipText=True)
+            # Get the ID, Library ID and Imported File for all the Quotes' source Documents in a single query
+            query = """SELECT DocumentNum, DocumentID, SeriesID, ImportedFile FROM Documents2 a, Series2 b
+                         WHERE DocumentNum IN (%s) AND
+                               a.LibraryNum = b.SeriesNum"""
+            documents = {}
+            for row in DBInterface.fetchall_named_by_nums(query, [quote.source_document_num for quote in quotes.values()]):
+                values = (row['DocumentID'], row['SeriesID'], row['ImportedFile'] or '')
+                # Convert the values to the proper UTF-8 representation if needed
+                if 'unicode' in wx.PlatformInfo:
+                    values = tuple([DBInterface.ProcessDBDataForUTF8Encoding(value) for value in values])
+                documents[row['DocumentNum']] = values
+            # If we're doing a Library report, we need the ID and Library ID of the Clips' source Episodes for
+            # Episode Filter comparison.  Get them in a single query.
+            episodes = {}
+            if self.libraryNum != 0:
+                query = """SELECT EpisodeNum, EpisodeID, SeriesID FROM Episodes2 a, Series2 b
+                             WHERE EpisodeNum IN (%s) AND
+                                   a.SeriesNum = b.SeriesNum"""
+                for row in DBInterface.fetchall_named_by_nums(query, [clip.episode_num for clip in clips.values()]):
+                    values = (row['EpisodeID'], row['SeriesID'])
+                    # Convert the values to the proper UTF-8 representation if needed
+                    if 'unicode' in wx.PlatformInfo:
+                        values = tuple([DBInterface.ProcessDBDataForUTF8Encoding(value) for value in values])
+                    episodes[row['EpisodeNum']] = values
+
+            def GetKeywordFields(objKeywords):
+                """ Get the "1" or "0" values indicating which of the checked keywords an object has """
+                return ['1' if (keyword in objKeywords) else '0' for keyword in checkedKeywords]
+
             prompt = unicode(_('Collection Name\tItem Type\tItem Name\tSource File\tStart\tStop\tLength'), 'utf8')
             # Write the Header line.  We're creating a tab-delimited file, so we'll use tabs to separate the items.
-            f.write(prompt)
-            # Add keywords to the Header.  Iterate through the Keyword List.
-            for keyword in keywordList:
-                # See if the user has left the keyword "checked" in the filter dialog.
-                if keyword[2]:
-                    # Encode and write all "checked" keywords to the Header.
-                    kwg = keyword[0]
-                    kw = keyword[1]
-                    f.write('\t%s : %s' % (kwg, kw))
-            # Add a line break to signal the end of the Header line. 
-            f.write('\n')
+            # Add the "checked" keywords to the Header, and a line break to signal the end of the Header line. 
+            f.write('\t'.join([prompt] + [u'%s : %s' % (kwg, kw) for (kwg, kw) in checkedKeywords]) + '\n')
 
             # Now iterate through the Quote List
             for quoteRec in quoteList:
-                # See if the user has left the Quote "checked" in the filter dialog.
-                # Also, if we are using a collection report, either Nested Data should be requested OR the current
-                # Quote should be from the main collection if it is to be included in the report.
-                if quoteRec[2] and ((self.collectionNum == 0) or (showNested) or (quoteRec[1] == self.collectionNum)):
-                    # Load the Quote data.  The QuoteLookup dictionary allows this easily.
-                    # No need to load the Quote Text, which can be slow to load.
-                    quote = Quote.Quote(quoteLookup[quoteRec[0], quoteRec[1]], skipText=True)
-                    # Get the collection the Quote is from.
-                    collection = Collection.Collection(quote.collection_num)
-                    # Encode string values using the Export Encoding
-                    collectionID = collection.GetNodeString()
+                # Get the Quote data, if the Quote is to be included in the report.  The QuoteLookup dictionary allows this easily.
+                # (A Quote deleted since the Filter Dialog was set up won't be in the quotes dictionary.)
+                quote = quotes.get(quoteLookup[quoteRec[0], quoteRec[1]], None)
+                if IsIncluded(quoteRec, self.collectionNum) and (quote != None):
+                    # Get the Node String of the collection the Quote is from.
+                    collectionID = GetCollectionNodeString(quote.collection_num)
                     quoteID = quote.id
-                    try:
-                        document = Document.Document(quote.source_document_num)
-                        documentID = document.id
-                        quoteSourceFilename = document.imported_file
-                        # If we're doing a Library report, we need the Quote's source document and Library for Document Filter comparison.
-                        if self.libraryNum != 0:
-                            library = Library.Library(document.library_num)
-                            libraryID = library.id
+                    # If we know the Quote's source Document ...
+                    if documents.has_key(quote.source_document_num):
+                        # ... get the source document's ID, Library ID (for Document Filter comparison), and Imported File
+                        (documentID, libraryID, quoteSourceFilename) = documents[quote.source_document_num]
                     # If we have an orphaned Quote ...
-                    except TransanaExceptions.RecordNotFoundError, e:
+                    else:
                         # ... then we don't know these values!
                         documentID = ''
                         quoteSourceFilename = _('Source Document unknown')
@@ -498,67 +477,40 @@ class AnalyticDataExport(Dialogs.GenForm):
                     # Implement Document filtering if needed.  If we have a Library Report, we need to confirm that the Source Document
                     # is "checked" in the filter list.  (If we don't have a Library Report, this check isn't needed.)
                     if (self.libraryNum == 0) or ((documentID == '') and (libraryID == '')) or ((documentID, libraryID, True) in documentList):
-                        # Write the Quote's data values to the output file.  We're creating a tab-delimited file,
-                        # so we'll use tabs to separate the items.
-                        f.write('%s\t%s\t%s\t%s\t%s\t%s\t%d' % (collectionID, '1', quoteID, quoteSourceFilename,
-                                                            quote.start_char, quote.end_char,
-                                                            (quote.end_char - quote.start_char)))
-
-                        # Now we iterate through the keyword list ...
-                        for keyword in keywordList:
-                            # ... looking only at those keywords the user left "checked" in the filter dialog ...
-                            if keyword[2]:
-                                # ... and check to see if the Quote HAS the keyword.
-                                if quote.has_keyword(keyword[0], keyword[1]):
-                                    # If so, we write a "1", indicating True.
-                                    f.write('\t1')
-                                else:
-                                    # If not, we write a "0", indicating False.
-                                    f.write('\t0')
-                        # Add a line break to signal the end of the Quote record
-                        f.write('\n')
+                        # Assemble the Quote's data values, followed by a "1" or "0" for each "checked" keyword to indicate
+                        # whether the Quote HAS the keyword.
+                        fields = [collectionID, '1', quoteID, quoteSourceFilename,
+                                  '%s' % quote.start_char, '%s' % quote.end_char, '%d' % (quote.end_char - quote.start_char)]
+                        fields += GetKeywordFields(KeywordIndex.KeywordsForObject('Quote', quote.number))
+                        # Write the Quote record to the output file.  We're creating a tab-delimited file,
+                        # so we'll use tabs to separate the items, and a line break to signal the end of the record.
+                        f.write('\t'.join(fields) + '\n')
 
             # Now iterate through the Clip List
             for clipRec in clipList:
-                # See if the user has left the clip "checked" in the filter dialog.
-                # Also, if we are using a collection report, either Nested Data should be requested OR the current
-                # clip should be from the main collection if it is to be included in the report.
-                if clipRec[2] and ((self.collectionNum == 0) or (showNested) or (clipRec[1] == self.collectionNum)):
-                    # Load the Clip data.  The ClipLookup dictionary allows this easily.
-                    # No need to load the Clip Transcripts, which can be slow to load.
-                    clip = Clip.Clip(clipLookup[clipRec[0], clipRec[1]], skipText=True)
-                    # Get the collection the clip is from.
-                    collection = Collection.Collection(clip.collection_num)
-                    # Encode string values using the Export Encoding
-                    collectionID = collection.GetNodeString()
+                # Get the Clip data, if the Clip is to be included in the report.  The ClipLookup dictionary allows this easily.
+                # (A Clip deleted since the Filter Dialog was set up won't be in the clips dictionary.)
+                clip = clips.get(clipLookup[clipRec[0], clipRec[1]], None)
+                if IsIncluded(clipRec, self.collectionNum) and (clip != None):
+                    # Get the Node String of the collection the clip is from.
+                    collectionID = GetCollectionNodeString(clip.collection_num)
                     clipID = clip.id
                     clipMediaFilename = clip.media_filename
                     # If we're doing a Library report, we need the clip's source episode and Library for Episode Filter comparison.
                     if self.libraryNum != 0:
-                        episode = Episode.Episode(clip.episode_num)
-                        library = Library.Library(episode.series_num)
+                        (episodeID, libraryID) = episodes.get(clip.episode_num, ('', ''))
                     # Implement Episode filtering if needed.  If we have a Library Report, we need to confirm that the Source Episode
                     # is "checked" in the filter list.  (If we don't have a Library Report, this check isn't needed.)
-                    if (self.libraryNum == 0) or ((episode.id, library.id, True) in episodeList):
-                        # Write the Clip's data values to the output file.  We're creating a tab-delimited file,
-                        # so we'll use tabs to separate the items.
-                        f.write('%s\t%s\t%s\t%s\t%s\t%s\t%10.4f' % (collectionID, '2', clipID, clipMediaFilename,
-                                                            Misc.time_in_ms_to_str(clip.clip_start), Misc.time_in_ms_to_str(clip.clip_stop),
-                                                            (clip.clip_stop - clip.clip_start) / 1000.0))
-
-                        # Now we iterate through the keyword list ...
-                        for keyword in keywordList:
-                            # ... looking only at those keywords the user left "checked" in the filter dialog ...
-                            if keyword[2]:
-                                # ... and check to see if the Clip HAS the keyword.
-                                if clip.has_keyword(keyword[0], keyword[1]):
-                                    # If so, we write a "1", indicating True.
-                                    f.write('\t1')
-                                else:
-                                    # If not, we write a "0", indicating False.
-                                    f.write('\t0')
-                        # Add a line break to signal the end of the Clip record
-                        f.write('\n')
+                    if (self.libraryNum == 0) or ((episodeID, libraryID, True) in episodeList):
+                        # Assemble the Clip's data values, followed by a "1" or "0" for each "checked" keyword to indicate
+                        # whether the Clip HAS the keyword.
+                        fields = [collectionID, '2', clipID, clipMediaFilename,
+                                  Misc.time_in_ms_to_str(clip.clip_start), Misc.time_in_ms_to_str(clip.clip_stop),
+                                  '%10.4f' % ((clip.clip_stop - clip.clip_start) / 1000.0)]
+                        fields += GetKeywordFields(KeywordIndex.KeywordsForObject('Clip', clip.number))
+                        # Write the Clip record to the output file.  We're creating a tab-delimited file,
+                        # so we'll use tabs to separate the items, and a line break to signal the end of the record.
+                        f.write('\t'.join(fields) + '\n')
 
             # Flush the output file's buffer (probably unnecessary)
             f.flush()
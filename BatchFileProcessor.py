@@ -34,6 +34,8 @@ import TransanaConstants
 import TransanaGlobal
 # import Transana's waveform progress routines
 import WaveformProgress
+# import Transana's Waveform Graphic module
+import WaveformGraphic
 # import Python's locale module
 import locale
 # import Python's multiprocessing module
@@ -275,6 +277,14 @@ class BatchFileProcessor(Dialogs.GenForm):
                 self.runningConversions[indexNum] = progressDialog
                 # Tell the Waveform Progress Dialog to handle the audio extraction modally.
                 progressDialog.Extract(originalFilename, self.waveFilename)
+            # If we already have the extracted audio but it has no Peak File ...
+            elif not os.path.exists(WaveformGraphic.PeakFilename(self.waveFilename)):
+                # ... create the Peak File
+                try:
+                    WaveformGraphic.CreatePeakFile(self.waveFilename)
+                # If the Peak File can't be created, the waveform will be drawn from the wave file itself
+                except WaveformGraphic.PEAK_FILE_ERRORS:
+                    pass
             # Remove the file from the list
             self.processFileList = self.processFileList[1:]
 
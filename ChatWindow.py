@@ -25,6 +25,38 @@ if DEBUG:
 
 VERSION = 300
 
+# Several Database Tree messages can be combined into a single Batch ("B") message.  The individual messages
+# within a Batch message are separated by the Batch Separator.  Batch messages are only sent to Message Servers
+# that answer the Capabilities Query, which expand them for older clients.
+BATCH_SEPARATOR = ' <|> '
+# Once the Message Server has validated us, we send it the Capabilities Query.  The query is a private message to
+# a user name no one can have, so a Message Server that doesn't recognize it sends it back to us alone, and we
+# don't display it.  Message Servers that support Batch messages answer with the Capabilities Reply instead.
+CAPABILITIES_QUERY = 'M TransanaCapabilities >|< >|<'
+CAPABILITIES_REPLY = 'Capabilities'
+# Batch messages are kept small enough that older Message Servers, which read 1024 bytes at a time, can relay them.
+MAX_BATCH_BYTES = 960
+# When more than this many Database Tree messages arrive together, it is faster to re-load the Database Tree
+# than to apply the messages one at a time.
+BATCH_REFRESH_THRESHOLD = 250
+
+# Messages that add a node to the Database Tree, with the Node Type and (untranslated) Root Node they add to.
+# An add message followed by a Delete Node message for the same node can be dropped entirely.
+ADD_NODE_MESSAGES = {'AS'    : ('LibraryNode', 'Libraries'),
+                     'AE'    : ('EpisodeNode', 'Libraries'),
+                     'AT'    : ('TranscriptNode', 'Libraries'),
+                     'AD'    : ('DocumentNode', 'Libraries'),
+                     'AC'    : ('CollectionNode', 'Collections'),
+                     'ACl'   : ('ClipNode', 'Collections'),
+                     'ASnap' : ('SnapshotNode', 'Collections'),
+                     'AKG'   : ('KeywordGroupNode', 'Keywords'),
+                     'AK'    : ('KeywordNode', 'Keywords')}
+# Messages that only change the structure of the Database Tree.  These don't need to be applied if the whole
+# Database Tree is going to be re-loaded.
+TREE_STRUCTURE_MESSAGES = ADD_NODE_MESSAGES.keys() + ['AClSO', 'OC', 'MCN']
+# Messages that are not Database Tree messages
+NON_TREE_MESSAGES = ['M', 'C', 'R', 'I', 'V', 'D']
+
 # import wxPython
 import wx
 
@@ -56,6 +88,8 @@ import TransanaImages
 import DBInterface
 # import Transana Dialogs
 import Dialogs
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Document Object
 import Document
 # import Transana's Library object
@@ -91,6 +125,8 @@ EVT_POST_MESSAGE_ID = wx.NewId()
 EVT_CLOSE_MESSAGE_ID = wx.NewId()
 # Get an ID for a custom Event for if the Message Server is lost
 EVT_MESSAGESERVER_LOST_ID = wx.NewId()
+# Get an ID for a custom Event for signalling that messages are waiting in the Message Queue
+EVT_MESSAGE_QUEUE_ID = wx.NewId()
 
 # Define a custom "Post Message" event
 def EVT_POST_MESSAGE(win, func):
@@ -107,6 +143,11 @@ def EVT_MESSAGESERVER_LOST(win, func):
     """ Defines the EVT_CLOSE_MESSAGE event type """
     win.Connect(-1, -1, EVT_MESSAGESERVER_LOST_ID, func)
 
+# Define a custom "Message Queue" event
+def EVT_MESSAGE_QUEUE(win, func):
+    """ Defines the EVT_MESSAGE_QUEUE event type """
+    win.Connect(-1, -1, EVT_MESSAGE_QUEUE_ID, func)
+
 # Create the actual Custom Post Message Event object
 class PostMessageEvent(wx.PyEvent):
     """ This event is used to trigger posting a message in the GUI. It carries the data. """
@@ -143,6 +184,81 @@ class MessageServerLostEvent(wx.PyEvent):
         if DEBUG:
             print "MessageServerLost Event created"
 
+# Create the actual Custom Message Queue Event object
+class MessageQueueEvent(wx.PyEvent):
+    """ This event is used to signal the GUI that messages are waiting in the Message Queue.  The messages
+        themselves are held in the window's Message Queue, so that they can be processed together. """
+    def __init__(self):
+        # Initialize a wxPyEvent
+        wx.PyEvent.__init__(self)
+        # Link the event to the Event ID
+        self.SetEventType(EVT_MESSAGE_QUEUE_ID)
+
+def SplitMessage(message):
+    """ Break a message from the Message Server into its Header, Sender, and Message parts.
+        (Format:  "Header Sender: Message") """
+    messageHeader = message[:message.find(' ')]
+    message = message[message.find(' ') + 1:].strip()
+    messageSender = message[:message.find(' ') - 1]  # drop the ":"
+    message = message[message.find(' ') + 1:].strip()
+    return (messageHeader, messageSender, message)
+
+def ExpandBatchMessages(messages):
+    """ Replace Batch ("B") messages with the individual messages they contain """
+    results = []
+    for message in messages:
+        # If we have a Batch message ...
+        if message[:2] == 'B ':
+            # ... break it into its parts
+            (messageHeader, messageSender, message) = SplitMessage(message)
+            # Each part of a Batch message has the form "Header Message".  Add the sender to each one, so that
+            # it looks exactly as if it had come from the Message Server on its own.
+            for part in message.split(BATCH_SEPARATOR):
+                if part.find(' ') > -1:
+                    results.append('%s %s: %s' % (part[:part.find(' ')], messageSender, part[part.find(' ') + 1:]))
+                else:
+                    results.append('%s %s: ' % (part, messageSender))
+        else:
+            results.append(message)
+    return results
+
+def CollapseMessages(messages, userName):
+    """ Drop Database Tree messages that add a node when a later message deletes that same node.  Only
+        messages from other users are considered, as the tree messages a user sends are not processed. """
+    # Keep track of the messages to drop
+    dropped = set()
+    # Keep track of the add messages that might be collapsed, {(Node Type, Root Node, Node List) : message index}
+    pendingAdds = {}
+    for index in range(len(messages)):
+        (messageHeader, messageSender, message) = SplitMessage(messages[index])
+        # Our own messages are skipped, and don't affect the tree
+        if messageSender == userName:
+            continue
+        # If we have an Add message that we know how to pair up ...
+        if ADD_NODE_MESSAGES.has_key(messageHeader):
+            (nodeType, rootNode) = ADD_NODE_MESSAGES[messageHeader]
+            nodeKey = (nodeType, rootNode) + tuple([node.strip() for node in message.split(' >|< ')])
+            pendingAdds[nodeKey] = index
+        # If we have a Delete Node message ...
+        elif messageHeader == 'DN':
+            nodeKey = tuple([node.strip() for node in message.split(' >|< ')])
+            # ... and the node was added in this group of messages ...
+            if pendingAdds.has_key(nodeKey):
+                # ... then neither message needs to be processed.
+                dropped.add(pendingAdds[nodeKey])
+                dropped.add(index)
+                del(pendingAdds[nodeKey])
+                # Nodes that were added inside the deleted node are gone too
+                for key in pendingAdds.keys():
+                    if (len(key) > len(nodeKey)) and (key[1] == nodeKey[1]) and (key[2:len(nodeKey)] == nodeKey[2:]):
+                        dropped.add(pendingAdds[key])
+                        del(pendingAdds[key])
+        # Any other message might depend on nodes that have been added, so nothing before it can be collapsed.
+        elif not messageHeader in NON_TREE_MESSAGES:
+            pendingAdds = {}
+    # Return the messages that still need to be processed
+    return [messages[index] for index in range(len(messages)) if not index in dropped]
+
 # Create a Thread Lock object so that we can use thread locking as needed
 threadLock = threading.Lock()
 
@@ -176,12 +292,9 @@ class ListenerThread(threading.Thread):
             try:
                 # listen to the socket for a message from the Message Server
                 newData = self.socketObj.recv(2048)
-                # if we're using Unicode, we need to decode the socket message.
-                # Either way, we need to add the socket message to whatever overflow is unprocessed.
-                if 'unicode' in wx.PlatformInfo:
-                    data = dataOverflow + newData.decode('utf8')
-                else:
-                    data = dataOverflow + newData
+                # We need to add the socket message to whatever overflow is unprocessed.  (Messages are decoded
+                # once they are complete, so that a multi-byte character split between reads is not damaged.)
+                data = dataOverflow + newData
             except socket.error:
 
                 if DEBUG:
@@ -222,18 +335,24 @@ class ListenerThread(threading.Thread):
                 # then it will make no difference, but if it's NOT blank, it would otherwise get lost.
                 dataOverflow = messages[-1]
                 
-                # Process all the messages.  (The last message is always blank or overflow, so skip it!)
+                # If the Chat Window's Message Queue is empty, the Chat Window needs to be told that messages are
+                # waiting.  If not, it has already been told, and will process these messages with the others.
+                queueWasEmpty = (len(self.window.messageQueue) == 0)
+                # Add all the messages to the Message Queue.  (The last message is always blank or overflow, so skip it!)
                 for message in messages[:-1]:
+                    # if we're using Unicode, we need to decode the socket message.
+                    if 'unicode' in wx.PlatformInfo:
+                        message = message.decode('utf8')
 
                     if DEBUG:
-                        print "ChatWindow.ListenerThread.run() posting a PostMessageEvent of '%s'" % message
+                        print "ChatWindow.ListenerThread.run() queueing '%s'" % message
 
-                    tmpEvent = PostMessageEvent(message)
-                    
-                    # Post the Message Event with the message as data
-                    wx.PostEvent(self.window, tmpEvent)
+                    self.window.messageQueue.append(message)
                 # Unlock the thread when we're done processing all the messages.
                 threadLock.release()
+                # If needed, post the Message Queue Event so the messages will be processed
+                if queueWasEmpty and (len(messages) > 1):
+                    wx.PostEvent(self.window, MessageQueueEvent())
             else:
 
                 if DEBUG:
@@ -404,11 +523,22 @@ class ChatWindow(wx.Frame):
         self.txtEntry.SetFocus()
         # We need to know if loss of socket connection is expected or should be reported
         self.reportSocketLoss = True
+        # Messages received from the Message Server are held in the Message Queue until they can be processed
+        self.messageQueue = []
+        # Messages being processed as a group re-select the Database Tree selection once, at the end of the group
+        self.deferSelectionRestore = False
+        # Messages we send can be gathered up and sent as Batch messages.  Initialize the Batch depth and message list.
+        self.batchDepth = 0
+        self.batchMessages = []
+        # We only send Batch messages if the Message Server reports that it supports them when it validates us
+        self.serverSupportsBatches = False
         # Start the Listener Thread to listen for messages from the Message Server
         self.listener = ListenerThread(self, self.socketObj)
 
         # Define the custom Post Message Event's handler
         EVT_POST_MESSAGE(self, self.OnPostMessage)
+        # Define the custom Message Queue Event's handler
+        EVT_MESSAGE_QUEUE(self, self.OnMessageQueue)
         # Define the custom Post Message Event's handler
         EVT_MESSAGESERVER_LOST(self, self.OnMessageServerLost)
 
@@ -531,6 +661,11 @@ class ChatWindow(wx.Frame):
 
     def SendMessage(self, message):
         """ Send a message through the chatWindow's socket """
+        # If we're gathering messages into a Batch, and this isn't a Text Message ...
+        if (self.batchDepth > 0) and (message[:2] != 'M '):
+            # ... hold the message until the Batch is ended.
+            self.batchMessages.append(message)
+            return
         try:
             # Process Windows Messages, if needed.  (Completes SAVES, in theory!)
             wx.YieldIfNeeded()
@@ -558,6 +693,51 @@ class ChatWindow(wx.Frame):
             traceback.print_exc(file=sys.stdout)
             
 
+    def BeginBatch(self):
+        """ Start gathering the messages sent through the Chat Window into Batch messages.  This allows operations
+            that change many objects to notify the other users with a few messages instead of many.  Batches can be
+            nested.  The messages are sent when the outermost Batch is ended. """
+        self.batchDepth += 1
+
+    def EndBatch(self):
+        """ Stop gathering messages, and send any messages that have been gathered as Batch messages """
+        # Reduce the Batch depth
+        self.batchDepth = max(self.batchDepth - 1, 0)
+        # If this is the outermost Batch and there are messages waiting ...
+        if (self.batchDepth == 0) and (len(self.batchMessages) > 0):
+            # Get the messages, and reset the Batch message list
+            messages = self.batchMessages
+            self.batchMessages = []
+            # Combine messages into Batch messages, staying below the Batch size limit
+            batch = []
+            batchSize = 0
+            for message in messages:
+                # Determine the size of this message as it will be sent, including the Batch Separator
+                if 'unicode' in wx.PlatformInfo:
+                    messageSize = len(message.encode('utf8')) + len(BATCH_SEPARATOR)
+                else:
+                    messageSize = len(message) + len(BATCH_SEPARATOR)
+                # If this message won't fit in the current Batch ...
+                if (len(batch) > 0) and (batchSize + messageSize > MAX_BATCH_BYTES):
+                    # ... send the current Batch and start a new one
+                    self.SendBatch(batch)
+                    batch = []
+                    batchSize = 0
+                batch.append(message)
+                batchSize += messageSize
+            # Send the final Batch
+            self.SendBatch(batch)
+
+    def SendBatch(self, messages):
+        """ Send a list of messages as a single Batch message """
+        # A single message doesn't need to be sent as a Batch, and a Message Server that doesn't support Batch
+        # messages would pass them to clients that can't understand them, so send the messages one at a time.
+        if (len(messages) == 1) or not self.serverSupportsBatches:
+            for message in messages:
+                self.SendMessage(message)
+        elif len(messages) > 1:
+            self.SendMessage('B %s' % BATCH_SEPARATOR.join(messages))
+
     def OnSend(self, event):
         """ Send Message handler """
         # Get the message from the text entry box
@@ -704,6 +884,9 @@ class ChatWindow(wx.Frame):
             # Determine what type of message it is by looking at the first character.                
             # Text Message ?
             if messageHeader == 'M':
+                # A Message Server that doesn't recognize our Capabilities Query sends it back to us.  Don't display it.
+                if (messageSender == self.userName) and message.startswith('TransanaCapabilities'):
+                    return
                 # If it's not visible ...
                 if not self.IsShown():
                     # ... show the ChatWindow and ...
@@ -787,8 +970,16 @@ class ChatWindow(wx.Frame):
 
             # Server Validation
             elif messageHeader == 'V':
-                # Indicate that the server has been validated.  The Validation Timer processes this later.
-                self.serverValidation = True
+                # If this is the Message Server's answer to our Capabilities Query ...
+                if (messageSender == 'MessageServer') and message.startswith(CAPABILITIES_REPLY):
+                    # ... see if this Message Server supports Batch messages
+                    self.serverSupportsBatches = ('Batches' in message.split(' '))
+                else:
+                    # Indicate that the server has been validated.  The Validation Timer processes this later.
+                    self.serverValidation = True
+                    # Ask the Message Server what it supports.  Until it answers, messages are sent one at a time.
+                    if (messageSender == 'MessageServer') and (message == 'ServerValidated'):
+                        self.SendMessage(CAPABILITIES_QUERY)
                 
             # Disconnect Message ?
             elif messageHeader == 'D':
@@ -863,6 +1054,8 @@ class ChatWindow(wx.Frame):
                             tempQuote = Quote.Quote(quoteID=nodelist[-1], collectionID=tempCollection.id, collectionParent=tempCollection.parent, skipText=True)
                             # avoidRecursiveYields added to try to prevent a problem on the Mac when converting Searches
                             self.ControlObject.DataWindow.DBTab.tree.add_Node('QuoteNode', (_('Collections'),) + nodelist, tempQuote.number, tempCollection.number, sortOrder=tempQuote.sort_order, expandNode=False, avoidRecursiveYields=True)
+                            # A new or copied Quote may already have Keywords.  Update the in-memory Keyword Index.
+                            KeywordIndex.RefreshObject('Quote', tempQuote.number)
                             # If the Quote's Document is open, it needs to be updated with the Quote information!
                             self.ControlObject.AddQuoteToOpenDocument(tempQuote)
                             # If we are moving a Quote, the quote's Notes need to travel with the Quote.  The first step is to
@@ -870,7 +1063,7 @@ class ChatWindow(wx.Frame):
                             noteList = DBInterface.list_of_notes(Quote=tempQuote.number)
                             # If there are Quote Notes, we need to make sure they travel with the Quote
                             if noteList != []:
-                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'QuoteNode', ensureVisible=False)
+                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'QuoteNode', ensureVisible=False, recNum=tempQuote.number)
                                 # We accomplish this using the TreeCtrl's "add_note_nodes" method
                                 self.ControlObject.DataWindow.DBTab.tree.add_note_nodes(noteList, insertNode, Quote=tempQuote.number)
                                 self.ControlObject.DataWindow.DBTab.tree.Refresh()
@@ -887,12 +1080,14 @@ class ChatWindow(wx.Frame):
                             tempClip = Clip.Clip(nodelist[-1], tempCollection.id, tempCollection.parent, skipText=True)
                             # avoidRecursiveYields added to try to prevent a problem on the Mac when converting Searches
                             self.ControlObject.DataWindow.DBTab.tree.add_Node('ClipNode', (_('Collections'),) + nodelist, tempClip.number, tempCollection.number, sortOrder=tempClip.sort_order, expandNode=False, avoidRecursiveYields=True)
+                            # A new or copied Clip may already have Keywords.  Update the in-memory Keyword Index.
+                            KeywordIndex.RefreshObject('Clip', tempClip.number)
                             # If we are moving a Clip, the clip's Notes need to travel with the Clip.  The first step is to
                             # get a list of those Notes.
                             noteList = DBInterface.list_of_notes(Clip=tempClip.number)
                             # If there are Clip Notes, we need to make sure they travel with the Clip
                             if noteList != []:
-                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'ClipNode', ensureVisible=False)
+                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'ClipNode', ensureVisible=False, recNum=tempClip.number)
                                 # We accomplish this using the TreeCtrl's "add_note_nodes" method
                                 self.ControlObject.DataWindow.DBTab.tree.add_note_nodes(noteList, insertNode, Clip=tempClip.number)
                                 self.ControlObject.DataWindow.DBTab.tree.Refresh()
@@ -912,12 +1107,14 @@ class ChatWindow(wx.Frame):
                             # Add new node, leaving the insertNode out of the nodeList.
                             # avoidRecursiveYields added to try to prevent a problem on the Mac when converting Searches
                             self.ControlObject.DataWindow.DBTab.tree.add_Node('ClipNode', (_('Collections'),) + nodelist[:-2] + (nodelist[-1],), tempClip.number, tempCollection.number, sortOrder=tempClip.sort_order, expandNode=False, insertPos=insertNode, avoidRecursiveYields=True)
+                            # A new or copied Clip may already have Keywords.  Update the in-memory Keyword Index.
+                            KeywordIndex.RefreshObject('Clip', tempClip.number)
                             # If we are moving a Clip, the clip's Notes need to travel with the Clip.  The first step is to
                             # get a list of those Notes.
                             noteList = DBInterface.list_of_notes(Clip=tempClip.number)
                             # If there are Clip Notes, we need to make sure they travel with the Clip
                             if noteList != []:
-                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist[:-2] + (nodelist[-1],), 'ClipNode', ensureVisible=False)
+                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist[:-2] + (nodelist[-1],), 'ClipNode', ensureVisible=False, recNum=tempClip.number)
                                 # We accomplish this using the TreeCtrl's "add_note_nodes" method
                                 self.ControlObject.DataWindow.DBTab.tree.add_note_nodes(noteList, insertNode, Clip=tempClip.number)
                                 self.ControlObject.DataWindow.DBTab.tree.Refresh()
@@ -947,12 +1144,14 @@ class ChatWindow(wx.Frame):
                             tempSnapshot = Snapshot.Snapshot(nodelist[-1], parentNum)
                             # avoidRecursiveYields added to try to prevent a problem on the Mac when converting Searches
                             self.ControlObject.DataWindow.DBTab.tree.add_Node('SnapshotNode', (_('Collections'),) + nodelist, tempSnapshot.number, tempCollection.number, sortOrder=tempSnapshot.sort_order, expandNode=False, avoidRecursiveYields=True)
+                            # A new or copied Snapshot may already have Keywords.  Update the in-memory Keyword Index.
+                            KeywordIndex.RefreshObject('Snapshot', tempSnapshot.number)
                             # If we are moving a Snapshot, the snapshot's Notes need to travel with the Snapshot.  The first step is to
                             # get a list of those Notes.
                             noteList = DBInterface.list_of_notes(Snapshot=tempSnapshot.number)
                             # If there are Snapshot Notes, we need to make sure they travel with the Snapshot
                             if noteList != []:
-                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'SnapshotNode', ensureVisible=False)
+                                insertNode = self.ControlObject.DataWindow.DBTab.tree.select_Node((_('Collections'),) + nodelist, 'SnapshotNode', ensureVisible=False, recNum=tempSnapshot.number)
                                 # We accomplish this using the TreeCtrl's "add_note_nodes" method
                                 self.ControlObject.DataWindow.DBTab.tree.add_note_nodes(noteList, insertNode, Snapshot=tempSnapshot.number)
                                 self.ControlObject.DataWindow.DBTab.tree.Refresh()
@@ -1117,11 +1316,17 @@ class ChatWindow(wx.Frame):
                             # Get a temporary copy of the Clip.  We don't need the clip's transcript, which speeds this up.
                             tempClip = Clip.Clip(int(nodelist[0]), skipText=True)
                             self.ControlObject.DataWindow.DBTab.tree.add_Node('KeywordExampleNode', (_('Keywords'),) + nodelist[1:], tempClip.number, tempClip.collection_num, expandNode=False, avoidRecursiveYields = True)
+                            # Update the in-memory Keyword Index
+                            KeywordIndex.SetExample(nodelist[1], nodelist[2], tempClip.number, 1)
 
                         # Rename a Node
                         elif messageHeader == 'RN':
                             # Convert the Message to a Node List
                             nodelist = ConvertMessageToNodeList(message)
+                            # If a Keyword Group or Keyword is being renamed ...
+                            if nodelist[0] in ['KeywordGroupNode', 'KeywordNode']:
+                                # ... the in-memory Keyword Index needs to be re-loaded
+                                KeywordIndex.Invalidate()
                             # The first element in the nodelist is the nodeType, which we need for the rename_Node call.
                             # The second element in the nodelist is the UNTRANSLATED root node label.  This avoids problems
                             # in mixed-language environments.  But we now need to translate it.
@@ -1391,12 +1596,28 @@ class ChatWindow(wx.Frame):
                                 nodelist = nodelist[:-1]
                                 # ... and call delete_Node, passing the clip number.  We don't want messages sent further.
                                 self.ControlObject.DataWindow.DBTab.tree.delete_Node(nodelist[1:], nodelist[0], exampleClipNum = exampleClipNum, sendMessage=False)
+                                # Update the in-memory Keyword Index
+                                KeywordIndex.SetExample(nodelist[2], nodelist[3], exampleClipNum, 0)
                             # If we are removing any other kind of Node ...
                             else:
 
                                 # ... delete the node without passing further messages
                                 self.ControlObject.DataWindow.DBTab.tree.delete_Node(nodelist[1:], nodelist[0], sendMessage=False)
 
+                                # Update the in-memory Keyword Index.  If we're removing a Keyword Group ...
+                                if nodelist[0] == 'KeywordGroupNode':
+                                    # ... remove the Keyword Group's codings
+                                    KeywordIndex.RemoveKeywordGroup(nodelist[2])
+                                # If we're removing a Keyword ...
+                                elif nodelist[0] == 'KeywordNode':
+                                    # ... remove the Keyword's codings
+                                    KeywordIndex.RemoveKeyword(nodelist[2], nodelist[3])
+                                # If we're removing anything else, the object (or objects nested within it) may have
+                                # had Keywords applied ...
+                                else:
+                                    # ... so the in-memory Keyword Index needs to be re-loaded
+                                    KeywordIndex.Invalidate()
+
                             # If we're removing a Keyword Group ...
                             if nodelist[0] == 'KeywordGroupNode':
                                 # ... we need to update the Keyword Groups Data Structure
@@ -1505,6 +1726,14 @@ class ChatWindow(wx.Frame):
                         elif messageHeader == 'UKL':
                             # Parse the message at the space into object type and object number
                             msgData = message.split(' ')
+                            # If we know the object type ...
+                            if msgData[0] in KeywordIndex.OBJECT_TYPES:
+                                # ... update the object's Keywords in the in-memory Keyword Index
+                                KeywordIndex.RefreshObject(msgData[0], int(msgData[1]))
+                            # If not ...
+                            else:
+                                # ... the in-memory Keyword Index needs to be re-loaded
+                                KeywordIndex.Invalidate()
                             # See if the currently loaded object matches the object described in the message.
                             if ((isinstance(self.ControlObject.currentObj, Episode.Episode) and \
                                  (msgData[0] == 'Episode')) or \
@@ -1526,6 +1755,14 @@ class ChatWindow(wx.Frame):
                         elif messageHeader == 'UKV':
                             # Parse the message at the space into object type, object number, and possible Episode Number (if Clip)
                             msgData = message.split(' ')
+                            # If the message identifies a single object ...
+                            if (msgData[0] in KeywordIndex.OBJECT_TYPES) and (int(msgData[1]) > 0):
+                                # ... update that object's Keywords in the in-memory Keyword Index
+                                KeywordIndex.RefreshObject(msgData[0], int(msgData[1]))
+                            # If not ...
+                            else:
+                                # ... the in-memory Keyword Index needs to be re-loaded
+                                KeywordIndex.Invalidate()
                             # If no Object Type ...
                             if msgData[0] == 'None':
                                 # ... we need to update the keyword visualization no matter what.
@@ -1602,8 +1839,8 @@ class ChatWindow(wx.Frame):
                             # Inform the user of the unknown message.  This should never occur.
                             self.memo.AppendText('Unprocessed Message: "%s"\n' % event.data)
 
-                    # Unless we've just deleted it ...
-                    if messageHeader != 'DN':
+                    # Unless we've just deleted it, or we're processing a group of messages ...
+                    if (messageHeader != 'DN') and not self.deferSelectionRestore:
                         # First, de-select all items
                         self.ControlObject.DataWindow.DBTab.tree.UnselectAll()
                         for currNode in currentSelection:
@@ -1613,6 +1850,79 @@ class ChatWindow(wx.Frame):
                     if DEBUG:
                         print "We DON'T need to add an object, as we created it in the first place."
 
+    def OnMessageQueue(self, event):
+        """ Process all of the messages that have arrived from the Message Server since the Message Queue
+            was last processed """
+        # Lock the thread while we take the messages from the Message Queue
+        threadLock.acquire()
+        messages = self.messageQueue
+        self.messageQueue = []
+        threadLock.release()
+        # Replace Batch messages with the messages they contain ...
+        messages = ExpandBatchMessages(messages)
+        # ... and drop nodes that are added and then deleted again.
+        messages = CollapseMessages(messages, self.userName)
+        # A single message can just be processed
+        if (len(messages) == 1) or (self.ControlObject == None):
+            for message in messages:
+                self.OnPostMessage(PostMessageEvent(message))
+        elif len(messages) > 1:
+            # Get a pointer to the Tree Control
+            tree = self.ControlObject.DataWindow.DBTab.tree
+            # Count the Database Tree messages from other users
+            treeMessageCount = 0
+            for message in messages:
+                (messageHeader, messageSender, message) = SplitMessage(message)
+                if (not messageHeader in NON_TREE_MESSAGES) and (messageSender != self.userName):
+                    treeMessageCount += 1
+            # We can't have the tree selection changing because of the activity of other users.  Note the current selection
+            # so it can be restored once, after all the messages have been processed.
+            currentSelection = tree.GetSelections()
+            self.deferSelectionRestore = True
+            # Note whether a node has been deleted, in which case the selection may no longer exist
+            nodeDeleted = False
+            # If there are enough Database Tree messages that re-loading the tree is faster than applying them ...
+            refreshTree = (treeMessageCount > BATCH_REFRESH_THRESHOLD)
+            # Freeze the Database Tree so it isn't re-drawn after each message
+            tree.Freeze()
+            try:
+                for message in messages:
+                    (messageHeader, messageSender, tmpMessage) = SplitMessage(message)
+                    # If we're re-loading the tree, messages that only change the tree's structure can be skipped
+                    if refreshTree and (messageHeader in TREE_STRUCTURE_MESSAGES) and (messageSender != self.userName):
+                        continue
+                    if messageHeader == 'DN':
+                        nodeDeleted = True
+                    # If we're re-loading the tree, nodes these messages refer to may not be in the tree yet.  Don't
+                    # let a problem with one message stop us from processing the others.
+                    if refreshTree:
+                        try:
+                            self.OnPostMessage(PostMessageEvent(message))
+                        # The object the message refers to may have been deleted since the message was sent, or its
+                        # node may not be in the tree (or the tree's indexes) until the tree is re-loaded.
+                        except (TransanaExceptions.RecordNotFoundError, wx._core.PyAssertionError, KeyError, IndexError):
+                            if DEBUG:
+                                print "ChatWindow.OnMessageQueue():", sys.exc_info()[0], sys.exc_info()[1]
+                    else:
+                        self.OnPostMessage(PostMessageEvent(message))
+                # If we're re-loading the tree ...
+                if refreshTree:
+                    # ... re-load the Database Tree ...
+                    self.ControlObject.UpdateDataWindow()
+                    # ... and update the Keyword Groups Data Structure, which refers to tree nodes
+                    tree.updateKWGroupsData()
+                # If no nodes have been deleted and the tree hasn't been re-loaded, the original selection still exists
+                elif not nodeDeleted:
+                    # First, de-select all items
+                    tree.UnselectAll()
+                    for currNode in currentSelection:
+                        # ... now that we're done, we should re-select the originally-selected tree item
+                        tree.SelectItem(currNode)
+            finally:
+                # Thaw the Database Tree so it can be re-drawn
+                tree.Thaw()
+                self.deferSelectionRestore = False
+
     def OnMessageServerLost(self, event):
         dlg = Dialogs.ErrorDialog(None, _("Your connection to the Message Server has been lost.\nYou may have lost your connection to the network, or there may be a problem with the Server.\nPlease quit Transana immediately and resolve the problem."))
         dlg.ShowModal()
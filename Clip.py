@@ -36,6 +36,8 @@ import Collection
 import DataObject
 # Import the Transana Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Dialogs
 import Dialogs
 # Import Transana's Episode Object
@@ -281,6 +283,63 @@ class Clip(DataObject.DataObject):
         # Close the database cursor
         c.close()
 
+    @classmethod
+    def load_many(cls, nums, skipText=False, skipTranscriptText=False):
+        """ Load a list of Clips, including their Additional Media Files, Keywords, and Clip Transcripts, using a
+            constant number of database queries rather than several queries per Clip.  Returns a dictionary of
+            Clip objects keyed by Clip Number.  Clips that are not found in the database are left out.
+            skipText leaves out the Clip Transcripts.  skipTranscriptText loads the Clip Transcripts without their text. """
+        # Craft a query to get the Clip data
+        query = """
+        SELECT a.*, b.*
+          FROM Clips2 a, Collections2 b
+          WHERE a.ClipNum IN (%s) AND
+                a.CollectNum = b.CollectNum
+        """
+        # Initialize the results dictionary
+        clips = {}
+        # For each Clip record ...
+        for row in DBInterface.fetchall_named_by_nums(query, nums):
+            # ... create an empty Clip object.  (Clip Transcripts are loaded for all Clips at once below.)
+            tempClip = cls(skipText=True)
+            # ... load the data into the Clip object ...
+            tempClip._load_row(row)
+            # ... remember if we're supposed to skip the RTF Text ...
+            tempClip.skipText = skipText
+            # ... start with an empty Keyword list ...
+            tempClip._kwlist = []
+            # ... and add it to the results
+            clips[tempClip.number] = tempClip
+
+        # Get the Additional Media Files for all the Clips
+        query = """SELECT ClipNum, MediaFile, VidLength, Offset, Audio FROM AdditionalVids2
+                     WHERE ClipNum IN (%s) ORDER BY ClipNum, AddVidNum"""
+        for row in DBInterface.fetchall_named_by_nums(query, clips.keys()):
+            # Add each video to its Clip's additional media files list
+            clips[row['ClipNum']]._add_additional_vid(row['MediaFile'], row['VidLength'], row['Offset'], row['Audio'])
+
+        # Get the Keywords for all the Clips
+        kwLists = DBInterface.dictionary_of_keyword_lists('Clip', clips.keys())
+        # Add the Keywords to each Clip
+        for tempClip in clips.values():
+            for (kwg, kw, example) in kwLists[tempClip.number]:
+                tempClip._kwlist.append(ClipKeywordObject.ClipKeyword(kwg, kw, clipNum=tempClip.number, example=example))
+
+        # If we're NOT skipping the Transcripts ...
+        if not skipText:
+            # Get the list of Clip Transcripts for all the Clips
+            query = """SELECT TranscriptNum, ClipNum, SortOrder FROM Transcripts2
+                         WHERE ClipNum IN (%s) ORDER BY ClipNum, SortOrder"""
+            trList = DBInterface.fetchall_named_by_nums(query, clips.keys())
+            # Load all the Clip Transcripts at once
+            transcripts = Transcript.Transcript.load_many([row['TranscriptNum'] for row in trList], skipText=skipTranscriptText)
+            # Add the Transcripts to their Clips, in Sort Order
+            for row in trList:
+                if transcripts.has_key(row['TranscriptNum']):
+                    clips[row['ClipNum']].transcripts.append(transcripts[row['TranscriptNum']])
+        # Return the results
+        return clips
+
     def db_save(self, use_transactions=True):
         """Save the record to the database using Insert or Update as appropriate."""
 
@@ -534,6 +593,8 @@ class Clip(DataObject.DataObject):
             # Undo the database save transaction
             if use_transactions:
                 c.execute('ROLLBACK')
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
             # Close the Database Cursor
             c.close()
             # Complete the error prompt
@@ -589,6 +650,8 @@ class Clip(DataObject.DataObject):
                         if use_transactions:
                             # We must roll back the transaction before we unlock the record.
                             c.execute("ROLLBACK")
+                            # Undo the transaction's changes to the in-memory Keyword Index
+                            KeywordIndex.Rollback()
                         # Close the database cursor
                         c.close()
                         # unlock the Clip record
@@ -649,6 +712,8 @@ class Clip(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e
@@ -660,6 +725,20 @@ class Clip(DataObject.DataObject):
         """ Override the DataObject Lock Method """
         # Also lock the Clip Transcript records
 
+        # Make sure the Clip Transcripts can be locked along with the Clip
+        self._lock_group()
+
+        # For each transcript in the clip transcripts list ...
+        for tr in self.transcripts:
+            # ... lock the transcript
+            tr.lock_record()
+
+        # Lock the Clip Record.  Call this second so the Clip is not identified as locked if the
+        # Clip Transcript record lock fails.
+        DataObject.DataObject.lock_record(self)
+
+    def _lock_group(self):
+        """ Override the DataObject method.  The Clip Transcripts are locked along with the Clip. """
         # If we're skipping Transcripts but want to lock the Clip ...
         if self.skipText:
             # ... that's a programming error!  That should not be allowed!
@@ -681,14 +760,8 @@ class Clip(DataObject.DataObject):
                 # Raise an exception before locking any transcripts!
                 raise RecordLockedError(user=tr.record_lock)
 
-        # For each transcript in the clip transcripts list ...
-        for tr in self.transcripts:
-            # ... lock the transcript
-            tr.lock_record()
-
-        # Lock the Clip Record.  Call this second so the Clip is not identified as locked if the
-        # Clip Transcript record lock fails.
-        DataObject.DataObject.lock_record(self)
+        # Lock the Clip Transcripts with the Clip
+        return self.transcripts + [self]
             
 
     def unlock_record(self):
@@ -835,26 +908,31 @@ class Clip(DataObject.DataObject):
         c.execute(query, (self.number, ))
         # For each video in the query results ...
         for (vidFilename, vidLength, vidOffset, audio) in c.fetchall():
-            # Detection of the use of the Video Root Path is platform-dependent and must be done for EACH filename!
-            if wx.Platform == "__WXMSW__":
-                # On Windows, check for a colon in the position, which signals the presence or absence of a drive letter
-                useVideoRoot = (vidFilename[1] != ':') and (vidFilename[:2] != '//')
-            else:
-                # On Mac OS-X and *nix, check for a slash in the first position for the root folder designation
-                useVideoRoot = (vidFilename[0] != '/')
-            # If we are using the Video Root Path, add it to the Filename
-            if useVideoRoot:
-                video = TransanaGlobal.configData.videoPath.replace('\\', '/') + DBInterface.ProcessDBDataForUTF8Encoding(vidFilename)
-            else:
-                video = DBInterface.ProcessDBDataForUTF8Encoding(vidFilename)
-            # Add the video to the additional media files list
-            self.additional_media_files = {'filename' : video,
-                                           'length'   : vidLength,
-                                           'offset'   : vidOffset,
-                                           'audio'    : audio}
+            # ... add the video to the additional media files list
+            self._add_additional_vid(vidFilename, vidLength, vidOffset, audio)
         # Close the database cursor
         c.close()
 
+    def _add_additional_vid(self, vidFilename, vidLength, vidOffset, audio):
+        """ Add an additional media file, as loaded from the database, to the additional media files list """
+        # Detection of the use of the Video Root Path is platform-dependent and must be done for EACH filename!
+        if wx.Platform == "__WXMSW__":
+            # On Windows, check for a colon in the position, which signals the presence or absence of a drive letter
+            useVideoRoot = (vidFilename[1] != ':') and (vidFilename[:2] != '//')
+        else:
+            # On Mac OS-X and *nix, check for a slash in the first position for the root folder designation
+            useVideoRoot = (vidFilename[0] != '/')
+        # If we are using the Video Root Path, add it to the Filename
+        if useVideoRoot:
+            video = TransanaGlobal.configData.videoPath.replace('\\', '/') + DBInterface.ProcessDBDataForUTF8Encoding(vidFilename)
+        else:
+            video = DBInterface.ProcessDBDataForUTF8Encoding(vidFilename)
+        # Add the video to the additional media files list
+        self.additional_media_files = {'filename' : video,
+                                       'length'   : vidLength,
+                                       'offset'   : vidOffset,
+                                       'audio'    : audio}
+
     def remove_an_additional_vid(self, indx):
         """ remove ONE additional media file from the list of additional media files """
         del(self._additional_media[indx])
@@ -94,17 +94,31 @@ class ClipKeyword(object):
         # NOTE:  This routine, at present, is ONLY used by the Database Import routine.
         #        Therefore, it does no checking for duplicate records.  If you want to
         #        use it for other purposes, you probably have to make it smarter!
+        ClipKeyword.db_save_many([self])
 
-        # If we're using Unicode ...
-        if 'unicode' in wx.PlatformInfo:
-            # ... encode the text fields for this object
-            keywordGroup = self.keywordGroup.encode(TransanaGlobal.encoding)
-            keyword = self.keyword.encode(TransanaGlobal.encoding)
-        # If we're not using Unicode ...
-        else:
-            # ... no encoding is needed
-            keywordGroup = self.keywordGroup
-            keyword = self.keyword
+    @classmethod
+    def db_save_many(cls, clipKeywords):
+        """ Saves a list of ClipKeyword records to the Database with a single query.  Like db_save(),
+            this does no checking for duplicate records. """
+        # Prepare the Data Values for the query
+        values = []
+        # For each Clip Keyword ...
+        for clipKeyword in clipKeywords:
+            # If we're using Unicode ...
+            if 'unicode' in wx.PlatformInfo:
+                # ... encode the text fields for this object
+                keywordGroup = clipKeyword.keywordGroup.encode(TransanaGlobal.encoding)
+                keyword = clipKeyword.keyword.encode(TransanaGlobal.encoding)
+            # If we're not using Unicode ...
+            else:
+                # ... no encoding is needed
+                keywordGroup = clipKeyword.keywordGroup
+                keyword = clipKeyword.keyword
+            values.append((clipKeyword.documentNum, clipKeyword.episodeNum, clipKeyword.quoteNum, clipKeyword.clipNum,
+                           clipKeyword.snapshotNum, keywordGroup, keyword, clipKeyword.example))
+        # If there's nothing to save, we're done
+        if len(values) == 0:
+            return
         # Get a Database Cursor
         dbCursor = DBInterface.get_db().cursor()
         # Create the Insert Query
@@ -114,10 +128,8 @@ class ClipKeyword(object):
                         (%s, %s, %s, %s, %s, %s, %s, %s) """
         # Adjust the query for sqlite if needed
         SQLText = DBInterface.FixQuery(SQLText)
-        # Prepare the Data Values for the query
-        values = (self.documentNum, self.episodeNum, self.quoteNum, self.clipNum, self.snapshotNum, keywordGroup, keyword, self.example)
         # Execute the Query
-        dbCursor.execute(SQLText, values)
+        dbCursor.executemany(SQLText, values)
         # Close the Database Cursor
         dbCursor.close()
     
@@ -32,6 +32,8 @@ import Clip
 import DataObject
 # import Transana's Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Note Object
 import Note
 # import Transana's Quote object
@@ -345,6 +347,8 @@ class Collection(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
 
                 if DEBUG:
                     print "Collection: roll back Transaction"
@@ -83,6 +83,7 @@ class ConfigData(object):
         str += 'tabSize = %s\n' % self.tabSize
         str += 'wordWrap = %s\n' % self.wordWrap
         str += 'autoSave = %s\n' % self.autoSave
+        str += 'lazyDatabaseTree = %s\n' % self.lazyDatabaseTree
         str += 'maxTranscriptImageWidth = %s\n' % self.maxTranscriptImageWidth
         str = str + 'defaultFontFace = %s\n' % self.defaultFontFace
         str = str + 'defaultFontSize = %s\n' % self.defaultFontSize
@@ -213,6 +214,8 @@ class ConfigData(object):
             self.wordWrap = config.ReadInt('/2.0/WordWrap', stc.STC_WRAP_WORD)
             # Load the Auto Save setting
             self.autoSave = config.ReadInt('2.0/AutoSave', True)
+            # Load the Lazy Database Tree setting
+            self.lazyDatabaseTree = config.ReadInt('2.0/LazyDatabaseTree', True)
             # Load Max Transcript Image Width
             self.maxTranscriptImageWidth = config.ReadInt('2.0/MaxTranscriptImageWidth', 1)
             # Load Default Font Face Setting
@@ -323,6 +326,8 @@ class ConfigData(object):
             self.wordWrap = stc.STC_WRAP_WORD
             # Auto Save
             self.autoSave = True
+            # Lazy Database Tree loading
+            self.lazyDatabaseTree = True
             # Max Transcript Image Width
             self.maxTranscriptImageWidth = 1
             # Language setting
@@ -556,6 +561,8 @@ class ConfigData(object):
         config.WriteInt('/2.0/WordWrap', self.wordWrap)
         # Save the AutoSave Setting
         config.WriteInt('/2.0/AutoSave', self.autoSave)
+        # Save the Lazy Database Tree Setting
+        config.WriteInt('/2.0/LazyDatabaseTree', self.lazyDatabaseTree)
         # Save the Max Transcript Image Width Setting
         config.WriteInt('/2.0/MaxTranscriptImageWidth', self.maxTranscriptImageWidth)
         # Save Default Font Face Setting
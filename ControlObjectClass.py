@@ -3605,20 +3605,24 @@ class ControlObject(object):
                     # ... we really can stop looking!
                     break
 
-        # Get the Quote Data from the Database
-        data = DBInterface.list_of_quotes_by_document(documentNum, textPos, textSel)
-
-        # Iterate through the list of quotes found in the DATABASE.  We need to go backwards because we may
-        # delete some elements, which screws up list iteration otherwise
-        for x in range(len(data)-1, -1, -1):
-            # If the Quote is in the LIVE document ...
-            if data[x]['QuoteNum'] in docFound.quote_dict.keys():
-                # ... use the live document's quote positions
-                (data[x]['StartChar'], data[x]['EndChar']) = docFound.quote_dict[data[x]['QuoteNum']]
-            # If the quote has been deleted from the LIVE Document ...
-            else:
-                # ... drop it from the Database List
-                del(data[x])
+        # If the Document isn't open ...
+        if docFound == None:
+            # ... just get the Quote Data from the Database
+            return DBInterface.list_of_quotes_by_document(documentNum, textPos, textSel)
+
+        # Use the LIVE document's Quote Position Index to find the Quotes at the text position or selection.  (The
+        # positions in the database may be out of date if the document has been edited.)  Quotes that have been
+        # deleted from the LIVE document are not in the index.
+        quoteNums = docFound.quote_dict.QuotesContaining(textPos, textSel)
+        # Get the rest of the Quote Data for those Quotes from the Database
+        data = DBInterface.list_of_quotes_by_document(documentNum, quoteNums=quoteNums)
+
+        # Iterate through the list of quotes found in the DATABASE
+        for quote in data:
+            # ... use the live document's quote positions
+            (quote['StartChar'], quote['EndChar']) = docFound.quote_dict[quote['QuoteNum']]
+        # Sort the Quotes the way the database would, using the live positions
+        data.sort(key=lambda quote: (quote['StartChar'], quote['CollectID'], quote['QuoteID']))
         
         return data
 
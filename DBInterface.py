@@ -25,6 +25,8 @@ if DEBUG:
 
 # import Transana's Constants
 import TransanaConstants
+# import the python DateTime module
+import datetime
 
 if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server']:
     # import MySQLdb
@@ -37,8 +39,6 @@ elif TransanaConstants.DBInstalled in ['PyMySQL']:
 elif TransanaConstants.DBInstalled in ['sqlite3']:
     # import sqlite
     import sqlite3
-    # import the python DateTime module
-    import datetime
 else:
     import TransanaExceptions
     raise TransanaExceptions.ProgrammingError('No Database Module loaded in DBInterface.py.')
@@ -66,6 +66,8 @@ import os
 import sys
 # import Python's string module
 import string
+# import Python's threading module
+import threading
 # import Transana's Clip object
 import Clip
 # import Transana's Collection Object
@@ -90,10 +92,23 @@ import TransanaGlobal
 import TransanaExceptions
 # Import Transana's Transcript Object
 import Transcript
+# Import Transana's in-memory Keyword Index
+import KeywordIndex
 
 # Declare Global Variables
 # Database Reference
 _dbref = None
+# The parameters the Database Reference was opened with, and the Database Name
+_connectParameters = None
+_connectDatabase = None
+# The Database Reference used by background threads.  (See get_worker_db().)
+_workerDBRef = None
+# The lock a background thread holds while it uses the background Database Reference
+workerDBLock = threading.Lock()
+# The difference between the Database Server's clock and the local clock.  (See ServerDateTime().)
+_serverTimeOffset = None
+# The number of records LockRecords() locks with a single UPDATE.  (sqlite allows 999 query parameters.)
+LOCK_BATCH_SIZE = 500
 
 def InitializeSingleUserDatabase():
     """ For single-user Transana only, this initializes (starts) the embedded MySQL Server. """
@@ -889,6 +904,199 @@ def CreateAdditionalVidsTableQuery(num):
     return query % (num, autoIncrementSyntax)
 
 
+# Secondary Indexes.  The Create*TableQuery() methods above only define Primary Keys, but nearly all of
+# Transana's queries select records by their parent's record number or by Keyword.  These indexes are
+# created (and maintained) by UpdateIndexes(), which is called from establish_db_exists().
+# NOTE:  If you change this list, you MUST increment INDEX_VERSION so existing databases get updated!
+INDEX_VERSION = 1
+# Each entry is (Index Name, Table Name, (Column Names))
+INDEX_DEFINITIONS = [('idxEpisodesSeriesNum',            'Episodes2',             ('SeriesNum', )),
+                     ('idxTranscriptsEpisodeNum',        'Transcripts2',          ('EpisodeNum', )),
+                     ('idxTranscriptsClipNum',           'Transcripts2',          ('ClipNum', )),
+                     ('idxTranscriptsSourceTranscript',  'Transcripts2',          ('SourceTranscriptNum', )),
+                     ('idxCollectionsParentCollectNum',  'Collections2',          ('ParentCollectNum', )),
+                     ('idxClipsEpisodeNum',              'Clips2',                ('EpisodeNum', 'ClipStart')),
+                     ('idxClipsCollectNum',              'Clips2',                ('CollectNum', )),
+                     ('idxSnapshotsEpisodeNum',          'Snapshots2',            ('EpisodeNum', )),
+                     ('idxSnapshotsTranscriptNum',       'Snapshots2',            ('TranscriptNum', )),
+                     ('idxSnapshotsCollectNum',          'Snapshots2',            ('CollectNum', )),
+                     ('idxDocumentsLibraryNum',          'Documents2',            ('LibraryNum', )),
+                     ('idxQuotesSourceDocumentNum',      'Quotes2',               ('SourceDocumentNum', )),
+                     ('idxQuotesCollectNum',             'Quotes2',               ('CollectNum', )),
+                     ('idxQuotePositionsDocumentNum',    'QuotePositions2',       ('DocumentNum', 'StartChar')),
+                     ('idxNotesSeriesNum',               'Notes2',                ('SeriesNum', )),
+                     ('idxNotesEpisodeNum',              'Notes2',                ('EpisodeNum', )),
+                     ('idxNotesCollectNum',              'Notes2',                ('CollectNum', )),
+                     ('idxNotesClipNum',                 'Notes2',                ('ClipNum', )),
+                     ('idxNotesSnapshotNum',             'Notes2',                ('SnapshotNum', )),
+                     ('idxNotesTranscriptNum',           'Notes2',                ('TranscriptNum', )),
+                     ('idxNotesDocumentNum',             'Notes2',                ('DocumentNum', )),
+                     ('idxNotesQuoteNum',                'Notes2',                ('QuoteNum', )),
+                     ('idxClipKeywordsKeyword',          'ClipKeywords2',         ('KeywordGroup', 'Keyword')),
+                     ('idxClipKeywordsEpisodeNum',       'ClipKeywords2',         ('EpisodeNum', )),
+                     ('idxClipKeywordsDocumentNum',      'ClipKeywords2',         ('DocumentNum', )),
+                     ('idxClipKeywordsClipNum',          'ClipKeywords2',         ('ClipNum', )),
+                     ('idxClipKeywordsQuoteNum',         'ClipKeywords2',         ('QuoteNum', )),
+                     ('idxClipKeywordsSnapshotNum',      'ClipKeywords2',         ('SnapshotNum', )),
+                     ('idxSnapshotKeywordsSnapshotNum',  'SnapshotKeywords2',     ('SnapshotNum', )),
+                     ('idxSnapshotKeywordsKeyword',      'SnapshotKeywords2',     ('KeywordGroup', 'Keyword')),
+                     ('idxSnapshotKeywordStylesKeyword', 'SnapshotKeywordStyles2', ('KeywordGroup', 'Keyword')),
+                     ('idxAdditionalVidsEpisodeNum',     'AdditionalVids2',       ('EpisodeNum', )),
+                     ('idxAdditionalVidsClipNum',        'AdditionalVids2',       ('ClipNum', ))]
+
+def CreateIndexQuery(indexName, tableName, columns):
+    """ Create query for adding a secondary index to a table """
+    # If we are using a MySQL database ...
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        # ... MySQL does not support "IF NOT EXISTS" for indexes, so UpdateIndexes() must check first.
+        query = "ALTER TABLE %s ADD INDEX %s (%s)" % (tableName, indexName, ', '.join(columns))
+    # If we are using the sqlite database ...
+    elif TransanaConstants.DBInstalled in ['sqlite3']:
+        # ... use the sqlite syntax
+        query = "CREATE INDEX IF NOT EXISTS %s ON %s (%s)" % (indexName, tableName, ', '.join(columns))
+    # Return the query to the calling routine
+    return query
+
+def DropIndexQuery(indexName, tableName):
+    """ Create query for removing a secondary index from a table """
+    # If we are using a MySQL database ...
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        # ... use the MySQL syntax
+        query = "ALTER TABLE %s DROP INDEX %s" % (tableName, indexName)
+    # If we are using the sqlite database ...
+    elif TransanaConstants.DBInstalled in ['sqlite3']:
+        # ... use the sqlite syntax
+        query = "DROP INDEX IF EXISTS %s" % indexName
+    # Return the query to the calling routine
+    return query
+
+def list_of_table_indexes(dbCursor, tableName):
+    """ Return a list of the names of the indexes that currently exist on the specified table """
+    # Initialize the results list
+    results = []
+    # If we are using a MySQL database ...
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        # ... SHOW INDEX returns one row per index column, with the index name in the third column
+        dbCursor.execute("SHOW INDEX FROM %s" % tableName)
+        indexCol = 2
+    # If we are using the sqlite database ...
+    elif TransanaConstants.DBInstalled in ['sqlite3']:
+        # ... PRAGMA index_list returns one row per index, with the index name in the second column
+        dbCursor.execute("PRAGMA index_list(%s)" % tableName)
+        indexCol = 1
+    for row in dbCursor.fetchall():
+        # Check for "array" data and convert if needed
+        if type(row[indexCol]).__name__ == 'array':
+            indexName = row[indexCol].tostring()
+        else:
+            indexName = row[indexCol]
+        # Add each index only once, even if it spans multiple columns
+        if not indexName in results:
+            results.append(indexName)
+    # Return the results list
+    return results
+
+def VerifyIndexes(dbCursor=None):
+    """ Check the database for Transana's secondary indexes.  Returns a list of (Index Name, Table Name)
+        tuples for the indexes that are missing. """
+    # If no cursor was passed in ...
+    if dbCursor == None:
+        # ... get one, and remember to close it when we're done
+        dbCursor = get_db().cursor()
+        closeCursor = True
+    else:
+        closeCursor = False
+    # Initialize the results list
+    missing = []
+    # We cache the index list for each table so we only have to ask the database once per table
+    tableIndexes = {}
+    # For each index Transana should have ...
+    for (indexName, tableName, columns) in INDEX_DEFINITIONS:
+        # If we haven't looked at this table yet ...
+        if not tableIndexes.has_key(tableName):
+            # ... get the list of indexes that exist for it
+            tableIndexes[tableName] = list_of_table_indexes(dbCursor, tableName)
+        # If the index is not present ...
+        if not indexName in tableIndexes[tableName]:
+            # ... add it to the list of missing indexes
+            missing.append((indexName, tableName))
+    # If we created the cursor ...
+    if closeCursor:
+        # ... close it
+        dbCursor.close()
+    # Return the list of missing indexes
+    return missing
+
+def UpdateIndexes(dbCursor=None, rebuild=False):
+    """ Create any of Transana's secondary indexes that are missing from the database and record the
+        INDEX_VERSION in the ConfigInfo table.  If rebuild is True, existing indexes are dropped and
+        re-created, which is the "verify/rebuild" maintenance operation.  Returns the number of indexes
+        created. """
+    # If no cursor was passed in ...
+    if dbCursor == None:
+        # ... get one, and remember to close it when we're done
+        dbCursor = get_db().cursor()
+        closeCursor = True
+    else:
+        closeCursor = False
+    # If we're rebuilding ...
+    if rebuild:
+        # ... every index needs to be created
+        missing = [(indexName, tableName) for (indexName, tableName, columns) in INDEX_DEFINITIONS]
+    # If we're not rebuilding ...
+    else:
+        # ... only the missing indexes need to be created
+        missing = VerifyIndexes(dbCursor)
+    # Initialize the count of indexes created
+    count = 0
+    # Iterate through the index definitions so indexes are created in a predictable order
+    for (indexName, tableName, columns) in INDEX_DEFINITIONS:
+        # Skip indexes that are already in place
+        if not (indexName, tableName) in missing:
+            continue
+        # If we're rebuilding, and the index exists ...
+        if rebuild and (indexName in list_of_table_indexes(dbCursor, tableName)):
+            # ... drop the existing index
+            dbCursor.execute(DropIndexQuery(indexName, tableName))
+        # Get the query to create the index
+        query = CreateIndexQuery(indexName, tableName, columns)
+        # If we're using MySQL ...
+        if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+            try:
+                # ... MySQL 5.6 and later can build the index without blocking other users of the table
+                dbCursor.execute(query + ", ALGORITHM=INPLACE, LOCK=NONE")
+            except:
+                # Older MySQL versions don't support online index creation, so use the locking form
+                dbCursor.execute(query)
+        # If we're using sqlite ...
+        else:
+            # ... just create the index
+            dbCursor.execute(query)
+        # Count the index
+        count += 1
+
+    # Now record the Index Version in the Configuration Information table
+    query = "SELECT Value FROM ConfigInfo WHERE KeyVal = 'IndexVersion'"
+    dbCursor.execute(query)
+    # If there is no Index Version record yet ...
+    if len(dbCursor.fetchall()) == 0:
+        # ... create one
+        query = "INSERT INTO ConfigInfo (KeyVal, Value) VALUES ('IndexVersion', %s)"
+    # If there IS an Index Version record ...
+    else:
+        # ... update it
+        query = "UPDATE ConfigInfo SET Value = %s WHERE KeyVal = 'IndexVersion'"
+    # Adjust the query for sqlite if needed
+    query = FixQuery(query)
+    dbCursor.execute(query, ('%d' % INDEX_VERSION, ))
+
+    # If we created the cursor ...
+    if closeCursor:
+        # ... close it
+        dbCursor.close()
+    # Return the number of indexes created
+    return count
+
 def establish_db_exists(dbToOpen=None, usePrompt=True):
     """ Check for the existence of all database tables and create them
         if necessary.  dbToOpen is passed if we are automatically importing a database
@@ -1598,6 +1806,16 @@ def establish_db_exists(dbToOpen=None, usePrompt=True):
                         # signal failure to connect to the database
                         return False
 
+        # Now check the version of Transana's secondary indexes, stored in the ConfigInfo table
+        query = "SELECT Value FROM ConfigInfo WHERE KeyVal = 'IndexVersion'"
+        # Execute the Query
+        dbCursor.execute(query)
+        data = dbCursor.fetchall()
+        # If the indexes have never been created, or were created from an older index definition ...
+        if (len(data) == 0) or (int(data[0][0]) < INDEX_VERSION):
+            # ... create (or add) the secondary indexes.  Existing indexes are left in place.
+            UpdateIndexes(dbCursor)
+
         # See if this (username, server, database) combination has defined paths.
         if TransanaGlobal.configData.pathsByDB.has_key((TransanaGlobal.userName.encode('utf8'), TransanaGlobal.configData.host.encode('utf8'), TransanaGlobal.configData.database.encode('utf8'))):
             # If so, load the video root and visualization paths.
@@ -1712,7 +1930,7 @@ def UpdateTranscriptRecsfor240(self):
 def get_db(dbToOpen=None, usePrompt=True):
     """ Get a connection object reference to the database.  If a connection has not yet been established, then create the connection.
         dbToOpen is passed if we are automatically importing a database following 2.42 to 2.50 Data Conversion. """
-    global _dbref
+    global _dbref, _connectParameters, _connectDatabase
     # If a database reference is not defined ...
     if (_dbref == None):
         # If we are NOT passed a database name, we need to get information from the user.
@@ -1804,7 +2022,9 @@ def get_db(dbToOpen=None, usePrompt=True):
                 # If we should connect to the database ...
                 if result == wx.ID_YES:
                     # ... connect to it.
-                    _dbref = sqlite3.connect(dbName.encode('utf8'))
+                    _connectParameters = {'database' : dbName.encode('utf8')}
+                    _connectDatabase = databaseName
+                    _dbref = sqlite3.connect(**_connectParameters)
                     # Enable AutoCommit
                     _dbref.isolation_level = None
                     # Have sqlite use Strings rather than Unicode, as all fields in Transana are manually encoded
@@ -1832,10 +2052,12 @@ def get_db(dbToOpen=None, usePrompt=True):
                         if TransanaConstants.DBInstalled in ['MySQLdb-embedded']:
                             if 'unicode' in wx.PlatformInfo:
                                 # The single-user version requires no parameters
-                                _dbref = MySQLdb.connect(use_unicode=True)
+                                _connectParameters = {'use_unicode' : True}
+                                _dbref = MySQLdb.connect(**_connectParameters)
                             else:
                                 # The single-user version requires no parameters
-                                _dbref = MySQLdb.connect()
+                                _connectParameters = {}
+                                _dbref = MySQLdb.connect(**_connectParameters)
                         elif TransanaConstants.DBInstalled in ['sqlite3']:
                             pass
                     else:
@@ -1870,7 +2092,9 @@ def get_db(dbToOpen=None, usePrompt=True):
                                     print sslData
                                 
                                 # Use MySQLdb to establish the SSL and Unicode connection to the database server
-                                _dbref = MySQLdb.connect(host=dbServer, user=userName, passwd=password, port=int(port), use_unicode=True, ssl=sslData)
+                                _connectParameters = {'host' : dbServer, 'user' : userName, 'passwd' : password, 'port' : int(port),
+                                                      'use_unicode' : True, 'ssl' : sslData}
+                                _dbref = MySQLdb.connect(**_connectParameters)
 
                                 if DEBUG:
                                     print "Connected 1"
@@ -1878,13 +2102,16 @@ def get_db(dbToOpen=None, usePrompt=True):
                             # If we're NOT requesting an SSL Connection ...
                             else:
                                 # ... use MySQLdb to establish the Unicode connection to the database server without SSL
-                                _dbref = MySQLdb.connect(host=dbServer, user=userName, passwd=password, port=int(port), use_unicode=True)
+                                _connectParameters = {'host' : dbServer, 'user' : userName, 'passwd' : password, 'port' : int(port),
+                                                      'use_unicode' : True}
+                                _dbref = MySQLdb.connect(**_connectParameters)
 
                                 if DEBUG:
                                     print "Connected 2"
                         else:
                             # The multi-user version requires all information to connect to the database server
-                            _dbref = MySQLdb.connect(host=dbServer, user=userName, passwd=password, port=int(port))
+                            _connectParameters = {'host' : dbServer, 'user' : userName, 'passwd' : password, 'port' : int(port)}
+                            _dbref = MySQLdb.connect(**_connectParameters)
 
                             if DEBUG:
                                 print "Connected 3"
@@ -1989,10 +2216,12 @@ def get_db(dbToOpen=None, usePrompt=True):
                             # Re-establish a connection to the Database Server.
                             if 'unicode' in wx.PlatformInfo:
                                 # The single-user version requires no parameters
-                                _dbref = MySQLdb.connect(use_unicode=True)
+                                _connectParameters = {'use_unicode' : True}
+                                _dbref = MySQLdb.connect(**_connectParameters)
                             else:
                                 # The single-user version requires no parameters
-                                _dbref = MySQLdb.connect()
+                                _connectParameters = {}
+                                _dbref = MySQLdb.connect(**_connectParameters)
                             # We need to know what the max allowed packet size is later, so save it to the Globals
                             TransanaGlobal.max_allowed_packet = long(desiredPacket * 1024 * 1024)
                         # If we have the multi-user version ...
@@ -2065,22 +2294,14 @@ def get_db(dbToOpen=None, usePrompt=True):
                                 # ... and get out of here.
                                 return None
 
+                        # Remember the Database Name, so background threads can open it too
+                        _connectDatabase = databaseName
                         # If we have MySQL 4.1 or later, we have UTF-8 support and should use it.
                         if TransanaGlobal.DBVersion >= u'4.1':
                             # Get a Database Cursor
                             dbCursor = _dbref.cursor()
-                            # Set Character Encoding settings
-                            dbCursor.execute('SET CHARACTER SET utf8')
-                            dbCursor.execute('SET character_set_connection = utf8')
-                            dbCursor.execute('SET character_set_client = utf8')
-                            dbCursor.execute('SET character_set_server = utf8')
-                            dbCursor.execute('SET character_set_database = utf8')
-                            dbCursor.execute('SET character_set_results = utf8')
-                            dbCursor.execute('SET collation_connection = utf8_general_ci')
-                            dbCursor.execute('SET collation_database = utf8_general_ci')
-                            dbCursor.execute('SET collation_server = utf8_general_ci')
-                            
-                            dbCursor.execute('USE %s' % databaseName.encode('utf8'))
+                            # Set Character Encoding settings and select the database
+                            UseDatabaseUTF8(dbCursor, databaseName)
                             # Set the global character encoding to UTF-8
                             TransanaGlobal.encoding = 'utf8'
                         # If we're using MySQL 4.0 or earlier, we lack UTF-8 support, so should use 
@@ -2296,9 +2517,69 @@ def close_db():
         # Close the Database itself
         db.close()
 
-    global _dbref
+    # The in-memory Keyword Index belongs to this database connection, so discard it
+    KeywordIndex.Invalidate()
+
+    global _dbref, _serverTimeOffset, _connectParameters, _connectDatabase, _workerDBRef
     # Remove all reference to the database
     _dbref = None
+    _connectParameters = None
+    _connectDatabase = None
+    # Close the background threads' connection too, once no background thread is using it
+    workerDBLock.acquire()
+    try:
+        if _workerDBRef != None:
+            _workerDBRef.close()
+        _workerDBRef = None
+    finally:
+        workerDBLock.release()
+    # The next database may be on a different server, with a different clock
+    _serverTimeOffset = None
+
+
+def UseDatabaseUTF8(dbCursor, databaseName):
+    """ Set a MySQL 4.1 or later connection to use UTF-8, and select the database """
+    # Set Character Encoding settings
+    dbCursor.execute('SET CHARACTER SET utf8')
+    dbCursor.execute('SET character_set_connection = utf8')
+    dbCursor.execute('SET character_set_client = utf8')
+    dbCursor.execute('SET character_set_server = utf8')
+    dbCursor.execute('SET character_set_database = utf8')
+    dbCursor.execute('SET character_set_results = utf8')
+    dbCursor.execute('SET collation_connection = utf8_general_ci')
+    dbCursor.execute('SET collation_database = utf8_general_ci')
+    dbCursor.execute('SET collation_server = utf8_general_ci')
+
+    dbCursor.execute('USE %s' % databaseName.encode('utf8'))
+
+def get_worker_db():
+    """ Get a connection to the database for use by background threads, which must not use the main thread's
+        connection.  The connection is opened with the same parameters as the main connection the first time it
+        is needed, and is closed by close_db().  Background threads share it, so a thread must hold workerDBLock
+        while it uses the connection.  Returns None if no database is open. """
+    global _workerDBRef
+    # If the background connection hasn't been opened yet, and we know how to open it ...
+    if (_workerDBRef == None) and (_connectParameters != None):
+        # If we're using sqlite ...
+        if TransanaConstants.DBInstalled in ['sqlite3']:
+            # ... connect to the database file.  The connection is used by one background thread after another.
+            _workerDBRef = sqlite3.connect(check_same_thread=False, **_connectParameters)
+            # Enable AutoCommit
+            _workerDBRef.isolation_level = None
+            # Have sqlite use Strings rather than Unicode, as all fields in Transana are manually encoded
+            _workerDBRef.text_factory = str
+        # If we're using MySQL ...
+        else:
+            # ... connect to the Database Server ...
+            _workerDBRef = MySQLdb.connect(**_connectParameters)
+            dbCursor = _workerDBRef.cursor()
+            # ... and select the database, using the same encoding as the main connection
+            if TransanaGlobal.DBVersion >= u'4.1':
+                UseDatabaseUTF8(dbCursor, _connectDatabase)
+            else:
+                dbCursor.execute('USE %s', (_connectDatabase.encode(TransanaGlobal.encoding), ))
+            dbCursor.close()
+    return _workerDBRef
 
 
 def get_username():
@@ -2369,12 +2650,19 @@ def list_of_episodes_for_series(LibraryName):
     DBCursor.close()
     return l
 
-def list_of_episode_transcripts():
-    """ Get a list of all Episode Transcript records. """
+def list_of_episode_transcripts(libraryNum=None):
+    """ Get a list of all Episode Transcript records, or only those for the specified Library. """
     # Create an empty list
     l = []
     # Define the Query.  We only want Episode Transcripts, not Clip Transcripts.
-    query = "SELECT TranscriptNum, TranscriptID, EpisodeNum FROM Transcripts2 WHERE ClipNum = 0 ORDER BY TranscriptID"
+    if libraryNum != None:
+        query = """SELECT TranscriptNum, TranscriptID, t.EpisodeNum FROM Transcripts2 t, Episodes2 e
+                     WHERE t.EpisodeNum = e.EpisodeNum AND
+                           t.ClipNum = 0 AND
+                           e.SeriesNum = %d
+                     ORDER BY TranscriptID""" % libraryNum
+    else:
+        query = "SELECT TranscriptNum, TranscriptID, EpisodeNum FROM Transcripts2 WHERE ClipNum = 0 ORDER BY TranscriptID"
     # Get a Database Cursor
     DBCursor = get_db().cursor()
     # Execute the Query
@@ -2559,6 +2847,131 @@ def list_of_all_collections():
     # Return the List as the function result
     return l
 
+def list_of_collection_subtree(collectionNum=0):
+    """Get a list of the specified collection and all collections nested within it, at any depth.  If
+       collectionNum is 0, all collections are returned.  All Collection records are fetched in a single
+       query and the nesting is expanded in memory.  Results are (CollectNum, CollectID, ParentCollectNum)
+       tuples, in breadth-first order."""
+    # Get ALL collections in one query
+    allCollections = list_of_all_collections()
+    # Build a dictionary of child collections keyed by Parent Collection Number
+    children = {}
+    for collRec in allCollections:
+        # Top-level collections may have a ParentCollectNum of 0 or NULL.  Treat them the same.
+        if collRec[2] == None:
+            parentNum = 0
+        else:
+            parentNum = collRec[2]
+        children.setdefault(parentNum, []).append(collRec)
+    # If we want the Collection Root ...
+    if collectionNum == 0:
+        # ... start with the top-level collections
+        l = list(children.get(0, []))
+    # If we want a specific Collection ...
+    else:
+        # ... start with that collection's record
+        l = [collRec for collRec in allCollections if collRec[0] == collectionNum]
+    # Iterate through the results list, which grows as we go, adding each collection's children
+    index = 0
+    while index < len(l):
+        l += children.get(l[index][0], [])
+        index += 1
+    # Return the List as the function result
+    return l
+
+def _collection_number_list(collectionNums):
+    """ Build an SQL IN list of Collection Numbers.  The numbers are formatted as integers, so they are safe
+        to include in the query directly. """
+    return ', '.join(['%d' % collectNum for collectNum in collectionNums])
+
+def list_of_quotes_by_collectionnums(collectionNums=None):
+    """Get a list of all Quotes in ANY of the collections in the collectionNums list, in a single query.
+       If collectionNums is None, all Quotes in all Collections are returned.  Results are
+       (QuoteNum, QuoteID, CollectNum, SourceDocumentNum) tuples, like list_of_quotes_by_collectionnum()."""
+    quoteList = []
+    # An empty collection list has no quotes
+    if (collectionNums != None) and (len(collectionNums) == 0):
+        return quoteList
+    query = """ SELECT QuoteNum, QuoteID, CollectNum, SortOrder, SourceDocumentNum
+                FROM Quotes2 """
+    if collectionNums != None:
+        query += "WHERE CollectNum IN (%s) " % _collection_number_list(collectionNums)
+    query += "ORDER BY CollectNum, SortOrder, QuoteID "
+    cursor = get_db().cursor()
+    cursor.execute(query)
+    for (quoteNum, quoteID, collectNum, sortOrder, sourceDocNum) in cursor.fetchall():
+        id = quoteID
+        if 'unicode' in wx.PlatformInfo:
+            id = ProcessDBDataForUTF8Encoding(id)
+        quoteList.append((quoteNum, id, collectNum, sourceDocNum))
+    cursor.close()
+    return quoteList
+
+def list_of_clips_by_collectionnums(collectionNums=None):
+    """Get a list of all Clips in ANY of the collections in the collectionNums list, in a single query.
+       If collectionNums is None, all Clips in all Collections are returned.  Results are
+       (ClipNum, ClipID, CollectNum) tuples, like list_of_clips_by_collection()."""
+    clipList = []
+    # An empty collection list has no clips
+    if (collectionNums != None) and (len(collectionNums) == 0):
+        return clipList
+    query = """ SELECT ClipNum, ClipID, CollectNum, SortOrder
+                FROM Clips2 """
+    if collectionNums != None:
+        query += "WHERE CollectNum IN (%s) " % _collection_number_list(collectionNums)
+    query += "ORDER BY CollectNum, SortOrder, ClipID "
+    cursor = get_db().cursor()
+    cursor.execute(query)
+    for (clipNum, clipID, collectNum, sortOrder) in cursor.fetchall():
+        id = clipID
+        if 'unicode' in wx.PlatformInfo:
+            id = ProcessDBDataForUTF8Encoding(id)
+        clipList.append((clipNum, id, collectNum))
+    cursor.close()
+    return clipList
+
+def list_of_quotes_by_library(libraryNum):
+    """Get a list of all Quotes created from the Documents in a Library, in a single query.  Results are
+       (QuoteNum, QuoteID, CollectNum, SourceDocumentNum) tuples, like list_of_quotes_by_collectionnums()."""
+    quoteList = []
+    query = """ SELECT a.QuoteNum, a.QuoteID, a.CollectNum, a.SortOrder, a.SourceDocumentNum
+                FROM Quotes2 a, Documents2 b
+                WHERE a.SourceDocumentNum = b.DocumentNum AND
+                      b.LibraryNum = %s
+                ORDER BY a.CollectNum, a.SortOrder, a.QuoteID """
+    # Adjust the query for sqlite if needed
+    query = FixQuery(query)
+    cursor = get_db().cursor()
+    cursor.execute(query, (libraryNum, ))
+    for (quoteNum, quoteID, collectNum, sortOrder, sourceDocNum) in cursor.fetchall():
+        id = quoteID
+        if 'unicode' in wx.PlatformInfo:
+            id = ProcessDBDataForUTF8Encoding(id)
+        quoteList.append((quoteNum, id, collectNum, sourceDocNum))
+    cursor.close()
+    return quoteList
+
+def list_of_clips_by_library(libraryNum):
+    """Get a list of all Clips created from the Episodes in a Library, in a single query.  Results are
+       (ClipNum, ClipID, CollectNum) tuples, like list_of_clips_by_collectionnums()."""
+    clipList = []
+    query = """ SELECT a.ClipNum, a.ClipID, a.CollectNum, a.SortOrder
+                FROM Clips2 a, Episodes2 b
+                WHERE a.EpisodeNum = b.EpisodeNum AND
+                      b.SeriesNum = %s
+                ORDER BY a.CollectNum, a.SortOrder, a.ClipID """
+    # Adjust the query for sqlite if needed
+    query = FixQuery(query)
+    cursor = get_db().cursor()
+    cursor.execute(query, (libraryNum, ))
+    for (clipNum, clipID, collectNum, sortOrder) in cursor.fetchall():
+        id = clipID
+        if 'unicode' in wx.PlatformInfo:
+            id = ProcessDBDataForUTF8Encoding(id)
+        clipList.append((clipNum, id, collectNum))
+    cursor.close()
+    return clipList
+
 def locate_quick_quotes_and_clips_collection():
     """ Determine the collection number of the Quick Quotes and Clips Collection, creating it if necessary. """
     # Get a Database Cursor
@@ -2597,13 +3010,15 @@ def locate_quick_quotes_and_clips_collection():
         tempCollection.db_save()
         return (tempCollection.number, collectionName, True)    
 
-def list_of_quotes():
-    """ Get a list of all Quotes, regardless of collection. """
+def list_of_quotes(collectionNum=None):
+    """ Get a list of all Quotes, regardless of collection, or only those in the specified Collection. """
     # Create an empty list
     l = []
     # Define the Query
-    query = """ SELECT QuoteNum, QuoteID, CollectNum, SourceDocumentNum, SortOrder FROM Quotes2
-                  ORDER BY SortOrder, QuoteID """
+    query = " SELECT QuoteNum, QuoteID, CollectNum, SourceDocumentNum, SortOrder FROM Quotes2 "
+    if collectionNum != None:
+        query += "WHERE CollectNum = %d " % collectionNum
+    query += "ORDER BY SortOrder, QuoteID"
     # Get a Database Cursor
     DBCursor = get_db().cursor()
     # Execute the Query
@@ -2623,13 +3038,24 @@ def list_of_quotes():
     # Return the list as the funtion results
     return l
 
-def list_of_quotes_by_document(DocumentNum, textPos=-1, textSel=(-2, -2)):
+def list_of_quotes_by_document(DocumentNum, textPos=-1, textSel=(-2, -2), quoteNums=None):
     """Get a list of all Quotes that have been created from a given Document
-    Number."""
+    Number.  If a list of quoteNums is passed, only those Quotes are included,
+    regardless of position, and the list is NOT sorted."""
     if (textPos != -1) and (textSel == (-2, -2)):
         textSel = (textPos, textPos)
     l = []
-    if textSel == (-2, -2):
+    if quoteNums != None:
+        query = """
+                  SELECT a.QuoteNum, a.QuoteID, a.CollectNum, b.StartChar, b.EndChar, c.CollectID, c.ParentCollectNum, a.Comment
+                        FROM Quotes2 a, QuotePositions2 b, Collections2 c
+                        WHERE a.QuoteNum = b.QuoteNum AND
+                              a.CollectNum = c.CollectNum AND
+                              a.SourceDocumentNum = %d AND
+                              a.QuoteNum IN (%%s)
+                """ % DocumentNum
+        rows = fetchall_named_by_nums(query, quoteNums)
+    elif textSel == (-2, -2):
         query = """
                   SELECT a.QuoteNum, a.QuoteID, a.CollectNum, b.StartChar, b.EndChar, c.CollectID, c.ParentCollectNum, a.Comment
                         FROM Quotes2 a, QuotePositions2 b, Collections2 c
@@ -2653,11 +3079,14 @@ def list_of_quotes_by_document(DocumentNum, textPos=-1, textSel=(-2, -2)):
                 """
         args = (DocumentNum, textSel[0], textSel[0], textSel[0], textSel[1], textSel[1], textSel[1])
 
-    DBCursor = get_db().cursor()
-    # Adjust the query for sqlite if needed
-    query = FixQuery(query)
-    DBCursor.execute(query, args)
-    for row in fetchall_named(DBCursor):
+    if quoteNums == None:
+        DBCursor = get_db().cursor()
+        # Adjust the query for sqlite if needed
+        query = FixQuery(query)
+        DBCursor.execute(query, args)
+        rows = fetchall_named(DBCursor)
+        DBCursor.close()
+    for row in rows:
         QuoteNum = row['QuoteNum']
         QuoteID = row['QuoteID']
         CollectID = row['CollectID']
@@ -2671,7 +3100,6 @@ def list_of_quotes_by_document(DocumentNum, textPos=-1, textSel=(-2, -2)):
                   'CollectID' : CollectID, 'CollectNum' : row['CollectNum'], 'ParentCollectNum' : row['ParentCollectNum'],
                   'Comment' : row['Comment']})
 
-    DBCursor.close()
     return l
 
 def list_of_quotes_by_collectionnum(collectionNum, includeSortOrder=False):
@@ -2695,13 +3123,15 @@ def list_of_quotes_by_collectionnum(collectionNum, includeSortOrder=False):
     cursor.close()
     return quoteList
 
-def list_of_clips():
-    """ Get a list of all Clips, regardless of collection. """
+def list_of_clips(collectionNum=None):
+    """ Get a list of all Clips, regardless of collection, or only those in the specified Collection. """
     # Create an empty list
     l = []
     # Define the Query
-    query = """ SELECT ClipNum, ClipID, CollectNum, EpisodeNum, SortOrder FROM Clips2
-                  ORDER BY SortOrder, ClipID """
+    query = " SELECT ClipNum, ClipID, CollectNum, EpisodeNum, SortOrder FROM Clips2 "
+    if collectionNum != None:
+        query += "WHERE CollectNum = %d " % collectionNum
+    query += "ORDER BY SortOrder, ClipID"
     # Get a Database Cursor
     DBCursor = get_db().cursor()
     # Execute the Query
@@ -2922,13 +3352,15 @@ def list_of_clip_copies(clipID, sourceTranscriptNum, clipStart, clipStop):
     # Return the data list to the calling routine
     return clipList
 
-def list_of_snapshots():
-    """ Get a list of all Snapshots, regardless of collection. """
+def list_of_snapshots(collectionNum=None):
+    """ Get a list of all Snapshots, regardless of collection, or only those in the specified Collection. """
     # Create an empty list
     l = []
     # Define the Query
-    query = """ SELECT SnapshotNum, SnapshotID, CollectNum, SortOrder FROM Snapshots2
-                  ORDER BY SortOrder, SnapshotID """
+    query = " SELECT SnapshotNum, SnapshotID, CollectNum, SortOrder FROM Snapshots2 "
+    if collectionNum != None:
+        query += "WHERE CollectNum = %d " % collectionNum
+    query += "ORDER BY SortOrder, SnapshotID"
     # Get a Database Cursor
     DBCursor = get_db().cursor()
     # Execute the Query
@@ -3513,7 +3945,8 @@ def list_of_notes(** kwargs):
 
 def list_of_node_notes(** kwargs):
     """ Get a list of all Notes for the given Library or Collection node, including sub-nodes.
-        Valid parameters are LibraryNode=True or CollectionNode=True."""
+        Valid parameters are LibraryNode=True or CollectionNode=True.  LibraryNum or CollectionNum can
+        also be passed to limit the results to the Notes within a single Library or Collection. """
     # Create an empty list
     notelist = []
     # Start building the Query
@@ -3521,18 +3954,40 @@ def list_of_node_notes(** kwargs):
                  QuoteNum FROM Notes2 """
     # If we're looking for Library Node Notes ...
     if kwargs.has_key("LibraryNode"):
-        # ... we need to build a query for Library, Episode, or Transcript Notes
-        query += """WHERE   SeriesNum <> 0 OR
-                            EpisodeNum <> 0 OR
-                            TranscriptNum <> 0 OR
-                            DocumentNum <> 0 """
+        # If a Library Number is specified ...
+        if kwargs.has_key("LibraryNum"):
+            # ... we need to build a query for the Notes of the Library and its Episodes, Transcripts, and Documents
+            query += """WHERE   SeriesNum = %(lib)d OR
+                                EpisodeNum IN (SELECT EpisodeNum FROM Episodes2 WHERE SeriesNum = %(lib)d) OR
+                                TranscriptNum IN (SELECT TranscriptNum FROM Transcripts2 t, Episodes2 e
+                                                    WHERE t.EpisodeNum = e.EpisodeNum AND
+                                                          t.ClipNum = 0 AND
+                                                          e.SeriesNum = %(lib)d) OR
+                                DocumentNum IN (SELECT DocumentNum FROM Documents2 WHERE LibraryNum = %(lib)d) """ % \
+                     {'lib' : kwargs['LibraryNum']}
+        else:
+            # ... we need to build a query for Library, Episode, or Transcript Notes
+            query += """WHERE   SeriesNum <> 0 OR
+                                EpisodeNum <> 0 OR
+                                TranscriptNum <> 0 OR
+                                DocumentNum <> 0 """
     # If we're looking for Collection Node Notes ...
     elif kwargs.has_key("CollectionNode"):
-        # ... we need to build a query for Collection or Clip Notes
-        query += """WHERE   CollectNum <> 0 OR
-                            ClipNum <> 0 OR
-                            SnapshotNum <> 0 OR
-                            QuoteNum <> 0 """
+        # If a Collection Number is specified ...
+        if kwargs.has_key("CollectionNum"):
+            # ... we need to build a query for the Notes of the Collection and its Quotes, Clips, and Snapshots.
+            # (Notes for nested Collections are NOT included.)
+            query += """WHERE   CollectNum = %(coll)d OR
+                                ClipNum IN (SELECT ClipNum FROM Clips2 WHERE CollectNum = %(coll)d) OR
+                                SnapshotNum IN (SELECT SnapshotNum FROM Snapshots2 WHERE CollectNum = %(coll)d) OR
+                                QuoteNum IN (SELECT QuoteNum FROM Quotes2 WHERE CollectNum = %(coll)d) """ % \
+                     {'coll' : kwargs['CollectionNum']}
+        else:
+            # ... we need to build a query for Collection or Clip Notes
+            query += """WHERE   CollectNum <> 0 OR
+                                ClipNum <> 0 OR
+                                SnapshotNum <> 0 OR
+                                QuoteNum <> 0 """
     # If neither LibraryNode nor CollectionNode is defined, we've got a programming error.
     else:
         return []   # Should we raise an exception?
@@ -3828,6 +4283,8 @@ def SetKeywordExampleStatus(kwg, kw, clipNum, exampleValue):
     if (dbCursor.rowcount == 0) or (TransanaConstants.DBInstalled in ['sqlite3']):
         insert_clip_keyword(0, 0, clipNum, 0, 0, kwg, kw, 1)
     dbCursor.close()
+    # Update the in-memory Keyword Index
+    KeywordIndex.SetExample(kwg, kw, clipNum, exampleValue)
 
 
 def check_username_as_keyword():
@@ -4098,6 +4555,8 @@ def VideoFilePaths(filePath, update=False):
             dlg.Destroy()
             # If not, roll back the database changes.
             dbCursor.execute('ROLLBACK')
+            # Undo the transaction's changes to the in-memory Keyword Index
+            KeywordIndex.Rollback()
             # If we fail, no records will have been changed, so zero out both counters.
             episodeCount = 0
             clipCount = 0
@@ -4155,6 +4614,67 @@ def fetchall_named(cursor):
         l.append(dict)
     return l
 
+def fetchall_named_by_nums(query, nums, chunkSize=500):
+    """ Execute a query for a list of record numbers and return all rows as a sequence of dictionaries including
+        the database field names.  The query must contain a single %s, inside an "IN (%s)" clause, where the record
+        numbers go, and no other parameters.  Long lists of record numbers are queried in chunks. """
+    # Start with an empty list
+    l = []
+    # Remove duplicate record numbers
+    nums = list(set(nums))
+    # Get a Database Cursor
+    DBCursor = get_db().cursor()
+    # For each chunk of record numbers ...
+    for start in range(0, len(nums), chunkSize):
+        # ... execute the query.  (The record numbers are integers, so they can be put directly into the query.)
+        DBCursor.execute(query % ', '.join(['%d' % num for num in nums[start:start + chunkSize]]))
+        # Add the results to the list
+        l += fetchall_named(DBCursor)
+    # Close the Database Cursor
+    DBCursor.close()
+    # Return the results
+    return l
+
+def dictionary_of_keyword_lists(objType, nums):
+    """ Get the keywords for a list of Episodes, Documents, Clips, Quotes, or Snapshots in a constant number of queries,
+        rather than calling list_of_keywords() once per object.  The result is a dictionary keyed by object number,
+        with a list of (keyword group, keyword, example) tuples, as returned by list_of_keywords(), as each value.
+
+        example: dictionary_of_keyword_lists('Clip', [4, 7, 12])
+    """
+    # Start with an empty list for each object
+    kwDict = {}
+    for num in nums:
+        kwDict[num] = []
+    # Define the query
+    query = "SELECT %sNum, KeywordGroup, Keyword, Example FROM ClipKeywords2 " % objType
+    query += "WHERE %sNum IN (%%s) ORDER BY KeywordGroup, Keyword" % objType
+    # Iterate through the results
+    for row in fetchall_named_by_nums(query, nums):
+        # If we're using Unicode ...
+        if 'unicode' in wx.PlatformInfo:
+            # ... we need to decode the data
+            kwDict[row['%sNum' % objType]].append((ProcessDBDataForUTF8Encoding(row['KeywordGroup']),
+                                                   ProcessDBDataForUTF8Encoding(row['Keyword']),
+                                                   ProcessDBDataForUTF8Encoding(row['Example'])))
+        else:
+            kwDict[row['%sNum' % objType]].append((row['KeywordGroup'], row['Keyword'], row['Example']))
+    # Return the results
+    return kwDict
+
+def get_streaming_cursor():
+    """ Get a database cursor that retrieves query results from the database as they are fetched, rather than
+        all at once when the query is executed.  Use fetchmany() to process large tables in constant memory.
+        NOTE:  With MySQL, no other query can be run on the connection until all the results have been fetched
+               or the cursor has been closed. """
+    # If we're using MySQL ...
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        # ... we need a Server-Side Cursor
+        return get_db().cursor(MySQLdb.cursors.SSCursor)
+    # sqlite cursors already retrieve results as they are fetched
+    else:
+        return get_db().cursor()
+
 def list_all_keyword_examples_for_all_clips_in_a_collection(collectionNum):
     """ Lists all Keyword Examples for all Clips in the specified Collection and all
         nested Collections recursively """
@@ -4245,9 +4765,13 @@ def delete_all_keywords_for_a_group(epnum, docnum, clipnum, quotenum, snapshotnu
     DBCursor.execute(query, (num, ))
     # Close the database cursor
     DBCursor.close()
+    # Update the in-memory Keyword Index.  (The specifier is the Object Type followed by "Num".)
+    KeywordIndex.RemoveObject(specifier[:-3], num)
 
 def insert_clip_keyword(ep_num, doc_num, clip_num, quote_num, snapshot_num, kw_group, kw, exampleValue=0):
     """Insert a new record in the Clip Keywords table."""
+    # Remember the Keyword Group and Keyword values for the in-memory Keyword Index
+    (indexKwg, indexKw) = (kw_group, kw)
     if 'unicode' in wx.PlatformInfo:
         kw_group = kw_group.encode(TransanaGlobal.encoding)
         kw = kw.encode(TransanaGlobal.encoding)
@@ -4278,6 +4802,10 @@ def insert_clip_keyword(ep_num, doc_num, clip_num, quote_num, snapshot_num, kw_g
         query = FixQuery(query)
         DBCursor.execute(query, (ep_num, doc_num, clip_num, quote_num, snapshot_num, kw_group, kw, exampleValue))
         DBCursor.close()
+        # Update the in-memory Keyword Index.  Only one of the object numbers will be non-zero.
+        for (objType, objNum) in zip(KeywordIndex.OBJECT_TYPES, (ep_num, doc_num, clip_num, quote_num, snapshot_num)):
+            if objNum > 0:
+                KeywordIndex.AddCoding(objType, objNum, indexKwg, indexKw, exampleValue)
         # Signal success
         return True
     # If the keyword doesn't exist ...
@@ -4509,6 +5037,8 @@ def delete_keyword_group(name):
 
         # Finish the transaction
         DBCursor.execute("COMMIT")
+        # Update the in-memory Keyword Index
+        KeywordIndex.RemoveKeywordGroup(name)
     else:
         DBCursor.execute("ROLLBACK")
         DBCursor.close()
@@ -4728,6 +5258,8 @@ def delete_keyword(group, kw_name):
 
         # Finish the transaction
         DBCursor.execute("COMMIT")
+        # Update the in-memory Keyword Index
+        KeywordIndex.RemoveKeyword(group, kw_name)
     else:
         DBCursor.execute("ROLLBACK")
         DBCursor.close()
@@ -4870,6 +5402,63 @@ def record_match_count(table, field_names, field_values):
     # Return the number of records found
     return num
 
+def DecodeDBData(text, encoding):
+    """ Decode a string read from MySQL using the specified encoding.  Almost all data is either plain ASCII or
+        properly encoded, and can be decoded all at once.  Only malformed legacy data needs to be decoded a
+        character at a time.  Raises UnicodeDecodeError if the data cannot be decoded using the encoding. """
+    # If we have a string ...
+    if isinstance(text, str):
+        try:
+            # ... plain ASCII text is the same in all of Transana's encodings ...
+            return unicode(text, 'ascii')
+        except UnicodeDecodeError:
+            pass
+        try:
+            # ... and properly encoded text can be decoded in one step.
+            return unicode(text, encoding)
+        except UnicodeDecodeError:
+            pass
+    # Otherwise, fall back to decoding the data a character at a time
+    return DecodeDBDataByCharacter(text, encoding)
+
+def DecodeDBDataByCharacter(text, encoding):
+    """ Decode data read from MySQL a character at a time.  This handles data that cannot be decoded all at once.
+        Raises UnicodeDecodeError if a character cannot be decoded using the encoding. """
+    # Initialize a list of unicode objects to build the function's result
+    result = []
+    # Because some Unicode characters are more than one byte wide, we need to track where the next character starts
+    x = 0
+    # process each character in the text
+    while x < len(text):
+        # Check for a multi-byte character by looking to see if the first character is above 128
+        if ord(text[x]) > 127:
+            # UTF-8 characters are variable length.  We need to figure out the correct number of bytes.
+            # Note the current position
+            pos = x
+            # Begin processing of unicode characters, continue until we have a legal character.
+            while (pos < len(text)):
+                # Try to decode the bytes so far.  ("Un-Unicode" the characters if needed.)
+                c = ''.join([chr(ord(ch)) for ch in text[x:pos + 1]])
+                try:
+                    # See if we have a legal character yet.
+                    unicode(c, encoding)
+                    # If so, break out of the while loop
+                    break
+                # If we don't have a legal character, we'll get a UnicodeDecodeError exception
+                except UnicodeDecodeError:
+                    # We need to update the current position and keep processing until we have a legal character
+                    pos += 1
+            # Add the character to the results.  If we ran out of data without finding a legal character,
+            # this raises a UnicodeDecodeError.
+            result.append(unicode(c, encoding))
+            # Move on to the next character
+            x = pos + 1
+        else:
+            result.append(text[x])
+            x += 1
+    # Combine the characters into the function's result
+    return u''.join(result)
+
 def ProcessDBDataForUTF8Encoding(text):
     """ MySQL's UTF8 Encoding isn't straight-forward because of variable character length.  For example, the
         Chinese character 4EB0 is stored as \xE4\xBA\xB0 .  Therefore, we need to do some translation
@@ -4882,58 +5471,13 @@ def ProcessDBDataForUTF8Encoding(text):
     else:
         # If we're using MySQLdb (either server or embedded) ...
         if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server']:
-            # Initialize a unicode object to build the function's result
-            result = unicode('', TransanaGlobal.encoding)
-            # Because some Unicode characters are more than one byte wide, but the STC doesn't recognize this,
-            # we will need to skip the processing of the later parts of multi-byte characters.  skipNext allows this.
-            skipNext = 0
-            # process each character in the StyledText.  The GetStyledText() call has returned a string
-            # with the data in two-character chunks, the text char and the styling char.  This for loop
-            # allows up to process these character pairs.
             try:
-                for x in range(len(text)):
-                    # If we are looking at the second character of a Unicode character pair, we can skip
-                    # this processing, as it has already been handled.
-                    if skipNext > 0:
-                        # We need to reset the skipNext flag so we won't skip too many characters.
-                        skipNext -= 1
-                    else:
-                        # Check for a Unicode character pair by looking to see if the first character is above 128
-                        if ord(text[x]) > 127:
-                                
-                            # UTF-8 characters are variable length.  We need to figure out the correct number of bytes.
-                            # Note the current position
-                            pos = x
-                            # Initialize the final character variable
-                            c = ''
-
-                            # Begin processing of unicode characters, continue until we have a legal character.
-                            while (pos < len(text)):
-                                # Add the current character to the character variable
-                                c += chr(ord(text[pos]))  # "Un-Unicode" the character ????
-                                # Try to encode the character.
-                                try:
-                                    # See if we have a legal UTF-8 character yet.
-                                    d = unicode(c, TransanaGlobal.encoding)
-                                    # If so, break out of the while loop
-                                    break
-                                # If we don't have a legal UTF-8 character, we'll get a UnicodeDecodeError exception
-                                except UnicodeDecodeError:
-                                    # We need to signal the need to skip a charater in overall processing
-                                    skipNext += 1
-                                    # We need to update the current position and keep processing until we have a legal UTF-8 character
-                                    pos += 1
-
-                            result += unicode(c, TransanaGlobal.encoding)
-                        else:
-                            c = text[x]
-                            result += c
-
+                # Decode the data, using a single bulk decode whenever possible
+                result = DecodeDBData(text, TransanaGlobal.encoding)
             except TypeError:
                 result = text
             except UnicodeDecodeError:
-                # If we are reading Unicode text from Transana 2.05 or earlier, the line above that reads:
-                # result += unicode(c, TransanaGlobal.encoding)
+                # If we are reading Unicode text from Transana 2.05 or earlier, DecodeDBData()
                 # throws a UnicodeDecodeError when it can't interpret Latin-1 encoded characters using UTF-8.
                 # When that happens, we need to use Latin-1 encoding instead of UTF-8.
 
@@ -5257,6 +5801,8 @@ def UpdateDBFilenames(parent, filePath, fileList, newName=''):
     # Otherwise, Roll the Transaction Back.
     else:
         DBCursor.execute("ROLLBACK")
+        # Undo the transaction's changes to the in-memory Keyword Index
+        KeywordIndex.Rollback()
     # Close the Database Cursor
     DBCursor.close()
 
@@ -6120,23 +6666,212 @@ def ServerDateTime():
     #        Therefore, all comparisons should be made with the DB Server's current date and time.
     #        This function returns that value.
 
+    global _serverTimeOffset
+
     # MySQL supports a "Server Time", while sqlite does not.
     if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
-        # Get a Database Connection
-        dbConn = get_db()
-        # Get a Database Cursor
-        DBCursor = dbConn.cursor()
-        # Get the DB Server's current Date and Time
-        DBCursor.execute('SELECT CURRENT_TIMESTAMP()')
-        # Get the result
-        serverDateTime = DBCursor.fetchall()[0][0]
-        # Close the Database Cursor
-        DBCursor.close()
+        # If we know how far the DB Server's clock is from the local clock ...
+        if _serverTimeOffset != None:
+            # ... we can calculate the Server's current Date and Time without asking the Server.
+            # (The Server reports whole seconds.)
+            serverDateTime = (datetime.datetime.now() + _serverTimeOffset).replace(microsecond=0)
+        else:
+            # Get a Database Connection
+            dbConn = get_db()
+            # Get a Database Cursor
+            DBCursor = dbConn.cursor()
+            # Get the DB Server's current Date and Time
+            DBCursor.execute('SELECT CURRENT_TIMESTAMP()')
+            # Get the result
+            serverDateTime = DBCursor.fetchall()[0][0]
+            # Close the Database Cursor
+            DBCursor.close()
+            # Remember the difference between the Server's clock and the local clock for the rest of the session
+            _serverTimeOffset = serverDateTime - datetime.datetime.now()
     elif TransanaConstants.DBInstalled in ['sqlite3']:
         serverDateTime = datetime.datetime.now()
     # Return the value retrieved from the server
     return serverDateTime
 
+def LockRecord(tableName, numName, num, c=None):
+    """ Lock record num in tableName for the current user.  The lock is obtained with a single conditional UPDATE,
+        so two users can never both obtain it.  A record can be locked if it is not locked or if its lock has
+        expired, that is, it is at least two full days old.  Returns None if the lock was obtained.  Otherwise,
+        returns the name of the user who holds the lock. """
+    # Create a flag that indicates whether the cursor was passed in
+    close_c = False
+    # If no cursor was passed in ...
+    if c == None:
+        # ... update the flag ...
+        close_c = True
+        # ... and create a database cursor
+        c = get_db().cursor()
+    # MySQL can use the Server's Date and Time in the query
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        query = """ UPDATE %s
+                      SET RecordLock = %%s,
+                          LockTime = NOW()
+                      WHERE %s = %%s AND
+                            ((LockTime IS NULL) OR
+                             (RecordLock = '') OR
+                             (LockTime <= NOW() - INTERVAL 2 DAY)) """ % (tableName, numName)
+        values = (get_username(), num)
+    # sqlite stores the Lock Time as a string, which we have to provide
+    else:
+        query = """ UPDATE %s
+                      SET RecordLock = %%s,
+                          LockTime = %%s
+                      WHERE %s = %%s AND
+                            ((LockTime IS NULL) OR
+                             (RecordLock = '') OR
+                             (LockTime <= %%s)) """ % (tableName, numName)
+        # Get the current Date and Time
+        now = ServerDateTime()
+        values = (get_username(), str(now)[:-3], num, str(now - datetime.timedelta(days=2)))
+    # Adjust the query for sqlite if needed
+    query = FixQuery(query)
+    # Try to lock the record
+    c.execute(query, values)
+    # If the record was updated, we have the lock
+    if c.rowcount == 1:
+        lockHolder = None
+    # If not, the record is locked by someone else (or doesn't exist)
+    else:
+        # Find out who holds the lock
+        query = FixQuery("SELECT RecordLock FROM %s WHERE %s = %%s" % (tableName, numName))
+        c.execute(query, (num, ))
+        lockRec = c.fetchone()
+        # If the record doesn't exist, we can't lock it
+        if lockRec == None:
+            if close_c:
+                c.close()
+            raise TransanaExceptions.RecordNotFoundError, (num, 0)
+        lockHolder = lockRec[0]
+    # If we created the cursor locally (as flagged) ...
+    if close_c:
+        # ... close the database cursor
+        c.close()
+    # Return the name of the lock holder, or None if we obtained the lock
+    return lockHolder
+
+def LockRecords(tableName, numName, nums, c=None):
+    """ Lock a list of records in tableName for the current user, using one set-based UPDATE for each group of
+        LOCK_BATCH_SIZE records.  As in LockRecord(), a record can be locked if it is not locked or if its lock
+        has expired.  Returns a dictionary keyed by record number.  The value is None if we obtained the lock, or
+        the name of the user who holds the lock.  Records that do not exist are left out of the dictionary.  If
+        a database error occurs, the records locked so far are unlocked before the error is raised. """
+    # Create a flag that indicates whether the cursor was passed in
+    close_c = False
+    # If no cursor was passed in ...
+    if c == None:
+        # ... update the flag ...
+        close_c = True
+        # ... and create a database cursor
+        c = get_db().cursor()
+    # Get the current user name
+    userName = get_username()
+    # MySQL can use the Server's Date and Time in the query
+    if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
+        lockTime = 'NOW()'
+        lockable = "((LockTime IS NULL) OR (RecordLock = '') OR (LockTime <= NOW() - INTERVAL 2 DAY))"
+        lockValues = (userName, )
+        lockableValues = ()
+    # sqlite stores the Lock Time as a string, which we have to provide
+    else:
+        lockTime = '%s'
+        lockable = "((LockTime IS NULL) OR (RecordLock = '') OR (LockTime <= %s))"
+        # Get the current Date and Time once for the whole list
+        now = ServerDateTime()
+        lockValues = (userName, str(now)[:-3])
+        lockableValues = (str(now - datetime.timedelta(days=2)), )
+    # Initialize the results dictionary
+    lockHolders = {}
+    # Keep track of the records we have locked, in case we need to release them
+    lockedNums = []
+    # Remove duplicate record numbers
+    nums = list(set(nums))
+    try:
+        # Lock the records one batch at a time
+        for start in range(0, len(nums), LOCK_BATCH_SIZE):
+            batch = nums[start:start + LOCK_BATCH_SIZE]
+            inList = ', '.join(['%s'] * len(batch))
+            # Find out which records exist, who holds them now, and which can be locked.  A record the current user
+            # already holds is reported as locked, as LockRecord() does.
+            query = "SELECT %s, RecordLock, %s FROM %s WHERE %s IN (%s)" % (numName, lockable, tableName, numName, inList)
+            c.execute(FixQuery(query), lockableValues + tuple(batch))
+            before = {}
+            for (num, recordLock, canLock) in c.fetchall():
+                before[num] = (recordLock, canLock)
+            # Lock all the lockable records in the batch with a single conditional UPDATE
+            query = """ UPDATE %s
+                          SET RecordLock = %%s,
+                              LockTime = %s
+                          WHERE %s IN (%s) AND
+                                %s """ % (tableName, lockTime, numName, inList, lockable)
+            c.execute(FixQuery(query), lockValues + tuple(batch) + lockableValues)
+            # Count the records that could be locked
+            lockableCount = len([num for num in before.keys() if before[num][1]])
+            # If we locked every record that could be locked, the first query tells us who holds the others
+            if c.rowcount == lockableCount:
+                for num in before.keys():
+                    if before[num][1]:
+                        lockHolders[num] = None
+                        lockedNums.append(num)
+                    else:
+                        lockHolders[num] = before[num][0]
+            # If locks changed between the two queries, look at who holds each record now
+            else:
+                query = "SELECT %s, RecordLock FROM %s WHERE %s IN (%s)" % (numName, tableName, numName, inList)
+                c.execute(FixQuery(query), tuple(batch))
+                for (num, recordLock) in c.fetchall():
+                    (priorLock, canLock) = before.get(num, ('', True))
+                    # The record is ours if our name is on it now, unless we already held it before the UPDATE
+                    if (recordLock == userName) and (canLock or (priorLock != userName)):
+                        lockHolders[num] = None
+                        lockedNums.append(num)
+                    else:
+                        lockHolders[num] = recordLock
+    # If something goes wrong part way through ...
+    except:
+        # ... release the records we have already locked ...
+        if len(lockedNums) > 0:
+            ReleaseRecordLocks(tableName, numName, lockedNums, c)
+        if close_c:
+            c.close()
+        # ... and pass the error on
+        raise
+    # If we created the cursor locally (as flagged) ...
+    if close_c:
+        # ... close the database cursor
+        c.close()
+    # Return the lock holders
+    return lockHolders
+
+def ReleaseRecordLocks(tableName, numName, nums, c=None):
+    """ Release the current user's locks on a list of records in tableName, using one UPDATE for each group of
+        LOCK_BATCH_SIZE records. """
+    # Create a flag that indicates whether the cursor was passed in
+    close_c = False
+    # If no cursor was passed in ...
+    if c == None:
+        # ... update the flag ...
+        close_c = True
+        # ... and create a database cursor
+        c = get_db().cursor()
+    # Unlock the records one batch at a time
+    for start in range(0, len(nums), LOCK_BATCH_SIZE):
+        batch = list(nums[start:start + LOCK_BATCH_SIZE])
+        query = """ UPDATE %s
+                      SET RecordLock = '',
+                          LockTime = NULL
+                      WHERE %s IN (%s) AND
+                            RecordLock = %%s """ % (tableName, numName, ', '.join(['%s'] * len(batch)))
+        c.execute(FixQuery(query), tuple(batch) + (get_username(), ))
+    # If we created the cursor locally (as flagged) ...
+    if close_c:
+        # ... close the database cursor
+        c.close()
+
 def CheckSUWin250Database(dbName):
     """  On the single-user version of Transana on Windows, version 2.50, we CANNOT upgrade existing data.
          This sucks, but is unavoidable, according to the MySQL folks.  This method does a subtle check
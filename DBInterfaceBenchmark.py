@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" A micro-benchmark for decoding data read from the database.
+
+    This utility builds a large transcript in each of the encodings Transana supports and times
+    DBInterface.DecodeDBData(), which is used by ProcessDBDataForUTF8Encoding(), against the
+    character-at-a-time decoding used for malformed legacy data.  It also checks that both
+    produce the same results.
+
+    usage:  python DBInterfaceBenchmark.py [options] """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's gettext module
+import gettext
+# import Python's optparse module
+import optparse
+# import python's sys module
+import sys
+# import Python's time module
+import time
+
+# DBInterface and the modules it imports expect the translation function to be defined
+gettext.install('Transana', unicode=True)
+
+# import Transana's Database Interface
+import DBInterface
+# import Transana's Constants
+import TransanaConstants
+
+# Sample text for each encoding Transana uses for MySQL data
+SAMPLES = [('utf8',      u'Caf\xe9 na\xefve 亰 '),
+           ('koi8_r',    u'Привет '),
+           ('iso8859_2', u'Ł\xf3dź '),
+           ('iso8859_7', u'Αθήνα '),
+           ('cp932',     u'日本語 '),
+           ('cp949',     u'한국어 ')]
+# Add the Chinese encoding, if it differs from the others
+if TransanaConstants.chineseEncoding not in [encoding for (encoding, sample) in SAMPLES]:
+    SAMPLES.append((TransanaConstants.chineseEncoding, u'中文 '))
+
+def BuildTranscript(sample, size):
+    """ Build a transcript of approximately size bytes, mixing plain RTF with the sample text """
+    line = u'{\\rtf1\\ansi \\b Speaker 1:\\b0  plain text with ' + sample + u'and more plain text.\\par}\n'
+    return line * max(1, size / len(line))
+
+def TimeDecode(function, data, encoding, repeat):
+    """ Return the result of function(data, encoding) and the best time of repeat calls """
+    bestTime = None
+    for x in range(repeat):
+        startTime = time.time()
+        result = function(data, encoding)
+        elapsed = time.time() - startTime
+        if (bestTime == None) or (elapsed < bestTime):
+            bestTime = elapsed
+    return (result, bestTime)
+
+def RunBenchmark(options):
+    """ Run the benchmark described by the options """
+    success = True
+    print "%-10s %10s %12s %14s %8s" % ('Encoding', 'Bytes', 'Bulk (ms)', 'By char (ms)', 'Match')
+    for (encoding, sample) in SAMPLES:
+        text = BuildTranscript(sample, options.size)
+        data = text.encode(encoding)
+        (bulkResult, bulkTime) = TimeDecode(DBInterface.DecodeDBData, data, encoding, options.repeat)
+        (charResult, charTime) = TimeDecode(DBInterface.DecodeDBDataByCharacter, data, encoding, 1)
+        match = (bulkResult == text) and (charResult == text)
+        success = success and match
+        print "%-10s %10d %12.1f %14.1f %8s" % (encoding, len(data), bulkTime * 1000.0, charTime * 1000.0, match)
+    # Plain ASCII data should take the fastest path
+    data = BuildTranscript(u'', options.size).encode('ascii')
+    (asciiResult, asciiTime) = TimeDecode(DBInterface.DecodeDBData, data, 'utf8', options.repeat)
+    print "%-10s %10d %12.1f" % ('ascii', len(data), asciiTime * 1000.0)
+    return success
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--size', type='int', default=4000000, help='approximate transcript size in bytes (default 4000000)')
+    parser.add_option('--repeat', type='int', default=5, help='number of times to repeat the bulk decode (default 5)')
+    (options, args) = parser.parse_args()
+
+    if RunBenchmark(options):
+        print "PASSED"
+        sys.exit(0)
+    else:
+        print "FAILED"
+        sys.exit(1)
@@ -27,12 +27,15 @@ if DEBUG:
     lock_record()
     unlock_record()
     get_note_nums()
+
+   The LockRecords() function locks the records of a list of Data Objects.
 """
 
 __author__ = 'Nathaniel Case, David Woods <dwoods@wcer.wisc.edu>'
 
 import DBInterface
 import inspect
+import KeywordIndex
 import copy
 import Misc
 import TransanaConstants
@@ -75,6 +78,147 @@ SELECT * From Clips2 a, Collections2 b
         b.CollectID = 'some collection ID'
 """
 
+# The deletable properties of each class, {class : [property names]}.  (See DeletableProperties().)
+_deletableProperties = {}
+
+def DeletableProperties(cls):
+    """ Return the names of the deletable properties of a class.  Finding the properties requires introspection
+        of the whole class hierarchy, so the list is determined once per class and cached. """
+    if not _deletableProperties.has_key(cls):
+        _deletableProperties[cls] = [attr.name for attr in inspect.classify_class_attrs(cls)
+                                     if (attr.kind == "property") and (attr.object.fdel != None)]
+    return _deletableProperties[cls]
+
+
+def LockRecords(dataObjects):
+    """ Lock the records of a list of Data Objects, using one set-based UPDATE per table.  Returns a list of
+        (dataObject, exception) tuples for the records that could not be locked, either because another user
+        holds the lock (RecordLockedError) or because the record no longer exists (RecordNotFoundError).  The
+        records that were locked stay locked and must be unlocked by the caller.  If a database error occurs,
+        the records locked so far are unlocked before the error is raised. """
+    # Initialize the list of records that could not be locked
+    failures = []
+    # Each Data Object may need several records locked together.  (A Clip locks its Transcripts too.)
+    lockGroups = []
+    # The record numbers to lock, by (table name, record number field name)
+    tables = {}
+    # For each Data Object ...
+    for dataObject in dataObjects:
+        # ... skip objects that have not been saved, as lock_record() does
+        if dataObject.number == 0:
+            continue
+        # Get the list of saved records that must be locked with this object
+        try:
+            records = [record for record in dataObject._lock_group() if record.number != 0]
+        # If the object knows it cannot be locked, note why
+        except RecordLockedError, e:
+            failures.append((dataObject, e))
+            continue
+        lockGroups.append((dataObject, records))
+        # Add the records to the lists to be locked
+        for record in records:
+            key = (record._table(), record._num())
+            if not tables.has_key(key):
+                tables[key] = []
+            tables[key].append(record.number)
+
+    # The lock holder for each record, by (table name, record number).  None means we hold the lock.
+    lockHolders = {}
+    # The record numbers we have locked, by (table name, record number field name)
+    lockedNums = {}
+    try:
+        # Lock the records one table at a time
+        for (tableName, numName) in tables.keys():
+            holders = DBInterface.LockRecords(tableName, numName, tables[(tableName, numName)])
+            lockedNums[(tableName, numName)] = [num for num in holders.keys() if holders[num] == None]
+            for num in holders.keys():
+                lockHolders[(tableName, num)] = holders[num]
+
+        # The records to release because another record in the same group could not be locked
+        releaseNums = {}
+        # The objects that are now locked
+        lockedRecords = []
+        # For each Data Object ...
+        for (dataObject, records) in lockGroups:
+            failure = None
+            # ... see if any of its records could not be locked
+            for record in records:
+                key = (record._table(), record.number)
+                # If the record doesn't exist, we can't lock it
+                if not lockHolders.has_key(key):
+                    failure = RecordNotFoundError(record.number, 0)
+                # If someone else holds the record, it is locked
+                elif lockHolders[key] != None:
+                    failure = RecordLockedError(lockHolders[key])
+                if failure != None:
+                    break
+            # If all the records were locked, remember them
+            if failure == None:
+                lockedRecords += records
+            # Otherwise, note the failure and release the group's other records
+            else:
+                failures.append((dataObject, failure))
+                for record in records:
+                    if lockHolders.get((record._table(), record.number), '') == None:
+                        key = (record._table(), record._num())
+                        if not releaseNums.has_key(key):
+                            releaseNums[key] = []
+                        releaseNums[key].append(record.number)
+        # Release the records of the groups that could not be locked completely
+        for (tableName, numName) in releaseNums.keys():
+            DBInterface.ReleaseRecordLocks(tableName, numName, releaseNums[(tableName, numName)])
+            lockedNums[(tableName, numName)] = [num for num in lockedNums[(tableName, numName)]
+                                                if not num in releaseNums[(tableName, numName)]]
+
+        # In multi-user Transana, reload any locked record that another user has saved since it was loaded
+        if not TransanaConstants.singleUserVersion:
+            ReloadChangedRecords([record for record in lockedRecords if hasattr(record, '_reload_if_changed')])
+    # If something goes wrong part way through ...
+    except:
+        # ... release the records we have already locked ...
+        for (tableName, numName) in lockedNums.keys():
+            DBInterface.ReleaseRecordLocks(tableName, numName, lockedNums[(tableName, numName)])
+        # ... and pass the error on
+        raise
+
+    # Indicate that the objects were successfully locked
+    for record in lockedRecords:
+        record._isLocked = True
+    # Return the records that could not be locked
+    return failures
+
+def ReloadChangedRecords(dataObjects):
+    """ Reload the Data Objects whose LastSaveTime in the database differs from the one loaded, using one query
+        per table.  Each object must have a _reload_if_changed() method. """
+    # The objects to check, by (table name, record number field name)
+    tables = {}
+    for dataObject in dataObjects:
+        key = (dataObject._table(), dataObject._num())
+        if not tables.has_key(key):
+            tables[key] = []
+        tables[key].append(dataObject)
+    # Get a database cursor
+    c = DBInterface.get_db().cursor()
+    # For each table ...
+    for (tableName, numName) in tables.keys():
+        objects = tables[(tableName, numName)]
+        # ... get the LastSaveTime of the records, one batch at a time
+        for start in range(0, len(objects), DBInterface.LOCK_BATCH_SIZE):
+            batch = objects[start:start + DBInterface.LOCK_BATCH_SIZE]
+            query = "SELECT %s, LastSaveTime FROM %s WHERE %s IN (%s)" % \
+                    (numName, tableName, numName, ', '.join(['%s'] * len(batch)))
+            c.execute(DBInterface.FixQuery(query), tuple([dataObject.number for dataObject in batch]))
+            lastSaveTimes = {}
+            for (num, lastSaveTime) in c.fetchall():
+                lastSaveTimes[num] = lastSaveTime
+            # Let each object reload itself if it has changed
+            for dataObject in batch:
+                if lastSaveTimes.has_key(dataObject.number):
+                    dataObject._reload_if_changed(lastSaveTimes[dataObject.number])
+    # Close the database cursor
+    c.close()
+
+
 class DataObject(object):
     """This class defines the features common among all classes in the
     Data Objects component group.  The Data Object classes will inherit
@@ -90,13 +234,11 @@ class DataObject(object):
 # Public methods
     def clear(self):
         """Clear all properties, resetting them to default values."""
-        attrdesc = inspect.classify_class_attrs(self.__class__)
-        for attr in attrdesc:
-            if attr[1] == "property":
-                try:
-                    delattr(self, attr[0])
-                except AttributeError, e:
-                    pass # probably a non-deletable attribute
+        for name in DeletableProperties(self.__class__):
+            try:
+                delattr(self, name)
+            except AttributeError, e:
+                pass # probably a non-deletable attribute
         
     def duplicate(self):
         """Return a copy of the object with only the record number changed."""
@@ -117,19 +259,10 @@ class DataObject(object):
         if self.number == 0:    # no record or new record not yet in database loaded
             return
             
-        tablename = self._table()
-        numname = self._num()
-        
-        db = DBInterface.get_db()
-        c = db.cursor()
-        lq = self._get_db_fields(('RecordLock', 'LockTime'), c)
+        # Lock the record in a single step, so no one else can lock it at the same time
+        lockHolder = DBInterface.LockRecord(self._table(), self._num(), self.number)
 
-        if (lq[1] == None) or (lq[0] == "") or ((DBInterface.ServerDateTime() - lq[1]).days > 1):
-            # Lock the record
-            self._set_db_fields(    ('RecordLock', 'LockTime'),
-                                    (DBInterface.get_username(),
-                                    str(DBInterface.ServerDateTime())[:-3]), c)
-            c.close()
+        if lockHolder == None:
             # Indicate that the object was successfully locked
             self._isLocked = True
 
@@ -137,14 +270,17 @@ class DataObject(object):
                 print "DataObject.lock_record(): Record '%s' locked by '%s'" % (self.number, DBInterface.get_username())
         else:
             # We just raise an exception here since GUI code isn't appropriate.
-            c.close()
-
             if DEBUG:
-                print "DataObject.lock_record(): Record %s locked by %s raises exception" % (self.id, lq[0])
+                print "DataObject.lock_record(): Record %s locked by %s raises exception" % (self.id, lockHolder)
                 
-            raise RecordLockedError, lq[0]  # Pass name of person
+            raise RecordLockedError, lockHolder  # Pass name of person
 
         
+    def _lock_group(self):
+        """ Return the list of Data Objects whose records LockRecords() must lock together with this one.
+            Raises RecordLockedError if the object is known not to be lockable. """
+        return [self]
+
     def unlock_record(self):
         """Unlock a record."""
 
@@ -393,6 +529,8 @@ class DataObject(object):
             else:
                 # Rollback transaction because some part failed
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
 
                 if DEBUG:
                     print "Transaction rolled back"
@@ -2262,6 +2262,32 @@ class _NodeData:
         return str
 
 
+# Node Types that are tracked in the Database Tree's Node Index, which maps (Node Type, Record Number) to tree nodes.
+# (Search Result nodes are not included, as their record numbers can change when a Search Result is converted to a Collection.)
+INDEXED_NODE_TYPES = ['LibraryNode', 'DocumentNode', 'EpisodeNode', 'TranscriptNode', 'CollectionNode', 'QuoteNode',
+                      'ClipNode', 'SnapshotNode', 'KeywordExampleNode', 'LibraryNoteNode', 'DocumentNoteNode',
+                      'EpisodeNoteNode', 'TranscriptNoteNode', 'CollectionNoteNode', 'QuoteNoteNode', 'ClipNoteNode',
+                      'SnapshotNoteNode']
+
+# The Node Type of the parent node for each Node Type whose parent can be found in the Node Index using the
+# parent record number
+PARENT_NODE_TYPES = {'DocumentNode' : 'LibraryNode',
+                     'EpisodeNode' : 'LibraryNode',
+                     'TranscriptNode' : 'EpisodeNode',
+                     'CollectionNode' : 'CollectionNode',
+                     'QuoteNode' : 'CollectionNode',
+                     'ClipNode' : 'CollectionNode',
+                     'SnapshotNode' : 'CollectionNode',
+                     'LibraryNoteNode' : 'LibraryNode',
+                     'DocumentNoteNode' : 'DocumentNode',
+                     'EpisodeNoteNode' : 'EpisodeNode',
+                     'TranscriptNoteNode' : 'TranscriptNode',
+                     'CollectionNoteNode' : 'CollectionNode',
+                     'QuoteNoteNode' : 'QuoteNode',
+                     'ClipNoteNode' : 'ClipNode',
+                     'SnapshotNoteNode' : 'SnapshotNode'}
+
+
 class _DBTreeCtrl(wx.TreeCtrl):
     """Private class that implements the details of the tree widget."""
     def __init__(self, parent, id, pos, size, style):
@@ -2306,6 +2332,13 @@ class _DBTreeCtrl(wx.TreeCtrl):
         # drop is supposed to be occurring to see if it will allow the drop.
         dt = DragAndDropObjects.DataTreeDropTarget(self)
         self.SetDropTarget(dt)
+
+        # Initialize the Node Index, {(nodeType, recNum) : [tree nodes]}.  The Node Index is maintained by
+        # SetPyData(), Delete(), DeleteChildren(), and DeleteAllItems().
+        self.nodeIndex = {}
+        # Initialize the list of Library and Collection nodes whose contents have not yet been loaded from the
+        # database, {(nodeType, recNum) : True}.  (See LoadNodeChildren().)
+        self.unloadedNodes = {}
         
         self.refresh_tree()
 
@@ -2333,6 +2366,9 @@ class _DBTreeCtrl(wx.TreeCtrl):
         # Process Database Tree Label Edits
         wx.EVT_TREE_END_LABEL_EDIT(self, id, self.OnEndLabelEdit)
 
+        # Load the contents of Library and Collection nodes when they are first expanded
+        wx.EVT_TREE_ITEM_EXPANDING(self, id, self.OnItemExpanding)
+
         # Process Key Presses
         self.Bind(wx.EVT_KEY_DOWN, self.OnKeyDown)
 
@@ -2413,6 +2449,167 @@ class _DBTreeCtrl(wx.TreeCtrl):
         self.SetItemImage(item, index, wx.TreeItemIcon_Expanded)
         self.SetItemImage(item, index, wx.TreeItemIcon_SelectedExpanded)
         
+    def SetPyData(self, item, data):
+        """ This method over-rides the wxTreeCtrl method, and adds the node to the Node Index """
+        # If the node already has data, remove it from the Node Index under its old data
+        self.RemoveFromNodeIndex(item)
+        # Set the node's data
+        wx.TreeCtrl.SetPyData(self, item, data)
+        # If the node is of a type we track ...
+        if isinstance(data, _NodeData) and (data.nodetype in INDEXED_NODE_TYPES):
+            # ... add it to the Node Index
+            self.nodeIndex.setdefault((data.nodetype, data.recNum), []).append(item)
+
+    def RemoveFromNodeIndex(self, item):
+        """ Remove a single tree node from the Node Index """
+        # Get the node's data
+        data = self.GetPyData(item)
+        # If the node is of a type we track ...
+        if isinstance(data, _NodeData) and self.nodeIndex.has_key((data.nodetype, data.recNum)):
+            # ... remove the node from the Node Index list for its data
+            nodes = self.nodeIndex[(data.nodetype, data.recNum)]
+            for index in range(len(nodes)):
+                if nodes[index] == item:
+                    del(nodes[index])
+                    break
+            # If there are no nodes left for this data, remove the entry
+            if len(nodes) == 0:
+                del(self.nodeIndex[(data.nodetype, data.recNum)])
+
+    def RemoveChildrenFromNodeIndex(self, item):
+        """ Remove all of the descendants of a tree node from the Node Index """
+        # Keep a list of nodes to check, which may expand as we find nested nodes.
+        nodesToCheck = [item]
+        while len(nodesToCheck) > 0:
+            parentNode = nodesToCheck.pop()
+            # (Use the wxTreeCtrl method, as there's no need to load unloaded nodes just to remove them.)
+            (childNode, cookieItem) = wx.TreeCtrl.GetFirstChild(self, parentNode)
+            while childNode.IsOk():
+                self.RemoveFromNodeIndex(childNode)
+                # If the child has children, they need to be removed too
+                if self.ItemHasChildren(childNode):
+                    nodesToCheck.append(childNode)
+                (childNode, cookieItem) = self.GetNextChild(parentNode, cookieItem)
+
+    def Delete(self, item):
+        """ This method over-rides the wxTreeCtrl method, and removes the node and its descendants from the Node Index """
+        self.RemoveChildrenFromNodeIndex(item)
+        self.RemoveFromNodeIndex(item)
+        wx.TreeCtrl.Delete(self, item)
+        self.PurgeUnloadedNodes()
+
+    def DeleteChildren(self, item):
+        """ This method over-rides the wxTreeCtrl method, and removes the node's descendants from the Node Index """
+        self.RemoveChildrenFromNodeIndex(item)
+        wx.TreeCtrl.DeleteChildren(self, item)
+        self.PurgeUnloadedNodes()
+
+    def DeleteAllItems(self):
+        """ This method over-rides the wxTreeCtrl method, and clears the Node Index """
+        self.nodeIndex = {}
+        self.unloadedNodes = {}
+        wx.TreeCtrl.DeleteAllItems(self)
+
+    def PurgeUnloadedNodes(self):
+        """ Remove deleted nodes from the list of unloaded nodes """
+        for key in self.unloadedNodes.keys():
+            if not self.nodeIndex.has_key(key):
+                del(self.unloadedNodes[key])
+
+    def GetFirstChild(self, item):
+        """ This method over-rides the wxTreeCtrl method, and loads the node's contents from the database first if needed """
+        if len(self.unloadedNodes) > 0:
+            self.LoadNodeChildren(item)
+        return wx.TreeCtrl.GetFirstChild(self, item)
+
+    def GetLastChild(self, item):
+        """ This method over-rides the wxTreeCtrl method, and loads the node's contents from the database first if needed """
+        if len(self.unloadedNodes) > 0:
+            self.LoadNodeChildren(item)
+        return wx.TreeCtrl.GetLastChild(self, item)
+
+    def MarkNodeUnloaded(self, item):
+        """ Indicate that a Library or Collection node's contents should be loaded from the database when needed """
+        data = self.GetPyData(item)
+        self.unloadedNodes[(data.nodetype, data.recNum)] = True
+        # Show the node as expandable even though it has no children yet
+        self.SetItemHasChildren(item, True)
+
+    def IsNodeUnloaded(self, item):
+        """ Indicates whether a node's contents have not yet been loaded from the database """
+        data = self.GetPyData(item)
+        return isinstance(data, _NodeData) and self.unloadedNodes.has_key((data.nodetype, data.recNum))
+
+    def LoadNodeChildren(self, item):
+        """ Load the contents of a Library or Collection node from the database, if they have not yet been loaded """
+        # If the node has already been loaded (or doesn't need to be), there's nothing to do
+        if not self.IsNodeUnloaded(item):
+            return
+        data = self.GetPyData(item)
+        # Remove the node from the list of unloaded nodes.  Once loaded, the node's contents are kept up to date
+        # by add_Node() and delete_Node() until the tree is refreshed.
+        del(self.unloadedNodes[(data.nodetype, data.recNum)])
+        # If we have a Library node ...
+        if data.nodetype == 'LibraryNode':
+            # ... add the Library's Documents, Episodes, Transcripts, and Notes
+            mapDict = {'Libraries' : {data.recNum : item}, 'Episode' : {}, 'Transcript' : {}, 'Document' : {}}
+            self.populate_library_nodes(mapDict, Library.Library(data.recNum))
+        # If we have a Collection node ...
+        elif data.nodetype == 'CollectionNode':
+            # ... add the Collection's Quotes, Clips, Snapshots, and Notes.  (Nested Collections are already in the tree.)
+            mapDict = {'Collection' : {data.recNum : item}, 'Clip' : {}, 'Snapshot' : {}, 'Quote' : {}}
+            self.populate_collection_nodes(mapDict, data.recNum)
+        # If the node turns out to be empty, it should no longer be shown as expandable
+        if not wx.TreeCtrl.GetFirstChild(self, item)[0].IsOk():
+            self.SetItemHasChildren(item, False)
+
+    def OnItemExpanding(self, event):
+        """ Load the contents of a Library or Collection node the first time it is expanded """
+        self.LoadNodeChildren(event.GetItem())
+        event.Skip()
+
+    def FindNode(self, nodeType, recNum, itemText=None):
+        """ Find a tree node using the Node Index rather than by crawling the tree.
+              nodeType  The Node Type of the node
+              recNum    The Record Number of the node
+              itemText  (optional) The text the node must have
+            Returns the tree node, or None if the node is not found. """
+        # If a node text is specified, prepare it for comparison
+        if itemText != None:
+            if ('unicode' in wx.PlatformInfo) and (type(itemText).__name__ == 'str'):
+                itemText = unicode(itemText, 'utf8')
+            itemText = Misc.unistrip(itemText).upper()
+        # Check the nodes in the Node Index for the Node Type and Record Number
+        for item in self.nodeIndex.get((nodeType, recNum), []):
+            # Make sure the node is still valid, and still describes the same record
+            if item.IsOk():
+                data = self.GetPyData(item)
+                if (data.nodetype == nodeType) and (data.recNum == recNum) and \
+                   ((itemText == None) or (Misc.unistrip(self.GetItemText(item)).upper() == itemText)):
+                    return item
+        return None
+
+    def FindKeywordExampleNode(self, keywordGroup, keyword, clipNum):
+        """ Find the Keyword Example node for a Clip under a Keyword using the Node Index.
+            Returns the tree node, or None if the node is not found. """
+        # Prepare the Keyword Group and Keyword for comparison
+        if ('unicode' in wx.PlatformInfo) and (type(keywordGroup).__name__ == 'str'):
+            keywordGroup = unicode(keywordGroup, 'utf8')
+        if ('unicode' in wx.PlatformInfo) and (type(keyword).__name__ == 'str'):
+            keyword = unicode(keyword, 'utf8')
+        keywordGroup = Misc.unistrip(keywordGroup).upper()
+        keyword = Misc.unistrip(keyword).upper()
+        # A Clip can be an example for several Keywords.  Check each of the Clip's Keyword Example nodes.
+        for item in self.nodeIndex.get(('KeywordExampleNode', clipNum), []):
+            if item.IsOk():
+                # The Example's parent is the Keyword, and its grandparent is the Keyword Group
+                keywordNode = self.GetItemParent(item)
+                keywordGroupNode = self.GetItemParent(keywordNode)
+                if (Misc.unistrip(self.GetItemText(keywordNode)).upper() == keyword) and \
+                   (Misc.unistrip(self.GetItemText(keywordGroupNode)).upper() == keywordGroup):
+                    return item
+        return None
+
     # FIXME: Doesn't preserve node 'expanded' states
     def refresh_tree(self, evt=None):
         """Load information from database and re-create the tree."""
@@ -2717,9 +2914,27 @@ class _DBTreeCtrl(wx.TreeCtrl):
             self.set_image(item, "Library16")
             # Add the new node to the map dictionary
             mapDict['Libraries'][libraryNo] = item
-
+            # If the Database Tree is loaded lazily ...
+            if TransanaGlobal.configData.lazyDatabaseTree:
+                # ... the Library's contents will be loaded when the node is expanded
+                self.MarkNodeUnloaded(item)
+
+        # If the Database Tree is NOT loaded lazily ...
+        if not TransanaGlobal.configData.lazyDatabaseTree:
+            # ... populate the Libraries now
+            self.populate_library_nodes(mapDict)
+
+    def populate_library_nodes(self, mapDict, library=None):
+        """ Populate the Library nodes in mapDict with their Documents, Episodes, Transcripts, and Notes.
+            If library is specified, only that Library's contents are loaded from the database. """
+        # If a Library is specified, we need its number to limit the database queries
+        if library != None:
+            libraryNum = library.number
+        else:
+            libraryNum = None
+        
         # Populate the tree with all Documents AND Episodes
-        tmpDict = DBInterface.dictionary_of_documents_and_episodes()
+        tmpDict = DBInterface.dictionary_of_documents_and_episodes(library)
         keys = tmpDict.keys()
         keys.sort()
         for key in keys:
@@ -2751,7 +2966,7 @@ class _DBTreeCtrl(wx.TreeCtrl):
                 print "ABANDONED %s RECORD!" % objType.upper(), objNum, objParentNum
 
         # Populate the tree with all Episode Transcripts
-        for (transcriptNo, transcriptID, transcriptEpisodeNo) in DBInterface.list_of_episode_transcripts():
+        for (transcriptNo, transcriptID, transcriptEpisodeNo) in DBInterface.list_of_episode_transcripts(libraryNum):
             # Find the correct Library node using the map dictionary
             epitem = mapDict['Episode'][transcriptEpisodeNo]
             # Create the tree node
@@ -2763,9 +2978,13 @@ class _DBTreeCtrl(wx.TreeCtrl):
             # Add the new node to the map dictionary
             mapDict['Transcript'][transcriptNo] = titem
 
+        # If a Library is specified, limit the Notes to that Library
+        if libraryNum != None:
+            noteList = DBInterface.list_of_node_notes(LibraryNode=True, LibraryNum=libraryNum)
+        else:
+            noteList = DBInterface.list_of_node_notes(LibraryNode=True)
         # Now add all the Notes to the objects in the Library node of the database tree
-        for (noteNum, noteID, libraryNum, episodeNum, transcriptNum, collectNum, clipNum, snapshotNum, documentNum, quoteNum) in \
-            DBInterface.list_of_node_notes(LibraryNode=True):
+        for (noteNum, noteID, libraryNum, episodeNum, transcriptNum, collectNum, clipNum, snapshotNum, documentNum, quoteNum) in noteList:
             # Find the correct Library, Episode, or Transcript node using the map dictionary
             if libraryNum > 0:
                 item = mapDict['Libraries'][libraryNum]
@@ -2885,9 +3104,27 @@ class _DBTreeCtrl(wx.TreeCtrl):
                 # ... we need to place that collection in the list of items to process later, once the parent Collection
                 # has been added to the database tree
                 deferredItems.append((collNo, collID, parentCollNo))
-                
+
+        # If the Database Tree is loaded lazily ...
+        if TransanaGlobal.configData.lazyDatabaseTree:
+            # For each Collection ...
+            for key in mapDict['Collection'].keys():
+                # ... (other than the Collections Root) ...
+                if key != 0:
+                    # ... the Collection's contents will be loaded when the node is expanded
+                    self.MarkNodeUnloaded(mapDict['Collection'][key])
+                # Sort the nested Collections
+                self.SortChildren(mapDict['Collection'][key])
+        # If the Database Tree is NOT loaded lazily ...
+        else:
+            # ... populate the Collections now
+            self.populate_collection_nodes(mapDict)
+
+    def populate_collection_nodes(self, mapDict, collectionNum=None):
+        """ Populate the Collection nodes in mapDict with their Quotes, Clips, Snapshots, and Notes.
+            If collectionNum is specified, only that Collection's contents are loaded from the database. """
         # Populate the tree with all Clip records
-        for (clipNo, clipID, collNo, sourceNo, sortOrder) in DBInterface.list_of_clips():
+        for (clipNo, clipID, collNo, sourceNo, sortOrder) in DBInterface.list_of_clips(collectionNum):
             # Check to see if the Clip's parent collection is in the tree.  It should be there, but I did
             # have a testing database where one collection was missing, despite the presence of Clips and Notes.
             if mapDict['Collection'].has_key(collNo):
@@ -2908,7 +3145,7 @@ class _DBTreeCtrl(wx.TreeCtrl):
         # If we're in a Pro version, not the Standard Version ...
         if TransanaConstants.proVersion:
             # Populate the tree with all Quote records
-            for (quoteNum, quoteID, collNum, sourceDoc, sortOrder) in DBInterface.list_of_quotes():
+            for (quoteNum, quoteID, collNum, sourceDoc, sortOrder) in DBInterface.list_of_quotes(collectionNum):
                 # Check to see if the Quote's parent collection is in the tree.  It should be there.
                 if mapDict['Collection'].has_key(collNum):
                     # First, let's see if the parent collection is in the map dictionary.
@@ -2926,7 +3163,7 @@ class _DBTreeCtrl(wx.TreeCtrl):
                     print "ABANDONED QUOTE RECORD!" , quoteNum, quoteID.encode('utf8'), collNum
 
             # Populate the tree with all Snapshot records
-            for (snapshotNo, snapshotID, collNo, sortOrder) in DBInterface.list_of_snapshots():
+            for (snapshotNo, snapshotID, collNo, sortOrder) in DBInterface.list_of_snapshots(collectionNum):
                 # Check to see if the Snapshot's parent collection is in the tree.  It should be there, but I did
                 # have a testing database where one collection was missing, despite the presence of Clips and Notes.
                 if mapDict['Collection'].has_key(collNo):
@@ -2949,9 +3186,13 @@ class _DBTreeCtrl(wx.TreeCtrl):
             # ... sort the collection's children!
             self.SortChildren(mapDict['Collection'][key])
 
+        # If a Collection is specified, limit the Notes to that Collection
+        if collectionNum != None:
+            noteList = DBInterface.list_of_node_notes(CollectionNode=True, CollectionNum=collectionNum)
+        else:
+            noteList = DBInterface.list_of_node_notes(CollectionNode=True)
         # Now add all the Notes to the objects in the Collection node of the database tree
-        for (noteNum, noteID, libraryNum, episodeNum, transcriptNum, collectNum, clipNum, snapshotNum, documentNum, quoteNum) in \
-            DBInterface.list_of_node_notes(CollectionNode=True):
+        for (noteNum, noteID, libraryNum, episodeNum, transcriptNum, collectNum, clipNum, snapshotNum, documentNum, quoteNum) in noteList:
             item = None
             # Find the correct Collection or Clip node using the map dictionary
             if collectNum > 0:
@@ -3280,10 +3521,23 @@ class _DBTreeCtrl(wx.TreeCtrl):
             print 'expectedNodeType =', expectedNodeType
             print 'nodeData = ', nodeData
 
+        # If the new node's parent can be found in the Node Index, we can start there rather than crawling the tree from the root
+        parentNode = None
+        if PARENT_NODE_TYPES.has_key(nodeType) and (len(nodeData) > 2) and (nodeParent not in [None, 0]):
+            parentNode = self.FindNode(PARENT_NODE_TYPES[nodeType], nodeParent, nodeData[-2])
+        if parentNode != None:
+            # Start at the parent node, looking for the last node in the node list
+            currentNode = parentNode
+            nodeListPos = len(nodeData) - 1
+            expectedNodeType = nodeType
+            nodesToCrawl = nodeData[-1:]
+        else:
+            # Crawl the whole node list
+            nodesToCrawl = nodeData
 
         indexPos = 0
 
-        for node in nodeData:
+        for node in nodesToCrawl:
 
             node = Misc.unistrip(node)
 
@@ -3295,6 +3549,11 @@ class _DBTreeCtrl(wx.TreeCtrl):
 
             if DEBUG:
                 print "Getting children for ", self.GetItemText(currentNode)
+
+            # If the contents of the node we need to look in have not been loaded from the database yet, the new node
+            # will be loaded along with them, so we don't need to add it now.  (Nested Collections are always loaded.)
+            if (nodeType != 'CollectionNode') and self.IsNodeUnloaded(currentNode):
+                return
                 
             (childNode, cookieItem) = self.GetFirstChild(currentNode)
 
@@ -3762,12 +4021,23 @@ class _DBTreeCtrl(wx.TreeCtrl):
             except:
                 pass
 
-    def select_Node(self, nodeData, nodeType, ensureVisible=True):
+    def select_Node(self, nodeData, nodeType, ensureVisible=True, recNum=None):
         """ This method is used to select nodes in the tree.
-            nodeData is a list that gives the tree structure that describes where the node should be selected. """
+            nodeData is a list that gives the tree structure that describes where the node should be selected.
+            If the node's record number is known, it can be passed in recNum so the node can be found using the
+            Node Index rather than by crawling the tree. """
 
         currentNode = self.GetRootItem()
 
+        # If we know the node's record number, see if it's in the Node Index
+        if (recNum != None) and (nodeType in INDEXED_NODE_TYPES):
+            indexNode = self.FindNode(nodeType, recNum, nodeData[-1])
+            # If it is ...
+            if indexNode != None:
+                # ... we have the node, and there's no need to crawl the tree.
+                currentNode = indexNode
+                nodeData = ()
+
         # print "Root node = %s" % self.GetItemText(currentNode)
         # print "nodeData = ", nodeData
 
@@ -4010,6 +4280,17 @@ class _DBTreeCtrl(wx.TreeCtrl):
         
         msgData = ''
 
+        # Keyword Example nodes we don't need to report to other users can be found using the Node Index rather than
+        # by crawling the tree
+        if (nodeType == 'KeywordExampleNode') and (exampleClipNum > 0) and (len(nodeData) == 4) and \
+           (TransanaConstants.singleUserVersion or not sendMessage):
+            indexNode = self.FindKeywordExampleNode(nodeData[1], nodeData[2], exampleClipNum)
+            # If the node is found ...
+            if indexNode != None:
+                # ... we have the node, and there's no need to crawl the tree.
+                currentNode = indexNode
+                nodeData = ()
+
         for node in nodeData:
 
             node = Misc.unistrip(node)
@@ -4035,6 +4316,18 @@ class _DBTreeCtrl(wx.TreeCtrl):
                     elif node == keywordsPrompt:
                         msgData = nodeType + ' >|< Keywords'
 
+            # If the contents of the node we need to look in have not been loaded from the database yet, the node
+            # to be deleted isn't in the tree, so we don't need to delete it.  (Nested Collections are always loaded.)
+            if (nodeType != 'CollectionNode') and (currentNode != None) and self.IsNodeUnloaded(currentNode):
+                # Other users may have the node loaded, though, so we still need to tell them about the deletion.
+                if not TransanaConstants.singleUserVersion and sendMessage and (msgData != ''):
+                    # Add the rest of the node list to the message
+                    for remainingNode in nodeData[nodeListPos + 1:]:
+                        msgData += ' >|< %s' % Misc.unistrip(remainingNode)
+                    if TransanaGlobal.chatWindow != None:
+                        TransanaGlobal.chatWindow.SendMessage("DN %s" % msgData)
+                return
+
             notDone = True
             (childNode, cookieItem) = self.GetFirstChild(currentNode)
 
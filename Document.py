@@ -36,12 +36,16 @@ import ClipKeywordObject
 import DataObject
 # import Transana's Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Dialogs
 import Dialogs
 # import Transana's Miscellaneous Functions
 import Misc
 # import Transana's Note Object
 import Note
+# import Transana's Quote Position Index
+import QuotePositionIndex
 # import Transana's Library Object
 import Library
 # import Transana's Constants
@@ -68,7 +72,7 @@ class Document(DataObject.DataObject):
             self.db_load_by_name(libraryID, documentID)
         else:
             self.library_id = ''
-            self.quote_dict = {}
+            self.quote_dict = QuotePositionIndex.QuotePositions()
         # For Partial Transcript Editing, create a data structure for storing the transcript information by LINE
         self.lines = []
         # Initialize a paragraph counter
@@ -471,9 +475,9 @@ class Document(DataObject.DataObject):
                     if TransanaConstants.DBInstalled in ['MySQLdb-embedded', 'MySQLdb-server', 'PyMySQL']:
                         query = "INSERT INTO QuotePositions2 (QuoteNum, DocumentNum, StartChar, EndChar) VALUES "
                         values = ()
-                        for key in self.quote_dict.keys():
+                        for (key, (startChar, endChar)) in self.quote_dict.items():
                             query += "(%s, %s, %s, %s), "
-                            values += (key, self.number, self.quote_dict[key][0], self.quote_dict[key][1])
+                            values += (key, self.number, startChar, endChar)
                         # Strip the final comma off the query!
                         query = query[:-2]
                         # Adjust the query for sqlite if needed
@@ -486,8 +490,8 @@ class Document(DataObject.DataObject):
 
                         query = "INSERT INTO QuotePositions2 (QuoteNum, DocumentNum, StartChar, EndChar) VALUES "
                         query += "(%s, %s, %s, %s) "
-                        for key in self.quote_dict.keys():
-                            values = (key, self.number, self.quote_dict[key][0], self.quote_dict[key][1])
+                        for (key, (startChar, endChar)) in self.quote_dict.items():
+                            values = (key, self.number, startChar, endChar)
 
 #                            print
 #                            print
@@ -591,6 +595,8 @@ class Document(DataObject.DataObject):
                 if use_transactions:
                     # Undo the database save transaction
                     c.execute('ROLLBACK')
+                    # Undo the transaction's changes to the in-memory Keyword Index
+                    KeywordIndex.Rollback()
                 # Close the Database Cursor
                 c.close()
                 # Complete the error prompt
@@ -697,6 +703,8 @@ class Document(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e
@@ -707,6 +715,8 @@ class Document(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 # Close the database cursor
                 c.close()
                 # unlock the record
@@ -782,7 +792,7 @@ class Document(DataObject.DataObject):
     def clear_quotes(self):
         """ Clear the Quote List """
         # Clear the Quote List
-        self.quote_dict = {}
+        self.quote_dict = QuotePositionIndex.QuotePositions()
 
     def refresh_quotes(self):
         # Clear the Quote List
@@ -850,6 +860,12 @@ class Document(DataObject.DataObject):
         
         # ... lock the Transcript Record
         DataObject.DataObject.lock_record(self)
+
+    def _reload_if_changed(self, lastSaveTime):
+        """ Called by DataObject.LockRecords() once the record is locked.  If another user has saved the document
+            since it was loaded, reload it. """
+        if lastSaveTime != self.lastsavetime:
+            self.db_load_by_num(self.number)
             
     def unlock_record(self):
         """ Override the DataObject Unlock Method """
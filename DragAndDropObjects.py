@@ -59,6 +59,7 @@ import cPickle                      # use Python's fast cPickle tool instead of
 import sys                          # import Python's sys module
 
 import DBInterface                  # Import Transana's Database Interface
+import DataObject                   # Import the Transana Data Object base (for locking records together)
 import Library                       # Import the Transana Library object
 import Document                     # Import the Transana Document object
 import Episode                      # Import the Transana Episode Object
@@ -1992,6 +1993,21 @@ def ProcessPasteDrop(treeCtrl, sourceData, destNode, action, confirmations=True)
           destNode   -- the actual Tree Node selected for Drop or Paste
           action     -- a string of "Copy" or "Move", indicating whether a Copy or Cut/Move has been requested.
                         (This value is ignored in some instances where "Move" has no meaning.  """
+    # A Paste or Drop can add, move, or delete a great many objects.  In Multi-user mode, gather up the messages
+    # for the other users into Batch messages, so they don't have to process them one at a time.
+    chatWindow = TransanaGlobal.chatWindow
+    if not TransanaConstants.singleUserVersion and (chatWindow != None):
+        chatWindow.BeginBatch()
+    try:
+        ProcessPasteDropObjects(treeCtrl, sourceData, destNode, action, confirmations)
+    finally:
+        # Send the messages that have been gathered up
+        if not TransanaConstants.singleUserVersion and (chatWindow != None):
+            chatWindow.EndBatch()
+
+def ProcessPasteDropObjects(treeCtrl, sourceData, destNode, action, confirmations=True):
+    """ This method does the work of processing a "Paste" or "Drop" request for ProcessPasteDrop().  The
+        parameters are the same. """
 
     global YESTOALL
 
@@ -5427,119 +5443,63 @@ def ChangeClipOrder(treeCtrl, destNode, sourceObject, sourceCollection):
     # ... Set up a variable that signals failure
     allObjectsLocked = True
 
-    # Create a Dictionary to hold all the Quote data, so we only need to have one copy of the quote
+    # Create Dictionaries to hold all the Quote, Clip, and Snapshot data, so we only need to have one copy of each
     Quotes = {}
-    # Get all the quotes for the Source Collection Number
-    quoteLockList = DBInterface.list_of_quotes_by_collectionnum(sourceCollection.number)
-    # Start Exception Handling
-    try:
-        # For each Quote in the Collection ...
-        for (tmpQuoteNum, tmpQuoteID, tmpCollectNum, tmpSourceDocNum) in quoteLockList:
-            # Load the Quote.
-            tmpQuote = Quote.Quote(num=tmpQuoteNum)
-            # Lock the QuoteRecord
-            tmpQuote.lock_record()
-            # If we have the Source Object, clear the sort_order value
-            if isinstance(sourceObject, Quote.Quote) and (sourceObject.number == tmpQuoteNum):
-                tmpQuote.sort_order = 0
-            # Add this clip to the Quotes dictionary
-            Quotes[tmpQuoteNum] = tmpQuote
-    # If we couldn't get a lock on one or more of the quotes...
-    except TransanaExceptions.RecordLockedError, e:
-        # Set the "Failure" flag
-        allObjectsLocked = False
-        # Create an error message for the user
-        if 'unicode' in wx.PlatformInfo:
-            # Encode with UTF-8 rather than TransanaGlobal.encoding because this is a prompt, not DB Data.
-            msg = unicode(_('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                          _('Transana could not change the sort order because you cannot obtain a lock on Quote "%s"') + \
-                          _('.\nThe record is currently locked by %s.'), 'utf8')
-        else:
-            msg = _('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                  _('Transana could not change the sort order because you cannot obtain a lock on Quote "%s"') + \
-                  _('.\nThe record is currently locked by %s.')
-        # Display the error message
-        dlg = Dialogs.ErrorDialog(None, msg % (sourceCollection.id, tmpQuote.id, e.user))
-        dlg.ShowModal()
-        dlg.Destroy()
-
-        # If the Change of Sort Orders failed, put the new object at the END
-        targetSortOrder = DBInterface.getMaxSortOrder(destData.parent) + 1
-
-    # Create a Dictionary to hold all the Clip data, so we only need to have one copy of the clip
     Clips = {}
-    # Get all the clips for the Source Collection Number
-    clipLockList = DBInterface.list_of_clips_by_collectionnum(sourceCollection.number)
-    # Start Exception Handling
-    try:
-        # For each Clip in the Collection ...
-        for (tmpClipNum, tmpClipID, tmpCollectNum) in clipLockList:
-            # Load the Clip.
-            tmpClip = Clip.Clip(tmpClipNum)
-            # Lock the Clip Record
-            tmpClip.lock_record()
-            # If we have the Source Object, clear the sort_order value
-            if isinstance(sourceObject, Clip.Clip) and (sourceObject.number == tmpClipNum):
-                tmpClip.sort_order = 0
-            # Add this clip to the Clips dictionary
-            Clips[tmpClipNum] = tmpClip
-    # If we couldn't get a lock on one or more of the clips ...
-    except TransanaExceptions.RecordLockedError, e:
-        # Set the "Failure" flag
-        allObjectsLocked = False
-        # Create an error message for the user
-        if 'unicode' in wx.PlatformInfo:
-            # Encode with UTF-8 rather than TransanaGlobal.encoding because this is a prompt, not DB Data.
-            msg = unicode(_('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                          _('Transana could not change the sort order because you cannot obtain a lock on Clip "%s"') + \
-                          _('.\nThe record is currently locked by %s.'), 'utf8')
+    Snapshots = {}
+    # Load all the Quotes, Clips, and Snapshots in the Source Collection
+    lockObjects = []
+    for (tmpQuoteNum, tmpQuoteID, tmpCollectNum, tmpSourceDocNum) in DBInterface.list_of_quotes_by_collectionnum(sourceCollection.number):
+        lockObjects.append(Quote.Quote(num=tmpQuoteNum))
+    for (tmpClipNum, tmpClipID, tmpCollectNum) in DBInterface.list_of_clips_by_collectionnum(sourceCollection.number):
+        lockObjects.append(Clip.Clip(tmpClipNum))
+    for (tmpSnapshotNum, tmpSnapshotID, tmpCollectNum) in DBInterface.list_of_snapshots_by_collectionnum(sourceCollection.number):
+        lockObjects.append(Snapshot.Snapshot(tmpSnapshotNum))
+    # Lock all of their records at once.  Records that cannot be locked are reported back.
+    failures = DataObject.LockRecords(lockObjects)
+    failedObjects = [tmpObj for (tmpObj, e) in failures]
+    # For each object we were able to lock ...
+    for tmpObj in lockObjects:
+        if tmpObj in failedObjects:
+            continue
+        # If we have the Source Object, clear the sort_order value
+        if isinstance(sourceObject, tmpObj.__class__) and (sourceObject.number == tmpObj.number):
+            tmpObj.sort_order = 0
+        # Add the object to the proper dictionary
+        if isinstance(tmpObj, Quote.Quote):
+            Quotes[tmpObj.number] = tmpObj
+        elif isinstance(tmpObj, Clip.Clip):
+            Clips[tmpObj.number] = tmpObj
         else:
-            msg = _('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                  _('Transana could not change the sort order because you cannot obtain a lock on Clip "%s"') + \
-                  _('.\nThe record is currently locked by %s.')
-        # Display the error message
-        dlg = Dialogs.ErrorDialog(None, msg % (sourceCollection.id, tmpClip.id, e.user))
-        dlg.ShowModal()
-        dlg.Destroy()
+            Snapshots[tmpObj.number] = tmpObj
 
-        # If the Change of Sort Orders failed, put the new object at the END
-        targetSortOrder = DBInterface.getMaxSortOrder(destData.parent) + 1
-
-    # Create a Dictionary to hold all the Snapshot data, so we only need to have one copy of the Snapshot
-    Snapshots = {}
-    # Get all the snapshots for the Source Collection Number
-    snapshotLockList = DBInterface.list_of_snapshots_by_collectionnum(sourceCollection.number)
-    # Start Exception Handling
-    try:
-        # For each Snapshot in the Collection ...
-        for (tmpSnapshotNum, tmpSnapshotID, tmpCollectNum) in snapshotLockList:
-            # Load the Snapshot.
-            tmpSnapshot = Snapshot.Snapshot(tmpSnapshotNum)
-            # Lock the Snapshot Record
-            tmpSnapshot.lock_record()
-            # If we have the Source Object, clear the sort_order value
-            if isinstance(sourceObject, Snapshot.Snapshot) and (sourceObject.number == tmpSnapshotNum):
-                tmpSnapshot.sort_order = 0
-            # Add this snapshot to the Snapshots dictionary
-            Snapshots[tmpSnapshotNum] = tmpSnapshot
-    # If we couldn't get a lock on one or more of the clips ...
-    except TransanaExceptions.RecordLockedError, e:
+    # If we couldn't get a lock on one or more of the items ...
+    if len(failures) > 0:
         # Set the "Failure" flag
         allObjectsLocked = False
-        # Create an error message for the user
-        if 'unicode' in wx.PlatformInfo:
-            # Encode with UTF-8 rather than TransanaGlobal.encoding because this is a prompt, not DB Data.
-            msg = unicode(_('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                          _('Transana could not change the sort order because you cannot obtain a lock on Snapshot "%s"') + \
-                          _('.\nThe record is currently locked by %s.'), 'utf8')
-        else:
-            msg = _('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
-                  _('Transana could not change the sort order because you cannot obtain a lock on Snapshot "%s"') + \
-                  _('.\nThe record is currently locked by %s.')
-        # Display the error message
-        dlg = Dialogs.ErrorDialog(None, msg % (sourceCollection.id, tmpSnapshot.id, e.user))
-        dlg.ShowModal()
-        dlg.Destroy()
+        # Report the first locked Quote, Clip, and Snapshot
+        for (objClass, prompt) in ((Quote.Quote, _('Transana could not change the sort order because you cannot obtain a lock on Quote "%s"')),
+                                   (Clip.Clip, _('Transana could not change the sort order because you cannot obtain a lock on Clip "%s"')),
+                                   (Snapshot.Snapshot, _('Transana could not change the sort order because you cannot obtain a lock on Snapshot "%s"'))):
+            lockedItems = [(tmpObj, e) for (tmpObj, e) in failures
+                           if isinstance(tmpObj, objClass) and isinstance(e, TransanaExceptions.RecordLockedError)]
+            if len(lockedItems) == 0:
+                continue
+            (tmpObj, e) = lockedItems[0]
+            # Create an error message for the user
+            if 'unicode' in wx.PlatformInfo:
+                # Encode with UTF-8 rather than TransanaGlobal.encoding because this is a prompt, not DB Data.
+                msg = unicode(_('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
+                              prompt + \
+                              _('.\nThe record is currently locked by %s.'), 'utf8')
+            else:
+                msg = _('Items in Collection "%s" are not in the desired order.') + '\n\n' + \
+                      prompt + \
+                      _('.\nThe record is currently locked by %s.')
+            # Display the error message
+            dlg = Dialogs.ErrorDialog(None, msg % (sourceCollection.id, tmpObj.id, e.user))
+            dlg.ShowModal()
+            dlg.Destroy()
 
         # If the Change of Sort Orders failed, put the new object at the END
         targetSortOrder = DBInterface.getMaxSortOrder(destData.parent) + 1
@@ -37,6 +37,8 @@ import ClipKeywordObject
 import DataObject
 # import Transana's Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Miscellaneous Functions
 import Misc
 # import Transana's Note Object
@@ -433,6 +435,8 @@ class Episode(DataObject.DataObject):
             if use_transactions:
                 # Undo the database save transaction
                 c.execute('ROLLBACK')
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
             # Close the Database Cursor
             c.close()
             # Complete the error prompt
@@ -517,6 +521,8 @@ class Episode(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e
@@ -52,6 +52,11 @@
       LoadFile(filename.bmp)             Loads a BITMAP image, which is resized to fit the control
       SaveAs                             Saves the Buffered Image as a JPEG graphic
       SetDimensions(x, y, width, height) Alters the dimensions of the Graphic Area, including resizing the underlying Bitmap if there is one.
+      SetVisualizationImage(img, backgroundImage=None)
+                                         Displays a finished Visualization image composed on a GraphicsCanvas
+
+    The GraphicsCanvas class records the same drawing methods without a window, and its Render(backgroundImage=None)
+    method returns the drawing as a wxImage.  It can be used outside of the main thread.
     """
 
 __author__ = 'David K. Woods <dwoods@wcer.wisc.edu>, Rajas Sambhare'
@@ -65,7 +70,238 @@ import time
 # import Transana's Globals
 import TransanaGlobal
 
-class GraphicsControl(wx.ScrolledWindow):
+# The size, in pixels, of the cells used to track which parts of the canvas each batch of lines covers
+BATCH_CELL_SIZE = 16
+
+class LineBatches(object):
+    """ The lines of a Graphics Control, grouped into batches that share a colour and thickness so each batch
+        can be drawn with a single DrawLineList() or DrawRectangleList() call.  A group of lines joins the last
+        batch with its colour and thickness unless a later batch has drawn on part of the canvas the group covers,
+        so drawing the batches in order produces the same image as drawing each group of lines in order. """
+
+    def __init__(self, lines):
+        # Remember the list of lines being batched
+        self.lines = lines
+        # The number of groups of lines from the list that have been batched
+        self.count = 0
+        # The batches, in drawing order.  Each batch is (colour, thickness, shapes), where shapes are line
+        # coordinates for thin lines and rectangles for thick lines.
+        self.batches = []
+        # The index of the last batch for each (colour, thickness) pair
+        self.lastBatch = {}
+        # The index of the last batch to draw in each cell of the canvas
+        self.cells = {}
+
+    def Update(self):
+        """ Add any groups of lines that have been added to the list since the last update """
+        for (colour, thickness, line) in self.lines[self.count:]:
+            self.Add(colour, thickness, line)
+        self.count = len(self.lines)
+
+    def Add(self, colour, thickness, line):
+        """ Add a group of lines to the batches """
+        # Lines extend beyond their coordinates by half their thickness, plus the border of thick lines
+        margin = int(thickness / 2) + 2
+        # Determine the shapes to draw and the canvas cells they cover
+        shapes = []
+        cells = set()
+        for coords in line:
+            (x1, y1, x2, y2) = [int(coord) for coord in coords]
+            # dc.DrawLine produces a line with rounded ends if it's too thick.  It doesn't look
+            # very good.  So thick lines are drawn as rectangles instead.
+            if thickness > 2:
+                shapes.append((x1, y1 - int(thickness / 2), x2 - x1, thickness))
+            else:
+                shapes.append((x1, y1, x2, y2))
+            for cellX in range((min(x1, x2) - margin) // BATCH_CELL_SIZE, (max(x1, x2) + margin) // BATCH_CELL_SIZE + 1):
+                for cellY in range((min(y1, y2) - margin) // BATCH_CELL_SIZE, (max(y1, y2) + margin) // BATCH_CELL_SIZE + 1):
+                    cells.add((cellX, cellY))
+        # Find the last batch with this colour and thickness
+        index = self.lastBatch.get((colour, thickness), -1)
+        # If there is no such batch, or a later batch has drawn where these lines go ...
+        if (index < 0) or (max([self.cells.get(cell, -1) for cell in cells] + [-1]) > index):
+            # ... start a new batch
+            index = len(self.batches)
+            self.batches.append((colour, thickness, []))
+            self.lastBatch[(colour, thickness)] = index
+        # Add the shapes to the batch
+        self.batches[index][2].extend(shapes)
+        # Note that the batch draws in the cells these lines cover
+        for cell in cells:
+            self.cells[cell] = index
+
+class GraphicsDrawing(object):
+    """ The drawing methods shared by the Graphics Control and the off-screen Graphics Canvas.  Lines and text are
+        recorded as they are added, and drawn onto a Device Context by DrawLines(). """
+    def InitDrawing(self):
+        """ Initialize the drawing settings, and the lists of lines and text """
+        # Initialize the batches used to draw "lines"
+        self.lineBatches = None
+        # Initialize the caches of Colours, Pens, Brushes, and Fonts used in drawing
+        self.colours = {}
+        self.pens = {}
+        self.brushes = {}
+        self.fonts = {}
+        # Set default line color, pattern, and thickness
+        self.thickness = 1
+        self.linepattern = wx.SOLID
+        self.SetColour("BLACK")
+        # Set default text color, font size, font family, font style, and font weight
+        self.textcolour = "BLACK"
+        self.fontsize = 10
+        self.fontfamily = wx.ROMAN
+        self.fontstyle = wx.NORMAL
+        self.fontweight = wx.NORMAL
+        # Initialize "lines" to an empty list
+        self.lines = []
+        # Initialize  "text" to an empty list
+        self.text = []
+
+    def SetColour(self, colour):
+        """ Set color and create the appropriate Pen """
+        self.colour = colour
+        self.colourDef = self.GetColourDef(colour)
+        self.pen = self.GetPen(colour, self.thickness, self.linepattern)
+
+    def GetColourDef(self, colour):
+        """ Return the wx.Colour for a colour name (using wxNamedColours) or an (R, G, B) tuple """
+        # If we haven't seen this colour before ...
+        if not self.colours.has_key(colour):
+            # ... create the wx.Colour for it
+            if isinstance(colour, str):
+                self.colours[colour] = wx.NamedColour(colour)
+            else:
+                self.colours[colour] = wx.Colour(colour[0], colour[1], colour[2])
+        return self.colours[colour]
+
+    def GetPen(self, colour, thickness, style):
+        """ Return a Pen for the colour, thickness, and style, creating it only if it hasn't been used before """
+        if not self.pens.has_key((colour, thickness, style)):
+            self.pens[(colour, thickness, style)] = wx.Pen(self.GetColourDef(colour), thickness, style)
+        return self.pens[(colour, thickness, style)]
+
+    def GetBrush(self, colour):
+        """ Return a solid Brush for the colour, creating it only if it hasn't been used before """
+        if not self.brushes.has_key(colour):
+            self.brushes[colour] = wx.Brush(self.GetColourDef(colour), wx.SOLID)
+        return self.brushes[colour]
+
+    def GetFont(self, size, family):
+        """ Return a Font for the size and family in the current style and weight, creating it only if it hasn't been used before """
+        if not self.fonts.has_key((size, family, self.fontstyle, self.fontweight)):
+            self.fonts[(size, family, self.fontstyle, self.fontweight)] = wx.Font(size, family, self.fontstyle, self.fontweight)
+        return self.fonts[(size, family, self.fontstyle, self.fontweight)]
+
+    def SetFontColour(self, colour):
+        """ Set text color """
+        self.textcolour = colour
+
+    def SetThickness(self, thickness):
+        """ Set Line Thickness """
+        self.thickness = thickness
+        self.pen = self.GetPen(self.colour, self.thickness, self.linepattern)
+
+    def SetFontSize(self, size):
+        """ Set Font Size """
+        self.fontsize = size
+
+    def AddLines(self, newlines):
+        """ Adds new lines (send as a list) to the drawing """
+        self.lines.append((self.colour, self.thickness, newlines))
+        self.reInitBuffer = True
+
+    def AddLines2(self, newlines):
+        """ Adds new lines (send as a list) to the second layer of the drawing """
+        # If the temporary line is in bounds of the graphic ...
+        if (newlines[0][0] >= 0) and (newlines[0][0] <= self.canvassize[0]):
+            # ... add the line to the temporary line buffer ...
+            self.lines2.append((self.colour, self.thickness, newlines))
+            # ... and signal that the image needs to be redrawn.
+            self.reInitBuffer = True
+
+    def AddText(self, text, x, y):
+        """ Adds new Text Objects to the drawing """
+        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'LEFT'))
+        self.reInitBuffer = True
+
+    def AddTextCentered(self, text, x, y):
+        """ Adds new Text Objects to the drawing, centered on the point submitted """
+        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'CENTER'))
+        self.reInitBuffer = True
+
+    def AddTextRight(self, text, x, y):
+        """ Adds new Text Objects to the drawing, right justified on the point submitted """
+        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'RIGHT'))
+        self.reInitBuffer = True
+
+    def DrawLines(self, dc):
+        """ Redraw all lines that have been recorded EXCEPT THE TEMPORARY LINES """
+        # Let the Device Context know that we are beginning to draw
+        dc.BeginDrawing()
+
+        # If the lines have been replaced since they were last batched ...
+        if (self.lineBatches == None) or (self.lineBatches.lines is not self.lines) or (self.lineBatches.count > len(self.lines)):
+            # ... start new batches
+            self.lineBatches = LineBatches(self.lines)
+        # Add any new lines to the batches
+        self.lineBatches.Update()
+
+        # For each batch of lines, determine the color, line thickness, and shapes
+        for colour, thickness, shapes in self.lineBatches.batches:
+            # dc.DrawLine produces a line with rounded ends if it's too thick.  It doesn't look
+            # very good.  So thick lines have been batched as rectangles instead.
+            if thickness > 2:
+                # For lines that are thick enough ...
+                if thickness > 3:
+                    # ... let's draw a black border
+                    penCol = (0, 0, 0)
+                # For lines that are too thin ...
+                else:
+                    # We'll just have the border match the bar color
+                    penCol = colour
+                # Draw the rectangles with a pen for the outline and a brush, set to our bar color, for the interior
+                dc.DrawRectangleList(shapes, self.GetPen(penCol, 1, wx.SOLID), self.GetBrush(colour))
+            # For "thin" lines ...
+            else:
+                # ...DC's DrawLineList will be adequate.
+                dc.DrawLineList(shapes, self.GetPen(colour, thickness, self.linepattern))
+        # Drawing the lines leaves the last line's color as the current color
+        if len(self.lines) > 0:
+            self.SetColour(self.lines[-1][0])
+
+        # For each text item, determine the string, position, color, size, family, and alignment
+        for text, x, y, colour, size, family, alignment in self.text:
+            # Set the Font for the Device Context
+            dc.SetFont(self.GetFont(size, family))
+            # Set the Text Color
+            self.SetColour(colour)
+            dc.SetTextForeground(self.colourDef)
+            # Determine the size the string will be when drawn
+            (w, h) = dc.GetTextExtent(text)
+            # Alter the position values based on alignment
+            if alignment == 'CENTER':
+                x = x - w / 2
+            elif alignment == 'RIGHT':
+                x = x - w - 30
+            # Place the text on the Device Context
+            dc.DrawText(text, int(x), int(y))
+        # Let the Device Context know we are done drawing
+        dc.EndDrawing()
+
+    def GetMaxWidth(self, start=0):
+        """ returns the width of the widest label in the text labels """
+        max = 0
+        tempbuffer = wx.EmptyBitmap(self.canvassize[0], self.canvassize[1])
+        dc = wx.BufferedDC(None, tempbuffer)
+        dc.Clear()
+        for text, x, y, colour, size, family, alignment in self.text[start:]:
+            dc.SetFont(self.GetFont(size, family))
+            (w, h) = dc.GetTextExtent(text)
+            if w > max:
+                max = w
+        return max
+
+class GraphicsControl(wx.ScrolledWindow, GraphicsDrawing):
     """ Graphics Control Class implements a Graphic Control used for doing some
         low-level drawing in the Visualization Window and the Keyword Map """
     def __init__(self, parent, ID, pos=wx.Point(100, 100), size=(800, 600), canvassize=(999, 999),
@@ -98,23 +334,18 @@ class GraphicsControl(wx.ScrolledWindow):
         self.backgroundImage = None
         # Initialize the temporary visualization image to None.
         self.visualizationImage = None
-        # Set default line color, pattern, and thickness
-        self.thickness = 1
-        self.linepattern = wx.SOLID
-        self.SetColour("BLACK")
-        # Set default text color, font size, font family, font style, and font weight
-        self.textcolour = "BLACK"
-        self.fontsize = 10
-        self.fontfamily = wx.ROMAN
-        self.fontstyle = wx.NORMAL
-        self.fontweight = wx.NORMAL
-        # Initialize "lines" to an empty list
-        self.lines = []
+        # Initialize the bitmap of the temporary visualization image, which is built when it is first needed
+        self.baseBitmap = None
+        self.baseSource = None
+        # Initialize the description of the temporary (lines2[]) layer drawn on the buffer, and the part of the buffer that
+        # changed the last time it was drawn.  (None means the whole buffer.)
+        self.overlay = None
+        self.overlayBuffer = None
+        self.dirtyRect = None
+        # Initialize the drawing settings, "lines", and "text"
+        self.InitDrawing()
         # Let's create a second layer of lines that can be manipulated (and deleted) separately.  
         self.lines2 = []
-
-        # Initialize  "text" to an empty list
-        self.text = []
         # Initialize drawing position
         self.x = self.y = 0
         # Initialize Cursor Position, but be used to remove the cursor
@@ -208,60 +439,10 @@ class GraphicsControl(wx.ScrolledWindow):
         self.startTime = 0.0
         self.endTime = 0.0
 
-    def SetColour(self, colour):
-        """ Set color and create the appropriate Pen """
-        if isinstance(colour, str):
-            self.colour = colour
-            self.colourDef = wx.NamedColour(self.colour)
-        else:
-            self.colour = colour
-            self.colourDef = wx.Colour(colour[0], colour[1], colour[2])
-        self.pen = wx.Pen(self.colourDef, self.thickness, self.linepattern)
-
-    def SetFontColour(self, colour):
-        """ Set text color """
-        self.textcolour = colour
-
-    def SetThickness(self, thickness):
-        """ Set Line Thickness """
-        self.thickness = thickness
-        self.pen = wx.Pen(self.colourDef, self.thickness, self.linepattern)
-
-    def SetFontSize(self, size):
-        """ Set Font Size """
-        self.fontsize = size
-
-    def AddLines(self, newlines):
-        """ Adds new lines (send as a list) to the drawing """
-        self.lines.append((self.colour, self.thickness, newlines))
-        self.reInitBuffer = True
-
-    def AddLines2(self, newlines):
-        """ Adds new lines (send as a list) to the second layer of the drawing """
-        # If the temporary line is in bounds of the graphic ...
-        if (newlines[0][0] >= 0) and (newlines[0][0] <= self.canvassize[0]):
-            # ... add the line to the temporary line buffer ...
-            self.lines2.append((self.colour, self.thickness, newlines))
-            # ... and signal that the image needs to be redrawn.
-            self.reInitBuffer = True
-
-    def AddText(self, text, x, y):
-        """ Adds new Text Objects to the drawing """
-        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'LEFT'))
-        self.reInitBuffer = True
-
-    def AddTextCentered(self, text, x, y):
-        """ Adds new Text Objects to the drawing, centered on the point submitted """
-        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'CENTER'))
-        self.reInitBuffer = True
-
-    def AddTextRight(self, text, x, y):
-        """ Adds new Text Objects to the drawing, right justified on the point submitted """
-        self.text.append((text, x, y, self.textcolour, self.fontsize, self.fontfamily, 'RIGHT'))
-        self.reInitBuffer = True
-
     def InitBuffer(self):
         """ Initialize the Bitmap used for buffering the display """
+        # Assume the whole buffer will change
+        self.dirtyRect = None
         # If the temporary Visualization Image has NOT been created ...
         if (self.visualizationImage == None):
 
@@ -303,7 +484,7 @@ class GraphicsControl(wx.ScrolledWindow):
                     # Draw the line here.
                     dc.DrawLine(0, self.backgroundImage.GetHeight()-1, self.backgroundImage.GetWidth()-1, self.backgroundImage.GetHeight()-1)
             # Set the Pen to the defined Color, thickness, and pattern
-            self.pen = wx.Pen(self.colourDef, self.thickness, self.linepattern)
+            self.pen = self.GetPen(self.colour, self.thickness, self.linepattern)
             # Draw any defined lines
             self.DrawLines(dc)
 
@@ -323,37 +504,85 @@ class GraphicsControl(wx.ScrolledWindow):
             # Now draw the temporary lines
             self.DrawRect(dc)
             self.DrawLines2(dc)
+            # The temporary lines are part of a new image, so they can't be erased without redrawing it
+            self.overlay = None
             
         # If the temporary Visualization Image HAS been created (to speed up drawing and prevent video stuttering) ...
         else:
-            # Create a Buffered Device Context using the initial bitmap
-            dc = wx.BufferedDC(None, self.bmpBuffer)
-
-            # Set the Brush and Background colors to the Background Color
-            dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
-            # Clear the drawing
-            dc.Clear()
-            # Create a Memory Device Context 
-            dc2 = wx.MemoryDC()
-            # Load the temporary Visualization Image into the memory DC
-            dc2.SelectObject(self.visualizationImage.ConvertToBitmap())
-            # Copy the MemoryDC image onto the visualization window image's Device Context
-            dc.Blit(0, 0, self.visualizationImage.GetWidth(), self.visualizationImage.GetHeight(), dc2, 0, 0, wx.COPY, False)
-            # Now create a pen to draw a line between the image and the rest of the graphic.
-            dc.SetPen(wx.Pen(wx.LIGHT_GREY, 1, wx.SOLID))
-            # Draw the line here.
-            dc.DrawLine(0, self.visualizationImage.GetHeight()-1, self.visualizationImage.GetWidth()-1, self.visualizationImage.GetHeight()-1)
-            # Draw lines based on timecodes
-            # You can choose two different methods. 
-            #   a. DrawRect: Very responsive, covers selection with grey diagonal lines
-            #   b. SetSelection: Much less responsive, highlights (paints in white areas actually).
-            # Note that SetSelection will find and add lines to the self.lines structures and
-            # DrawLines will do the actual painting. If SetSelection is not used, DrawLines will
-            # only paint the GREY marker in response to a single left click.
-
-            # Now draw the temporary lines
-            self.DrawRect(dc)
-            self.DrawLines2(dc)
+            # Describe the temporary lines that need to be drawn
+            overlay = self.GetOverlay()
+            # If the bitmap of the temporary Visualization Image needs to be built ...
+            if (self.baseSource is not self.visualizationImage) or \
+               (self.baseBitmap.GetSize() != self.bmpBuffer.GetSize()):
+                # ... build it now, so the image doesn't have to be converted every time we draw
+                self.baseBitmap = wx.EmptyBitmap(self.bmpBuffer.GetWidth(), self.bmpBuffer.GetHeight())
+                self.baseSource = self.visualizationImage
+                # Create a Buffered Device Context using the base bitmap
+                dc = wx.BufferedDC(None, self.baseBitmap)
+                # Set the Brush and Background colors to the Background Color
+                dc.SetBackground(wx.Brush(self.GetBackgroundColour()))
+                # Clear the drawing
+                dc.Clear()
+                # Create a Memory Device Context 
+                dc2 = wx.MemoryDC()
+                # Load the temporary Visualization Image into the memory DC
+                dc2.SelectObject(self.visualizationImage.ConvertToBitmap())
+                # Copy the MemoryDC image onto the visualization window image's Device Context
+                dc.Blit(0, 0, self.visualizationImage.GetWidth(), self.visualizationImage.GetHeight(), dc2, 0, 0, wx.COPY, False)
+                # Now create a pen to draw a line between the image and the rest of the graphic.
+                dc.SetPen(wx.Pen(wx.LIGHT_GREY, 1, wx.SOLID))
+                # Draw the line here.
+                dc.DrawLine(0, self.visualizationImage.GetHeight()-1, self.visualizationImage.GetWidth()-1, self.visualizationImage.GetHeight()-1)
+                # Release the base bitmap from the Device Contexts
+                del(dc)
+                dc2.SelectObject(wx.NullBitmap)
+                # The temporary lines will need to be drawn over the whole image
+                self.overlay = None
+            # If the buffer holds the base bitmap and the temporary lines we drew last time ...
+            if (self.overlay != None) and (self.overlayBuffer is self.bmpBuffer):
+                # ... then only the parts of the buffer where the temporary lines have changed need to be redrawn
+                changes = set(overlay) ^ set(self.overlay)
+                if len(changes) > 0:
+                    left = max(min([rect[0] for (item, rect) in changes]), 0)
+                    top = max(min([rect[1] for (item, rect) in changes]), 0)
+                    right = min(max([rect[2] for (item, rect) in changes]), self.bmpBuffer.GetWidth())
+                    bottom = min(max([rect[3] for (item, rect) in changes]), self.bmpBuffer.GetHeight())
+                    self.dirtyRect = wx.Rect(left, top, max(right - left, 0), max(bottom - top, 0))
+                else:
+                    self.dirtyRect = wx.Rect(0, 0, 0, 0)
+            else:
+                self.dirtyRect = wx.Rect(0, 0, self.bmpBuffer.GetWidth(), self.bmpBuffer.GetHeight())
+            # If any part of the buffer needs to be redrawn ...
+            if not self.dirtyRect.IsEmpty():
+                # Create a Buffered Device Context using the initial bitmap
+                dc = wx.BufferedDC(None, self.bmpBuffer)
+                # Create a Memory Device Context 
+                dc2 = wx.MemoryDC()
+                # Load the bitmap of the temporary Visualization Image into the memory DC
+                dc2.SelectObject(self.baseBitmap)
+                # Copy the part of the MemoryDC image that has changed onto the visualization window image's Device Context
+                dc.Blit(self.dirtyRect.x, self.dirtyRect.y, self.dirtyRect.width, self.dirtyRect.height,
+                        dc2, self.dirtyRect.x, self.dirtyRect.y, wx.COPY, False)
+                # Release the base bitmap from the Memory Device Context
+                dc2.SelectObject(wx.NullBitmap)
+                # Limit drawing to the part of the image that has changed
+                dc.SetClippingRect(self.dirtyRect)
+                # Draw lines based on timecodes
+                # You can choose two different methods. 
+                #   a. DrawRect: Very responsive, covers selection with grey diagonal lines
+                #   b. SetSelection: Much less responsive, highlights (paints in white areas actually).
+                # Note that SetSelection will find and add lines to the self.lines structures and
+                # DrawLines will do the actual painting. If SetSelection is not used, DrawLines will
+                # only paint the GREY marker in response to a single left click.
+
+                # Now draw the temporary lines
+                self.DrawRect(dc)
+                self.DrawLines2(dc)
+                # Remove the clipping region
+                dc.DestroyClippingRegion()
+            # Remember what temporary lines the buffer now holds
+            self.overlay = overlay
+            self.overlayBuffer = self.bmpBuffer
 
         # Signal that the control has been redrawn
         self.reInitBuffer = False
@@ -364,99 +593,55 @@ class GraphicsControl(wx.ScrolledWindow):
             dc.BeginDrawing()
             dc.SetBrush(wx.Brush("GREY", wx.BDIAGONAL_HATCH))
             # Get start and end X coords from startTime and endTime
-            startX = self.canvassize[0]*self.parent.PctPosFromTimeCode(self.startTime)
-            endX = self.canvassize[0]*self.parent.PctPosFromTimeCode(self.endTime)
-
-            # If we are in a Right-To-Left Language ...
-            if TransanaGlobal.configData.LayoutDirection == wx.Layout_RightToLeft:
-                # ... we need to adjust the X positions for that
-                startX = self.canvassize[0] - startX
-                endX = self.canvassize[0] - endX
+            (startX, endX) = self.GetSelectionX()
 
             # If startTime and endTime are the same, then startX = endX so we
             # end up drawing a zero width rectangle which works with wxPython
             dc.DrawRectangle(int(startX), 0, int(endX - startX), int(self.canvassize[1]))
             # Remember that erasing of this rectangle will be handled by InitBuffer
             dc.EndDrawing()
-        
-    def DrawLines(self, dc):
-        """ Redraw all lines that have been recorded EXCEPT THE TEMPORARY LINES """
-        # Let the Device Context know that we are beginning to draw
-        dc.BeginDrawing()
 
-        # For each line, determine the color, line thickness, and line list
-        for colour, thickness, line in self.lines:
-            # Create a Pen
-            self.SetColour(colour)
-            pen = wx.Pen(self.colourDef, thickness, self.linepattern)
-            # Set the Pen for the Device Context
-            dc.SetPen(pen)
-            # Draw the lines in the line list
-            # dc.DrawLine(**dict(line)) #TODO: This would work if points were (x,y)
-            for coords in line:
-                # dc.DrawLine produces a line with rounded ends if it's too thick.  It doesn't look
-                # very good.  So if we're drawing a thick line, let's use DrawRectangle instead.
-                if thickness > 2:
-                    # For lines that are thick enough ...
-                    if thickness > 3:
-                        # ... let's draw a black border
-                        penCol = wx.Colour(0, 0, 0)
-                    # For lines that are too thin ...
-                    else:
-                        # We'll just have the border match the bar color
-                        penCol = self.colourDef
-                    # Create a pen for the rectangle outline.
-                    pen = wx.Pen(penCol, 1, wx.SOLID)
-                    # Set the pen for the DC
-                    dc.SetPen(pen)
-                    # Create a brush, which paint the interior of the rectangle.  Set it to our bar color.
-                    brush = wx.Brush(self.colourDef, wx.SOLID)
-                    # Set the brush to the DC
-                    dc.SetBrush(brush)
-                    # Draw a rectangle based on the line coordinates and specified thickness.
-                    dc.DrawRectangle(coords[0], coords[1]-int(thickness/2), coords[2]-coords[0], thickness)
-                # For "thin" lines ...
-                else:
-                    # ...DC's DrawLine will be adequate.
-                    dc.DrawLine(*coords)
-
-        # For each text item, determine the string, position, color, size, family, and alignment
-        for text, x, y, colour, size, family, alignment in self.text:
-            # Create a Font
-            font = wx.Font(size, family, self.fontstyle, self.fontweight)
-            # Set the Font for the Device Context
-            dc.SetFont(font)
-            # Set the Text Color
-            self.SetColour(colour)
-            dc.SetTextForeground(self.colourDef)
-            # Determine the size the string will be when drawn
-            (w, h) = dc.GetTextExtent(text)
-            # Alter the position values based on alignment
-            if alignment == 'CENTER':
-                x = x - w / 2
-            elif alignment == 'RIGHT':
-                x = x - w - 30
-            # Place the text on the Device Context
-            dc.DrawText(text, int(x), int(y))
-        # Let the Device Context know we are done drawing
-        dc.EndDrawing()
+    def GetSelectionX(self):
+        """ Return the X coordinates of the start and end of the selection """
+        # Get start and end X coords from startTime and endTime
+        startX = self.canvassize[0]*self.parent.PctPosFromTimeCode(self.startTime)
+        endX = self.canvassize[0]*self.parent.PctPosFromTimeCode(self.endTime)
 
+        # If we are in a Right-To-Left Language ...
+        if TransanaGlobal.configData.LayoutDirection == wx.Layout_RightToLeft:
+            # ... we need to adjust the X positions for that
+            startX = self.canvassize[0] - startX
+            endX = self.canvassize[0] - endX
+        return (startX, endX)
+
+    def GetOverlay(self):
+        """ Describe the temporary layer drawn by DrawRect() and DrawLines2() as a list of (item, (left, top, right, bottom)) """
+        overlay = []
+        # The selection rectangle is only drawn in visualizationMode
+        if self.visualizationMode:
+            (startX, endX) = self.GetSelectionX()
+            overlay.append((('SELECTION', int(startX), int(endX)),
+                            (min(int(startX), int(endX)) - 1, 0, max(int(startX), int(endX)) + 2, int(self.canvassize[1]) + 1)))
+        # Each group of temporary lines covers the area around its line coordinates
+        for colour, thickness, line in self.lines2:
+            margin = int(thickness) + 1
+            overlay.append(((colour, thickness, tuple([tuple(coords) for coords in line])),
+                            (int(min([min(coords[0], coords[2]) for coords in line])) - margin,
+                             int(min([min(coords[1], coords[3]) for coords in line])) - margin,
+                             int(max([max(coords[0], coords[2]) for coords in line])) + margin + 1,
+                             int(max([max(coords[1], coords[3]) for coords in line])) + margin + 1)))
+        return overlay
+        
     def DrawLines2(self, dc):
         """ Redraw the TEMPORARY lines that have been recorded """
         # Let the Device Context know that we are beginning to draw
         dc.BeginDrawing()
         # For each line in lines2, determine the color, line thickness, and line list
         for colour, thickness, line in self.lines2:
-            # Create a Pen
+            # Set the current Color
             self.SetColour(colour)
-            pen = wx.Pen(self.colourDef, thickness, self.linepattern)
-            # Set the Pen for the Device Context
-            dc.SetPen(pen)
             # Draw the lines in the line list
-            # dc.DrawLine(**dict(line)) #TODO: This would work if points were (x,y)
-            for coords in line:
-                # apply(dc.DrawLine, coords)
-                dc.DrawLine(*coords)
+            dc.DrawLineList(line, self.GetPen(colour, thickness, self.linepattern))
         # Let the Device Context know we are done drawing
         dc.EndDrawing()
 
@@ -563,6 +748,8 @@ class GraphicsControl(wx.ScrolledWindow):
             # If we're click-dragging, we need visible feedback.  Therefore, let's start drawing until the mouse button is released.
             # (Used in OnMotion.  Release by TransanaOnLeftUp.)
             self.drawing = True
+            # That feedback is drawn directly on the buffer, so the whole buffer will need to be redrawn afterwards
+            self.overlay = None
             # Record the current mouse position
             self.x = event.GetX() + (self.GetViewStart()[0] * self.GetScrollPixelsPerUnit()[0])
             self.y = event.GetY() + (self.GetViewStart()[1] * self.GetScrollPixelsPerUnit()[1])
@@ -746,8 +933,16 @@ class GraphicsControl(wx.ScrolledWindow):
         if not(self.isDragging) and self.reInitBuffer:
             # Draw the image to the Control
             self.InitBuffer()
-            # Refresh the image
-            self.Refresh(False)
+            # If only part of the image changed ...
+            if self.dirtyRect != None:
+                # ... and it's not empty ...
+                if not self.dirtyRect.IsEmpty():
+                    # ... refresh only that part of the image
+                    (x, y) = self.CalcScrolledPosition(self.dirtyRect.x, self.dirtyRect.y)
+                    self.RefreshRect(wx.Rect(x, y, self.dirtyRect.width, self.dirtyRect.height), False)
+            else:
+                # Refresh the image
+                self.Refresh(False)
             # note the draw time
             self.lastUpdateTime = time.time()
 
@@ -757,20 +952,6 @@ class GraphicsControl(wx.ScrolledWindow):
         # with wxPython 2.5.4 and is necessary to allow scrolling to work right.
         dc = wx.BufferedPaintDC(self, self.bmpBuffer, style=wx.BUFFER_VIRTUAL_AREA)
 
-    def GetMaxWidth(self, start=0):
-        """ returns the width of the widest label in the text labels """
-        max = 0
-        tempbuffer = wx.EmptyBitmap(self.canvassize[0], self.canvassize[1])
-        dc = wx.BufferedDC(None, tempbuffer)
-        dc.Clear()
-        for text, x, y, colour, size, family, alignment in self.text[start:]:
-            font = wx.Font(size, family, self.fontstyle, self.fontweight)
-            dc.SetFont(font)
-            (w, h) = dc.GetTextExtent(text)
-            if w > max:
-                max = w
-        return max
-
     def LoadFile(self, filename=None):
         if filename == None:
             # dlg = wx.FileDialog(self, "Load File", wildcard="BMP Files|*.bmp", style=wx.OPEN|wx.CHANGE_DIR)
@@ -810,6 +991,8 @@ class GraphicsControl(wx.ScrolledWindow):
         self.backgroundGraphicName = ''
         # Save the passed-in wxImage as the visualizationImage
         self.visualizationImage = img
+        # The bitmap of the visualizationImage will need to be rebuilt
+        self.baseSource = None
         # Create a wxImage
         self.backgroundImage = img
         # Resize the Bitmap to the size of the Graphic Control
@@ -821,6 +1004,23 @@ class GraphicsControl(wx.ScrolledWindow):
         # Required to get the image to show up!
         self.Refresh()
 
+    def SetVisualizationImage(self, img, backgroundImage=None):
+        """ Take a wxImage of a finished Keyword or Hybrid Visualization, composed on a Graphics Canvas, and display it.
+            backgroundImage is the Hybrid Visualization's Waveform, kept so the Filter can redraw over it later. """
+        # Remove all lines and text, which were drawn onto the image already.  (The selection and cursor are kept.)
+        self.lines = []
+        self.text = []
+        # Remember the Waveform for the Hybrid Visualization
+        self.backgroundImage = backgroundImage
+        # Save the passed-in wxImage as the visualizationImage
+        self.visualizationImage = img
+        # The bitmap of the visualizationImage will need to be rebuilt
+        self.baseSource = None
+        # Convert the wxImage to a wxBitmap and make it the active image
+        self.bmpBuffer = wx.BitmapFromImage(img)
+        # Required to get the image to show up!
+        self.Refresh()
+
     # Define the Method that Saves the image as a Graphic
     def SaveAs(self):
         dlg = wx.FileDialog(self, _("Save File"), wildcard=_("JPEG Files|*.jpg"), style=wx.SAVE|wx.OVERWRITE_PROMPT|wx.CHANGE_DIR)
@@ -912,6 +1112,50 @@ class GraphicsControl(wx.ScrolledWindow):
         self.reInitBuffer = True
 
 
+class GraphicsCanvas(GraphicsDrawing):
+    """ Graphics Canvas Class records the same drawing as the Graphics Control, but renders it off-screen
+        to a wxImage.  It has no window, so a background thread can use it to compose a visualization. """
+    def __init__(self, canvassize=(999, 999)):
+        self.canvassize = canvassize
+        # Initialize the drawing settings and the lists of lines and text
+        self.InitDrawing()
+
+    def getWidth(self):
+        return self.canvassize[0]
+
+    def getHeight(self):
+        return self.canvassize[1]
+
+    def Clear(self, reset=True):
+        """ Clear the Graphic Canvas.  The reset variable is accepted for compatibility with the Graphic Control. """
+        # Remove all lines and text
+        self.lines = []
+        self.text = []
+        self.lineBatches = None
+
+    def Render(self, backgroundImage=None):
+        """ Draw the recorded lines and text, over the backgroundImage if one is passed, and return the wxImage """
+        # Create the bitmap to draw on and a Device Context for it
+        bmp = wx.EmptyBitmap(self.canvassize[0], self.canvassize[1])
+        dc = wx.BufferedDC(None, bmp)
+        # Set the Brush and Background colors to White and clear the drawing
+        dc.SetBackground(wx.Brush(wx.WHITE))
+        dc.Clear()
+        # If we have a background image (the Hybrid Visualization's Waveform) ...
+        if backgroundImage != None:
+            # ... draw it WITHOUT rescaling it
+            dc.DrawBitmap(backgroundImage.ConvertToBitmap(), 0, 0)
+            # Now create a pen to draw a line between the image and the rest of the graphic.
+            dc.SetPen(wx.Pen(wx.LIGHT_GREY, 1, wx.SOLID))
+            # Draw the line here.
+            dc.DrawLine(0, backgroundImage.GetHeight()-1, backgroundImage.GetWidth()-1, backgroundImage.GetHeight()-1)
+        # Draw the recorded lines and text
+        self.DrawLines(dc)
+        # Release the Device Context so the bitmap is complete
+        del(dc)
+        return bmp.ConvertToImage()
+
+
 # If this class is run independently (for testing), create an
 # Application Frame and put in a GraphicsControl.
 if __name__ == '__main__':
@@ -0,0 +1,122 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" This module implements the interval index the Keyword Map and the Library Map use to find the
+    Clips, Quotes, and Snapshots under the mouse.
+
+    The items on a row of a map are (objType, start, end, objNum, objName) tuples.  An IntervalIndex
+    sorts them by start, and for each node of an implicit binary tree over the sorted items it keeps
+    the largest end value of the items below that node.  The items that contain a position can then
+    be found without looking at the items that start after it or end before it.
+
+    usage:  python IntervalIndex.py [options]     runs a benchmark against a linear scan """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's bisect module
+import bisect
+
+
+class IntervalIndex(object):
+    """ An index of (objType, start, end, objNum, objName) items for finding the items that contain a position """
+
+    def __init__(self, items):
+        """ Build the index for a list of items """
+        # Remember the items in their original order
+        self.items = list(items)
+        # Determine the order of the items sorted by their start values
+        self.order = sorted(range(len(self.items)), key=lambda i: self.items[i][1])
+        # Build the sorted list of start values, used to find the items that start at or before a position
+        self.starts = [self.items[i][1] for i in self.order]
+        # The tree is stored in a list, with the root at 1 and the leaves, one per item in sorted order, starting at self.size
+        self.size = 1
+        while self.size < len(self.items):
+            self.size *= 2
+        # Each node holds the largest end value of the items below it.  Empty leaves never contain anything.
+        self.maxEnd = [float('-inf')] * (2 * self.size)
+        for (pos, i) in enumerate(self.order):
+            self.maxEnd[self.size + pos] = self.items[i][2]
+        for node in range(self.size - 1, 0, -1):
+            self.maxEnd[node] = max(self.maxEnd[2 * node], self.maxEnd[2 * node + 1])
+
+    def __len__(self):
+        return len(self.items)
+
+    def Containing(self, *values):
+        """ Return the items for which start <= value <= end for any of the values, in their original order """
+        # Collect the positions of the matching items in the original list
+        found = set()
+        for value in values:
+            # Only the items that start at or before the value can contain it
+            count = bisect.bisect_right(self.starts, value)
+            # Search the tree, starting at the root, which covers all the leaves.  Each entry is (node, first leaf, number of leaves).
+            nodes = [(1, 0, self.size)]
+            while len(nodes) > 0:
+                (node, first, width) = nodes.pop()
+                # Skip nodes with no items that start at or before the value, or no items that end at or after it
+                if (first >= count) or (self.maxEnd[node] < value):
+                    continue
+                # If we've reached a leaf, its item contains the value
+                if node >= self.size:
+                    found.add(self.order[first])
+                # Otherwise, search the node's children
+                else:
+                    width = width / 2
+                    nodes.append((2 * node, first, width))
+                    nodes.append((2 * node + 1, first + width, width))
+        # Return the matching items in their original order
+        return [self.items[i] for i in sorted(found)]
+
+
+if __name__ == '__main__':
+    # import Python's optparse module
+    import optparse
+    # import Python's random module
+    import random
+    # import Python's time module
+    import time
+
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--items', type='int', default=10000, help='number of segments in the row (default 10000)')
+    parser.add_option('--length', type='int', default=3600000, help='length of the row in milliseconds (default 3600000)')
+    parser.add_option('--queries', type='int', default=1000, help='number of positions to look up (default 1000)')
+    (options, args) = parser.parse_args()
+
+    # Build a row of segments of random length
+    random.seed(0)
+    items = []
+    for x in range(options.items):
+        start = random.randint(0, options.length)
+        items.append(('Clip', start, min(start + random.randint(1, 60000), options.length), x, 'Clip %d' % x))
+    positions = [random.randint(0, options.length) for x in range(options.queries)]
+
+    startTime = time.time()
+    index = IntervalIndex(items)
+    buildTime = time.time() - startTime
+
+    startTime = time.time()
+    linear = [[item for item in items if (item[1] <= pos) and (item[2] >= pos)] for pos in positions]
+    linearTime = time.time() - startTime
+
+    startTime = time.time()
+    indexed = [index.Containing(pos) for pos in positions]
+    indexTime = time.time() - startTime
+
+    print "%d segments, %d lookups" % (options.items, options.queries)
+    print "Build index:   %8.2f ms" % (buildTime * 1000.0)
+    print "Linear scan:   %8.3f ms per lookup" % (linearTime * 1000.0 / options.queries)
+    print "Indexed:       %8.3f ms per lookup" % (indexTime * 1000.0 / options.queries)
+    print "Match:         %s" % (linear == indexed)
@@ -0,0 +1,249 @@
+# Copyright (C) 2003-2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+"""This module implements Transana's in-memory Keyword Index.
+
+   The Keyword Index holds the contents of the ClipKeywords2 table in memory, so that Search can find out
+   which Episodes, Documents, Quotes, Clips and Snapshots are coded with a Keyword without re-querying the
+   database.
+
+   The index is loaded from the database the first time it is needed after a database connection is
+   opened.  DBInterface keeps it up to date as Keywords are applied and removed locally, and the Chat
+   Window keeps it up to date as Keyword changes are reported by the Message Server.  Changes the index
+   cannot follow in detail simply call Invalidate(), and the index is re-loaded the next time it is used.
+
+   Keywords are applied and removed inside database transactions, before the COMMIT.  Code that issues a
+   ROLLBACK must call Rollback(), which re-loads the objects whose Keywords changed from the database.
+
+   Search, the Keyword Summary Report and the Analytic Data Export read the index.  The Keyword Map and
+   Library Map still query ClipKeywords2 themselves, as they need the Keywords together with the start and
+   end positions of the Clips and Quotes, which the index does not hold.
+
+   Keyword Group and Keyword values are stored the same way DBInterface returns them, that is as unicode
+   strings when running in unicode mode.
+
+   Object Types are 'Episode', 'Document', 'Quote', 'Clip', and 'Snapshot'.
+"""
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import wxPython only for unicode testing
+import wx
+
+# import Transana's Database Interface
+import DBInterface
+
+# The Object Types, in the order of the columns in the ClipKeywords2 table
+OBJECT_TYPES = ('Episode', 'Document', 'Clip', 'Quote', 'Snapshot')
+
+# Declare Global Variables
+# The database connection the index was loaded from
+_connection = None
+# The Keyword Index:  {(kwg, kw) : {objType : {objNum : example}}}
+_keywordIndex = None
+# The Object Index:  {(objType, objNum) : {(kwg, kw) : example}}
+_objectIndex = None
+# The objects whose Keywords have changed since the last Rollback(), {(objType, objNum) : True}.
+# None if there were too many to track, in which case Rollback() discards the whole index.
+_changedObjects = {}
+# The largest number of changed objects Rollback() re-loads individually
+MAX_CHANGED_OBJECTS = 1000
+
+def _ExampleFlag(value):
+    """ Convert an Example value from the database into 0 or 1 """
+    # Check for "array" data and convert if needed
+    if type(value).__name__ == 'array':
+        value = value.tostring()
+    if value in [1, '1', u'1', True]:
+        return 1
+    else:
+        return 0
+
+def _AddCoding(objType, objNum, kwg, kw, example):
+    """ Add a Keyword coding to the in-memory index.  The index must already be loaded. """
+    # Add the coding to the Keyword Index ...
+    kwData = _keywordIndex.setdefault((kwg, kw), {})
+    kwData.setdefault(objType, {})[objNum] = example
+    # ... and to the Object Index
+    _objectIndex.setdefault((objType, objNum), {})[(kwg, kw)] = example
+
+def _RemoveCoding(objType, objNum, kwg, kw):
+    """ Remove a Keyword coding from the in-memory index.  The index must already be loaded. """
+    # Remove the coding from the Keyword Index ...
+    if _keywordIndex.has_key((kwg, kw)) and _keywordIndex[(kwg, kw)].has_key(objType):
+        if _keywordIndex[(kwg, kw)][objType].has_key(objNum):
+            del(_keywordIndex[(kwg, kw)][objType][objNum])
+    # ... and from the Object Index
+    if _objectIndex.has_key((objType, objNum)) and _objectIndex[(objType, objNum)].has_key((kwg, kw)):
+        del(_objectIndex[(objType, objNum)][(kwg, kw)])
+
+def _NoteChange(objType, objNum):
+    """ Remember that an object's Keywords have changed, in case the change is rolled back """
+    global _changedObjects
+    if _changedObjects != None:
+        _changedObjects[(objType, objNum)] = True
+        # If there are too many to re-load individually, stop tracking them
+        if len(_changedObjects) > MAX_CHANGED_OBJECTS:
+            _changedObjects = None
+
+def _RemoveObject(objType, objNum):
+    """ Remove all of an object's Keyword codings from the in-memory index.  The index must already be loaded. """
+    if _objectIndex.has_key((objType, objNum)):
+        for (kwg, kw) in _objectIndex[(objType, objNum)].keys():
+            _RemoveCoding(objType, objNum, kwg, kw)
+        del(_objectIndex[(objType, objNum)])
+
+def IsLoaded():
+    """ Indicates whether the Keyword Index is loaded for the current database connection """
+    return (_keywordIndex != None) and (_connection is DBInterface._dbref) and (_connection != None)
+
+def Load():
+    """ Load the Keyword Index from the ClipKeywords2 table """
+    global _connection
+    global _keywordIndex
+    global _objectIndex
+    global _changedObjects
+    # Start with empty indexes
+    _keywordIndex = {}
+    _objectIndex = {}
+    _changedObjects = {}
+    # Note the database connection the index is loaded from
+    _connection = DBInterface.get_db()
+    # Get a database cursor
+    dbCursor = _connection.cursor()
+    # Get ALL Clip Keyword records in a single query
+    query = "SELECT EpisodeNum, DocumentNum, ClipNum, QuoteNum, SnapshotNum, KeywordGroup, Keyword, Example FROM ClipKeywords2"
+    dbCursor.execute(query)
+    for (episodeNum, documentNum, clipNum, quoteNum, snapshotNum, kwg, kw, example) in dbCursor.fetchall():
+        # Convert the Keyword Group and Keyword to the proper UTF-8 representation if needed
+        if 'unicode' in wx.PlatformInfo:
+            kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
+            kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
+        # Only one of the object numbers will be non-zero.  Add the coding for that object.
+        for (objType, objNum) in zip(OBJECT_TYPES, (episodeNum, documentNum, clipNum, quoteNum, snapshotNum)):
+            if objNum > 0:
+                _AddCoding(objType, objNum, kwg, kw, _ExampleFlag(example))
+    # Close the database cursor
+    dbCursor.close()
+
+def Invalidate():
+    """ Discard the Keyword Index.  It will be re-loaded from the database the next time it is used. """
+    global _connection
+    global _keywordIndex
+    global _objectIndex
+    global _changedObjects
+    _connection = None
+    _keywordIndex = None
+    _objectIndex = None
+    _changedObjects = {}
+
+def Rollback():
+    """ Report that a database transaction has been rolled back.  Keyword changes made in the transaction
+        were applied to the index before the COMMIT, so the objects whose Keywords changed are re-loaded. """
+    global _changedObjects
+    # If the index isn't loaded, there's nothing to correct.
+    if not IsLoaded():
+        _changedObjects = {}
+    # If we lost track of the changes, discard the index.  It will be re-loaded when needed.
+    elif _changedObjects == None:
+        Invalidate()
+    else:
+        changedObjects = _changedObjects.keys()
+        _changedObjects = {}
+        for (objType, objNum) in changedObjects:
+            RefreshObject(objType, objNum)
+
+def _EnsureLoaded():
+    """ Make sure the Keyword Index is loaded for the current database connection """
+    if not IsLoaded():
+        Load()
+
+def ObjectSetForKeyword(kwg, kw, objType):
+    """ Return the set of object numbers of the given type coded with the Keyword """
+    _EnsureLoaded()
+    if _keywordIndex.has_key((kwg, kw)) and _keywordIndex[(kwg, kw)].has_key(objType):
+        return set(_keywordIndex[(kwg, kw)][objType].keys())
+    else:
+        return set()
+
+def KeywordsForObject(objType, objNum):
+    """ Return the set of (Keyword Group, Keyword) pairs applied to an object """
+    _EnsureLoaded()
+    if _objectIndex.has_key((objType, objNum)):
+        return set(_objectIndex[(objType, objNum)].keys())
+    else:
+        return set()
+
+def KeywordExamples():
+    """ Return the set of (Keyword Group, Keyword) pairs that have a Keyword Example """
+    _EnsureLoaded()
+    examples = set()
+    for (kwg, kw) in _keywordIndex.keys():
+        for objType in _keywordIndex[(kwg, kw)].keys():
+            if 1 in _keywordIndex[(kwg, kw)][objType].values():
+                examples.add((kwg, kw))
+    return examples
+
+def CodedObjectSet(objType):
+    """ Return the set of object numbers of the given type that have any Keyword applied """
+    _EnsureLoaded()
+    return set([objNum for (tmpObjType, objNum) in _objectIndex.keys() if (tmpObjType == objType) and (len(_objectIndex[(tmpObjType, objNum)]) > 0)])
+
+def AddCoding(objType, objNum, kwg, kw, example=0):
+    """ Report that a Keyword has been applied to an object """
+    # If the index isn't loaded, there's nothing to update.  It will be loaded from the database when needed.
+    if IsLoaded():
+        _AddCoding(objType, objNum, kwg, kw, _ExampleFlag(example))
+        _NoteChange(objType, objNum)
+
+def RemoveObject(objType, objNum):
+    """ Report that all Keywords have been removed from an object """
+    if IsLoaded():
+        _RemoveObject(objType, objNum)
+        _NoteChange(objType, objNum)
+
+def RemoveKeyword(kwg, kw):
+    """ Report that a Keyword has been deleted """
+    if IsLoaded() and _keywordIndex.has_key((kwg, kw)):
+        for objType in _keywordIndex[(kwg, kw)].keys():
+            for objNum in _keywordIndex[(kwg, kw)][objType].keys():
+                _RemoveCoding(objType, objNum, kwg, kw)
+        del(_keywordIndex[(kwg, kw)])
+
+def RemoveKeywordGroup(kwg):
+    """ Report that a Keyword Group and all its Keywords have been deleted """
+    if IsLoaded():
+        for (tmpKwg, kw) in _keywordIndex.keys():
+            if tmpKwg == kwg:
+                RemoveKeyword(tmpKwg, kw)
+
+def SetExample(kwg, kw, clipNum, example):
+    """ Report that the Keyword Example status of a Clip Keyword has changed """
+    if IsLoaded():
+        _AddCoding('Clip', clipNum, kwg, kw, _ExampleFlag(example))
+        _NoteChange('Clip', clipNum)
+
+def RefreshObject(objType, objNum):
+    """ Re-load the Keywords for a single object from the database.  This is used when another user
+        changes an object's Keywords. """
+    # If the index isn't loaded, there's nothing to update.
+    if not IsLoaded():
+        return
+    # Remove the object's current codings from the index
+    _RemoveObject(objType, objNum)
+    # Get the object's codings from the database and add them to the index
+    for (kwg, kw, example) in DBInterface.list_of_keywords(**{objType : objNum}):
+        _AddCoding(objType, objNum, kwg, kw, _ExampleFlag(example))
@@ -44,6 +44,10 @@ import Document
 import Episode
 # Import Transana's Filter Dialog
 import FilterDialog
+# import Transana's Interval Index
+import IntervalIndex
+# import Transana's Keyword Map data loader
+import KeywordMapData
 # import Transana's Keyword Object
 import KeywordObject
 # import Transana Miscellaneous functions
@@ -90,7 +94,7 @@ class KeywordMap(wx.Frame):
     """ This is the main class for the Keyword Map application.
         It can be instantiated as a free-standing report with a frame, or can be
         called as an embedded graphic display for the Visualization window. """
-    def __init__(self, parent, ID=-1, title="", embedded=False, topOffset=0, controlObject=None):
+    def __init__(self, parent, ID=-1, title="", embedded=False, topOffset=0, controlObject=None, graphic=None):
         # It's always important to remember your ancestors.
         self.parent = parent
         # Remember the title
@@ -129,6 +133,10 @@ class KeywordMap(wx.Frame):
             # we need data from the database, which we cannot get until we have gotten the username
             # and password information.  However, to get that information, we need a Main Form to
             # exist.  Be careful not to confuse Setup() with SetupEmbedded().
+        # If we ARE embedded and are passed an off-screen Graphics Canvas, the Keyword Visualization is drawn
+        # in a background thread.  The parent's graphics canvas is attached later with AttachGraphic().
+        elif graphic != None:
+            self.graphic = graphic
         # If we ARE embedded, we just use the parent object's graphics canvas for drawing the Keyword Map.
         else:
             # We need to unbind existing mouse motion event connections to avoid overlapping ToolTips and other problems.
@@ -171,12 +179,18 @@ class KeywordMap(wx.Frame):
         self.startChar = -1
         self.endChar = -1
         self.keywordClipList = {}
+        # The Keyword / Clip List is indexed for finding the items under the mouse
+        self.keywordClipIndex = {}
         self.configName = ''
         # Initialize variables required to avoid crashes when the visualization has been cleared
         self.graphicindent = 0
         self.Bounds = [1, 1, 1, 1]
         # Create a dictionary of the colors for each keyword.
         self.keywordColors = {'lastColor' : -1}
+        # The Default Keyword Colors, if they have been loaded ahead of drawing.  (See SetupEmbedded().)
+        self.defaultKeywordColors = None
+        # Signal whether the Default filter configuration still needs to be loaded.  (See SetupEmbedded().)
+        self.defaultConfigPending = False
         if not self.embedded:
             # Get the Configuration values for the Keyword Map Options
             self.barHeight = TransanaGlobal.configData.keywordMapBarHeight
@@ -369,8 +383,10 @@ class KeywordMap(wx.Frame):
                       filteredClipList=[], unfilteredClipList = [],
                       filteredSnapshotList=[], unfilteredSnapshotList = [],
                       filteredKeywordList=[], unfilteredKeywordList = [],
-                      keywordColors = None, clipNum=None, configName='', loadDefault=False):
-        """ Complete setup for the embedded version of the Keyword Map. """
+                      keywordColors = None, clipNum=None, configName='', loadDefault=False, DBCursor=None, episode=None):
+        """ Complete setup for the embedded version of the Keyword Map.
+            When drawing on an off-screen Graphics Canvas in a background thread, DBCursor must be a cursor on the
+            background thread's connection (DBInterface.get_worker_db()), and episode the loaded Episode object. """
         # Remember the appropriate Episode information
         self.episodeNum = episodeNum
         self.seriesName = seriesName
@@ -409,17 +425,48 @@ class KeywordMap(wx.Frame):
             if keywordColors != None:
                 self.keywordColors = keywordColors
             # Populate the drawing
-            self.ProcessEpisode()
+            self.ProcessEpisode(DBCursor=DBCursor, episode=episode)
+            # If we're using a background thread's Database Cursor ...
+            if DBCursor != None:
+                # ... load the Default Keyword Colors now, so DrawGraph() doesn't have to load Keywords
+                self.defaultKeywordColors = KeywordMapData.LoadKeywordColors(DBCursor)
             # We need to draw the graph before we set the Default filter
             self.DrawGraph()
+            # If we need to load the Default Configuration, but are drawing off-screen in a background thread ...
+            if loadDefault and isinstance(self.graphic, GraphicsControlClass.GraphicsCanvas):
+                # ... we can't create the Filter Dialog here.  Note whether there is a Default configuration to load
+                # once the graphic has been attached.
+                self.defaultConfigPending = self.HasDefaultConfig(DBCursor)
             # If we need to load the Default Configuration ...
-            if loadDefault:
+            elif loadDefault:
                 # We actually need to wipe out the original graphic prior to loading the Default filter!
                 self.graphic.Clear()
                 # Trigger the load of the Default filter, if one exists.  An event of None signals we're loading the
                 # Default config, and the OnFilter method will handle drawing the graph!
                 self.OnFilter(None)
 
+    def AttachGraphic(self, graphic):
+        """ Attach the parent's graphics canvas to a Keyword Visualization that was drawn off-screen """
+        # We need to unbind existing mouse motion event connections to avoid overlapping ToolTips and other problems.
+        graphic.Unbind(wx.EVT_MOTION)
+        # point the local graphic object to the parent's graphics canvas
+        self.graphic = graphic
+        # We need to assign the Keyword Map's Mouse Motion event to the graphic object.
+        self.graphic.Bind(wx.EVT_MOTION, self.OnMouseMotion)
+
+    def HasDefaultConfig(self, DBCursor):
+        """ Determine whether a Default filter configuration has been saved for this Episode's Keyword Visualization """
+        # reportType=2 indicates a Keyword Visualization.  The Default config name is saved in English.
+        query = """ SELECT COUNT(*) FROM Filters2
+                      WHERE ReportType = %s AND
+                            ReportScope = %s AND
+                            ConfigName = %s """
+        # Adjust the query for sqlite if needed
+        query = DBInterface.FixQuery(query)
+        # Execute the query with the data values
+        DBCursor.execute(query, (2, self.episodeNum, 'Default'))
+        return (DBCursor.fetchone()[0] > 0)
+
     def SetupTextEmbedded(self,
                           textObj,
                           startChar,
@@ -1102,37 +1149,45 @@ class KeywordMap(wx.Frame):
                 self.startChar = 0
                 self.endChar = self.CharacterLength
                 
+        if isinstance(self.textObj, Document.Document):
+            # Create the Quote Keyword Placement lines to be displayed.  We need them to be in StartChar, QuoteNum order so colors will be
+            # distributed properly across bands.
+            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, qp.StartChar, qp.EndChar, q.QuoteNum, q.QuoteID, q.CollectNum
+                           FROM Quotes2 q, QuotePositions2 qp, ClipKeywords2 ck
+                           WHERE q.SourceDocumentNum = %s AND
+                                 q.QuoteNum = qp.QuoteNum AND
+                                 q.QuoteNum = ck.QuoteNum
+                           ORDER BY StartChar, q.QuoteNum, KeywordGroup, Keyword"""
+        elif isinstance(self.textObj, Quote.Quote):
+            # Create the Quote Keyword Placement lines to be displayed.  We need them to be in StartChar, QuoteNum order so colors will be
+            # distributed properly across bands.
+            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, qp.StartChar, qp.EndChar, q.QuoteNum, q.QuoteID, q.CollectNum
+                           FROM Quotes2 q, QuotePositions2 qp, ClipKeywords2 ck
+                           WHERE q.QuoteNum = %s AND
+                                 q.QuoteNum = qp.QuoteNum AND
+                                 q.QuoteNum = ck.QuoteNum
+                           ORDER BY StartChar, q.QuoteNum, KeywordGroup, Keyword"""
+        # Adjust the query for sqlite if needed
+        SQLText = DBInterface.FixQuery(SQLText)
+        self.DBCursor.execute(SQLText, (self.textObj.number, ))
+        quoteRecords = []
+        for (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) in self.DBCursor.fetchall():
+            kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
+            kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
+            quoteID = DBInterface.ProcessDBDataForUTF8Encoding(quoteID)
+            quoteRecords.append((kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum))
+
         # If this is our first time through ...
         if (self.filteredKeywordList == []) and (self.unfilteredKeywordList == []):
             # If we deleted the last keyword in a filtered list, the Filter Dialog ended up with
             # duplicate entries.  This should prevent it!!
             self.unfilteredKeywordList = []
-            if isinstance(self.textObj, Document.Document):
-                # Get the list of QUOTE Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Quotes2 q, ClipKeywords2 ck
-                               WHERE q.SourceDocumentNum = %s AND
-                                     q.QuoteNum = ck.QuoteNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword"""
-            elif isinstance(self.textObj, Quote.Quote):
-                # Get the list of QUOTE Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Quotes2 q, ClipKeywords2 ck
-                               WHERE q.QuoteNum = %s AND
-                                     q.QuoteNum = ck.QuoteNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (self.textObj.number, ))
-            for (kwg, kw) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                if not (kwg, kw) in self.filteredKeywordList:
-                    self.filteredKeywordList.append((kwg, kw))
-                if not (kwg, kw, True) in self.unfilteredKeywordList:
-                    self.unfilteredKeywordList.append((kwg, kw, True))
+            # The QUOTE Keywords to be displayed are the Keywords used in the Keyword Placement data
+            keywords = list(set([(kwg, kw) for (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) in quoteRecords]))
+            keywords.sort()
+            for (kwg, kw) in keywords:
+                self.filteredKeywordList.append((kwg, kw))
+                self.unfilteredKeywordList.append((kwg, kw, True))
 
 ##            if TransanaConstants.proVersion:
 ##                # Get the list of WHOLE SNAPSHOT Keywords to be displayed
@@ -1177,31 +1232,10 @@ class KeywordMap(wx.Frame):
             self.unfilteredKeywordList.sort()
             self.filteredKeywordList.sort()
         
-        if isinstance(self.textObj, Document.Document):
-            # Create the Quote Keyword Placement lines to be displayed.  We need them to be in StartChar, QuoteNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, qp.StartChar, qp.EndChar, q.QuoteNum, q.QuoteID, q.CollectNum
-                           FROM Quotes2 q, QuotePositions2 qp, ClipKeywords2 ck
-                           WHERE q.SourceDocumentNum = %s AND
-                                 q.QuoteNum = qp.QuoteNum AND
-                                 q.QuoteNum = ck.QuoteNum
-                           ORDER BY StartChar, q.QuoteNum, KeywordGroup, Keyword"""
-        elif isinstance(self.textObj, Quote.Quote):
-            # Create the Quote Keyword Placement lines to be displayed.  We need them to be in StartChar, QuoteNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, qp.StartChar, qp.EndChar, q.QuoteNum, q.QuoteID, q.CollectNum
-                           FROM Quotes2 q, QuotePositions2 qp, ClipKeywords2 ck
-                           WHERE q.QuoteNum = %s AND
-                                 q.QuoteNum = qp.QuoteNum AND
-                                 q.QuoteNum = ck.QuoteNum
-                           ORDER BY StartChar, q.QuoteNum, KeywordGroup, Keyword"""
-        # Adjust the query for sqlite if needed
-        SQLText = DBInterface.FixQuery(SQLText)
-        self.DBCursor.execute(SQLText, (self.textObj.number, ))
-        for (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) in self.DBCursor.fetchall():
-            kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-            kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-            quoteID = DBInterface.ProcessDBDataForUTF8Encoding(quoteID)
+        # Note the Quote records and Quote Filter List items we already have, so duplicates can be skipped quickly
+        quoteListRecords = set(self.quoteList)
+        quoteFilterItems = set([(quoteID, collectNum) for (quoteID, collectNum, checked) in self.quoteFilterList])
+        for (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) in quoteRecords:
             # Handle orphaned Quotes
             if isinstance(self.textObj, Quote.Quote):
                 if startChar == -1:
@@ -1211,14 +1245,15 @@ class KeywordMap(wx.Frame):
             # If we're dealing with a Document, self.QuoteNum will be None and we want all Quotes.
             # If we're dealing with a Quote, we only want to deal with THIS Quote!
             if (self.quoteNum == None) or (quoteNum == self.quoteNum):
-                if (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) not in self.quoteList:
+                if (kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum) not in quoteListRecords:
                     if isinstance(self.textObj, Document.Document):
                         self.quoteList.append((kwg, kw, self.textObj.quote_dict[quoteNum][0], self.textObj.quote_dict[quoteNum][1], quoteNum, quoteID, collectNum))
                     elif isinstance(self.textObj, Quote.Quote):
                         self.quoteList.append((kwg, kw, startChar, endChar, quoteNum, quoteID, collectNum))
-                if (not ((quoteID, collectNum, True) in self.quoteFilterList)) and \
-                   (not ((quoteID, collectNum, False) in self.quoteFilterList)):
+                    quoteListRecords.add(self.quoteList[-1])
+                if not (quoteID, collectNum) in quoteFilterItems:
                     self.quoteFilterList.append((quoteID, collectNum, True))
+                    quoteFilterItems.add((quoteID, collectNum))
 
 ##        if TransanaConstants.proVersion:
 ##            # Create the WHOLE SNAPSHOT Keyword Placement lines to be displayed.  We need them to be in SnapshotTimeCode, SnapshotNum order so colors will be
@@ -1267,16 +1302,24 @@ class KeywordMap(wx.Frame):
 ##                       (not ((SnapshotID, collectNum, False) in self.snapshotFilterList)):
 ##                        self.snapshotFilterList.append((SnapshotID, collectNum, True))
 
-    def ProcessEpisode(self):
-        """ Process a Keyword Map for an Episode """
+    def ProcessEpisode(self, DBCursor=None, episode=None):
+        """ Process a Keyword Map for an Episode.  The DBCursor and the loaded episode can be passed in
+            when drawing in a background thread. """
         # We need a data struture to hold the data about what clips correspond to what keywords
         self.MediaFile = ''
         self.MediaLength = 0
 
         # Start Exception Handling
         try:
-            # Load the specified Episode
-            tmpEpObj = Episode.Episode(num=self.episodeNum)
+            # If we were passed the Episode ...
+            if episode != None:
+                # ... use it.  An Episode number of 0 indicates the Episode wasn't found.
+                if episode.number == 0:
+                    raise TransanaExceptions.RecordNotFoundError(self.episodeNum, 0)
+                tmpEpObj = episode
+            else:
+                # Load the specified Episode
+                tmpEpObj = Episode.Episode(num=self.episodeNum)
             # Note the Media File Name (without path) and the Media File Length
             self.MediaFile = os.path.split(tmpEpObj.media_filename)[1]
             self.MediaLength = tmpEpObj.episode_length()
@@ -1291,141 +1334,60 @@ class KeywordMap(wx.Frame):
             import traceback
             traceback.print_exc(file=sys.stdout)
 
+        # If we weren't passed a Database Cursor, use the Keyword Map's
+        if DBCursor == None:
+            DBCursor = self.DBCursor
+        # Load the Clip and Snapshot Keyword Placement data for the Episode
+        codings = KeywordMapData.LoadCodings(DBCursor, 'Episode', self.episodeNum, TransanaConstants.proVersion)
+
         # If this is our first time through ...
         if (self.filteredKeywordList == []) and (self.unfilteredKeywordList == []):
             # If we deleted the last keyword in a filtered list, the Filter Dialog ended up with
             # duplicate entries.  This should prevent it!!
             self.unfilteredKeywordList = []
-            # Get the list of CLIP Keywords to be displayed
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                           FROM Clips2 cl, ClipKeywords2 ck
-                           WHERE cl.EpisodeNum = %s AND
-                                 cl.ClipNum = ck.ClipNum
-                           GROUP BY ck.keywordgroup, ck.keyword
-                           ORDER BY KeywordGroup, Keyword, ClipStart"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (self.episodeNum, ))
-            for (kwg, kw) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                if not (kwg, kw) in self.filteredKeywordList:
-                    self.filteredKeywordList.append((kwg, kw))
-                if not (kwg, kw, True) in self.unfilteredKeywordList:
-                    self.unfilteredKeywordList.append((kwg, kw, True))
-
-            if TransanaConstants.proVersion:
-                # Get the list of WHOLE SNAPSHOT Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Snapshots2 sn, ClipKeywords2 ck
-                               WHERE sn.EpisodeNum = %s AND
-                                     sn.SnapshotNum = ck.SnapshotNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-                # Adjust the query for sqlite if needed
-                SQLText = DBInterface.FixQuery(SQLText)
-                self.DBCursor.execute(SQLText, (self.episodeNum, ))
-                for (kwg, kw) in self.DBCursor.fetchall():
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    if not (kwg, kw) in self.filteredKeywordList:
-                        self.filteredKeywordList.append((kwg, kw))
-                    if not (kwg, kw, True) in self.unfilteredKeywordList:
-                        self.unfilteredKeywordList.append((kwg, kw, True))
-
-                # Get the list of SNAPSHOT CODING Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Snapshots2 sn, SnapshotKeywords2 ck
-                               WHERE sn.EpisodeNum = %s AND
-                                     sn.SnapshotNum = ck.SnapshotNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-                # Adjust the query for sqlite if needed
-                SQLText = DBInterface.FixQuery(SQLText)
-                self.DBCursor.execute(SQLText, (self.episodeNum, ))
-                for (kwg, kw) in self.DBCursor.fetchall():
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    if not (kwg, kw) in self.filteredKeywordList:
-                        self.filteredKeywordList.append((kwg, kw))
-                    if not (kwg, kw, True) in self.unfilteredKeywordList:
-                        self.unfilteredKeywordList.append((kwg, kw, True))
+            # The Keywords to be displayed are the Keywords used by the Episode's Clips and Snapshots
+            for (kwg, kw) in KeywordMapData.Keywords(codings):
+                self.filteredKeywordList.append((kwg, kw))
+                self.unfilteredKeywordList.append((kwg, kw, True))
 
         # If we haven't loaded a configuration (which contains its own sort order) ...
         if self.configName == '':
             # Sort the Keyword List
             self.unfilteredKeywordList.sort()
             self.filteredKeywordList.sort()
-        
-        # Create the Clip Keyword Placement lines to be displayed.  We need them to be in ClipStart, ClipNum order so colors will be
+
+        # Note the Clip records and Clip Filter List items we already have, so duplicates can be skipped quickly
+        clipRecords = set(self.clipList)
+        clipFilterItems = set([(clipID, collectNum) for (clipID, collectNum, checked) in self.clipFilterList])
+        # Create the Clip Keyword Placement lines to be displayed.  They are in ClipStart, ClipNum order so colors will be
         # distributed properly across bands.
-        SQLText = """SELECT ck.KeywordGroup, ck.Keyword, cl.ClipStart, cl.ClipStop, cl.ClipNum, cl.ClipID, cl.CollectNum
-                       FROM Clips2 cl, ClipKeywords2 ck
-                       WHERE cl.EpisodeNum = %s AND
-                             cl.ClipNum = ck.ClipNum
-                       ORDER BY ClipStart, cl.ClipNum, KeywordGroup, Keyword"""
-        # Adjust the query for sqlite if needed
-        SQLText = DBInterface.FixQuery(SQLText)
-        self.DBCursor.execute(SQLText, (self.episodeNum, ))
-        for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum) in self.DBCursor.fetchall():
-            kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-            kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-            clipID = DBInterface.ProcessDBDataForUTF8Encoding(clipID)
+        for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum, episodeNum) in codings[KeywordMapData.CLIP]:
             # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
             # If we're dealing with a Clip, we only want to deal with THIS clip!
             if (self.clipNum == None) or (clipNum == self.clipNum):
-                if (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum) not in self.clipList:
+                if (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum) not in clipRecords:
                     self.clipList.append((kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum))
-                if (not ((clipID, collectNum, True) in self.clipFilterList)) and \
-                   (not ((clipID, collectNum, False) in self.clipFilterList)):
+                    clipRecords.add((kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum))
+                if not (clipID, collectNum) in clipFilterItems:
                     self.clipFilterList.append((clipID, collectNum, True))
-
-        if TransanaConstants.proVersion:
-            # Create the WHOLE SNAPSHOT Keyword Placement lines to be displayed.  We need them to be in SnapshotTimeCode, SnapshotNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum, sn.SnapshotID, sn.CollectNum
-                           FROM Snapshots2 sn, ClipKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (self.episodeNum, ))
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                SnapshotID = DBInterface.ProcessDBDataForUTF8Encoding(SnapshotID)
-                # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
-                # If we're dealing with a Clip, we only want to deal with THIS clip!
-                if (self.clipNum == None):
-                    if (kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum) not in self.snapshotList:
-                        self.snapshotList.append((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum))
-                    if (not ((SnapshotID, collectNum, True) in self.snapshotFilterList)) and \
-                       (not ((SnapshotID, collectNum, False) in self.snapshotFilterList)):
-                        self.snapshotFilterList.append((SnapshotID, collectNum, True))
-
-            # Create the SNAPSHOT CODING Keyword Placement lines to be displayed.  We need them to be in SnapshotTimeCode, SnapshotNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum, sn.SnapshotID, sn.CollectNum
-                           FROM Snapshots2 sn, SnapshotKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (self.episodeNum, ))
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                SnapshotID = DBInterface.ProcessDBDataForUTF8Encoding(SnapshotID)
-                # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
-                # If we're dealing with a Clip, we only want to deal with THIS clip!
-                if (self.clipNum == None):
-                    if (kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum) not in self.snapshotList:
-                        self.snapshotList.append((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum))
-                    if (not ((SnapshotID, collectNum, True) in self.snapshotFilterList)) and \
-                       (not ((SnapshotID, collectNum, False) in self.snapshotFilterList)):
-                        self.snapshotFilterList.append((SnapshotID, collectNum, True))
+                    clipFilterItems.add((clipID, collectNum))
+
+        # Note the Snapshot records and Snapshot Filter List items we already have, so duplicates can be skipped quickly
+        snapshotRecords = set(self.snapshotList)
+        snapshotFilterItems = set([(SnapshotID, collectNum) for (SnapshotID, collectNum, checked) in self.snapshotFilterList])
+        # Create the WHOLE SNAPSHOT and SNAPSHOT CODING Keyword Placement lines to be displayed.  They are in SnapshotTimeCode,
+        # SnapshotNum order so colors will be distributed properly across bands.
+        for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum, episodeNum) in \
+            codings[KeywordMapData.SNAPSHOT] + codings[KeywordMapData.SNAPSHOTCODING]:
+            # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
+            # If we're dealing with a Clip, we only want to deal with THIS clip!
+            if (self.clipNum == None):
+                if (kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum) not in snapshotRecords:
+                    self.snapshotList.append((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum))
+                    snapshotRecords.add((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum))
+                if not (SnapshotID, collectNum) in snapshotFilterItems:
+                    self.snapshotFilterList.append((SnapshotID, collectNum, True))
+                    snapshotFilterItems.add((SnapshotID, collectNum))
 
     def ProcessCollection(self):
         """ Process a Collection for the Collection Keyword Map variation of the Keyword Map """
@@ -1438,79 +1400,20 @@ class KeywordMap(wx.Frame):
         # Initialize the Media Length, which we will accumulate from the clips
         self.MediaLength = 0
 
+        # Load the Clip and Snapshot Keyword Placement data for the Collection
+        codings = KeywordMapData.LoadCodings(self.DBCursor, 'Collection', self.collectionNum, TransanaConstants.proVersion)
+
         # We need a data struture to hold the data about what clips and snapshots correspond to what keywords.
         # But we only need to process it once.
         if self.filteredKeywordList == []:
             # If we deleted the last keyword in a filtered list, the Filter Dialog ended up with
             # duplicate entries.  This should prevent it!!
             self.unfilteredKeywordList = []
-            # Get the list of CLIP Keywords to be displayed.  This query should do it.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                           FROM Clips2 cl, ClipKeywords2 ck
-                           WHERE cl.CollectNum = %s AND
-                                 cl.ClipNum = ck.ClipNum
-                           GROUP BY ck.keywordgroup, ck.keyword
-                           ORDER BY KeywordGroup, Keyword, ClipStart"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            # Execute the query
-            self.DBCursor.execute(SQLText, (self.collectionNum, ))
-            # For each record in the query results ...
-            for (kwg, kw) in self.DBCursor.fetchall():
-                # ... encode the KWG and KW
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                # ... and add them to the filtered and unfiltered keyword lists
+            # The Keywords to be displayed are the Keywords used by the Collection's Clips and Snapshots
+            for (kwg, kw) in KeywordMapData.Keywords(codings):
                 self.filteredKeywordList.append((kwg, kw))
                 self.unfilteredKeywordList.append((kwg, kw, True))
 
-            if TransanaConstants.proVersion:
-                # Get the list of WHOLE SNAPSHOT Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Snapshots2 sn, ClipKeywords2 ck
-                               WHERE sn.CollectNum = %s AND
-                                     sn.SnapshotNum = ck.SnapshotNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-                # Adjust the query for sqlite if needed
-                SQLText = DBInterface.FixQuery(SQLText)
-                # Execute the query
-                self.DBCursor.execute(SQLText, (self.collectionNum, ))
-                # For each record in the query results ...
-                for (kwg, kw) in self.DBCursor.fetchall():
-                    # ... encode the KWG and KW
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    # ... and IF they're not already there, add them to the filtered and unfiltered keyword lists.
-                    # Unlike with Clips, a Snapshot can have multiple instances of the same keyword!!
-                    if not (kwg, kw) in self.filteredKeywordList:
-                        self.filteredKeywordList.append((kwg, kw))
-                    if not (kwg, kw, True) in self.unfilteredKeywordList:
-                        self.unfilteredKeywordList.append((kwg, kw, True))
-
-                # Get the list of SNAPSHOT CODING Keywords to be displayed
-                SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                               FROM Snapshots2 sn, SnapshotKeywords2 ck
-                               WHERE sn.CollectNum = %s AND
-                                     sn.SnapshotNum = ck.SnapshotNum
-                               GROUP BY ck.keywordgroup, ck.keyword
-                               ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-                # Adjust the query for sqlite if needed
-                SQLText = DBInterface.FixQuery(SQLText)
-                # Execute the query
-                self.DBCursor.execute(SQLText, (self.collectionNum, ))
-                # For each record in the query results ...
-                for (kwg, kw) in self.DBCursor.fetchall():
-                    # ... encode the KWG and KW
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    # ... and IF they're not already there, add them to the filtered and unfiltered keyword lists.
-                    # Unlike with Clips, a Snapshot can have multiple instances of the same keyword!!
-                    if not (kwg, kw) in self.filteredKeywordList:
-                        self.filteredKeywordList.append((kwg, kw))
-                    if not (kwg, kw, True) in self.unfilteredKeywordList:
-                        self.unfilteredKeywordList.append((kwg, kw, True))
-
         # Sort the Keyword Lists
         self.unfilteredKeywordList.sort()
         self.filteredKeywordList.sort()
@@ -1522,18 +1425,8 @@ class KeywordMap(wx.Frame):
         # Initialize the Collection Contents dictionary, which allows us to sort Clips and Snapshots in the right order
         collectionOrder = {}
 
-        # Get the CLIP information for the Keyword Placement lines to be displayed.  
-        SQLText = """SELECT ck.KeywordGroup, ck.Keyword, cl.ClipStart, cl.ClipStop, cl.ClipNum, cl.ClipID, cl.CollectNum, cl.SortOrder
-                       FROM Clips2 cl, ClipKeywords2 ck
-                       WHERE cl.CollectNum = %s AND
-                             cl.ClipNum = ck.ClipNum
-                       ORDER BY SortOrder, KeywordGroup, Keyword"""
-        # Adjust the query for sqlite if needed
-        SQLText = DBInterface.FixQuery(SQLText)
-        # Execute the query
-        self.DBCursor.execute(SQLText, (self.collectionNum, ))
-        # Iterate through the query results
-        for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum, sortOrder) in self.DBCursor.fetchall():
+        # Iterate through the CLIP information for the Keyword Placement lines to be displayed
+        for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum, sortOrder) in codings[KeywordMapData.CLIP]:
             # If there's no entry for this item in the Sort Order ...
             if not collectionOrder.has_key(sortOrder):
                 # ... create a new list of Clip Keyword entries for this Sort Order item
@@ -1543,62 +1436,28 @@ class KeywordMap(wx.Frame):
                 # ... append the new Keyword to the list.  (We must allow multiple keywords per clip/snapshot!)
                 collectionOrder[sortOrder].append(('Clip', kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum))
 
-        if TransanaConstants.proVersion:
-            # Create the WHOLE SNAPSHOT Keyword Placement lines to be displayed.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum,
-                                sn.SnapshotID, sn.CollectNum, sn.SortOrder
-                           FROM Snapshots2 sn, ClipKeywords2 ck
-                           WHERE sn.CollectNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            # Execute the query
-            self.DBCursor.execute(SQLText, (self.collectionNum, ))
-            # Iterate through the query results
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum, sortOrder) in self.DBCursor.fetchall():
-                # If the Snapshot does not have a defined duration ...
-                if SnapshotDuration <= 0:
-                    # ... let's give it a temporary length of 10 seconds so it will show up!
-                    SnapshotDuration = 10000
-                # If there's no entry for this item in the Sort Order ...
-                if not collectionOrder.has_key(sortOrder):
-                    # ... create a new list of Snapshot Keyword entries for this Sort Order item
-                    collectionOrder[sortOrder] = [('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
-                                                   collectNum)]
-                # If there already is an entry for this item in the Sort Order ...
-                else:
-                    # ... append the new Keyword to the list.  (We must allow multiple keywords per clip/snapshot!)
-                    collectionOrder[sortOrder].append(('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
-                                                       collectNum))
-
-            # Create the SNAPSHOT CODING Keyword Placement lines to be displayed.  
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum,
-                                sn.SnapshotID, sn.CollectNum, sn.SortOrder
-                           FROM Snapshots2 sn, SnapshotKeywords2 ck
-                           WHERE sn.CollectNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            # Execute the query
-            self.DBCursor.execute(SQLText, (self.collectionNum, ))
-            # Iterate through the query results
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum, sortOrder) in self.DBCursor.fetchall():
-                # If the Snapshot does not have a defined duration ...
-                if SnapshotDuration <= 0.0:
-                    # ... let's give it a temporary length of 10 seconds so it will show up!
-                    SnapshotDuration = 10000
-                # If there's no entry for this item in the Sort Order ...
-                if not collectionOrder.has_key(sortOrder):
-                    # ... create a new list of Snapshot Keyword entries for this Sort Order item
-                    collectionOrder[sortOrder] = [('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
-                                                   collectNum)]
-                # If there already is an entry for this item in the Sort Order ...
-                else:
-                    # ... append the new Keyword to the list.  (We must allow multiple keywords per clip/snapshot!)
-                    collectionOrder[sortOrder].append(('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
-                                                       collectNum))
+        # Iterate through the WHOLE SNAPSHOT and SNAPSHOT CODING information for the Keyword Placement lines to be displayed
+        for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum, sortOrder) in \
+            codings[KeywordMapData.SNAPSHOT] + codings[KeywordMapData.SNAPSHOTCODING]:
+            # If the Snapshot does not have a defined duration ...
+            if SnapshotDuration <= 0:
+                # ... let's give it a temporary length of 10 seconds so it will show up!
+                SnapshotDuration = 10000
+            # If there's no entry for this item in the Sort Order ...
+            if not collectionOrder.has_key(sortOrder):
+                # ... create a new list of Snapshot Keyword entries for this Sort Order item
+                collectionOrder[sortOrder] = [('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
+                                               collectNum)]
+            # If there already is an entry for this item in the Sort Order ...
+            else:
+                # ... append the new Keyword to the list.  (We must allow multiple keywords per clip/snapshot!)
+                collectionOrder[sortOrder].append(('Snapshot', kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID,
+                                                   collectNum))
+
+        # Note the Filter List items and Snapshot records we already have, so duplicates can be skipped quickly
+        clipFilterItems = set([(clipID, collectNum) for (clipID, collectNum, checked) in self.clipFilterList])
+        snapshotFilterItems = set([(snapshotID, collectNum) for (snapshotID, collectNum, checked) in self.snapshotFilterList])
+        snapshotRecords = set(self.snapshotList)
         # Get the Sort Order Keys (which are the Sort Order values)
         keys = collectionOrder.keys()
         # Sort the Sort Order Keys, so they're in Sort Order order!!
@@ -1618,18 +1477,15 @@ class KeywordMap(wx.Frame):
                         self.MediaLength += (clipStop - clipStart + 100)
                         # ... and update the current clip number so this clip won't be counted again if it has multiple keywords
                         currClip = clipNum
-                    # Decode the KWG, KW, and Clip ID
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    clipID = DBInterface.ProcessDBDataForUTF8Encoding(clipID)
                     # If we're dealing with a Collection Keyword Report, self.clipNum will be None
                     if (self.clipNum == None):
                         # Add the current Clip/keyword combo to the Clip List, placing it to the right of the last clip.
                         self.clipList.append((kwg, kw, self.MediaLength - (clipStop - clipStart) - 50, self.MediaLength - 50, clipNum, clipID, collectNum))
                         # If the clip ID isn't already in the Clip Filter List ...
-                        if not ((clipID, collectNum, True) in self.clipFilterList):
+                        if not ((clipID, collectNum) in clipFilterItems):
                             # ... add the clip to the Clip Filter List
                             self.clipFilterList.append((clipID, collectNum, True))
+                            clipFilterItems.add((clipID, collectNum))
                 # If the next record is a SNAPSHOT ...
                 elif recData[0] == 'Snapshot':
                     # ... extract the Snapshot data
@@ -1640,22 +1496,19 @@ class KeywordMap(wx.Frame):
                         self.MediaLength += (snapshotDuration + 100)
                         # ... and update the current snapshot number so this snapshot won't be counted again if it has multiple keywords
                         currSnapshot = snapshotNum
-                    # Decode the KWG, KW, and Snapshot ID
-                    kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                    kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                    snapshotID = DBInterface.ProcessDBDataForUTF8Encoding(snapshotID)
                     # If we're dealing with a Collection Keyword Report, self.clipNum will be None and we want all data.
                     if (self.clipNum == None):
                         # Snapshots, unlike Clips, can have the same keyword multiple times.  Let's check to see if this Keyword is already
                         # in the Snapshot List.
-                        if (kwg, kw, self.MediaLength - snapshotDuration - 50, self.MediaLength - 50, snapshotNum, snapshotID, collectNum) not in self.snapshotList:
+                        if (kwg, kw, self.MediaLength - snapshotDuration - 50, self.MediaLength - 50, snapshotNum, snapshotID, collectNum) not in snapshotRecords:
                             # Add the current Snapshot/keyword combo to the Snapshot List, placing it to the right of the last snapshot.
                             self.snapshotList.append((kwg, kw, self.MediaLength - snapshotDuration - 50, self.MediaLength - 50, snapshotNum, snapshotID, collectNum))
+                            snapshotRecords.add((kwg, kw, self.MediaLength - snapshotDuration - 50, self.MediaLength - 50, snapshotNum, snapshotID, collectNum))
                         # If the snapshot ID isn't already in the Snapshot Filter List ...
-                        if (not ((snapshotID, collectNum, True) in self.snapshotFilterList)) and \
-                           (not ((snapshotID, collectNum, False) in self.snapshotFilterList)):
+                        if not ((snapshotID, collectNum) in snapshotFilterItems):
                             # ... add it to the Snapshot Filter List
                             self.snapshotFilterList.append((snapshotID, collectNum, True))
+                            snapshotFilterItems.add((snapshotID, collectNum))
 
         # When we're done adding clips, we know the total width of the graphic.  Set self.endTime to the accumulated
         # Media Length so the graphic will render correctly.
@@ -1918,6 +1771,7 @@ class KeywordMap(wx.Frame):
     def DrawGraph(self):
         """ Actually Draw the Keyword Map """
         self.keywordClipList = {}
+        self.keywordClipIndex = {}
         # We need to remember Snapshot Color for when self.keywordAsColor is False
         # Otherwise, whole snapshot coding may get a different color than detail snapshot coding.
         snapshotColor = {}
@@ -2194,20 +2048,27 @@ class KeywordMap(wx.Frame):
                     colourindex = self.keywordColors[(KWG, KW)]
                 # If the color has NOT been defined ...
                 else:
-                    # Load the keyword
-                    tmpKeyword = KeywordObject.Keyword(KWG, KW)
+                    # If the Default Keyword Colors have been loaded ...
+                    if self.defaultKeywordColors != None:
+                        # ... look up the keyword's color.  Keywords without one aren't included.
+                        (lineColorName, lineColorDef) = self.defaultKeywordColors.get((KWG, KW), ('', ''))
+                    else:
+                        # Load the keyword
+                        tmpKeyword = KeywordObject.Keyword(KWG, KW)
+                        lineColorName = tmpKeyword.lineColorName
+                        lineColorDef = tmpKeyword.lineColorDef
                     # If the Default Keyword Color is in the set of defined colors ...
-                    if tmpKeyword.lineColorName in colorSet:
+                    if lineColorName in colorSet:
                         # ... define the color for this keyword
-                        self.keywordColors[(KWG, KW)] = colorSet.index(tmpKeyword.lineColorName)
+                        self.keywordColors[(KWG, KW)] = colorSet.index(lineColorName)
                     # If the Default Keyword Color is NOT in the defined colors ...
-                    elif tmpKeyword.lineColorName != '':
+                    elif lineColorName != '':
                         # ... add the color name to the colorSet List
-                        colorSet.append(tmpKeyword.lineColorName)
+                        colorSet.append(lineColorName)
                         # ... add the color's definition to the colorLookup dictionary
-                        colorLookup[tmpKeyword.lineColorName] = (int(tmpKeyword.lineColorDef[1:3], 16), int(tmpKeyword.lineColorDef[3:5], 16), int(tmpKeyword.lineColorDef[5:7], 16))
+                        colorLookup[lineColorName] = (int(lineColorDef[1:3], 16), int(lineColorDef[3:5], 16), int(lineColorDef[5:7], 16))
                         # ... determine the new color's index
-                        colourindex = colorSet.index(tmpKeyword.lineColorName)
+                        colourindex = colorSet.index(lineColorName)
                         # ... define the new color for this keyword
                         self.keywordColors[(KWG, KW)] = colourindex
                     # If there is no Default Keyword Color defined
@@ -2606,6 +2467,11 @@ class KeywordMap(wx.Frame):
         for tempLine in overlapLines:
             self.graphic.AddLines(tempLine)
 
+        # Index the Keyword / Clip List so the items under the mouse can be found quickly
+        self.keywordClipIndex = {}
+        for key in self.keywordClipList.keys():
+            self.keywordClipIndex[key] = IntervalIndex.IntervalIndex(self.keywordClipList[key])
+
         if not self.embedded:
             
             # Enable tracking of mouse movement over the graphic
@@ -2618,7 +2484,8 @@ class KeywordMap(wx.Frame):
                     self.menuFile.Enable(M_FILE_PRINTPREVIEW, True)
                 self.menuFile.Enable(M_FILE_PRINTSETUP, True)
                 self.menuFile.Enable(M_FILE_PRINT, True)
-        else:
+        # An off-screen Graphics Canvas is not the waveform.  (See AttachGraphic().)
+        elif not isinstance(self.graphic, GraphicsControlClass.GraphicsCanvas):
             # The DrawGraph routine destroys and recreates self.graphic.  We need to re-point the waveform to it.
             self.parent.waveform = self.graphic
 
@@ -2657,13 +2524,13 @@ class KeywordMap(wx.Frame):
                     # Set the Status Text to indicate the current Keyword and Position values
                     self.SetStatusText(prompt % (kw[0], kw[1], time))
                 # If there's a defined keyword in the Keyword Clip List ...
-                if (self.keywordClipList.has_key(kw)):
+                if (self.keywordClipIndex.has_key(kw)):
                     # ... and we have media-based data ...
                     if self.MediaLength > 0:
                         # initialize the string that will hold the names of clips being pointed to
                         clipNames = ''
-                        # Get the list of Clips that contain the current Keyword from the keyword / Clip List dictionary
-                        clips = self.keywordClipList[kw]
+                        # Get the list of Clips that contain the current Keyword and Time from the keyword / Clip Index
+                        clips = self.keywordClipIndex[kw].Containing(time)
                         # Iterate through the Clip List ...
                         for (objType, startTime, endTime, clipNum, clipName) in clips:
                             # If the current Time value falls between the Clip's StartTime and EndTime ...
@@ -2686,8 +2553,8 @@ class KeywordMap(wx.Frame):
                     elif self.CharacterLength > 0:
                         # initialize the string that will hold the names of quotes being pointed to.
                         quoteNames = ''
-                        # Get the list of Quotes that contain the current Keyword from the keyword / Clip List dictionary
-                        quotes = self.keywordClipList[kw]
+                        # Get the list of Quotes that contain the current Keyword and Position from the keyword / Clip Index
+                        quotes = self.keywordClipIndex[kw].Containing(time)
                         # Iterate through the Quote List ...
                         for (objType, startChar, endChar, quoteNum, quoteName) in quotes:
                             # If the current Character value falls between the Quote's StartChar and EndChar ...
@@ -2717,14 +2584,14 @@ class KeywordMap(wx.Frame):
                (((self.MediaLength > 0) and (time < self.MediaLength)) or \
                 ((self.CharacterLength > 0) and (time < self.CharacterLength)) or \
                 ((True))):
-                if (self.keywordClipList.has_key(kw)):
+                if (self.keywordClipIndex.has_key(kw)):
                     # If we have a Media File ...
                     if self.MediaLength > 0:
                         # initialize the string that will hold the names of clips being pointed to.
                         # We don't actually need to know the names, but this signals that we're at least OVER a Clip.
                         clipNames = ''
-                        # Get the list of Clips that contain the current Keyword from the keyword / Clip List dictionary
-                        clips = self.keywordClipList[kw]
+                        # Get the list of Clips that contain the current Keyword and Time from the keyword / Clip Index
+                        clips = self.keywordClipIndex[kw].Containing(time)
                         # Iterate through the Clip List ...
                         for (objType, startTime, endTime, clipNum, clipName) in clips:
                             # If the current Time value falls between the Clip's StartTime and EndTime ...
@@ -2742,8 +2609,9 @@ class KeywordMap(wx.Frame):
                         # initialize the string that will hold the names of quotes being pointed to.
                         # We don't actually need to know the names, but this signals that we're at least OVER a Quote.
                         quoteNames = ''
-                        # Get the list of Quotes that contain the current Keyword from the keyword / Clip List dictionary
-                        quotes = self.keywordClipList[kw]
+                        # Get the list of Quotes that contain the current Keyword and Position, or are Orphans (which start
+                        # at 0), from the keyword / Clip Index
+                        quotes = self.keywordClipIndex[kw].Containing(time, 0)
                         # Iterate through the Quote List ...
                         for (objType, startChar, endChar, quoteNum, quoteName) in quotes:
                             # If the current Character value falls between the Quote's StartChar and EndChar ...
@@ -2785,15 +2653,15 @@ class KeywordMap(wx.Frame):
         else:
             maxVal = self.CharacterLength
         # First, let's make sure we're actually on the data portion of the graph
-        if (time > 0) and (time < maxVal) and (kw != None) and (self.keywordClipList.has_key(kw)):
+        if (time > 0) and (time < maxVal) and (kw != None) and (self.keywordClipIndex.has_key(kw)):
             if 'unicode' in wx.PlatformInfo:
                 prompt = unicode(_("Keyword:  %s : %s,  Time: %s"), 'utf8')
             else:
                 prompt = _("Keyword:  %s : %s,  Time: %s")
             # Set the Status Text to indicate the current Keyword and Time values
             self.SetStatusText(prompt % (kw[0], kw[1], Misc.time_in_ms_to_str(time)))
-            # Get the list of Clips that contain the current Keyword from the keyword / Clip List dictionary
-            clips = self.keywordClipList[kw]
+            # Get the list of Clips that contain the current Keyword and Time from the keyword / Clip Index
+            clips = self.keywordClipIndex[kw].Containing(time)
             # Iterate through the Clip List ...
             for (objType, startTime, endTime, clipNum, clipName) in clips:
                 # If the current Time value falls between the Clip's StartTime and EndTime ...
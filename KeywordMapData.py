@@ -0,0 +1,116 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" This module loads the keyword coding data and keyword colors displayed by the Keyword Map and the Library Map.
+
+    The Clip keywords, whole Snapshot keywords, and Snapshot coding keywords for an Episode, a Collection,
+    or a Library (Series) are read with a single query.  The maps used to read the keywords and the keyword
+    placements for each type of item separately, and for each Episode in a Library. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Transana's Database Interface
+import DBInterface
+
+# Types of coding records
+CLIP = 1
+SNAPSHOT = 2
+SNAPSHOTCODING = 3
+
+def LoadCodings(DBCursor, scope, scopeNum, includeSnapshots=True):
+    """ Load the keyword codings for the Episode, Collection, or Series (scope) numbered scopeNum.
+
+        Returns a dictionary, indexed by CLIP, SNAPSHOT, and SNAPSHOTCODING, of lists of
+        (kwg, kw, start, stop, objNum, objID, collectNum, extra) records.  For Clips, stop is the Clip Stop.
+        For Snapshots, it is the Snapshot Duration.  extra is the Sort Order for Collections and the Episode
+        Number otherwise.  Clip records are in ClipStart, ClipNum order (Sort Order for Collections) and
+        Snapshot records are in SnapshotTimeCode, SnapshotNum order, then by Keyword Group and Keyword,
+        just as the maps have always read them. """
+    # Determine the tables, conditions, and columns for the scope
+    if scope == 'Series':
+        tables = 'Episodes2 e, '
+        clipScope = 'e.SeriesNum = %s AND cl.EpisodeNum = e.EpisodeNum'
+        snapshotScope = 'e.SeriesNum = %s AND sn.EpisodeNum = e.EpisodeNum'
+    elif scope == 'Collection':
+        tables = ''
+        clipScope = 'cl.CollectNum = %s'
+        snapshotScope = 'sn.CollectNum = %s'
+    else:
+        tables = ''
+        clipScope = 'cl.EpisodeNum = %s'
+        snapshotScope = 'sn.EpisodeNum = %s'
+    if scope == 'Collection':
+        clipExtra = 'cl.SortOrder, cl.SortOrder, 0'
+        snapshotExtra = 'sn.SortOrder, sn.SnapshotTimeCode, sn.SnapshotNum'
+    else:
+        clipExtra = 'cl.EpisodeNum, cl.ClipStart, cl.ClipNum'
+        snapshotExtra = 'sn.EpisodeNum, sn.SnapshotTimeCode, sn.SnapshotNum'
+
+    # Each part of the query returns the record type, the record, and two sort columns
+    queries = ["""SELECT %d, ck.KeywordGroup, ck.Keyword, cl.ClipStart, cl.ClipStop, cl.ClipNum, cl.ClipID, cl.CollectNum, %s
+                    FROM %sClips2 cl, ClipKeywords2 ck
+                    WHERE %s AND
+                          cl.ClipNum = ck.ClipNum""" % (CLIP, clipExtra, tables, clipScope)]
+    if includeSnapshots:
+        # Get the WHOLE SNAPSHOT Keywords and the SNAPSHOT CODING Keywords
+        for (recType, keywordTable) in [(SNAPSHOT, 'ClipKeywords2'), (SNAPSHOTCODING, 'SnapshotKeywords2')]:
+            queries.append("""SELECT %d, ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum,
+                                     sn.SnapshotID, sn.CollectNum, %s
+                                FROM %sSnapshots2 sn, %s ck
+                                WHERE %s AND
+                                      sn.SnapshotNum = ck.SnapshotNum""" % (recType, snapshotExtra, tables, keywordTable, snapshotScope))
+    SQLText = ' UNION ALL '.join(queries) + ' ORDER BY 1, 10, 11, 2, 3'
+    # Adjust the query for sqlite if needed
+    SQLText = DBInterface.FixQuery(SQLText)
+    # Execute the query
+    DBCursor.execute(SQLText, (scopeNum, ) * len(queries))
+
+    codings = {CLIP : [], SNAPSHOT : [], SNAPSHOTCODING : []}
+    for (recType, kwg, kw, start, stop, objNum, objID, collectNum, extra, sort1, sort2) in DBCursor.fetchall():
+        kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
+        kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
+        objID = DBInterface.ProcessDBDataForUTF8Encoding(objID)
+        codings[recType].append((kwg, kw, start, stop, objNum, objID, collectNum, extra))
+    return codings
+
+def Keywords(codings):
+    """ Return the sorted list of the (kwg, kw) pairs used in the codings returned by LoadCodings() """
+    keywords = set()
+    for records in codings.values():
+        for record in records:
+            keywords.add((record[0], record[1]))
+    keywords = list(keywords)
+    keywords.sort()
+    return keywords
+
+def LoadKeywordColors(DBCursor):
+    """ Load the Default Keyword Color of every Keyword that has one.
+
+        Returns a dictionary of (lineColorName, lineColorDef) values indexed by (kwg, kw), so
+        the maps don't have to load each Keyword to look up its color. """
+    SQLText = """SELECT KeywordGroup, Keyword, LineColorName, LineColorDef
+                   FROM Keywords2
+                   WHERE LineColorName <> ''"""
+    # Execute the query
+    DBCursor.execute(SQLText)
+
+    colors = {}
+    for (kwg, kw, lineColorName, lineColorDef) in DBCursor.fetchall():
+        kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
+        kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
+        lineColorName = DBInterface.ProcessDBDataForUTF8Encoding(lineColorName)
+        colors[(kwg, kw)] = (lineColorName, lineColorDef)
+    return colors
@@ -27,12 +27,13 @@ __author__ = 'David Woods <dwoods@wcer.wisc.edu>, Nathaniel Case'
 
 import wx
 from TransanaExceptions import *
+import DataObject
 import DBInterface
 import Dialogs
+import KeywordIndex
 import Misc
 import TransanaConstants
 import TransanaGlobal
-import inspect
 # import Python String module
 import string
 import types
@@ -85,13 +86,11 @@ class Keyword(object):
 
     def clear(self):
         """Clear all properties, resetting them to default values."""
-        attrdesc = inspect.classify_class_attrs(self.__class__)
-        for attr in attrdesc:
-            if attr[1] == "property":
-                try:
-                    delattr(self, attr[0])
-                except AttributeError, e:
-                    pass # probably a non-deletable attribute
+        for name in DataObject.DeletableProperties(self.__class__):
+            try:
+                delattr(self, name)
+            except AttributeError, e:
+                pass # probably a non-deletable attribute
 
     def checkEpisodesClipsSnapshotsForLocks(self):
         """ Checks Episodes, Clips, and Snapshots to see if a Keyword record is free of related locks """
@@ -597,6 +596,8 @@ that would corrupt the record that is currently locked by %s.  Please try again
                     values = (keywordGroup, keyword, originalKeywordGroup, originalKeyword)
                     query = DBInterface.FixQuery(query)
                     c.execute(query, values)
+                    # The in-memory Keyword Index can't follow a rename or merge, so discard it
+                    KeywordIndex.Invalidate()
 
                 # If the Keyword Group or Keyword has changed, we need to update all Snapshot Keyword records too.
                 if ((originalKeywordGroup != keywordGroup) or \
@@ -39,6 +39,8 @@ import Dialogs
 import FilterDialog
 # Import Transana's keyword object
 import KeywordObject as Keyword
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # Import Transana's SnapshotWindow so we can get CodingStyleGraphics for keywords that have color and style defined
 import SnapshotWindow
 # Import Transana's Text Report infrastructure
@@ -179,12 +181,8 @@ class KeywordSummaryReport(wx.Object):
             # Skip a couple of lines.
             reportText.InsertStyledText('\n\n')
 
-        # Initialize an empty list for Keyword Examples
-        keywordExamplesList = []
-        # Iterate through the list of all keyword examples ...
-        for KWE in DBInterface.list_of_keyword_examples():
-            # ... adding the keywords to the KeywordExamples List
-            keywordExamplesList.append((KWE[3], KWE[4]))
+        # Get the Keywords that have Keyword Examples from the in-memory Keyword Index
+        keywordExamplesList = KeywordIndex.KeywordExamples()
 
         # Get the graphic for the Keyword Example indicator
         kweGraphic = TransanaImages.Clip16.GetImage()
@@ -30,6 +30,8 @@ import types
 import DataObject
 # import Transana's Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana Dialogs
 import Dialogs
 # import Transana Document object
@@ -324,6 +326,8 @@ class Library(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e    
@@ -40,6 +40,10 @@ import DBInterface
 import Dialogs
 # Import Transana's Filter Dialog
 import FilterDialog
+# import Transana's Interval Index
+import IntervalIndex
+# import Transana's Keyword Map data loader
+import KeywordMapData
 # import Transana's Keyword Object
 import KeywordObject
 # import Transana's Globals
@@ -131,6 +135,8 @@ class LibraryMap(wx.Frame):
         self.startTime = 0
         self.endTime = 0
         self.keywordClipList = {}
+        # The Keyword / Clip List is indexed for finding the items under the mouse
+        self.keywordClipIndex = {}
         self.configName = ''
         # Initialize variables required to avoid crashes when the visualization has been cleared
         self.graphicindent = 0
@@ -820,8 +826,27 @@ class LibraryMap(wx.Frame):
         SQLText = DBInterface.FixQuery(SQLText)
         # Execute the query
         self.DBCursor.execute(SQLText, (self.seriesNum, ))
-
-        for (EpisodeNum, EpisodeID, SeriesNum, MediaFile, EpisodeLength, SeriesID) in self.DBCursor.fetchall():
+        episodes = self.DBCursor.fetchall()
+
+        # Load the Clip and Snapshot Keyword Placement data for all of the Series' Episodes
+        codings = KeywordMapData.LoadCodings(self.DBCursor, 'Series', self.seriesNum)
+        # The Keywords to be displayed are the Keywords used by the Series' Clips and Snapshots
+        for (kwg, kw) in KeywordMapData.Keywords(codings):
+            self.filteredKeywordList.append((kwg, kw))
+            self.unfilteredKeywordList.append((kwg, kw, True))
+        # Group the Keyword Placement data by Episode.  Within each Episode, Clips are in ClipStart, ClipNum order and Snapshots
+        # are in SnapshotTimeCode, SnapshotNum order so colors will be distributed properly across bands.
+        episodeClips = {}
+        for record in codings[KeywordMapData.CLIP]:
+            episodeClips.setdefault(record[7], []).append(record)
+        episodeSnapshots = {}
+        for record in codings[KeywordMapData.SNAPSHOT] + codings[KeywordMapData.SNAPSHOTCODING]:
+            episodeSnapshots.setdefault(record[7], []).append(record)
+        # Note the Filter List items we have, so duplicates can be skipped quickly
+        clipFilterItems = set()
+        snapshotFilterItems = set()
+
+        for (EpisodeNum, EpisodeID, SeriesNum, MediaFile, EpisodeLength, SeriesID) in episodes:
             EpisodeID = DBInterface.ProcessDBDataForUTF8Encoding(EpisodeID)
             SeriesID = DBInterface.ProcessDBDataForUTF8Encoding(SeriesID)
             MediaFile = DBInterface.ProcessDBDataForUTF8Encoding(MediaFile)
@@ -835,130 +860,26 @@ class LibraryMap(wx.Frame):
             # Remember the Episode's length
             self.episodeLengths[(EpisodeID, SeriesID)] = EpisodeLength
 
-            # Get the list of Keywords to be displayed
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                           FROM Clips2 cl, ClipKeywords2 ck
-                           WHERE cl.EpisodeNum = %s AND
-                                 cl.ClipNum = ck.ClipNum
-                           GROUP BY ck.keywordgroup, ck.keyword
-                           ORDER BY KeywordGroup, Keyword, ClipStart"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-
-            for (kwg, kw) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                if not (kwg, kw) in self.filteredKeywordList:
-                    self.filteredKeywordList.append((kwg, kw))
-                if not (kwg, kw, True) in self.unfilteredKeywordList:
-                    self.unfilteredKeywordList.append((kwg, kw, True))
-
-            # Get the list of WHOLE SNAPSHOT Keywords to be displayed
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                           FROM Snapshots2 sn, ClipKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           GROUP BY ck.keywordgroup, ck.keyword
-                           ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-            for (kwg, kw) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                if not (kwg, kw) in self.filteredKeywordList:
-                    self.filteredKeywordList.append((kwg, kw))
-                if not (kwg, kw, True) in self.unfilteredKeywordList:
-                    self.unfilteredKeywordList.append((kwg, kw, True))
-
-            # Get the list of SNAPSHOT CODING Keywords to be displayed
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword
-                           FROM Snapshots2 sn, SnapshotKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           GROUP BY ck.keywordgroup, ck.keyword
-                           ORDER BY KeywordGroup, Keyword, SnapshotTimeCode"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-            for (kwg, kw) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                if not (kwg, kw) in self.filteredKeywordList:
-                    self.filteredKeywordList.append((kwg, kw))
-                if not (kwg, kw, True) in self.unfilteredKeywordList:
-                    self.unfilteredKeywordList.append((kwg, kw, True))
-
-            # Sort the Keyword List
-            self.unfilteredKeywordList.sort()
-
-            # Create the Keyword Placement lines to be displayed.  We need them to be in ClipStart, ClipNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, cl.ClipStart, cl.ClipStop, cl.ClipNum, cl.ClipID, cl.CollectNum
-                           FROM Clips2 cl, ClipKeywords2 ck
-                           WHERE cl.EpisodeNum = %s AND
-                                 cl.ClipNum = ck.ClipNum
-                           ORDER BY ClipStart, cl.ClipNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-            for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                clipID = DBInterface.ProcessDBDataForUTF8Encoding(clipID)
+            # Create the Keyword Placement lines to be displayed.
+            for (kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum, episodeNum) in episodeClips.get(EpisodeNum, []):
                 # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
                 # If we're dealing with a Clip, we only want to deal with THIS clip!
                 if (self.clipNum == None) or (clipNum == self.clipNum):
                     self.clipList.append((kwg, kw, clipStart, clipStop, clipNum, clipID, collectNum, EpisodeID, SeriesID))
 
-                    if not ((clipID, collectNum, True) in self.clipFilterList):
+                    if not ((clipID, collectNum) in clipFilterItems):
                         self.clipFilterList.append((clipID, collectNum, True))
+                        clipFilterItems.add((clipID, collectNum))
 
-            # Create the WHOLE SNAPSHOT Keyword Placement lines to be displayed.  We need them to be in SnapshotTimeCode, SnapshotNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum, sn.SnapshotID, sn.CollectNum
-                           FROM Snapshots2 sn, ClipKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                SnapshotID = DBInterface.ProcessDBDataForUTF8Encoding(SnapshotID)
-                # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
-                # If we're dealing with a Clip, we only want to deal with THIS clip!
-                if (self.clipNum == None):
-                    self.snapshotList.append((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum, EpisodeID, SeriesID))
-                    if not ((SnapshotID, collectNum, True) in self.snapshotFilterList):
-                        self.snapshotFilterList.append((SnapshotID, collectNum, True))
-
-            # Create the SNAPSHOT CODING Keyword Placement lines to be displayed.  We need them to be in SnapshotTimeCode, SnapshotNum order so colors will be
-            # distributed properly across bands.
-            SQLText = """SELECT ck.KeywordGroup, ck.Keyword, sn.SnapshotTimeCode, sn.SnapshotDuration, sn.SnapshotNum, sn.SnapshotID, sn.CollectNum
-                           FROM Snapshots2 sn, SnapshotKeywords2 ck
-                           WHERE sn.EpisodeNum = %s AND
-                                 sn.SnapshotNum = ck.SnapshotNum
-                           ORDER BY SnapshotTimeCode, sn.SnapshotNum, KeywordGroup, Keyword"""
-            # Adjust the query for sqlite if needed
-            SQLText = DBInterface.FixQuery(SQLText)
-            self.DBCursor.execute(SQLText, (EpisodeNum, ))
-            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum) in self.DBCursor.fetchall():
-                kwg = DBInterface.ProcessDBDataForUTF8Encoding(kwg)
-                kw = DBInterface.ProcessDBDataForUTF8Encoding(kw)
-                SnapshotID = DBInterface.ProcessDBDataForUTF8Encoding(SnapshotID)
+            # Create the WHOLE SNAPSHOT and SNAPSHOT CODING Keyword Placement lines to be displayed.
+            for (kwg, kw, SnapshotTimeCode, SnapshotDuration, SnapshotNum, SnapshotID, collectNum, episodeNum) in episodeSnapshots.get(EpisodeNum, []):
                 # If we're dealing with an Episode, self.clipNum will be None and we want all clips.
                 # If we're dealing with a Clip, we only want to deal with THIS clip!
                 if (self.clipNum == None):
                     self.snapshotList.append((kwg, kw, SnapshotTimeCode, SnapshotTimeCode + SnapshotDuration, SnapshotNum, SnapshotID, collectNum, EpisodeID, SeriesID))
-                    if not ((SnapshotID, collectNum, True) in self.snapshotFilterList):
+                    if not ((SnapshotID, collectNum) in snapshotFilterItems):
                         self.snapshotFilterList.append((SnapshotID, collectNum, True))
-
-        # Sort the Keyword List
-        self.filteredKeywordList.sort()
+                        snapshotFilterItems.add((SnapshotID, collectNum))
 
     def UpdateKeywordVisualization(self):
         """ Update the Keyword Visualization following something that could have changed it. """
@@ -1031,6 +952,7 @@ class LibraryMap(wx.Frame):
     def DrawGraph(self):
         """ Actually Draw the Series Map """
         self.keywordClipList = {}
+        self.keywordClipIndex = {}
 
         # Series Keyword Sequence Map, if multi-line display is desired
         if (self.reportType == 1) and (not self.singleLineDisplay):
@@ -1883,6 +1805,11 @@ class LibraryMap(wx.Frame):
                 self.graphic.AddLines([(startX - 6, startY - 24, endX + 6, startY - 24), (endX + 6, startY - 24, endX + 6, endY - 4),
                                        (endX + 6, endY - 4, startX - 6, endY - 4), (startX - 6, endY - 4, startX - 6, startY - 24)])            
 
+        # Index the Keyword / Clip List so the items under the mouse can be found quickly
+        self.keywordClipIndex = {}
+        for key in self.keywordClipList.keys():
+            self.keywordClipIndex[key] = IntervalIndex.IntervalIndex(self.keywordClipList[key])
+
     def DrawTimeLine(self, startVal, endVal):
         """ Draw the time line on the Series Map graphic """
         # Set the line thickness to 3
@@ -2003,11 +1930,11 @@ class LibraryMap(wx.Frame):
                         prompt = _("Episode:  %s,  Keyword:  %s : %s,  Time: %s")
                     # Set the Status Text to indicate the current Keyword and Time values
                     self.SetStatusText(prompt % (overlapKey[0], overlapKey[1], overlapKey[2], Misc.time_in_ms_to_str(time)))
-                if (self.keywordClipList.has_key(overlapKey)):
+                if (self.keywordClipIndex.has_key(overlapKey)):
                     # initialize the string that will hold the names of clips being pointed to
                     clipNames = ''
-                    # Get the list of Clips that contain the current Keyword from the keyword / Clip List dictionary
-                    clips = self.keywordClipList[overlapKey]
+                    # Get the list of Clips that contain the current Keyword and Time from the keyword / Clip Index
+                    clips = self.keywordClipIndex[overlapKey].Containing(time)
                     # For the single-line display ...
                     if self.singleLineDisplay:
                         # Initialize a string for the popup to show
@@ -2135,7 +2062,7 @@ class LibraryMap(wx.Frame):
         # Create an empty Dictionary Object for tracking Clip data
         clipNames = {}
         # First, let's make sure we're actually on the data portion of the graph
-        if (time > 0) and (time < self.MediaLength) and (kw != None) and (self.keywordClipList.has_key(kw)):
+        if (time > 0) and (time < self.MediaLength) and (kw != None) and (self.keywordClipIndex.has_key(kw)):
             # If we have a Series Keyword Sequence Map ...
             # (The Bar Graph and Percentage Graph do not have defined Click behaviors!)
             if self.reportType == 1:
@@ -2145,8 +2072,8 @@ class LibraryMap(wx.Frame):
                     prompt = _("Episode:  %s,  Keyword:  %s : %s,  Time: %s")
                 # Set the Status Text to indicate the current Keyword and Time values
                 self.SetStatusText(prompt % (kw[0], kw[1], kw[2], Misc.time_in_ms_to_str(time)))
-                # Get the list of Clips that contain the current Keyword from the keyword / Clip List dictionary
-                clips = self.keywordClipList[kw]
+                # Get the list of Clips that contain the current Keyword and Time from the keyword / Clip Index
+                clips = self.keywordClipIndex[kw].Containing(time)
                 # Iterate through the Clip List ...
                 for (objType, startTime, endTime, clipNum, clipName) in clips:
                     # If the current Time value falls between the Clip's StartTime and EndTime ...
@@ -77,6 +77,7 @@ MENU_TOOLS_IMPORT_DATABASE      =  wx.NewId()
 MENU_TOOLS_EXPORT_DATABASE      =  wx.NewId()
 MENU_TOOLS_COLORCONFIG          =  wx.NewId()
 MENU_TOOLS_BATCHWAVEFORM        =  wx.NewId()
+MENU_TOOLS_VERIFYINDEXES        =  wx.NewId()
 MENU_TOOLS_CHAT                 =  wx.NewId()
 MENU_TOOLS_RECORDLOCK           =  wx.NewId()
 
@@ -222,6 +223,7 @@ class MenuSetup(wx.MenuBar):
         self.toolsmenu.Append(MENU_TOOLS_EXPORT_DATABASE, _("&Export Database"))
         self.toolsmenu.Append(MENU_TOOLS_COLORCONFIG, _("&Graphics Color Configuration"))
         self.toolsmenu.Append(MENU_TOOLS_BATCHWAVEFORM, _("&Batch Waveform Generator"))
+        self.toolsmenu.Append(MENU_TOOLS_VERIFYINDEXES, _("&Verify Database Indexes"))
         if not TransanaConstants.singleUserVersion:
             self.toolsmenu.Append(MENU_TOOLS_CHAT, _("&Chat Window"))
             self.toolsmenu.Append(MENU_TOOLS_RECORDLOCK, _("&Record Lock Utility"))
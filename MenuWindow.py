@@ -621,6 +621,8 @@ class MenuWindow(wx.Frame):  # wx.MDIParentFrame
         wx.EVT_MENU(self, MenuSetup.MENU_TOOLS_COLORCONFIG, self.OnColorConfig)
         # Define handler for Tools > Batch Waveform Generator
         wx.EVT_MENU(self, MenuSetup.MENU_TOOLS_BATCHWAVEFORM, self.OnBatchWaveformGenerator)
+        # Define handler for Tools > Verify Database Indexes
+        wx.EVT_MENU(self, MenuSetup.MENU_TOOLS_VERIFYINDEXES, self.OnVerifyIndexes)
         # Define handler for Tools > Chat Window
         wx.EVT_MENU(self, MenuSetup.MENU_TOOLS_CHAT, self.OnChat)
         # Define handler for Tools > Record Lock Utility
@@ -1513,6 +1515,45 @@ class MenuWindow(wx.Frame):  # wx.MDIParentFrame
         # Destroy the Dialog
 ##        temp.Destroy()
 
+    def OnVerifyIndexes(self, event):
+        """ Verify / Rebuild Database Indexes """
+        # Check the database for missing secondary indexes
+        missing = DBInterface.VerifyIndexes()
+        # If indexes are missing ...
+        if len(missing) > 0:
+            # ... list them for the user
+            prompt = unicode(_("The following database indexes are missing:"), 'utf8') + u'\n\n'
+            for (indexName, tableName) in missing:
+                prompt += u'  %s  (%s)\n' % (indexName, tableName)
+            prompt += u'\n' + unicode(_("Do you want to create them now?"), 'utf8')
+            # Only the missing indexes need to be created
+            rebuild = False
+        # If no indexes are missing ...
+        else:
+            # ... offer to rebuild them anyway, in case they've become damaged
+            prompt = unicode(_("All database indexes are present.\nDo you want to rebuild them anyway?"), 'utf8')
+            # All indexes will be dropped and re-created
+            rebuild = True
+        # Ask the user what to do
+        dlg = Dialogs.QuestionDialog(self, prompt)
+        result = dlg.LocalShowModal()
+        dlg.Destroy()
+        # If the user says to proceed ...
+        if result == wx.ID_YES:
+            # This can take a while on a large database, so show the busy cursor
+            wx.BeginBusyCursor()
+            try:
+                # Create or rebuild the indexes
+                count = DBInterface.UpdateIndexes(rebuild=rebuild)
+            finally:
+                # Restore the normal cursor
+                wx.EndBusyCursor()
+            # Let the user know what was done
+            prompt = unicode(_("%d database index(es) created."), 'utf8')
+            dlg = Dialogs.InfoDialog(self, prompt % count)
+            dlg.ShowModal()
+            dlg.Destroy()
+
     def OnChat(self, event):
         """ Chat Window """
         # If a Chat Window has been defined ...
@@ -2222,6 +2263,7 @@ class MenuWindow(wx.Frame):  # wx.MDIParentFrame
         self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_EXPORT_DATABASE, _("&Export Database"))
         self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_COLORCONFIG, _("&Graphics Color Configuration"))
         self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_BATCHWAVEFORM, _("&Batch Waveform Generator"))
+        self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_VERIFYINDEXES, _("&Verify Database Indexes"))
         if not TransanaConstants.singleUserVersion:
             self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_CHAT, _("&Chat Window"))
             self.menuBar.toolsmenu.SetLabel(MenuSetup.MENU_TOOLS_RECORDLOCK, _("&Record Lock Utility"))
@@ -0,0 +1,725 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" The event-driven engine of the Transana Message Server.
+
+    Earlier Message Servers created a thread for each client connection, and all the threads competed for
+    a single lock.  This engine services all client connections from a single thread using select(), so
+    no locking is needed.  Each connection has its own input buffer, which is split into messages on the
+    ' ||| ' message terminator, and its own output buffer, which is written as the socket is able to accept
+    data.  Clients are grouped into "rooms" by Database Host and Database Name, so a message is only
+    examined for the clients who share the sender's database.
+
+    The protocol is the Transana 3.00 protocol, with an optional extension.  Once validated, newer
+    Transana-MU clients send the Capabilities Query.  Messages for these clients are held for a fraction
+    of a second so that bursts of messages, such as the tree updates from a bulk copy, reach each client
+    in a few socket writes, and Batch ("B") messages are passed to them as they are.
+
+    Older Transana-MU clients decode each socket read on its own, so they are sent one message per
+    socket write, as earlier Message Servers did.  They also don't understand Batch messages, so they get
+    the messages a Batch contains one at a time.  Existing clients work with this engine. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# Indicate whether DEBUG messages should be shown or not.
+DEBUG = False
+DEBUG2 = False   # Report output
+if DEBUG:
+    print "MessageServerEngine DEBUG is ON!"
+
+# import Python's errno module
+import errno
+# import the Python os module
+import os
+# import Python's re (regular expression) module
+import re
+# import Python's select module
+import select
+# import Python's SSL module
+import ssl
+# import python's socket module
+import socket
+# import python's sys module
+import sys
+# import python's thread module
+import threading
+# import Python's time module
+import time
+
+# The Message Terminator that separates messages on the wire
+TERMINATOR = ' ||| '
+# The maximum number of bytes read from a socket at one time
+RECV_SIZE = 65536
+# If a client stops reading, its output buffer grows.  Past this size, we give up on the client.
+MAX_OUTPUT_BUFFER = 8 * 1024 * 1024
+# The maximum time (in seconds) to wait for socket activity before checking whether the server should stop
+SELECT_TIMEOUT = 1.0
+# Messages queued for a client within this many seconds are sent in a single socket write.  Bulk operations
+# such as a large drag-and-drop copy generate hundreds of tree update messages.  (Clients pace their own
+# messages about 0.05 seconds apart, so the window must be longer than that to combine them.)
+COALESCE_WINDOW = 0.1
+# Queued output larger than this is sent without waiting for the rest of the window.  A single socket write
+# combines whole messages up to this size.
+COALESCE_BYTES = 65536
+# Newer Transana-MU clients send the Capabilities Query once they have been validated.  These clients
+# re-assemble messages split between socket reads, so their messages can be combined into larger socket
+# writes, and they understand Batch ("B") messages, which combine several messages separated by the Batch
+# Separator.  The query is a private message to a user name no one can have, so a Message Server that doesn't
+# recognize it sends it back to the sender alone.  We answer with CAPABILITIES_REPLY instead.
+CAPABILITIES_QUERY = 'M TransanaCapabilities >|< >|<'
+CAPABILITIES_REPLY = 'V MessageServer: Capabilities Batches ||| '
+BATCH_SEPARATOR = ' <|> '
+# User Names allowed to use the SHOW USERS and RESET USERS commands
+ADMIN_USERS = ['DavidW', 'DavidW(2)', 'DavidW(3)']
+# Socket errors that just mean "try again later" on a non-blocking socket
+WOULD_BLOCK_ERRORS = [errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR]
+
+def now():
+    """ function that returns the current date and time """
+    return time.ctime(time.time())
+
+
+class clientConnection(object):
+    """ The state of a single client connection to the Message Server """
+    def __init__(self, connection, address, useSSL):
+        # connection is the connection established by the socket
+        self.connection = connection
+        # address is the address of the socket connection
+        self.address = address
+        # SSL connections need to complete the SSL handshake before they can be used
+        self.useSSL = useSSL
+        self.handshakeComplete = not useSSL
+        self.handshakeWantsWrite = False
+        # Data received that does not yet form a complete message
+        self.inBuffer = ''
+        # Data waiting to be sent.  outBuffer holds queued messages, and writeBuffer holds the data currently being written.
+        # (SSL requires that a write be retried with the same data if the socket isn't ready.)
+        self.outBuffer = []
+        self.writeBuffer = ''
+        self.outBytes = 0
+        # The time the oldest message in outBuffer was queued, or None if outBuffer is empty
+        self.queuedSince = None
+        # The user's information, which is unknown until we get a Connection message
+        self.name = ''
+        self.dbHost = None
+        self.dbName = None
+        self.ssl = 'FALSE'
+        self.version = '100'
+        # Indicates whether the client can receive several messages in a single socket write
+        self.coalesce = False
+        # Indicates whether the client understands Batch messages
+        self.batches = False
+        # The room (Database Host, Database Name) the user has joined
+        self.room = None
+        # Signals that the connection should be closed once its output buffer is empty
+        self.closing = False
+        # Let's keep track of the number of errors that arise
+        self.errorCount = 0
+
+    def fileno(self):
+        """ Allow the client connection to be used with select() """
+        return self.connection.fileno()
+
+    def Queue(self, message):
+        """ Add a message to the output buffer """
+        if len(self.outBuffer) == 0:
+            self.queuedSince = time.time()
+        self.outBuffer.append(message)
+        self.outBytes += len(message)
+
+    def FlushDue(self, currentTime):
+        """ Indicates whether queued messages should be written now, or wait for more messages to send with them """
+        return (len(self.outBuffer) > 0) and \
+               (self.closing or (not self.coalesce) or (self.outBytes >= COALESCE_BYTES) or \
+                (currentTime - self.queuedSince >= COALESCE_WINDOW))
+
+    def NextWrite(self):
+        """ Remove the next socket write's worth of messages from the output buffer and return them as a string.
+            Messages are never split between writes. """
+        # Old clients get a single message per write
+        if not self.coalesce:
+            count = 1
+        # Newer clients get as many whole messages as fit in COALESCE_BYTES, but always at least one
+        else:
+            count = 1
+            size = len(self.outBuffer[0])
+            while (count < len(self.outBuffer)) and (size + len(self.outBuffer[count]) <= COALESCE_BYTES):
+                size += len(self.outBuffer[count])
+                count += 1
+        data = ''.join(self.outBuffer[:count])
+        del(self.outBuffer[:count])
+        # If the output buffer is now empty, no messages are being held
+        if len(self.outBuffer) == 0:
+            self.queuedSince = None
+        return data
+
+    def WantsWrite(self, currentTime):
+        """ Indicates whether we're waiting for the socket to accept data """
+        if not self.handshakeComplete:
+            return self.handshakeWantsWrite
+        return (self.writeBuffer != '') or self.FlushDue(currentTime)
+
+
+class dispatcher(object):
+    """ This starts the Transana Message Server.  It listens for un-encrypted Socket connections and for SSL-encrypted
+        Socket connections, and processes all client connections from a single thread. """
+    def __init__(self, host='', port=17595, sslPort=17596, certFile=None, keyFile=None, version=300, checkInterval=20.0):
+        # Remember the server configuration
+        self.host = host
+        self.port = port
+        self.sslPort = sslPort
+        self.certFile = certFile
+        self.keyFile = keyFile
+        self.version = version
+        self.checkInterval = checkInterval
+        # Maintain a dictionary of client connections, keyed by socket address
+        self.connections = {}
+        # Maintain a dictionary of rooms, keyed by (Database Host, Database Name), holding the client connections in each
+        self.rooms = {}
+        # Maintain a dictionary of the client connections that have joined a room, keyed by User Name
+        self.users = {}
+        # Maintain a dictionary of listening sockets, indicating whether each uses SSL
+        self.listeners = {}
+        # We need a way to signal to the server that it's time to quit!
+        self.keepRunning = True
+
+        # Create the un-encrypted Listener
+        self.CreateListener(port, False)
+        # If an SSL port is specified, create the encrypted Listener
+        if sslPort != None:
+            self.CreateListener(sslPort, True)
+
+        if DEBUG:
+            print "Starting MessageServer on ports %s (unencrypted) and %s (SSL-encrypted)" % (port, sslPort)
+
+        # Create and start the thread that services all the sockets
+        self.thread = threading.Thread(target=self.Run)
+        self.thread.start()
+
+    def CreateListener(self, port, useSSL):
+        """ Create a non-blocking socket that listens for connections on the specified port """
+        # Create a TCP Socket object
+        sockobj = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # Allow the server to be restarted immediately.  (On Windows, this would allow two servers on the same port.)
+        if sys.platform != 'win32':
+            sockobj.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Bind the socket to the port
+        sockobj.bind((self.host, port))
+        # Allow as many pending connections as the system permits
+        sockobj.listen(socket.SOMAXCONN)
+        sockobj.setblocking(0)
+        self.listeners[sockobj] = useSSL
+
+    def Run(self):
+        """ Service all the sockets until told to stop """
+        # Note when we last reported
+        lastReport = time.time()
+        while self.keepRunning:
+            try:
+                # Build the lists of sockets to wait on
+                currentTime = time.time()
+                readers = self.listeners.keys() + self.connections.values()
+                writers = [client for client in self.connections.values() if client.WantsWrite(currentTime)]
+                # Wait until the oldest message still being held for coalescing is due to be sent.  (Messages that
+                # are already due are waiting for their socket to accept data.)
+                timeout = SELECT_TIMEOUT
+                for client in self.connections.values():
+                    if (client.queuedSince != None) and not client.FlushDue(currentTime):
+                        timeout = min(timeout, max(client.queuedSince + COALESCE_WINDOW - currentTime, 0))
+                try:
+                    (readable, writable, errors) = select.select(readers, writers, [], timeout)
+                except select.error, e:
+                    # A signal can interrupt select().  Just try again.
+                    if e.args[0] == errno.EINTR:
+                        continue
+                    raise
+                # Process sockets with data to read
+                for sock in readable:
+                    if self.listeners.has_key(sock):
+                        self.Accept(sock, self.listeners[sock])
+                    elif self.connections.has_key(sock.address):
+                        self.Read(sock)
+                # Process sockets that can accept data
+                for client in writable:
+                    if self.connections.has_key(client.address):
+                        self.Write(client)
+                # Send any output that is due, rather than waiting for the next select()
+                currentTime = time.time()
+                for client in self.connections.values():
+                    if client.handshakeComplete and client.WantsWrite(currentTime):
+                        self.Write(client)
+                    # Close connections that are finished
+                    if client.closing and (client.outBytes == 0):
+                        self.CloseConnection(client)
+                # If it's time, Report
+                if time.time() - lastReport > self.checkInterval:
+                    self.Report()
+                    lastReport = time.time()
+            except:
+                if DEBUG:
+                    print "except"
+                    print sys.exc_info()[0], sys.exc_info()[1]
+                    import traceback
+                    traceback.print_exc(file=sys.stdout)
+
+        # Close all connections and listeners
+        for client in self.connections.values():
+            self.CloseConnection(client)
+        for sock in self.listeners.keys():
+            sock.close()
+        self.listeners = {}
+
+    def Accept(self, sockobj, useSSL):
+        """ Accept all pending connections on a listening socket """
+        while True:
+            try:
+                # Detect a new socket connection
+                (connection, address) = sockobj.accept()
+            except socket.error, e:
+                # If there are no more pending connections, we're done
+                if e.args[0] in WOULD_BLOCK_ERRORS:
+                    break
+                if DEBUG:
+                    print "Accept error:", sys.exc_info()[0], sys.exc_info()[1]
+                break
+            try:
+                connection.setblocking(0)
+                if useSSL:
+                    if DEBUG:
+                        print "Creating SSL Connection"
+                    # Wrap the connection using SSL.  The handshake is completed as the socket becomes ready.
+                    connection = ssl.wrap_socket(connection,
+                                                 server_side=True,
+                                                 certfile=self.certFile,
+                                                 keyfile=self.keyFile,
+                                                 do_handshake_on_connect=False)
+                elif DEBUG:
+                    print "Creating Connection without SSL"
+            except:
+                if DEBUG:
+                    print sys.exc_info()[0], sys.exc_info()[1]
+                connection.close()
+                continue
+
+            if DEBUG:
+                print 'Server connection established from %s at %s\n' % (address, now())
+                print 'There are currently %d connections to this Message Server.' % (len(self.connections) + 1)
+
+            client = clientConnection(connection, address, useSSL)
+            self.connections[address] = client
+            # Start the SSL handshake
+            if useSSL:
+                self.Handshake(client)
+
+    def Handshake(self, client):
+        """ Continue the SSL handshake for a client connection """
+        try:
+            client.connection.do_handshake()
+            client.handshakeComplete = True
+            client.handshakeWantsWrite = False
+        except ssl.SSLError, e:
+            if e.args[0] == ssl.SSL_ERROR_WANT_READ:
+                client.handshakeWantsWrite = False
+            elif e.args[0] == ssl.SSL_ERROR_WANT_WRITE:
+                client.handshakeWantsWrite = True
+            else:
+                self.ConnectionLost(client)
+        except socket.error:
+            self.ConnectionLost(client)
+
+    def Read(self, client):
+        """ Read available data from a client connection and process any complete messages """
+        # If the SSL handshake isn't complete, continue it
+        if not client.handshakeComplete:
+            self.Handshake(client)
+            return
+        # Note if the connection is lost
+        lost = False
+        # Read all the available data
+        chunks = []
+        while True:
+            try:
+                data = client.connection.recv(RECV_SIZE)
+            except ssl.SSLError, e:
+                if e.args[0] in [ssl.SSL_ERROR_WANT_READ, ssl.SSL_ERROR_WANT_WRITE]:
+                    break
+                lost = True
+                break
+            except socket.error, e:
+                if e.args[0] in WOULD_BLOCK_ERRORS:
+                    break
+                lost = True
+                break
+            # An empty read means the client has closed the connection
+            if not data:
+                lost = True
+                break
+            chunks.append(data)
+            # Plain sockets will be reported by select() again if there's more data.  SSL sockets may hold decrypted
+            # data select() doesn't know about, so we keep reading them until they would block.
+            if not client.useSSL:
+                break
+
+        # Split the data into messages on the message terminator.  The last piece is an incomplete message.
+        messages = (client.inBuffer + ''.join(chunks)).split(TERMINATOR)
+        client.inBuffer = messages.pop()
+        # Process the complete messages
+        for message in messages:
+            # If the connection has been closed while processing messages, stop
+            if not self.connections.has_key(client.address) or client.closing:
+                break
+            if message != '':
+                try:
+                    self.ProcessMessage(client, message)
+                except:
+                    if DEBUG:
+                        print "except"
+                        print sys.exc_info()[0], sys.exc_info()[1]
+                        import traceback
+                        traceback.print_exc(file=sys.stdout)
+
+                    client.errorCount += 1
+                    if client.errorCount > 50:
+                        if DEBUG:
+                            print "break.  Too many errors."
+                        lost = True
+                        break
+
+        # If the connection was lost, clean up
+        if lost and self.connections.has_key(client.address) and not client.closing:
+            self.ConnectionLost(client)
+
+    def Write(self, client):
+        """ Write as much pending output as the client connection will accept """
+        # If the SSL handshake isn't complete, continue it
+        if not client.handshakeComplete:
+            self.Handshake(client)
+            return
+        # If we're not in the middle of a write, gather the next write's worth of queued messages
+        if (client.writeBuffer == '') and (len(client.outBuffer) > 0):
+            client.writeBuffer = client.NextWrite()
+        if client.writeBuffer == '':
+            return
+        try:
+            sent = client.connection.send(client.writeBuffer)
+        except ssl.SSLError, e:
+            if e.args[0] in [ssl.SSL_ERROR_WANT_READ, ssl.SSL_ERROR_WANT_WRITE]:
+                return
+            self.ConnectionLost(client)
+            return
+        except socket.error, e:
+            if e.args[0] in WOULD_BLOCK_ERRORS:
+                return
+            self.ConnectionLost(client)
+            return
+        # Remove the sent data from the buffers
+        client.writeBuffer = client.writeBuffer[sent:]
+        client.outBytes -= sent
+
+    def Send(self, client, message):
+        """ Queue a message to be sent to a client """
+        if DEBUG:
+            print "sending %s to %s" % (message, client.address)
+
+        client.Queue(message)
+        # If the client has stopped reading, don't let its buffer grow without limit
+        if (client.outBytes > MAX_OUTPUT_BUFFER) and not client.closing:
+            if DEBUG:
+                print "Output buffer overflow for %s.  Dropping the connection." % (client.address, )
+            self.ConnectionLost(client)
+
+    def ProcessMessage(self, client, data):
+        """ Process a single message received from a client """
+        if DEBUG:
+            print 'Server received  "%s" from %s' % (data, client.address)
+
+        # If the message is a Connection message ...
+        # (Format: "C Username DatabaseHost DatabaseName [SSL] Version")
+        if (len(data) > 1) and (data[:data.find(' ')] == 'C'):
+            data = self.ProcessConnection(client, data)
+        elif (len(data) > 1) and (data[:data.find(' ')] == 'D') and (client.room != None):
+            # Substitute the correct user name, the one the Message Server knows.
+            data = 'D %s' % client.name
+
+        # Messages from clients that haven't identified their database have nowhere to go
+        if client.room == None:
+            return
+
+        # Newer clients announce that they can have their messages combined into larger socket writes and that
+        # they understand Batch messages
+        if data == CAPABILITIES_QUERY:
+            client.coalesce = True
+            client.batches = True
+            self.Send(client, CAPABILITIES_REPLY)
+
+        elif (data == 'M SHOW USERS') and (client.name in ADMIN_USERS):
+            self.Send(client, "M MessageServer: Users: ||| ")
+            for c in self.users.values():
+                self.Send(client, "M MessageServer: %s %s %s %s ||| " % (c.name, c.dbHost, c.dbName, c.ssl))
+
+        elif (data == 'M SHOW CERTIFICATES'):
+            self.Send(client, "M MessageServer: %s %s ||| " % (self.certFile, self.certFile != None and os.path.exists(self.certFile)))
+            self.Send(client, "M MessageServer: %s %s ||| " % (self.keyFile, self.keyFile != None and os.path.exists(self.keyFile)))
+
+        elif (data == 'M RESET USERS') and (client.name in ADMIN_USERS):
+            self.Send(client, "M MessageServer: RESET -  Exit immediately.  %s %s %s ||| " % (client.name, client.dbHost, client.dbName))
+            # Close all client connections
+            for c in self.connections.values():
+                self.LeaveRoom(c)
+                c.closing = True
+
+        else:
+            # Broadcast the incoming message to the others in the sender's room
+            self.Broadcast(data, client)
+            # If this is a Disconnect message ...
+            if (len(data) > 1) and (data[:data.find(' ')] == 'D'):
+
+                if DEBUG:
+                    print "Disconnection message from ", client.name
+
+                # ... remove the client from its room and close the connection once the output has been sent
+                self.LeaveRoom(client)
+                client.closing = True
+
+    def ProcessConnection(self, client, data):
+        """ Process a Connection message.  Returns the message to be broadcast to the room. """
+        # Strip the connection flag from the message
+        st = data[2:].strip()
+        # extract the User Name
+        userName = st[:st.find(' ')]
+        # remove the User Name from the data string
+        st = st[st.find(' ') + 1:]
+        # extract the Database Host
+        dbHost = st[:st.find(' ')].upper()
+        # remove the Database Host from the data string
+        st = st[st.find(' ') + 1:]
+        # See if there is another parameter after dbName
+        if st.find(' ') > -1:
+            # extract the Database Name
+            dbName = st[:st.find(' ')].upper()
+            # remove the Database Name from the data string
+            st = st[st.find(' ') + 1:]
+            # See if there are both "SSL" and "Version" parameter
+            if st.find(' ') > -1:
+                # Extract the SSL value ...
+                SSL = st[:st.find(' ')].upper()
+                # ... and conver the Version value
+                version = st[st.find(' ') + 1:]
+            else:
+                # If there's no SSL value, then SSL is FALSE!!
+                SSL = 'FALSE'
+                # Extract the VERSION value
+                version = st.upper()
+        # If dbName is the last parameter
+        else:
+            # ... extract the Database Name
+            dbName = st.upper()
+            # ... set SSL to False
+            SSL = 'FALSE'
+            # ... and default Version to 1.00
+            version = '100'
+
+        if DEBUG:
+            print 'New Connection: Username = "%s", dbHost = "%s", dbName = "%s", SSL = "%s", version = "%s"' % (userName, dbHost, dbName, SSL, version)
+
+        # Check the Transana version against the Message Server version.
+        # Detect Transana 2.60 on a Transana 2.61 server
+        if (int(version) == 260) and (self.version == 261):
+            self.Send(client, 'M MessageServer: The Transana Message Server you have connected to is newer than ||| ')
+            self.Send(client, 'M MessageServer: your copy of Transana-MU.  Please upgrade your copy of Transana-MU ||| ')
+            self.Send(client, 'M MessageServer: as soon as you are able. ||| ')
+            self.Send(client, 'M MessageServer: - ||| ')
+            # But we can go ahead and validate the Message Server, as it WILL work!
+            self.Send(client, 'V MessageServer: ServerValidated ||| ')
+        # Detect old Transana versions...
+        elif int(version) < self.version:
+            self.Send(client, 'M MessageServer: The Transana Message Server you have connected to is newer than ||| ')
+            self.Send(client, 'M MessageServer: your copy of Transana-MU.  Please upgrade your copy of Transana-MU ||| ')
+            self.Send(client, 'M MessageServer: immediately. ||| ')
+            self.Send(client, 'M MessageServer: - ||| ')
+            self.Send(client, 'M MessageServer: Please do not proceed.  Data corruption could result. ||| ')
+            self.Send(client, 'M MessageServer: - ||| ')
+        # Detect new Transana versions...
+        elif int(version) > self.version:
+            self.Send(client, 'M MessageServer: The Transana Message Server you have connected to is older than ||| ')
+            self.Send(client, 'M MessageServer: your copy of Transana-MU.  Please ask your system administrator ||| ')
+            self.Send(client, 'M MessageServer: to upgrade your copy of the Transana-MU Message Server immediately. ||| ')
+            self.Send(client, 'M MessageServer: - ||| ')
+            self.Send(client, 'M MessageServer: Please do not proceed.  Data corruption could result. ||| ')
+            self.Send(client, 'M MessageServer: - ||| ')
+        else:
+            self.Send(client, 'V MessageServer: ServerValidated ||| ')
+
+        # If this client is already in a room, it's leaving that room
+        self.LeaveRoom(client)
+
+        # Check for duplicate user names among the other connections and avoid them.
+        while self.users.has_key(userName):
+            # Define a regular expression to find the " (#)" portion of a name
+            regex = re.compile("\(\d+\)")
+            # Find that regular expression in the userName
+            regexResult = regex.findall(userName)
+
+            # If the regex is not found ...
+            if regexResult == []:
+                # ... then we add "(2)" to the username
+                userName = userName + '(2)'
+            # However, if the regex is found ...
+            else:
+                # ... extract the number from the string.
+                # (the regexResult is in the form ['(#)'], so we extract the list element,
+                #  then strip the parentheses from the string, then convert to an integer.)
+                n = int(regexResult[0][1:-1])
+                # Update the user name with the new number, in parentheses
+                userName = userName[:userName.rfind('(')] + "(%d)" % (n + 1)
+
+            # Prepare the data string to be broadcast with the new username
+            data = 'C %s %s' % (userName, SSL)
+            # Inform the Chat Client that the username was updated
+            self.Send(client, 'R %s %s ||| ' % (userName, SSL))
+
+        # Record the User information for the connection
+        client.name = userName
+        client.dbHost = dbHost
+        client.dbName = dbName
+        client.ssl = SSL
+        client.version = version
+
+        # Broadcast the existing connection information to the new user.  This tells the newly connected user who else
+        # was already connected when s/he joined the group.
+        for c in self.rooms.get((dbHost, dbName), []):
+            self.Send(client, 'C %s %s ||| ' % (c.name, c.ssl))
+
+        # Add the client to the room for its database and to the User Name index
+        client.room = (dbHost, dbName)
+        self.rooms.setdefault(client.room, set()).add(client)
+        self.users[userName] = client
+
+        if DEBUG:
+            print "%d users are currently logged on. (1)" % len(self.users)
+
+        return data
+
+    def LeaveRoom(self, client):
+        """ Remove a client from its room and from the User Name index """
+        if (client.room != None) and self.rooms.has_key(client.room):
+            self.rooms[client.room].discard(client)
+            # Remove rooms that are now empty
+            if len(self.rooms[client.room]) == 0:
+                del(self.rooms[client.room])
+        if self.users.get(client.name) is client:
+            del(self.users[client.name])
+        client.room = None
+
+    def Broadcast(self, message, sender):
+        """ Broadcast a message from the sender to the users in the sender's room """
+        self.BroadcastMessage(message, sender.name, sender.room)
+
+    def BroadcastMessage(self, message, sendingUsername, room):
+        """ Send a message to the users in a room.  The message is prepared once, and private messages are
+            delivered using the User Name index rather than by checking every user in the room. """
+        # Detect Private Messages
+        if (message[0:2] == 'M ') and (message.find(' >|< ') > -1):
+            # Split the data into the message and the recipient list
+            messageParts = message.split(' >|< ')
+            # Save the recipient list as a string
+            recipientString = messageParts[1]
+            # Remove the recipient list from the message, and add the Private Message indicator
+            message = messageParts[0] + "  (" + "private message to " + recipientString + ")"
+            # The recipients are the originating user and the users listed, if they are in the room.
+            # (Each user should only get the message once.)
+            recipients = []
+            for user in [sendingUsername] + recipientString.split(' '):
+                if self.users.has_key(user) and (self.users[user].room == room) and (self.users[user] not in recipients):
+                    recipients.append(self.users[user])
+        # If this is NOT a Private Message ...
+        else:
+            # ... the message goes to everyone in the room
+            recipients = list(self.rooms.get(room, []))
+
+        # Older clients don't understand Batch messages.  They get the messages a Batch contains, one at a time,
+        # each looking exactly as if it had been sent on its own.
+        expandedMessages = []
+        if message[:2] == 'B ':
+            for part in message[2:].split(BATCH_SEPARATOR):
+                if part.find(' ') > -1:
+                    expandedMessages.append('%s %s: %s%s' % (part[:part.find(' ')], sendingUsername, part[part.find(' ') + 1:], TERMINATOR))
+                else:
+                    expandedMessages.append('%s %s: %s' % (part, sendingUsername, TERMINATOR))
+
+        # If it's a message other than Connect, Disconnect, and Rename, insert the
+        # username into the message.
+        if (len(message) > 0) and not (message[:message.find(' ')] in ['C', 'D', 'R']):
+            message = '%s %s: %s' % (message[:message.find(' ')], sendingUsername, message[message.find(' ') + 1:])
+        # Add the Message Terminator
+        message += TERMINATOR
+        # Queue the message for each recipient.  Messages are held briefly so that they can be combined into
+        # fewer socket writes.
+        for client in recipients:
+            if (len(expandedMessages) > 0) and not client.batches:
+                for expandedMessage in expandedMessages:
+                    self.Send(client, expandedMessage)
+            else:
+                self.Send(client, message)
+
+    def ConnectionLost(self, client):
+        """ Handle the loss of a client connection """
+        # If the client had joined a room ...
+        if client.room != None:
+            # ... remove it from the room ...
+            room = client.room
+            self.LeaveRoom(client)
+            # ... and broadcast the loss of the user to the other users in the room
+            self.BroadcastMessage('D %s' % client.name, client.name, room)
+        # Close the socket connection
+        self.CloseConnection(client)
+
+        if DEBUG:
+            print "Connection %s lost." % (client.address,)
+            print "%d connections remain." % len(self.connections)
+
+    def CloseConnection(self, client):
+        """ Close a client connection and forget about it """
+        self.LeaveRoom(client)
+        if self.connections.has_key(client.address):
+            del(self.connections[client.address])
+        try:
+            client.connection.close()
+        except:
+            pass
+
+    def Report(self):
+        """ Report status in DEBUG Mode """
+        if DEBUG and DEBUG2:
+            print
+            print "Report for %s:" % now()
+            print "Rooms:"
+            for room in self.rooms:
+                print room, [c.name for c in self.rooms[room]]
+            print "Connections:"
+            for c in self.connections.values():
+                print c.address, c.name, c.dbHost, c.dbName, c.outBytes
+            print
+
+    def KillAllThreads(self):
+        """ Stop the Message Server.  (The name is retained from the thread-based Message Server.) """
+        self.keepRunning = False
+
+    def Wait(self):
+        """ Wait for the Message Server to stop """
+        # Join with a timeout so that signals can still be handled while we wait
+        while self.thread.isAlive():
+            self.thread.join(SELECT_TIMEOUT)
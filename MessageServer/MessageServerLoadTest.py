@@ -0,0 +1,210 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" A load-test harness for the Transana Message Server.
+
+    This utility simulates many Transana-MU clients on localhost.  The clients are spread across several
+    databases ("rooms").  Each client connects, waits for validation, sends the Capabilities Query (unless
+    --basic is given, to simulate older clients), and then sends a series of chat messages.  The harness checks that every message reaches every client in the sender's room, and
+    reports throughput and delivery latency.
+
+    usage:  python MessageServerLoadTest.py [options]
+
+    By default, the harness starts the event-driven Message Server engine in-process on a spare port.
+    Use --host and --port to test a Message Server that is already running. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's optparse module
+import optparse
+# import Python's select module
+import select
+# import python's socket module
+import socket
+# import python's sys module
+import sys
+# import Python's time module
+import time
+
+# import the event-driven Message Server engine
+import MessageServerEngine
+
+# The Message Terminator that separates messages on the wire
+TERMINATOR = MessageServerEngine.TERMINATOR
+
+
+class simulatedClient(object):
+    """ A simulated Transana-MU client """
+    def __init__(self, index, host, port, room, version, basic=False):
+        self.index = index
+        self.userName = 'LoadTest%04d' % index
+        self.room = room
+        # Connect to the Message Server
+        self.connection = socket.create_connection((host, port))
+        self.inBuffer = ''
+        self.basic = basic
+        self.validated = False
+        self.capabilities = False
+        self.received = 0
+        self.latencies = []
+        self.lastReceived = 0.0
+        # Send the Connection message.  (Format: "C Username DatabaseHost DatabaseName SSL Version")
+        self.Send('C %s LOADTESTHOST %s FALSE %s' % (self.userName, room, version))
+
+    def fileno(self):
+        """ Allow the simulated client to be used with select() """
+        return self.connection.fileno()
+
+    def Send(self, message):
+        """ Send a message to the Message Server """
+        self.connection.sendall(message + TERMINATOR)
+
+    def Read(self):
+        """ Read and process available data.  Returns False if the connection was closed. """
+        data = self.connection.recv(65536)
+        if not data:
+            return False
+        messages = (self.inBuffer + data).split(TERMINATOR)
+        self.inBuffer = messages.pop()
+        for message in messages:
+            # The Message Server's answer to the Capabilities Query
+            if message == MessageServerEngine.CAPABILITIES_REPLY[:-len(TERMINATOR)]:
+                self.capabilities = True
+            elif message.startswith('V '):
+                self.validated = True
+                # Newer clients ask the Message Server what it supports
+                if not self.basic:
+                    self.Send(MessageServerEngine.CAPABILITIES_QUERY)
+            # Load Test messages have the form "M Username: LOAD index sequence timestamp"
+            elif message.startswith('M ') and (message.find(': LOAD ') > -1):
+                parts = message[message.find(': LOAD ') + 7:].split(' ')
+                self.received += 1
+                self.lastReceived = time.time()
+                self.latencies.append(self.lastReceived - float(parts[2]))
+        return True
+
+    def Close(self):
+        """ Disconnect from the Message Server """
+        try:
+            self.Send('D %s' % self.userName)
+            self.connection.close()
+        except socket.error:
+            pass
+
+
+def ServiceClients(clients, timeout):
+    """ Process data from the clients until no data arrives for the timeout period """
+    while True:
+        (readable, writable, errors) = select.select(clients, [], [], timeout)
+        if len(readable) == 0:
+            break
+        for client in readable:
+            if not client.Read():
+                clients.remove(client)
+
+def Percentile(values, percent):
+    """ Return the given percentile of a list of values """
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100.0), len(values) - 1)]
+
+def RunLoadTest(options):
+    """ Run the load test described by the options """
+    # If no host is specified, start a Message Server engine to test
+    if options.host == None:
+        server = MessageServerEngine.dispatcher('127.0.0.1', options.port, None)
+        host = '127.0.0.1'
+    else:
+        server = None
+        host = options.host
+
+    try:
+        # Connect the simulated clients, spreading them across the rooms
+        startTime = time.time()
+        clients = []
+        for index in range(options.clients):
+            clients.append(simulatedClient(index, host, options.port, 'LOADTESTDB%d' % (index % options.rooms), options.version, options.basic))
+        # Wait for all the clients to be validated
+        while len([client for client in clients if not client.validated]) > 0:
+            (readable, writable, errors) = select.select(clients, [], [], 10.0)
+            if len(readable) == 0:
+                print "Timed out waiting for client validation."
+                return False
+            for client in readable:
+                client.Read()
+        # Drain the connection notices
+        ServiceClients(list(clients), 0.5)
+        print "%d clients connected in %0.2f seconds, %d answered by the Capabilities Reply." % \
+              (len(clients), time.time() - startTime, len([client for client in clients if client.capabilities]))
+
+        # Each client sends its messages in turn, with the clients reading their data as we go
+        startTime = time.time()
+        for sequence in range(options.messages):
+            for client in clients:
+                client.Send('M LOAD %d %d %0.6f' % (client.index, sequence, time.time()))
+            ServiceClients(list(clients), 0)
+            if options.delay > 0:
+                time.sleep(options.delay)
+        # Collect the remaining messages
+        ServiceClients(list(clients), 2.0)
+        elapsed = max([client.lastReceived for client in clients]) - startTime
+
+        # Every message should reach every client in the sender's room, including the sender
+        roomSizes = {}
+        for client in clients:
+            roomSizes[client.room] = roomSizes.get(client.room, 0) + 1
+        expected = sum([roomSizes[client.room] * options.messages for client in clients])
+        received = sum([client.received for client in clients])
+        latencies = []
+        for client in clients:
+            latencies += client.latencies
+
+        print "%d messages sent, %d of %d expected deliveries received in %0.2f seconds (%0.0f deliveries per second)." % \
+              (len(clients) * options.messages, received, expected, elapsed, received / max(elapsed, 0.001))
+        print "Delivery latency:  median %0.1f ms, 95th percentile %0.1f ms, maximum %0.1f ms" % \
+              (Percentile(latencies, 50) * 1000.0, Percentile(latencies, 95) * 1000.0, Percentile(latencies, 100) * 1000.0)
+
+        # Disconnect the clients
+        for client in clients:
+            client.Close()
+
+        return (received == expected)
+    finally:
+        # Stop the Message Server engine if we started it
+        if server != None:
+            server.KillAllThreads()
+            server.Wait()
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--clients', type='int', default=200, help='number of simulated clients (default 200)')
+    parser.add_option('--rooms', type='int', default=4, help='number of databases the clients are spread across (default 4)')
+    parser.add_option('--messages', type='int', default=20, help='number of messages each client sends (default 20)')
+    parser.add_option('--delay', type='float', default=0.0, help='seconds to wait between rounds of messages (default 0)')
+    parser.add_option('--host', default=None, help='host of a running Message Server to test (default: start one in-process)')
+    parser.add_option('--port', type='int', default=17615, help='Message Server port (default 17615)')
+    parser.add_option('--version', type='int', default=300, help='Transana version reported by the clients (default 300)')
+    parser.add_option('--basic', action='store_true', default=False, help="simulate older clients, which don't send the Capabilities Query")
+    (options, args) = parser.parse_args()
+
+    if RunLoadTest(options):
+        print "PASSED"
+        sys.exit(0)
+    else:
+        print "FAILED"
+        sys.exit(1)
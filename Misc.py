@@ -239,10 +239,8 @@ def unistrip(strng, left=True):
     if left:
         # ... we can safely use lstrip() to remove whitespace from the left side of the string.
         strng = strng.lstrip()
-    # Now we can check the right side of the string character by character.  If the string still has
-    # characters and the last character is whitespace ...
-    while (len(strng) > 0) and (strng[-1] in string.whitespace):
-        # ... drop the last character from the string
-	strng = strng[:-1]
+    # Now we can remove whitespace from the right side of the string.  Only the characters in string.whitespace
+    # are removed, as rstrip() alone would also remove unicode characters such as the non-breaking space.
+    strng = strng.rstrip(string.whitespace)
     # return the results
     return strng
@@ -18,6 +18,10 @@
 
 __author__ = 'David Woods <dwoods@wcer.wisc.edu>'
 
+DEBUG = False
+if DEBUG:
+    print "ProcessSearch DEBUG is ON!!"
+
 # Import wxPython
 import wx
 
@@ -33,6 +37,8 @@ import Quote
 import Collection
 # Import the Transana Database Interface
 import DBInterface
+# Import Transana's in-memory Keyword Index
+import KeywordIndex
 # Import the Transana Search Dialog Box
 import SearchDialog
 # import Transana's Constants
@@ -43,6 +49,11 @@ import TransanaGlobal
 # Import the Python String module
 import string
 
+# Set this flag to False to use the original SQL-only search engine.  When True, Search Terms are parsed into
+# an expression tree and evaluated as set operations on the objects coded with each Keyword.  (The SQL engine
+# is still used if the set-based engine can't parse the Search Terms.)
+USE_SET_SEARCH = True
+
 
 class ProcessSearch(object):
     """ This class handles all processing related to Searching. """
@@ -172,14 +183,35 @@ class ProcessSearch(object):
                 # Get a Database Cursor
                 dbCursor = DBInterface.get_db().cursor()
 
+                # Assume the set-based search engine will not be used
+                setResults = None
+                # If the set-based search engine is enabled ...
+                if USE_SET_SEARCH:
+                    try:
+                        # ... evaluate the search using set operations
+                        setResults = self.ExecuteSetSearch(dbCursor, searchTerms, includeDocuments, includeEpisodes,
+                                                           includeQuotes, includeClips, includeSnapshots)
+                    except ValueError, e:
+                        # If the set-based engine can't parse the Search Terms, fall back to the SQL search engine
+                        if DEBUG:
+                            print "ProcessSearch: set-based search failed, using SQL search:", e
+                        setResults = None
+
                 if includeEpisodes:
-                    # Adjust query for sqlite, if needed
-                    episodeQuery = DBInterface.FixQuery(episodeQuery)
-                    # Execute the Library/Episode query
-                    dbCursor.execute(episodeQuery, tuple(params))
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['Episode']
+                    else:
+                        # Adjust query for sqlite, if needed
+                        episodeQuery = DBInterface.FixQuery(episodeQuery)
+                        # Execute the Library/Episode query
+                        dbCursor.execute(episodeQuery, tuple(params))
+                        # Get the results of the Library/Episode query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Process the results of the Library/Episode query
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # Add the new Transcript(s) to the Database Tree Tab.
                         # To add a Transcript, we need to build the node list for the tree's add_Node method to climb.
                         # We need to add the Library, Episode, and Transcripts to our Node List, so we'll start by loading
@@ -202,13 +234,20 @@ class ProcessSearch(object):
                             self.dbTree.add_Node('SearchEpisodeNode', nodeList, tempEpisode.number, tempLibrary.number)
 
                 if includeDocuments:
-                    # Adjust query for sqlite, if needed
-                    documentQuery = DBInterface.FixQuery(documentQuery)
-                    # Execute the Library/Document query
-                    dbCursor.execute(documentQuery, tuple(params))
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['Document']
+                    else:
+                        # Adjust query for sqlite, if needed
+                        documentQuery = DBInterface.FixQuery(documentQuery)
+                        # Execute the Library/Document query
+                        dbCursor.execute(documentQuery, tuple(params))
+                        # Get the results of the Library/Document query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Process the results of the Library/Document query
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # Add the new Document(s) to the Database Tree Tab.
                         # To add a Document, we need to build the node list for the tree's add_Node method to climb.
                         # We need to add the Library and Documents to our Node List, so we'll start by loading
@@ -221,13 +260,20 @@ class ProcessSearch(object):
                         self.dbTree.add_Node('SearchDocumentNode', nodeList + (tempDocument.id,), tempDocument.number, tempDocument.library_num)
 
                 if includeQuotes:
-                    # Adjust query for sqlite, if needed
-                    quoteQuery = DBInterface.FixQuery(quoteQuery)
-                    # Execute the Collection/Quote query
-                    dbCursor.execute(quoteQuery, params)
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['Quote']
+                    else:
+                        # Adjust query for sqlite, if needed
+                        quoteQuery = DBInterface.FixQuery(quoteQuery)
+                        # Execute the Collection/Quote query
+                        dbCursor.execute(quoteQuery, params)
+                        # Get the results of the Collection/Quote query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Process all results of the Collection/Quote query 
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # Add the new Quote to the Database Tree Tab.
                         # To add a Quote, we need to build the node list for the tree's add_Node method to climb.
                         # We need to add all of the Collection Parents to our Node List, so we'll start by loading
@@ -249,13 +295,20 @@ class ProcessSearch(object):
                         self.dbTree.add_Node('SearchQuoteNode', nodeList, line['QuoteNum'], line['CollectNum'], sortOrder=line['SortOrder'])
 
                 if includeClips:
-                    # Adjust query for sqlite, if needed
-                    clipQuery = DBInterface.FixQuery(clipQuery)
-                    # Execute the Collection/Clip query
-                    dbCursor.execute(clipQuery, params)
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['Clip']
+                    else:
+                        # Adjust query for sqlite, if needed
+                        clipQuery = DBInterface.FixQuery(clipQuery)
+                        # Execute the Collection/Clip query
+                        dbCursor.execute(clipQuery, params)
+                        # Get the results of the Collection/Clip query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Process all results of the Collection/Clip query 
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # Add the new Clip to the Database Tree Tab.
                         # To add a Clip, we need to build the node list for the tree's add_Node method to climb.
                         # We need to add all of the Collection Parents to our Node List, so we'll start by loading
@@ -277,17 +330,24 @@ class ProcessSearch(object):
                         self.dbTree.add_Node('SearchClipNode', nodeList, line['ClipNum'], line['CollectNum'], sortOrder=line['SortOrder'])
 
                 if includeSnapshots:
-                    # Adjust query for sqlite, if needed
-                    wholeSnapshotQuery = DBInterface.FixQuery(wholeSnapshotQuery)
-                    # Execute the Whole Snapshot query
-                    dbCursor.execute(wholeSnapshotQuery, params)
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['Snapshot']
+                    else:
+                        # Adjust query for sqlite, if needed
+                        wholeSnapshotQuery = DBInterface.FixQuery(wholeSnapshotQuery)
+                        # Execute the Whole Snapshot query
+                        dbCursor.execute(wholeSnapshotQuery, params)
+                        # Get the results of the Whole Snapshot query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Since we have two sources of Snapshots that get included, we need to track what we've already
                     # added so we don't add the same Snapshot twice
                     addedSnapshots = []
 
                     # Process all results of the Whole Snapshot query 
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # Add the new Snapshot to the Database Tree Tab.
                         # To add a Snapshot, we need to build the node list for the tree's add_Node method to climb.
                         # We need to add all of the Collection Parents to our Node List, so we'll start by loading
@@ -312,13 +372,20 @@ class ProcessSearch(object):
                         
                         tmpNode = self.dbTree.select_Node(nodeList[:-1], 'SearchCollectionNode', ensureVisible=False)
                         self.dbTree.SortChildren(tmpNode)
-                    # Adjust query for sqlite if needed
-                    snapshotCodingQuery = DBInterface.FixQuery(snapshotCodingQuery)
-                    # Execute the Snapshot Coding query
-                    dbCursor.execute(snapshotCodingQuery, params)
+                    # If we used the set-based search engine ...
+                    if setResults != None:
+                        # ... the results have already been retrieved
+                        results = setResults['SnapshotCoding']
+                    else:
+                        # Adjust query for sqlite if needed
+                        snapshotCodingQuery = DBInterface.FixQuery(snapshotCodingQuery)
+                        # Execute the Snapshot Coding query
+                        dbCursor.execute(snapshotCodingQuery, params)
+                        # Get the results of the Snapshot Coding query
+                        results = DBInterface.fetchall_named(dbCursor)
 
                     # Process all results of the Snapshot Coding query 
-                    for line in DBInterface.fetchall_named(dbCursor):
+                    for line in results:
                         # If the Snapshot is NOT already in the Search Results ...
                         if not (line['SnapshotNum'] in addedSnapshots):
                             # Add the new Snapshot to the Database Tree Tab.
@@ -643,3 +710,285 @@ class ProcessSearch(object):
         # Return the Library/Episode Query, the Collection/Clip Query, the Whole Snapshot Query, the Snapshot Coding Query, 
         # and the list of parameters to use with these queries to the calling routine.
         return (documentSQL, episodeSQL, quoteSQL, clipSQL, wholeSnapshotSQL, snapshotCodingSQL, params)
+
+    def ParseSearchTerms(self, queryText):
+        """ Convert natural language search terms (as structured by the Transana Search Dialog) into an expression
+            tree that can be evaluated by EvaluateSearchTree().  Nodes are tuples:  ('TERM', (kwg, kw)),
+            ('NOT', node), ('AND', node, node), and ('OR', node, node). """
+        # Initialize the list of tokens.  Tokens are '(', ')', 'AND', 'OR', and ('TERM', (kwg, kw), notFlag) tuples.
+        tokens = []
+        # We now will go through the Search Terms line by line, using the same rules as BuildQueries()
+        for lineNum in range(len(queryText)):
+            # Capture the Line being processed, and remove whitespace from either end
+            tempStr = string.strip(queryText[lineNum])
+            # Skip blank lines
+            if len(tempStr) == 0:
+                continue
+
+            # Initialize the "Continuation" string, which holds a BOOLEAN Operator ("AND" or "OR")
+            continStr = ''
+            # Initialize the flag that signals the BOOLEAN "NOT" Operator
+            notFlag = False
+            # Initialize the counter that tracks the number of parentheses that are closed on this line
+            closeParen = 0
+
+            # If a line ends with " AND"...
+            if tempStr[-4:] == ' AND':
+                # ... note the Boolean Operator and remove it from the line being processed.
+                continStr = 'AND'
+                tempStr = tempStr[:-4]
+            # If a line ends with " OR"...
+            if tempStr[-3:] == ' OR':
+                # ... note the Boolean Operator and remove it from the line being processed.
+                continStr = 'OR'
+                tempStr = tempStr[:-3]
+
+            # Process characters at the beginning of the Line, including open parens and the "NOT" operator.
+            while (len(tempStr) > 0) and ((tempStr[0] == '(') or (tempStr[:4] == 'NOT ')):
+                # If the line starts with an open paren ...
+                if tempStr[0] == '(':
+                    # ... add it to the token list and remove it from the line.
+                    tokens.append('(')
+                    tempStr = tempStr[1:]
+                # If the line starts with a "NOT" operator ...
+                if tempStr[:4] == 'NOT ':
+                    # ... set the NOT Flag and remove it from the line.
+                    notFlag = True
+                    tempStr = tempStr[4:]
+
+            # Count and remove the close parens in the line
+            closeParen = tempStr.count(')')
+            tempStr = tempStr.replace(')', '')
+
+            # All that should be left in the line being processed now should be a Keyword Group : Keyword pair.
+            if len(tempStr) > 0:
+                # Separate the Keyword Group from the Keyword
+                kwg = tempStr[:tempStr.find(':')]
+                kw = tempStr[tempStr.find(':') + 1:]
+                # Add the Keyword term to the token list
+                tokens.append(('TERM', (kwg, kw), notFlag))
+            # Add any closing parentheses to the token list
+            tokens += [')'] * closeParen
+            # Add the Boolean Operator, if one was specified
+            if continStr != '':
+                tokens.append(continStr)
+
+        # Parse the token list into an expression tree
+        (tree, pos) = self.ParseOrExpression(tokens, 0)
+        # If there are unused tokens, the search request is malformed
+        if pos != len(tokens):
+            raise ValueError('Unexpected search token at position %d' % pos)
+        # Return the expression tree
+        return tree
+
+    def ParseOrExpression(self, tokens, pos):
+        """ Parse an OR expression from the token list, starting at pos.  AND binds more tightly than OR, as in SQL. """
+        # Parse the left-hand AND expression
+        (node, pos) = self.ParseAndExpression(tokens, pos)
+        # As long as the next token is an OR operator ...
+        while (pos < len(tokens)) and (tokens[pos] == 'OR'):
+            # ... parse the right-hand AND expression and combine them
+            (right, pos) = self.ParseAndExpression(tokens, pos + 1)
+            node = ('OR', node, right)
+        # Return the expression and the next token position
+        return (node, pos)
+
+    def ParseAndExpression(self, tokens, pos):
+        """ Parse an AND expression from the token list, starting at pos. """
+        # Parse the left-hand term
+        (node, pos) = self.ParseTerm(tokens, pos)
+        # As long as the next token is an AND operator ...
+        while (pos < len(tokens)) and (tokens[pos] == 'AND'):
+            # ... parse the right-hand term and combine them
+            (right, pos) = self.ParseTerm(tokens, pos + 1)
+            node = ('AND', node, right)
+        # Return the expression and the next token position
+        return (node, pos)
+
+    def ParseTerm(self, tokens, pos):
+        """ Parse a parenthesized expression or a (possibly negated) Keyword term from the token list. """
+        # If we've run out of tokens, the search request is malformed
+        if pos >= len(tokens):
+            raise ValueError('Unexpected end of search terms')
+        # If we have an open paren ...
+        if tokens[pos] == '(':
+            # ... parse the enclosed expression ...
+            (node, pos) = self.ParseOrExpression(tokens, pos + 1)
+            # ... which must be followed by a close paren
+            if (pos >= len(tokens)) or (tokens[pos] != ')'):
+                raise ValueError('Unbalanced parentheses in search terms')
+            return (node, pos + 1)
+        # If we have a Keyword term ...
+        elif isinstance(tokens[pos], tuple):
+            # ... create a TERM node
+            node = ('TERM', tokens[pos][1])
+            # If the NOT operator was specified, wrap the TERM in a NOT node
+            if tokens[pos][2]:
+                node = ('NOT', node)
+            return (node, pos + 1)
+        # Anything else is an error
+        else:
+            raise ValueError('Unexpected search token "%s"' % tokens[pos])
+
+    def GetSearchTreeKeywords(self, tree, keywords=None):
+        """ Return the list of (kwg, kw) pairs used in a search expression tree """
+        if keywords == None:
+            keywords = []
+        # If this is a TERM node ...
+        if tree[0] == 'TERM':
+            # ... add its keyword, if it's not already in the list
+            if not tree[1] in keywords:
+                keywords.append(tree[1])
+        # Otherwise, process all the child nodes
+        else:
+            for node in tree[1:]:
+                self.GetSearchTreeKeywords(node, keywords)
+        return keywords
+
+    def SearchTreeHasNot(self, tree):
+        """ Determine whether a search expression tree includes the NOT operator """
+        if tree[0] == 'NOT':
+            return True
+        elif tree[0] == 'TERM':
+            return False
+        else:
+            return self.SearchTreeHasNot(tree[1]) or self.SearchTreeHasNot(tree[2])
+
+    def GetKeywordObjectSets(self, dbCursor, kwg, kw):
+        """ Get the sets of object numbers coded with the specified Keyword, by object type """
+        # Initialize the sets for all object types
+        objSets = {'SnapshotCoding' : set()}
+        for objType in KeywordIndex.OBJECT_TYPES:
+            objSets[objType] = set()
+        # Encode the values the same way BuildQueries() does for query parameters
+        if 'unicode' in wx.PlatformInfo:
+            kwg = kwg.encode(TransanaGlobal.encoding)
+            kw = kw.encode(TransanaGlobal.encoding)
+        # The database decides which Keywords match, so matching follows its collation exactly as the SQL search
+        # engine does.  (A case-insensitive collation can match several Keywords that differ only in case.)
+        query = """ SELECT DISTINCT KeywordGroup, Keyword FROM ClipKeywords2
+                      WHERE KeywordGroup = %s AND Keyword = %s """
+        # Adjust query for sqlite, if needed
+        query = DBInterface.FixQuery(query)
+        dbCursor.execute(query, (kwg, kw))
+        for (tmpKwg, tmpKw) in dbCursor.fetchall():
+            # Convert the Keyword Group and Keyword to the form the Keyword Index uses
+            if 'unicode' in wx.PlatformInfo:
+                tmpKwg = DBInterface.ProcessDBDataForUTF8Encoding(tmpKwg)
+                tmpKw = DBInterface.ProcessDBDataForUTF8Encoding(tmpKw)
+            # The in-memory Keyword Index knows which objects are coded with each matching Keyword
+            for objType in KeywordIndex.OBJECT_TYPES:
+                objSets[objType] |= KeywordIndex.ObjectSetForKeyword(tmpKwg, tmpKw, objType)
+        # Get all VISIBLE Snapshot Coding records for the Keyword
+        query = """ SELECT DISTINCT SnapshotNum FROM SnapshotKeywords2
+                      WHERE KeywordGroup = %s AND Keyword = %s AND Visible = 1 """
+        # Adjust query for sqlite, if needed
+        query = DBInterface.FixQuery(query)
+        dbCursor.execute(query, (kwg, kw))
+        for (snapshotNum, ) in dbCursor.fetchall():
+            if snapshotNum > 0:
+                objSets['SnapshotCoding'].add(snapshotNum)
+        # Return the object sets
+        return objSets
+
+    def GetCodedObjectSets(self, dbCursor):
+        """ Get the sets of all object numbers that have any Keyword applied, by object type.  These sets are the
+            universe the NOT operator works within, exactly as the GROUP BY in the SQL search engine does. """
+        # Initialize the sets for all object types
+        objSets = {'SnapshotCoding' : set()}
+        # The in-memory Keyword Index knows which objects are coded
+        for objType in KeywordIndex.OBJECT_TYPES:
+            objSets[objType] = KeywordIndex.CodedObjectSet(objType)
+        # Get all Snapshots with VISIBLE Snapshot Coding
+        query = "SELECT DISTINCT SnapshotNum FROM SnapshotKeywords2 WHERE Visible = 1"
+        dbCursor.execute(query)
+        for (snapshotNum, ) in dbCursor.fetchall():
+            if snapshotNum > 0:
+                objSets['SnapshotCoding'].add(snapshotNum)
+        # Return the object sets
+        return objSets
+
+    def EvaluateSearchTree(self, tree, objType, keywordSets, codedSets):
+        """ Evaluate a search expression tree for the given object type, returning the set of matching object numbers """
+        # A TERM is the set of objects coded with the Keyword
+        if tree[0] == 'TERM':
+            return keywordSets[tree[1]][objType]
+        # NOT is the set of coded objects NOT coded with the Keyword
+        elif tree[0] == 'NOT':
+            return codedSets[objType] - self.EvaluateSearchTree(tree[1], objType, keywordSets, codedSets)
+        # AND is the intersection of the two sets
+        elif tree[0] == 'AND':
+            return self.EvaluateSearchTree(tree[1], objType, keywordSets, codedSets) & \
+                   self.EvaluateSearchTree(tree[2], objType, keywordSets, codedSets)
+        # OR is the union of the two sets
+        elif tree[0] == 'OR':
+            return self.EvaluateSearchTree(tree[1], objType, keywordSets, codedSets) | \
+                   self.EvaluateSearchTree(tree[2], objType, keywordSets, codedSets)
+
+    def ExecuteSetSearch(self, dbCursor, queryText, includeDocuments, includeEpisodes, includeQuotes, includeClips, includeSnapshots):
+        """ Perform a search by resolving each Keyword to the set of objects coded with it and evaluating the
+            search request as set operations.  Returns a dictionary, keyed by object type, of lists of result
+            records with the same fields as the queries produced by BuildQueries(). """
+        # Parse the search terms into an expression tree
+        tree = self.ParseSearchTerms(queryText)
+        # Get the object sets for each Keyword in the search
+        keywordSets = {}
+        for (kwg, kw) in self.GetSearchTreeKeywords(tree):
+            keywordSets[(kwg, kw)] = self.GetKeywordObjectSets(dbCursor, kwg, kw)
+        # The set of all coded objects is only needed if the NOT operator is used
+        if self.SearchTreeHasNot(tree):
+            codedSets = self.GetCodedObjectSets(dbCursor)
+        else:
+            codedSets = {}
+
+        # Build the SQL that implements the Collections selections made on the Collections tab of the Search Form
+        if len(self.collectionList) > 0:
+            collectionSQL = ' AND (' + ' OR '.join(['(%%s.CollectNum = %d)' % coll[0] for coll in self.collectionList]) + ') '
+        else:
+            collectionSQL = ''
+
+        # Define the queries that get the data for the result objects.  The object number list gets substituted for "%s".
+        resultQueries = {'Document' : ('SELECT Doc.LibraryNum, SeriesID, Doc.DocumentNum, DocumentID ' + \
+                                       'FROM Series2 Se, Documents2 Doc ' + \
+                                       'WHERE (Doc.LibraryNum = Se.SeriesNum) AND (Doc.DocumentNum IN (%s)) ' + \
+                                       'ORDER BY SeriesID, DocumentID', includeDocuments),
+                         'Episode' : ('SELECT Ep.SeriesNum, SeriesID, Ep.EpisodeNum, EpisodeID ' + \
+                                      'FROM Series2 Se, Episodes2 Ep ' + \
+                                      'WHERE (Ep.SeriesNum = Se.SeriesNum) AND (Ep.EpisodeNum IN (%s)) ', includeEpisodes),
+                         'Quote' : ('SELECT Q.CollectNum, ParentCollectNum, Q.QuoteNum, CollectID, QuoteID, SortOrder ' + \
+                                    'FROM Collections2 Co, Quotes2 Q ' + \
+                                    'WHERE (Q.CollectNum = Co.CollectNum) AND (Q.QuoteNum IN (%s)) ' + \
+                                    collectionSQL.replace('%s', 'Q') + \
+                                    'ORDER BY CollectID, SortOrder', includeQuotes),
+                         'Clip' : ('SELECT Cl.CollectNum, ParentCollectNum, Cl.ClipNum, CollectID, ClipID, SortOrder ' + \
+                                   'FROM Collections2 Co, Clips2 Cl ' + \
+                                   'WHERE (Cl.CollectNum = Co.CollectNum) AND (Cl.ClipNum IN (%s)) ' + \
+                                   collectionSQL.replace('%s', 'Cl') + \
+                                   'ORDER BY CollectID, SortOrder', includeClips),
+                         'Snapshot' : ('SELECT Sn.CollectNum, ParentCollectNum, Sn.SnapshotNum, CollectID, SnapshotID, SortOrder ' + \
+                                       'FROM Collections2 Co, Snapshots2 Sn ' + \
+                                       'WHERE (Sn.CollectNum = Co.CollectNum) AND (Sn.SnapshotNum IN (%s)) ' + \
+                                       collectionSQL.replace('%s', 'Sn') + \
+                                       'ORDER BY CollectID, SortOrder', includeSnapshots)}
+        # Snapshot Coding results use the same data as Whole Snapshot results
+        resultQueries['SnapshotCoding'] = resultQueries['Snapshot']
+
+        # Initialize the results dictionary
+        results = {}
+        for objType in resultQueries.keys():
+            # Get the query and whether this object type was requested
+            (query, includeType) = resultQueries[objType]
+            # Initialize the result list
+            results[objType] = []
+            # If this object type was not requested, skip it
+            if not includeType:
+                continue
+            # Evaluate the search for this object type
+            objNums = self.EvaluateSearchTree(tree, objType, keywordSets, codedSets)
+            # If there are matching objects ...
+            if len(objNums) > 0:
+                # ... get the data for them.  Object numbers are integers, so it's safe to place them in the query.
+                dbCursor.execute(query % ', '.join(['%d' % objNum for objNum in sorted(objNums)]))
+                results[objType] = DBInterface.fetchall_named(dbCursor)
+        # Return the results
+        return results
@@ -0,0 +1,204 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" A benchmark for Transana's keyword searches.
+
+    This utility builds a temporary sqlite3 database with Transana's tables and secondary indexes, fills it
+    with randomly coded Episodes, Documents, Quotes, Clips, and Snapshots, and times the COUNT / HAVING queries
+    built by ProcessSearch.BuildQueries() against the set-based search engine, ProcessSearch.ExecuteSetSearch(),
+    for a number of search requests.  It also checks that both engines find the same objects.
+
+    usage:  python ProcessSearchBenchmark.py [options] """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's gettext module
+import gettext
+# import Python's optparse module
+import optparse
+# import Python's os module
+import os
+# import Python's random module
+import random
+# import Python's sqlite3 module
+import sqlite3
+# import python's sys module
+import sys
+# import Python's tempfile module
+import tempfile
+# import Python's time module
+import time
+
+# DBInterface and the modules it imports expect the translation function to be defined
+gettext.install('Transana', unicode=True)
+
+# The benchmark always uses sqlite3, whatever database this copy of Transana is configured for
+import TransanaConfigConstants
+TransanaConfigConstants.DBInstalled = 'sqlite3'
+
+# import Transana's Database Interface
+import DBInterface
+# import Transana's Keyword Index
+import KeywordIndex
+# import Transana's Search processing
+import ProcessSearch
+# import Transana's Globals
+import TransanaGlobal
+
+# The search requests to time, in the form the Search Dialog produces them
+SEARCHES = [['Group 1:Keyword 1'],
+            ['Group 1:Keyword 1 AND', 'Group 2:Keyword 2'],
+            ['Group 1:Keyword 1 OR', 'Group 2:Keyword 2 OR', 'Group 3:Keyword 3'],
+            ['Group 1:Keyword 1 AND', 'NOT Group 2:Keyword 2'],
+            ['(Group 1:Keyword 1 OR', 'Group 2:Keyword 2) AND', 'NOT Group 3:Keyword 3'],
+            ['(Group 1:Keyword 4 AND', 'Group 2:Keyword 5) OR', '(Group 3:Keyword 6 AND', 'NOT Group 1:Keyword 7)']]
+
+# The object number column for each type of search result
+RESULT_COLUMNS = {'Document' : 'DocumentNum',
+                  'Episode' : 'EpisodeNum',
+                  'Quote' : 'QuoteNum',
+                  'Clip' : 'ClipNum',
+                  'Snapshot' : 'SnapshotNum',
+                  'SnapshotCoding' : 'SnapshotNum'}
+
+def BuildDatabase(filename, options):
+    """ Create a sqlite3 database with randomly coded objects """
+    # The table and index creation queries need to know about the table type
+    if not hasattr(TransanaGlobal, 'hasInnoDB'):
+        TransanaGlobal.hasInnoDB = False
+    db = sqlite3.connect(filename)
+    dbCursor = db.cursor()
+    # Create the tables the searches use, with Transana's secondary indexes
+    for createQuery in [DBInterface.CreateLibraryTableQuery, DBInterface.CreateEpisodesTableQuery,
+                        DBInterface.CreateDocumentsTableQuery, DBInterface.CreateCollectionsTableQuery,
+                        DBInterface.CreateQuotesTableQuery, DBInterface.CreateClipsTableQuery,
+                        DBInterface.CreateSnapshotsTableQuery, DBInterface.CreateClipKeywordsTableQuery,
+                        DBInterface.CreateSnapshotKeywordsTableQuery]:
+        dbCursor.execute(createQuery(2))
+    for (indexName, tableName, columns) in DBInterface.INDEX_DEFINITIONS:
+        if tableName in ['Episodes2', 'Documents2', 'Collections2', 'Quotes2', 'Clips2', 'Snapshots2',
+                         'ClipKeywords2', 'SnapshotKeywords2']:
+            dbCursor.execute(DBInterface.CreateIndexQuery(indexName, tableName, columns))
+
+    # Use the same data every time
+    random.seed(0)
+    keywords = [('Group %d' % (x % 3 + 1), 'Keyword %d' % (x + 1)) for x in range(options.keywords)]
+    # Add the Libraries and Collections
+    for x in range(1, 11):
+        dbCursor.execute("INSERT INTO Series2 (SeriesNum, SeriesID) VALUES (?, ?)", (x, 'Library %d' % x))
+        dbCursor.execute("INSERT INTO Collections2 (CollectNum, CollectID, ParentCollectNum) VALUES (?, ?, 0)", (x, 'Collection %d' % x))
+    # Add the objects of each type, each coded with a few random Keywords
+    for objNum in range(1, options.objects + 1):
+        dbCursor.execute("INSERT INTO Episodes2 (EpisodeNum, EpisodeID, SeriesNum) VALUES (?, ?, ?)",
+                         (objNum, 'Episode %d' % objNum, random.randint(1, 10)))
+        dbCursor.execute("INSERT INTO Documents2 (DocumentNum, DocumentID, LibraryNum) VALUES (?, ?, ?)",
+                         (objNum, 'Document %d' % objNum, random.randint(1, 10)))
+        for (table, objType) in [('Quotes2', 'Quote'), ('Clips2', 'Clip'), ('Snapshots2', 'Snapshot')]:
+            dbCursor.execute("INSERT INTO %s (%sNum, %sID, CollectNum, SortOrder) VALUES (?, ?, ?, ?)" % (table, objType, objType),
+                             (objNum, '%s %d' % (objType, objNum), random.randint(1, 10), objNum))
+        # ClipKeywords2 records have one non-zero object number
+        for column in range(5):
+            nums = [0] * 5
+            nums[column] = objNum
+            for (kwg, kw) in random.sample(keywords, random.randint(0, 4)):
+                dbCursor.execute("""INSERT INTO ClipKeywords2 (EpisodeNum, DocumentNum, ClipNum, QuoteNum, SnapshotNum,
+                                                               KeywordGroup, Keyword, Example)
+                                      VALUES (?, ?, ?, ?, ?, ?, ?, '0')""", tuple(nums) + (kwg, kw))
+        # Snapshot Coding records may repeat a Keyword and may be hidden
+        for x in range(random.randint(0, 4)):
+            (kwg, kw) = random.choice(keywords)
+            dbCursor.execute("""INSERT INTO SnapshotKeywords2 (SnapshotNum, KeywordGroup, Keyword, x1, y1, x2, y2, visible)
+                                  VALUES (?, ?, ?, 0, 0, 10, 10, ?)""", (objNum, kwg, kw, random.choice(['0', '1'])))
+    db.commit()
+    return db
+
+def SQLSearch(search, dbCursor, searchTerms):
+    """ Run the search with the COUNT / HAVING queries.  Returns {objType : set of object numbers}. """
+    (documentQuery, episodeQuery, quoteQuery, clipQuery, wholeSnapshotQuery, snapshotCodingQuery, params) = \
+        search.BuildQueries(searchTerms)
+    results = {}
+    for (objType, query) in [('Document', documentQuery), ('Episode', episodeQuery), ('Quote', quoteQuery),
+                             ('Clip', clipQuery), ('Snapshot', wholeSnapshotQuery), ('SnapshotCoding', snapshotCodingQuery)]:
+        dbCursor.execute(DBInterface.FixQuery(query), tuple(params))
+        results[objType] = set([line[RESULT_COLUMNS[objType]] for line in DBInterface.fetchall_named(dbCursor)])
+    return results
+
+def SetSearch(search, dbCursor, searchTerms):
+    """ Run the search with the set-based engine.  Returns {objType : set of object numbers}. """
+    setResults = search.ExecuteSetSearch(dbCursor, searchTerms, True, True, True, True, True)
+    results = {}
+    for objType in RESULT_COLUMNS.keys():
+        results[objType] = set([line[RESULT_COLUMNS[objType]] for line in setResults[objType]])
+    return results
+
+def TimeSearch(function, search, dbCursor, searchTerms, repeat, reloadIndex=False):
+    """ Return the result of function(search, dbCursor, searchTerms) and the best time of repeat calls """
+    bestTime = None
+    for x in range(repeat):
+        # If requested, time the loading of the Keyword Index too
+        if reloadIndex:
+            KeywordIndex.Invalidate()
+        startTime = time.time()
+        result = function(search, dbCursor, searchTerms)
+        elapsed = time.time() - startTime
+        if (bestTime == None) or (elapsed < bestTime):
+            bestTime = elapsed
+    return (result, bestTime)
+
+def RunBenchmark(options):
+    """ Run the benchmark described by the options """
+    success = True
+    (handle, filename) = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    try:
+        startTime = time.time()
+        DBInterface._dbref = BuildDatabase(filename, options)
+        print "Built a database of %d objects of each type in %0.1f seconds" % (options.objects, time.time() - startTime)
+        dbCursor = DBInterface._dbref.cursor()
+        # Create a search object without the Search Dialog
+        search = ProcessSearch.ProcessSearch.__new__(ProcessSearch.ProcessSearch)
+        search.collectionList = []
+        print "%-4s %9s %14s %12s %8s %8s" % ('#', 'SQL (ms)', 'Set+load (ms)', 'Set (ms)', 'Found', 'Match')
+        for searchNum in range(len(SEARCHES)):
+            searchTerms = SEARCHES[searchNum]
+            (sqlResult, sqlTime) = TimeSearch(SQLSearch, search, dbCursor, searchTerms, options.repeat)
+            (coldResult, coldTime) = TimeSearch(SetSearch, search, dbCursor, searchTerms, 1, reloadIndex=True)
+            (setResult, setTime) = TimeSearch(SetSearch, search, dbCursor, searchTerms, options.repeat)
+            match = (sqlResult == setResult) and (coldResult == setResult)
+            success = success and match
+            found = sum([len(objNums) for objNums in sqlResult.values()])
+            print "%-4d %9.1f %14.1f %12.1f %8d %8s" % (searchNum + 1, sqlTime * 1000.0, coldTime * 1000.0, setTime * 1000.0, found, match)
+    finally:
+        if DBInterface._dbref != None:
+            DBInterface._dbref.close()
+            DBInterface._dbref = None
+        os.remove(filename)
+    return success
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--objects', type='int', default=100000, help='number of objects of each type (default 100000)')
+    parser.add_option('--keywords', type='int', default=60, help='number of keywords (default 60)')
+    parser.add_option('--repeat', type='int', default=3, help='number of times to repeat each search (default 3)')
+    (options, args) = parser.parse_args()
+
+    if RunBenchmark(options):
+        print "PASSED"
+        sys.exit(0)
+    else:
+        print "FAILED"
+        sys.exit(1)
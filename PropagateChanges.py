@@ -28,8 +28,12 @@ import wx
 import sys
 # import Transana's Clip object
 import Clip
+# import Transana's Data Object
+import DataObject
 # import Transana's Database interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Miscellaneous functions
 import Misc
 # import Transana's Quote object
@@ -52,6 +56,18 @@ else:
 ID_UPDATEALL = wx.NewId()
 ID_SKIP = wx.NewId()
 
+def LockDataObjects(dataObjs, lockedObjects, unlockedObjects):
+    """ Lock the records for a list of data objects.  Objects that could not be locked because they are locked by
+        another user are added to the lockedObjects dictionary.  Objects that we locked are added to the
+        unlockedObjects dictionary.  Both dictionaries are keyed by object number. """
+    # Lock all the records that can be locked, noting what cannot be locked.
+    for (dataObj, e) in DataObject.LockRecords(dataObjs):
+        lockedObjects[dataObj.number] = dataObj
+    # All the other objects are now locked by us
+    for dataObj in dataObjs:
+        if not lockedObjects.has_key(dataObj.number):
+            unlockedObjects[dataObj.number] = dataObj
+
 class PropagateObjectChanges(wx.Dialog):
     """ This window displays the Propagate Object Changes report form. """
     def __init__(self, parent, objType):
@@ -140,15 +156,9 @@ class PropagateObjectChanges(wx.Dialog):
             # request clips that include the current transcript cursor position
             objList = DBInterface.list_of_quotes_by_document(self.parent.TranscriptWindow.dlg.editor.TranscriptObj.number, textPos = insertionPoint, textSel=positionInfo)
 
-            # Iterate through the list of Quotes, loading the objects, locking what can be locked, and noting what cannot
-            # be locked.
-            for obj in objList:
-                dataObj = Quote.Quote(num = obj['QuoteNum'])
-                try:
-                    dataObj.lock_record()
-                    unlockedObjects[dataObj.number] = dataObj
-                except:
-                    lockedObjects[dataObj.number] = dataObj
+            # Load the Quotes, lock what can be locked, and note what cannot be locked.
+            dataObjs = [Quote.Quote(num = obj['QuoteNum']) for obj in objList]
+            LockDataObjects(dataObjs, lockedObjects, unlockedObjects)
 
         # If we have an Episode Transcript ...
         elif objType == 'Episode':
@@ -172,15 +182,9 @@ class PropagateObjectChanges(wx.Dialog):
                     objList.append(clip)
             # This still misses clips that have had BOTH time codes removed, but I can't figure out how to fix that.  It shouldn't happen very often.
         
-            # Iterate through the list of Clips, loading the objects, locking what can be locked, and noting what cannot
-            # be locked.
-            for obj in objList:
-                dataObj = Clip.Clip(obj['ClipNum'])
-                try:
-                    dataObj.lock_record()
-                    unlockedObjects[dataObj.number] = dataObj
-                except:
-                    lockedObjects[dataObj.number] = dataObj
+            # Load the Clips, lock what can be locked, and note what cannot be locked.
+            dataObjs = [Clip.Clip(obj['ClipNum']) for obj in objList]
+            LockDataObjects(dataObjs, lockedObjects, unlockedObjects)
 
         # If no data objects are returned ...
         if len(objList) == 0:
@@ -375,6 +379,8 @@ class PropagateObjectChanges(wx.Dialog):
             if results == wx.ID_CANCEL:
                 # ... undo Clip Transcript changes in the database ...
                 dbCursor.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 # ... and inform the user that the changes were cancelled.  To avoid confusion, clear the report information already generated.
                 self.memo.Clear()
                 self.memo.AppendText(cancellationMessage)
@@ -517,15 +523,9 @@ class PropagateClipChanges(wx.Dialog):
                 # ... then remove it from the list.  It's already been updated!
                 objList.remove((originalObj.number, originalObj.collection_num, originalObj.id, originalObj.source_document_num))
 
-            # Iterate through the list of Quotes, loading the objects, locking what can be locked, and noting what cannot
-            # be locked.
-            for obj in objList:
-                dataObj = Quote.Quote(num = obj[0])
-                try:
-                    dataObj.lock_record()
-                    unlockedObjects[dataObj.number] = dataObj
-                except:
-                    lockedObjects[dataObj.number] = dataObj
+            # Load the Quotes, lock what can be locked, and note what cannot be locked.
+            dataObjs = [Quote.Quote(num = obj[0]) for obj in objList]
+            LockDataObjects(dataObjs, lockedObjects, unlockedObjects)
 
         elif objType == 'Clip':
             # If we are passed a Transcript Index ...
@@ -572,15 +572,9 @@ class PropagateClipChanges(wx.Dialog):
                     # ... then remove it from the list.  It's already been updated!
                     objList.remove((originalObj.number, originalObj.collection_num, originalObj.id, originalObj.transcripts[sourceTranscriptIndex].number))
 
-            # Iterate through the list of Clips, loading the objects, locking what can be locked, and noting what cannot
-            # be locked.
-            for obj in objList:
-                dataObj = Clip.Clip(obj[0])
-                try:
-                    dataObj.lock_record()
-                    unlockedObjects[dataObj.number] = dataObj
-                except:
-                    lockedObjects[dataObj.number] = dataObj
+            # Load the Clips, lock what can be locked, and note what cannot be locked.
+            dataObjs = [Clip.Clip(obj[0]) for obj in objList]
+            LockDataObjects(dataObjs, lockedObjects, unlockedObjects)
 
         # If no objects are returned ...
         if len(objList) == 0:
@@ -911,6 +905,8 @@ class PropagateClipChanges(wx.Dialog):
             if results == wx.ID_CANCEL:
                 # ... undo Data Object changes in the database ...
                 dbCursor.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
 
                 # If the user presses Cancel, we have to reverse the changes that have already been made to the
                 # user interface (local and MU).  This probably isn't a great model (change, then undo if Cancelled),
@@ -32,14 +32,22 @@ IN_TRANSANA = True
 import wx
 import wx.richtext as richtext
 
-# import Python's cStringIO, os, and string modules
-import cStringIO, os, string
+# import Python's cStringIO, os, re, and string modules
+import cStringIO, os, re, string
 # import Python's XML Sax handler
 import xml.sax.handler
 
 if DEBUG:
     import time
 
+# Regular Expressions used to tokenize RTF data in bulk rather than one character at a time.
+# A run of characters with no special meaning in RTF
+RTF_TEXT_RUN = re.compile(r'[^{}\\]+')
+# A Control Word, with its optional numeric parameter, following a backslash
+RTF_CONTROL_WORD = re.compile(r'\\([A-Za-z]*)(-?[0-9]*)')
+# The special characters that seek_eob() needs to examine
+RTF_BLOCK_CHARS = re.compile(r'[{}\\]')
+
 
 class PyRichTextRTFHandler(richtext.RichTextFileHandler):
     """ A RichTextFileHandler that can handle Rich Text Format files,
@@ -1191,7 +1199,13 @@ class RTFTowxRichTextCtrlParser:
 
 #            print "No progress dialog.", len(self.buffer)
 
-        # We need to go through the file buffer one character at a time
+        # Note how often the Progress Dialog should be updated, and when the next update is due
+        if progressDlg:
+            progressStep = min(50000, int(len(self.buffer) / 20))
+            nextProgress = 0
+
+        # We need to go through the file buffer one RTF token at a time.  Runs of plain text are handled all at
+        # once, and special characters ({, }, and \) are handled individually.
         while self.index < len(self.buffer):
 
             # On rare occasions, text gets placed OUT OF ORDER in the transcript during RTF import.
@@ -1203,9 +1217,11 @@ class RTFTowxRichTextCtrlParser:
 
                 self.txtCtrl.SetInsertionPoint(self.txtCtrl.GetLastPosition() - self.insertionOffset - 1)
 
-            if progressDlg and (self.index % min(50000, int(len(self.buffer) / 20)) == 0) and (not IN_TRANSANA):
+            if progressDlg and (self.index >= nextProgress) and (not IN_TRANSANA):
 
                 progressDlg.Update(self.index)
+                # Note when the next update is due
+                nextProgress = self.index + progressStep
                 
             # Get one character
             c = self.buffer[self.index]
@@ -1602,21 +1618,26 @@ class RTFTowxRichTextCtrlParser:
 
             # If we don't have a special character (\\, { or }) to process ...
             else:
-                # If we're in the color table and have a semicolon character ...
-                if (self.in_color_table) and (c == ";"):
-                    # ... then increment the color index to the next color
-                    self.colorIndex += 1
+                # ... get the whole run of characters up to the next special character.  Nothing in the run
+                # can change the parser state, so the run can be handled all at once.
+                textRun = RTF_TEXT_RUN.match(self.buffer, self.index)
+                run = textRun.group()
+                # If we're in the color table ...
+                if self.in_color_table:
+                    # ... then each semicolon character increments the color index to the next color
+                    self.colorIndex += run.count(';')
+                    # The semicolons have been used
+                    run = run.replace(';', '')
                 # If we're in the Font Table ...
-                elif self.in_font_table:
-                    # ... if we DON'T have a semicolon, which signals the end of the font name) ...
-                    if c != ';' and c != '\n' and c != '\r':
-                        self.fontName += c
-                # For any other character other than a newline or \r ...
-                elif (c != '\r' and c != '\n'):
-                    # ... add the character to the local text variable ...
-                    txt = txt + c
-                # ... and move on to the next character
-                self.index += 1
+                if self.in_font_table:
+                    # ... add everything except semicolons (which signal the end of the font name) and newlines
+                    self.fontName += run.replace(';', '').replace('\n', '').replace('\r', '')
+                # For any other characters other than newlines or \r ...
+                else:
+                    # ... add the characters to the local text variable ...
+                    txt += run.replace('\n', '').replace('\r', '')
+                # ... and move on to the next special character
+                self.index = textRun.end()
 
         if readOnly:
             self.txtCtrl.SetReadOnly(True)
@@ -1632,14 +1653,9 @@ class RTFTowxRichTextCtrlParser:
 
     def hex2int(self, data):
         """ Image data is stored in a file-friendly Hex format.  We need to convert it to an image-friendly binary format. """
-        # Initialize the conversion result variable
-        result = ''
-        # For each PAIR of characters in the hex data string ...
-        for x in range(0, len(data), 2):
-            # ... convert the hex pair into a integer, find that character, and add it to the result variable
-            result += chr(int(data[x : x + 2], 16))
-        # Return the converted data
-        return result
+        # For each PAIR of characters in the hex data string, convert the hex pair into a integer and find that
+        # character.  Join the characters to get the converted data, and return it.
+        return ''.join([chr(int(data[x : x + 2], 16)) for x in range(0, len(data), 2)])
              
     def process_text(self, txt):
 	""" Process a text string """
@@ -1776,38 +1792,16 @@ class RTFTowxRichTextCtrlParser:
 
         # Start exception handling
         try:
-            # Initialize the ControlWord variable
-            cw = ""
-            # Move to the first character following the backslash
-            self.index += 1
-            # Get the character to process
+            # Get the control word (LETTERS) and any number (the minus sign and digits) that modifies it
+            controlWord = RTF_CONTROL_WORD.match(self.buffer, self.index)
+            (cw, numstr) = controlWord.groups()
+            # Move the index to the first character after the control word and its number
+            self.index = controlWord.end()
+            # Get the character to process.  (If we're at the end of the buffer, this raises an IndexError.)
             c = self.buffer[self.index]
-            # As long as we are processing LETTERS ...
-            while string.ascii_letters.count(c) > 0:
-                # ... add the character to the control word ...
-                cw = cw + c
-                # ... increment the index ...
-                self.index += 1
-                # ... and look at the next character
-                c = self.buffer[self.index]
-
-            # Now index is at the first character after the control word, which might be a number that modifies the control word.
-            # As long as we are processing NUMBERS or the minus sign ...
-            if (string.digits.count(c) > 0 or (c == '-')):
-                # Start collecting digits.  (This structure means only the first character can be the minus sign.)
-                numstr = c
-                # Increment the index ...
-                self.index += 1
-                # ... and look for the next digit
-                c = self.buffer[self.index]
-                # From now on, we only want digits ...
-                while string.digits.count(c) > 0:
-                    # ... add the next digit to the number string ...
-                    numstr += c
-                    # ... increment the index ...
-                    self.index += 1
-                    # ... and look for the next digit
-                    c = self.buffer[self.index]
+
+            # If the control word is modified by a number ...
+            if numstr != '':
                 # Start exception handling
                 try:
                     # Convert the number string to an integer
@@ -2747,7 +2741,15 @@ class RTFTowxRichTextCtrlParser:
         x = self.index
         # As long as we don't reach the end of the RTF text ...        
         while x < len(self.buffer):
-            # ... look for backslashes and skip them
+            # ... find the next special character.  Nothing else in the block matters.
+            specialChar = RTF_BLOCK_CHARS.search(self.buffer, x)
+            # If there isn't one ...
+            if specialChar == None:
+                # ... we've reached the end of the RTF text
+                x = len(self.buffer)
+                break
+            x = specialChar.start()
+            # Look for backslashes and skip them
             if self.buffer[x] == "\\":
                 x = x + 1
             # Look for new block starts ...
@@ -0,0 +1,109 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" A benchmark for importing Rich Text Format documents.
+
+    This utility loads RTF documents into a wxRichTextCtrl using PyRTFParser and reports how many
+    RTF characters per second are processed.  If no files are named, it builds a Word-style transcript
+    of the requested size.  It also reports an MD5 checksum of the XML the wxRichTextCtrl holds after
+    each import, so results can be compared between versions of the parser.
+
+    usage:  python PyRTFParserBenchmark.py [options] [file.rtf ...] """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's cStringIO module
+import cStringIO
+# import Python's gettext module
+import gettext
+# import Python's hashlib module
+import hashlib
+# import Python's optparse module
+import optparse
+# import Python's time module
+import time
+
+# import wxPython
+import wx
+# import the wxPython RichTextCtrl
+import wx.richtext as richtext
+
+# PyRTFParser expects the translation function to be defined
+gettext.install('Transana', unicode=True)
+
+# import Transana's RTF Parser
+import PyRTFParser
+
+# The header of the generated transcript, including Font and Color tables
+HEADER = "{\\rtf1\\ansi\\ansicpg1252\\deff0\\deflang1033{\\fonttbl{\\f0\\fswiss\\fcharset0 Arial;}{\\f1\\fmodern\\fcharset0 Courier New;}}\n" + \
+         "{\\colortbl ;\\red255\\green0\\blue0;\\red0\\green0\\blue255;}\n" + \
+         "{\\*\\generator Msftedit 5.41.21.2510;}\\viewkind4\\uc1\\pard\\sa200\\sl276\\slmult1\\lang9\\f0\\fs22 "
+# A paragraph of the generated transcript, with the formatting Word typically produces
+PARAGRAPH = "\\pard\\li720\\ri360\\fi-360\\sb120\\sa120 {\\b Speaker 1:}\\b0  This is plain transcript text that goes on " + \
+            "for a while, with a caf\\'e9, a {\\cf1 red} word, \\i italic\\i0  and \\ul underlined\\ulnone  text, \\{braces\\} " + \
+            "and a \\\\ backslash.\\par\n\\pard\\qc\\f1\\fs24 (0:01:23.4) A centered line\\par\n"
+
+def BuildTranscript(size):
+    """ Build an RTF transcript of approximately size bytes """
+    return HEADER + PARAGRAPH * max(1, size / len(PARAGRAPH)) + "}\n"
+
+def TimeImport(txtCtrl, buf, repeat):
+    """ Import buf into txtCtrl repeat times.  Return the best time and the MD5 checksum of the resulting XML. """
+    bestTime = None
+    for x in range(repeat):
+        # Start with an empty control
+        txtCtrl.Clear()
+        startTime = time.time()
+        PyRTFParser.PyRichTextRTFHandler().LoadString(txtCtrl, buf, displayProgress=False)
+        elapsed = time.time() - startTime
+        if (bestTime == None) or (elapsed < bestTime):
+            bestTime = elapsed
+    # Get the XML representation of the control's contents
+    stream = cStringIO.StringIO()
+    richtext.RichTextXMLHandler().SaveStream(txtCtrl.GetBuffer(), stream)
+    return (bestTime, hashlib.md5(stream.getvalue()).hexdigest())
+
+def RunBenchmark(options, filenames):
+    """ Run the benchmark described by the options """
+    # Create a hidden frame holding a wxRichTextCtrl to import into
+    frame = wx.Frame(None)
+    txtCtrl = richtext.RichTextCtrl(frame)
+    txtCtrl.SetBasicStyle(richtext.RichTextAttr())
+    # Get the documents to import
+    documents = []
+    for filename in filenames:
+        f = open(filename, 'r')
+        documents.append((filename, f.read()))
+        f.close()
+    if len(documents) == 0:
+        documents.append(('(generated)', BuildTranscript(options.size)))
+
+    print "%-30s %10s %10s %14s  %s" % ('Document', 'Bytes', 'Seconds', 'Chars / sec', 'XML MD5')
+    for (name, buf) in documents:
+        (elapsed, checksum) = TimeImport(txtCtrl, buf, options.repeat)
+        print "%-30s %10d %10.2f %14.0f  %s" % (name[-30:], len(buf), elapsed, len(buf) / max(elapsed, 0.001), checksum)
+
+    frame.Destroy()
+
+
+if __name__ == '__main__':
+    parser = optparse.OptionParser(usage="usage: %prog [options] [file.rtf ...]")
+    parser.add_option('--size', type='int', default=2000000, help='approximate size of the generated transcript in bytes (default 2000000)')
+    parser.add_option('--repeat', type='int', default=3, help='number of times to repeat each import (default 3)')
+    (options, args) = parser.parse_args()
+
+    app = wx.App(False)
+    RunBenchmark(options, args)
@@ -38,6 +38,8 @@ import Collection
 import DataObject
 # import Transana's Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Dialogs
 import Dialogs
 # import Transana's Miscellaneous Functions
@@ -257,6 +259,55 @@ class Quote(DataObject.DataObject):
         # Close the database cursor
         c.close()
 
+    @classmethod
+    def load_many(cls, nums, skipText=False):
+        """ Load a list of Quotes, including their Keywords, using a constant number of database queries rather than
+            several queries per Quote.  Returns a dictionary of Quote objects keyed by Quote Number.  Quotes that
+            are not found in the database are left out. """
+        # If we're skipping the XML Text ...
+        if skipText:
+            # Define the query to load Quotes without text
+            query = """SELECT a.QuoteNum, QuoteID, a.CollectNum, CollectID, SourceDocumentNum, SortOrder, a.Comment,
+                              StartChar, EndChar,
+                              a.RecordLock, a.LockTime, LastSaveTime
+                         FROM Quotes2 a, QuotePositions2 b, Collections2 c
+                         WHERE a.QuoteNum IN (%s) AND
+                               a.QuoteNum = b.QuoteNum AND
+                               a.CollectNum = c.CollectNum
+                    """
+        # If we're NOT skipping the XML Text ...
+        else:
+            # Define the query to load Quotes with everything
+            query = """SELECT a.QuoteNum, QuoteID, a.CollectNum, CollectID, SourceDocumentNum, SortOrder, a.Comment,
+                              StartChar, EndChar,
+                              XMLText, a.RecordLock, a.LockTime, LastSaveTime
+                         FROM Quotes2 a, QuotePositions2 b, Collections2 c
+                         WHERE a.QuoteNum IN (%s) AND
+                               a.QuoteNum = b.QuoteNum AND
+                               a.CollectNum = c.CollectNum
+                    """
+        # Initialize the results dictionary
+        quotes = {}
+        # For each Quote record ...
+        for row in DBInterface.fetchall_named_by_nums(query, nums):
+            # ... create an empty Quote object ...
+            tempQuote = cls(skipText=skipText)
+            # ... load the data into the Quote object ...
+            tempQuote._load_row(row)
+            # ... set up data structures needed for editing large paragraphs ...
+            tempQuote.UpdateParagraphs()
+            # ... and add it to the results
+            quotes[tempQuote.number] = tempQuote
+        # Get the Keywords for all the Quotes
+        kwLists = DBInterface.dictionary_of_keyword_lists('Quote', quotes.keys())
+        # Add the Keywords to each Quote
+        for tempQuote in quotes.values():
+            tempQuote._kwlist = []
+            for (kwg, kw, example) in kwLists[tempQuote.number]:
+                tempQuote._kwlist.append(ClipKeywordObject.ClipKeyword(kwg, kw, quoteNum=tempQuote.number, example=example))
+        # Return the results
+        return quotes
+
     def UpdateParagraphs(self):
         """ This method divides XML text up into paragraphs, needed for editing LONG documents """
         # Initialize (or re-initialize) the paragraph pointers dictionary
@@ -524,6 +575,8 @@ class Quote(DataObject.DataObject):
             # Undo the database save transaction
             if use_transactions:
                 c.execute('ROLLBACK')
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
             # Close the Database Cursor
             c.close()
             # Complete the error prompt
@@ -582,6 +635,8 @@ class Quote(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e
@@ -592,6 +647,8 @@ class Quote(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 # Close the database cursor
                 c.close()
                 # unlock the record
@@ -699,6 +756,12 @@ class Quote(DataObject.DataObject):
         
         # ... lock the Transcript Record
         DataObject.DataObject.lock_record(self)
+
+    def _reload_if_changed(self, lastSaveTime):
+        """ Called by DataObject.LockRecords() once the record is locked.  If another user has saved the quote
+            since it was loaded, reload it. """
+        if lastSaveTime != self.lastsavetime:
+            self.db_load_by_num(self.number)
             
     def unlock_record(self):
         """ Override the DataObject Unlock Method """
@@ -0,0 +1,403 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" This module implements the Quote Position index used by Documents.
+
+    A Document's quote_dict maps Quote Numbers to (StartChar, EndChar) tuples.  QuotePositions
+    behaves like that dictionary, but it keeps the Quotes sorted by StartChar in a pair of segment
+    trees.  When the Document is edited, all of the Quotes after the edit are moved with a single
+    range update, and only the Quotes that overlap the edit are adjusted one at a time.  It can
+    also find the Quotes that contain a text position without looking at every Quote.
+
+    Adding or deleting Quotes puts the positions back into a plain dictionary, and the trees are
+    rebuilt the next time the Document is edited or searched, so loading many Quotes stays fast. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's UserDict module
+import UserDict
+
+
+class _OffsetTree(object):
+    """ A segment tree over a list of integers that supports adding an offset to a range of the values,
+        reading single values, and finding the values that are at least a given value. """
+
+    def __init__(self, values):
+        """ Build the tree from a list of values """
+        # Remember the number of values
+        self.size = len(values)
+        # _max holds the largest value in each node's range, including the node's own offset but not
+        # the offsets of the nodes above it.  _add holds the offset that applies to each node's whole range.
+        self._max = [0] * (4 * max(self.size, 1))
+        self._add = [0] * (4 * max(self.size, 1))
+        # If there are values ...
+        if self.size > 0:
+            # ... build the tree
+            self._build(1, 0, self.size, values)
+
+    def _build(self, node, nodeLo, nodeHi, values):
+        """ Build the part of the tree for values[nodeLo:nodeHi] """
+        if nodeHi - nodeLo == 1:
+            self._max[node] = values[nodeLo]
+        else:
+            mid = (nodeLo + nodeHi) / 2
+            self._build(2 * node, nodeLo, mid, values)
+            self._build(2 * node + 1, mid, nodeHi, values)
+            self._max[node] = max(self._max[2 * node], self._max[2 * node + 1])
+
+    def addRange(self, lo, hi, delta):
+        """ Add delta to values[lo:hi] """
+        if (lo < hi) and (delta != 0):
+            self._addRange(1, 0, self.size, lo, hi, delta)
+
+    def _addRange(self, node, nodeLo, nodeHi, lo, hi, delta):
+        """ Add delta to the part of values[lo:hi] that falls in this node's range """
+        # If this node's range is entirely inside the range being changed ...
+        if (lo <= nodeLo) and (nodeHi <= hi):
+            # ... the offset can be recorded here, without visiting the nodes below
+            self._add[node] += delta
+            self._max[node] += delta
+        else:
+            mid = (nodeLo + nodeHi) / 2
+            if lo < mid:
+                self._addRange(2 * node, nodeLo, mid, lo, hi, delta)
+            if hi > mid:
+                self._addRange(2 * node + 1, mid, nodeHi, lo, hi, delta)
+            self._max[node] = max(self._max[2 * node], self._max[2 * node + 1]) + self._add[node]
+
+    def get(self, index):
+        """ Return values[index] """
+        (node, nodeLo, nodeHi, offset) = (1, 0, self.size, 0)
+        # Walk down to the leaf, adding up the offsets along the way
+        while nodeHi - nodeLo > 1:
+            offset += self._add[node]
+            mid = (nodeLo + nodeHi) / 2
+            if index < mid:
+                (node, nodeHi) = (2 * node, mid)
+            else:
+                (node, nodeLo) = (2 * node + 1, mid)
+        return self._max[node] + offset
+
+    def set(self, index, value):
+        """ Set values[index] to value """
+        self.addRange(index, index + 1, value - self.get(index))
+
+    def firstAtLeast(self, value):
+        """ Return the index of the first value that is at least value, or size if there is none """
+        # If there is no such value, say so
+        if (self.size == 0) or (self._max[1] < value):
+            return self.size
+        (node, nodeLo, nodeHi, offset) = (1, 0, self.size, 0)
+        while nodeHi - nodeLo > 1:
+            offset += self._add[node]
+            mid = (nodeLo + nodeHi) / 2
+            # Go left if the left half holds a large enough value, otherwise go right
+            if self._max[2 * node] + offset >= value:
+                (node, nodeHi) = (2 * node, mid)
+            else:
+                (node, nodeLo) = (2 * node + 1, mid)
+        return nodeLo
+
+    def atLeast(self, lo, hi, value):
+        """ Return the indexes in the range [lo, hi) whose values are at least value, in order """
+        result = []
+        if (lo < hi) and (self.size > 0):
+            self._atLeast(1, 0, self.size, lo, hi, value, 0, result)
+        return result
+
+    def _atLeast(self, node, nodeLo, nodeHi, lo, hi, value, offset, result):
+        """ Add the indexes in this node's part of [lo, hi) whose values are at least value to result """
+        # If nothing in this node's range is large enough, we can skip it entirely
+        if self._max[node] + offset < value:
+            return
+        if nodeHi - nodeLo == 1:
+            result.append(nodeLo)
+        else:
+            offset += self._add[node]
+            mid = (nodeLo + nodeHi) / 2
+            if lo < mid:
+                self._atLeast(2 * node, nodeLo, mid, lo, hi, value, offset, result)
+            if hi > mid:
+                self._atLeast(2 * node + 1, mid, nodeHi, lo, hi, value, offset, result)
+
+    def values(self):
+        """ Return a list of all of the values """
+        result = []
+        if self.size > 0:
+            self._values(1, 0, self.size, 0, result)
+        return result
+
+    def _values(self, node, nodeLo, nodeHi, offset, result):
+        """ Add the values in this node's range to result """
+        if nodeHi - nodeLo == 1:
+            result.append(self._max[node] + offset)
+        else:
+            offset += self._add[node]
+            mid = (nodeLo + nodeHi) / 2
+            self._values(2 * node, nodeLo, mid, offset, result)
+            self._values(2 * node + 1, mid, nodeHi, offset, result)
+
+
+class QuotePositions(UserDict.DictMixin):
+    """ A dictionary of Quote Number : (StartChar, EndChar) for the Quotes in a Document, indexed by position """
+
+    def __init__(self, positions=None):
+        """ Initialize the Quote Positions, optionally from a dictionary of Quote positions """
+        # While the positions are not indexed, they are kept in a plain dictionary
+        self._positions = {}
+        # The index, when it has been built, is made up of the Quote Numbers in StartChar order, a dictionary
+        # of the index of each Quote Number, and trees of the StartChar and EndChar values in that order.
+        self._keys = None
+        self._index = None
+        self._starts = None
+        self._ends = None
+        # If positions were passed in ...
+        if positions != None:
+            # ... add them
+            self._positions.update(positions)
+
+    def _build(self):
+        """ Build the position index if it has not been built """
+        # If the positions are in the plain dictionary ...
+        if self._positions != None:
+            # ... sort the Quotes by StartChar
+            items = self._positions.items()
+            items.sort(key=lambda item: (item[1][0], item[0]))
+            # Build the index
+            self._keys = [key for (key, (startChar, endChar)) in items]
+            self._index = dict([(self._keys[index], index) for index in range(len(self._keys))])
+            self._starts = _OffsetTree([startChar for (key, (startChar, endChar)) in items])
+            self._ends = _OffsetTree([endChar for (key, (startChar, endChar)) in items])
+            # The index now holds the positions
+            self._positions = None
+
+    def _release(self):
+        """ Move the positions from the index back to the plain dictionary """
+        # If the index has been built ...
+        if self._positions == None:
+            # ... move the positions to the plain dictionary ...
+            self._positions = dict(self.items())
+            # ... and drop the index
+            self._keys = None
+            self._index = None
+            self._starts = None
+            self._ends = None
+
+    def __getitem__(self, quoteNum):
+        if self._positions != None:
+            return self._positions[quoteNum]
+        index = self._index[quoteNum]
+        return (self._starts.get(index), self._ends.get(index))
+
+    def __setitem__(self, quoteNum, (startChar, endChar)):
+        # If the index has been built and already holds this Quote ...
+        if (self._positions == None) and self._index.has_key(quoteNum):
+            index = self._index[quoteNum]
+            # ... and the Quote's new StartChar keeps the Quotes in order ...
+            if ((index == 0) or (self._starts.get(index - 1) <= startChar)) and \
+               ((index == len(self._keys) - 1) or (startChar <= self._starts.get(index + 1))):
+                # ... then we can update the index directly
+                self._starts.set(index, startChar)
+                self._ends.set(index, endChar)
+                return
+        # Otherwise, update the plain dictionary
+        self._release()
+        self._positions[quoteNum] = (startChar, endChar)
+
+    def __delitem__(self, quoteNum):
+        self._release()
+        del(self._positions[quoteNum])
+
+    def keys(self):
+        if self._positions != None:
+            return self._positions.keys()
+        return list(self._keys)
+
+    def items(self):
+        if self._positions != None:
+            return self._positions.items()
+        return zip(self._keys, zip(self._starts.values(), self._ends.values()))
+
+    def has_key(self, quoteNum):
+        if self._positions != None:
+            return self._positions.has_key(quoteNum)
+        return self._index.has_key(quoteNum)
+
+    __contains__ = has_key
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        if self._positions != None:
+            return len(self._positions)
+        return len(self._keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def AdjustPositions(self, selStart, selEnd, sizeChange):
+        """ Adjust the Quote positions for an edit that replaced the text from selStart to selEnd and changed the
+            length of the Document by sizeChange.  If there was no selection, selStart and selEnd are both the
+            cursor position, and a negative sizeChange means the text from the cursor position to
+            selStart - sizeChange was deleted. """
+        # A deletion with no selection is the same as deleting the text that followed the cursor
+        if (selStart == selEnd) and (sizeChange < 0):
+            selEnd = selStart - sizeChange
+        # Make sure the index has been built
+        self._build()
+        # Find the first Quote that starts at or after the start of the selection, and
+        # the first Quote that starts at or after the end of the selection
+        inIndex = self._starts.firstAtLeast(selStart)
+        afterIndex = self._starts.firstAtLeast(selEnd)
+        # Quotes that start at or after the end of the selection move by the change in size.  (Their ends
+        # are after the selection too.)
+        self._starts.addRange(afterIndex, len(self._keys), sizeChange)
+        self._ends.addRange(afterIndex, len(self._keys), sizeChange)
+        # Quotes that start inside the selection now start at the start of the selection
+        for index in range(inIndex, afterIndex):
+            self._starts.set(index, selStart)
+            self._ends.set(index, self._AdjustEnd(selStart, self._ends.get(index), selStart, selEnd, sizeChange))
+        # Quotes that start before the selection only need adjusting if they end in or after the selection
+        for index in self._ends.atLeast(0, inIndex, selStart):
+            self._ends.set(index, self._AdjustEnd(self._starts.get(index), self._ends.get(index), selStart, selEnd, sizeChange))
+        # If the replacement text is shorter than the selection by more than the selection's length, the Quotes
+        # after the selection can move in front of Quotes that started earlier.  If so, re-sort the index.
+        if (0 < afterIndex < len(self._keys)) and (self._starts.get(afterIndex) < self._starts.get(afterIndex - 1)):
+            self._release()
+
+    def _AdjustEnd(self, startChar, endChar, selStart, selEnd, sizeChange):
+        """ Return the adjusted EndChar of a Quote that starts at startChar for an edit of the selection """
+        # If the Quote End is at or after the Selection End ...
+        # (We *MUST* maintain a quote size of at least one character!!)
+        if (endChar >= selEnd) and (endChar - startChar > 1):
+            # ... adjust the end position by the change in size
+            return endChar + sizeChange
+        # ELSE if the Quote End is INSIDE the Selection ...
+        elif (endChar >= selStart) and (endChar < selEnd):
+            # ... the Quote now ends at the end of the replacement text
+            return selEnd + sizeChange
+        return endChar
+
+    def QuotesContaining(self, textPos=-1, textSel=(-2, -2)):
+        """ Return the Quote Numbers of the Quotes that contain the text position textPos or overlap the text
+            selection textSel, in StartChar order.  This matches the test DBInterface.list_of_quotes_by_document()
+            uses.  If neither textPos nor textSel is given, all Quote Numbers are returned. """
+        # A text position is treated as an empty selection
+        if (textPos != -1) and (textSel == (-2, -2)):
+            textSel = (textPos, textPos)
+        # Make sure the index has been built
+        self._build()
+        # If there is no position or selection, return all the Quotes
+        if textSel == (-2, -2):
+            return list(self._keys)
+        (selStart, selEnd) = textSel
+        # Quotes that start before the selection and end after the selection start
+        indexes = set(self._ends.atLeast(0, self._starts.firstAtLeast(selStart), selStart + 1))
+        # Quotes that fall entirely inside the selection
+        for index in range(self._starts.firstAtLeast(selStart), self._starts.firstAtLeast(selEnd + 1)):
+            if self._ends.get(index) <= selEnd:
+                indexes.add(index)
+        # Quotes that start before the selection end and end after the selection end
+        indexes.update(self._ends.atLeast(0, self._starts.firstAtLeast(selEnd), selEnd + 1))
+        # Return the Quote Numbers in StartChar order
+        indexes = list(indexes)
+        indexes.sort()
+        return [self._keys[index] for index in indexes]
+
+
+if __name__ == '__main__':
+    # import Python's optparse module
+    import optparse
+    # import Python's random module
+    import random
+
+    parser = optparse.OptionParser(usage="usage: %prog [options]")
+    parser.add_option('--quotes', type='int', default=200, help='number of Quotes in the Document (default 200)')
+    parser.add_option('--edits', type='int', default=2000, help='number of edits to make (default 2000)')
+    (options, args) = parser.parse_args()
+
+    def BruteForceAdjust(positions, selStart, selEnd, sizeChange):
+        """ Adjust a plain dictionary of Quote positions for an edit one Quote at a time """
+        # A deletion with no selection deletes the text that followed the cursor
+        if (selStart == selEnd) and (sizeChange < 0):
+            selEnd = selStart - sizeChange
+        result = {}
+        for (key, (startChar, endChar)) in positions.items():
+            # Quotes after the edit move as a whole
+            if startChar >= selEnd:
+                result[key] = (startChar + sizeChange, endChar + sizeChange)
+                continue
+            elif startChar >= selStart:
+                startChar = selStart
+            if (endChar >= selEnd) and (endChar - startChar > 1):
+                endChar += sizeChange
+            elif (endChar >= selStart) and (endChar < selEnd):
+                endChar = selEnd + sizeChange
+            result[key] = (startChar, endChar)
+        return result
+
+    def BruteForceContaining(positions, textPos):
+        """ Return the set of Quote Numbers of the Quotes that contain textPos, using the test from
+            DBInterface.list_of_quotes_by_document() """
+        return set([key for (key, (startChar, endChar)) in positions.items()
+                    if ((startChar < textPos) and (endChar > textPos)) or ((startChar >= textPos) and (endChar <= textPos))])
+
+    def CheckContaining(quotes, positions, textPos):
+        """ Check that QuotesContaining() finds the right Quotes, in StartChar order.  (The order of Quotes with
+            the same StartChar is not defined.) """
+        result = quotes.QuotesContaining(textPos)
+        starts = [positions[key][0] for key in result]
+        return (set(result) == BruteForceContaining(positions, textPos)) and (starts == sorted(starts))
+
+    # Deleting 10 characters with no selection, where the deleted text holds the start of Quote 2 and part of
+    # Quote 1.  Quote 1 gets shorter, Quote 2 must now start at the cursor position, and Quote 3 moves back.
+    quotes = QuotePositions({1 : (5, 30), 2 : (12, 40), 3 : (50, 60)})
+    quotes.AdjustPositions(10, 10, -10)
+    positions = {1 : (5, 20), 2 : (10, 30), 3 : (40, 50)}
+    success = (dict(quotes.items()) == positions)
+    for textPos in range(60):
+        success = success and CheckContaining(quotes, positions, textPos)
+
+    # Random insertions and deletions, with and without a selection, checked against the brute force versions
+    random.seed(0)
+    length = 10000
+    positions = {}
+    for quoteNum in range(1, options.quotes + 1):
+        startChar = random.randint(0, length - 2)
+        positions[quoteNum] = (startChar, random.randint(startChar + 1, min(startChar + 500, length)))
+    quotes = QuotePositions(positions)
+    for x in range(options.edits):
+        selStart = random.randint(0, length)
+        if random.random() < 0.5:
+            # An insertion or deletion at the cursor position
+            selEnd = selStart
+            sizeChange = random.choice([random.randint(1, 20), -random.randint(1, min(20, length - selStart + 1))])
+        else:
+            # A selection replaced by shorter or longer text
+            selEnd = min(selStart + random.randint(1, 20), length)
+            sizeChange = random.randint(-(selEnd - selStart), 20)
+        positions = BruteForceAdjust(positions, selStart, selEnd, sizeChange)
+        quotes.AdjustPositions(selStart, selEnd, sizeChange)
+        length += sizeChange
+        textPos = random.randint(0, length)
+        if (dict(quotes.items()) != positions) or not CheckContaining(quotes, positions, textPos):
+            print "Mismatch after edit %d:  AdjustPositions(%d, %d, %d)" % (x + 1, selStart, selEnd, sizeChange)
+            success = False
+            break
+
+    print "%d Quotes, %d edits" % (options.quotes, options.edits)
+    print "Match:         %s" % success
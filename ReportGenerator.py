@@ -64,7 +64,9 @@ import Quote
 import Library
 # import Transana's Snapshot Object
 import Snapshot
-# Import Transana's Snapshot Window for loading images
+# import Transana's Snapshot Renderer for loading images
+import SnapshotRenderer
+# Import Transana's Snapshot Window
 import SnapshotWindow
 # Import Transana's Text Report infrastructure
 import TextReport
@@ -72,13 +74,16 @@ import TextReport
 import TransanaConstants
 # import Transana's Exceptions
 import TransanaExceptions
-# import Transana's Global variables
-import TransanaGlobal
 # import Transana's Transcript Object
 import Transcript
 # import Transana's Transcript Editor - Rich Text Ctrl version
 import TranscriptEditor_RTC
 
+# The largest Snapshot images for Full, Medium, and Small sizes (showSnapshotImage 0, 1, and 2)
+SNAPSHOT_IMAGE_SIZES = {0 : None, 1 : 500, 2 : 250}
+# The number of Quotes, Clips, and Snapshots loaded from the database at one time as the report is assembled
+PREFETCH_CHUNK_SIZE = 100
+
 
 class ReportGenerator(wx.Object):
     """ This class creates and displays the Object Reports, formerly the Keyword Usage Report and the Collection Summary Report """
@@ -929,6 +934,22 @@ class ReportGenerator(wx.Object):
                 #     behind Transana!)
                 progress = wx.ProgressDialog(self.title, _('Assembling report contents'), parent=self.report)
 
+            # If we have Collection-based data ...
+            if (self.collection != None) or ((self.searchColl != None) and (self.treeCtrl != None)):
+                # ... prepare to load the Quotes, Clips, and Snapshots that pass the report's filters in bulk.
+                # (The filter comparison is based on Clip data here.  Sets make the comparisons fast.)
+                filterSet = set(self.filterList)
+                quoteFilterSet = set(self.quoteFilterList)
+                snapshotFilterSet = set(self.snapshotFilterList)
+                self.PrefetchObjects([(objType, groupNo) for (objType, groupNo, group, parentCollNo) in majorList
+                                      if ((objType == 'Snapshot') and ((group, parentCollNo, True) in snapshotFilterSet)) or \
+                                         ((objType == 'Quote') and ((group, parentCollNo, True) in quoteFilterSet)) or \
+                                         ((group, parentCollNo, True) in filterSet)])
+            # If not ...
+            else:
+                # ... there's nothing to load
+                self.PrefetchObjects([])
+
             # Iterate through the major list
             for (objType, groupNo, group, parentCollNo) in majorList:
 
@@ -977,7 +998,7 @@ class ReportGenerator(wx.Object):
                     # If we have Collection-based data ...
                     if (self.collection != None) or ((self.searchColl != None) and (self.treeCtrl != None)):
                         # ... load the collection the current clip is in
-                        tempColl = Collection.Collection(parentCollNo)
+                        tempColl = self.GetCollection(parentCollNo)
 
                         # Check to see if we're showing Collection headers, if we're showing nested collections (since
                         # there's no point showing collection headers if there aren't different collections!), and
@@ -1100,7 +1121,7 @@ class ReportGenerator(wx.Object):
                         # If we're looking at a Quote ...
                         if objType == 'Quote':
                             # Get the full Quote data
-                            quoteObj = Quote.Quote(groupNo)
+                            quoteObj = self.GetReportObject('Quote', groupNo)
                             tmpObj = quoteObj
                             try:
                                 # If we have a Quote, load the Source Document!
@@ -1110,12 +1131,12 @@ class ReportGenerator(wx.Object):
                         # If we're looking at a Clip ...
                         elif objType == 'Clip':
                             # Get the full Clip data
-                            clipObj = Clip.Clip(groupNo)
+                            clipObj = self.GetReportObject('Clip', groupNo)
                             tmpObj = clipObj
                         # If we're looking at a Snapshot ...
                         elif objType == 'Snapshot':
                             # Get the full Snapshot data
-                            snapshotObj = Snapshot.Snapshot(groupNo, suppressEpisodeError = True)
+                            snapshotObj = self.GetReportObject('Snapshot', groupNo)
                             tmpObj = snapshotObj
                         # If we're supposed to show the Media File Name ...
                         if self.showFile:
@@ -1314,7 +1335,7 @@ class ReportGenerator(wx.Object):
                                             if tr.source_transcript > 0:
                                                 # ... try to load that source transcript
                                                 # To save time here, we can skip loading the actual transcript text, which can take time once we start dealing with images!
-                                                episodeTranscriptObj = Transcript.Transcript(tr.source_transcript, skipText=True)
+                                                episodeTranscriptObj = self.GetSourceTranscript(tr.source_transcript)
                                         # if the record is not found (orphaned Clip)
                                         except TransanaExceptions.RecordNotFoundError:
                                             # We don't need to do anything.
@@ -1422,17 +1443,10 @@ class ReportGenerator(wx.Object):
                         if (objType == 'Snapshot') and (self.showSnapshotImage in [0, 1, 2]):
                             # Start Exception Handling
                             try:
-                                # Open a HIDDEN Snapshot Window
-                                tmpSnapshotWindow = SnapshotWindow.SnapshotWindow(TransanaGlobal.menuWindow, -1, tmpObj.id, tmpObj, showWindow=False)
-                                # Get the cropped, coded image from the Snapshot Window
-                                tmpBMP = tmpSnapshotWindow.CopyBitmap()
-                                # Close the hidden Snapshot Window
-                                tmpSnapshotWindow.Close()
-                                # Explicitly Delete the Temporary Snapshot Window
-                                tmpSnapshotWindow.Destroy()
+                                # Get the cropped, coded image, rendered at the size the report needs.  (This doesn't require a
+                                # Snapshot Window, and the Snapshot Renderer caches the results.)
+                                tmpImage = SnapshotRenderer.RenderSnapshot(tmpObj, SNAPSHOT_IMAGE_SIZES[self.showSnapshotImage])
                                 
-                                # Convert the Bitmap to an Image so it can be rescaled
-                                tmpImage = tmpBMP.ConvertToImage()
                                 # Get the Image Size
                                 (imgWidth, imgHeight) = tmpImage.GetSize()
                                 # We need the SMALLER of the current image size and the current Transcript Window size
@@ -1465,9 +1479,8 @@ class ReportGenerator(wx.Object):
                                     reportText.SetTxtStyle(parLeftIndent = 0, parSpacingBefore = 24, parSpacingAfter = 24)
                                 # Add the image to the transcript
                                 reportText.WriteImage(tmpImage)
-                                # Delete the temporary image, bitmap, and device contexts
+                                # Delete the temporary image
                                 tmpImage.Destroy()
-                                tmpBMP.Destroy()
                                 # Add some more blank space.
                                 reportText.WriteText('\n')
                                 # Reset the Paragraph Spacing here
@@ -1904,33 +1917,33 @@ class ReportGenerator(wx.Object):
                 except:
                     tmpDoc = None
 
+            # Prepare to load the Quotes, Clips, and Snapshots that pass the report's filters in bulk.  (Sets make the
+            # filter comparisons fast.)
+            filterSets = {'Quote' : set(self.quoteFilterList), 'Clip' : set(self.filterList), 'Snapshot' : set(self.snapshotFilterList)}
+            self.PrefetchObjects([(itemRecord['Type'], itemRecord['%sNum' % itemRecord['Type']]) for itemRecord in majorList
+                                  if filterSets.has_key(itemRecord['Type']) and \
+                                     ((itemRecord['%sID' % itemRecord['Type']], itemRecord['CollectNum'], True) in filterSets[itemRecord['Type']])])
+
             # Iterate through the major list
             for itemRecord in majorList:
                 if itemRecord['Type'] == 'Quote':
                     # our Filter comparison is based on Quote data
                     filterVal = (itemRecord['QuoteID'], itemRecord['CollectNum'], True)
-                    filterList = self.quoteFilterList
                     prompt = _('Quote')
-                    # Load the Quote Object
-                    tmpObj = Quote.Quote(num=itemRecord['QuoteNum'])
                 elif itemRecord['Type'] == 'Clip':
                     # our Filter comparison is based on Clip data
                     filterVal = (itemRecord['ClipID'], itemRecord['CollectNum'], True)
-                    filterList = self.filterList
                     prompt = _('Clip')
-                    # Load the Clip Object
-                    tmpObj = Clip.Clip(itemRecord['ClipNum'])
                 elif itemRecord['Type'] == 'Snapshot':
                     # our Filter comparison is based on Clip data
                     filterVal = (itemRecord['SnapshotID'], itemRecord['CollectNum'], True)                    
-                    filterList = self.snapshotFilterList
                     prompt = _('Snapshot')
-                    # Load the Snapshot Object
-                    tmpObj = Snapshot.Snapshot(itemRecord['SnapshotNum'], suppressEpisodeError = True)
                 # now that we have the filter comparison data, we see if it's actually in the Filter List.
-                if filterVal in filterList:
+                if filterVal in filterSets.get(itemRecord['Type'], ()):
+                    # Load the Quote, Clip, or Snapshot Object
+                    tmpObj = self.GetReportObject(itemRecord['Type'], itemRecord['%sNum' % itemRecord['Type']])
                     # First, load the collection the current clip is in
-                    collectionObj = Collection.Collection(itemRecord['CollectNum'])
+                    collectionObj = self.GetCollection(itemRecord['CollectNum'])
                     # Set the font for the heading.
                     reportText.SetTxtStyle(fontSize = 12, fontBold = True)
                     reportText.SetTxtStyle(parAlign = wx.TEXT_ALIGNMENT_LEFT,
@@ -2162,7 +2175,7 @@ class ReportGenerator(wx.Object):
                                         if tr.source_transcript > 0:
                                             # ... try to load that source transcript
                                             # To save time here, we can skip loading the actual transcript text, which can take time once we start dealing with images!
-                                            episodeTranscriptObj = Transcript.Transcript(tr.source_transcript, skipText=True)
+                                            episodeTranscriptObj = self.GetSourceTranscript(tr.source_transcript)
                                     # if the record is not found (orphaned Clip)
                                     except TransanaExceptions.RecordNotFoundError:
                                         # We don't need to do anything.
@@ -2272,17 +2285,10 @@ class ReportGenerator(wx.Object):
                     # If we have a Snapshot, and we're displaying Full, Medium, or Small images, show the actual IMAGE
                     if (itemRecord['Type'] == 'Snapshot') and (self.showSnapshotImage in [0, 1, 2]):
                         try:
-                            # Open a HIDDEN Snapshot Window
-                            tmpSnapshotWindow = SnapshotWindow.SnapshotWindow(TransanaGlobal.menuWindow, -1, tmpObj.id, tmpObj, showWindow=False)
-                            # Get the cropped, coded image from the Snapshot Window
-                            tmpBMP = tmpSnapshotWindow.CopyBitmap()
-                            # Close the hidden Snapshot Window
-                            tmpSnapshotWindow.Close()
-                            # Explicitly Delete the Temporary Snapshot Window
-                            tmpSnapshotWindow.Destroy()
-
-                            # Convert the Bitmap to an Image so it can be rescaled
-                            tmpImage = tmpBMP.ConvertToImage()
+                            # Get the cropped, coded image, rendered at the size the report needs.  (This doesn't require a
+                            # Snapshot Window, and the Snapshot Renderer caches the results.)
+                            tmpImage = SnapshotRenderer.RenderSnapshot(tmpObj, SNAPSHOT_IMAGE_SIZES[self.showSnapshotImage])
+
                             # Get the Image Size
                             (imgWidth, imgHeight) = tmpImage.GetSize()
                             # We need the SMALLER of the current image size and the current Transcript Window size
@@ -2316,9 +2322,8 @@ class ReportGenerator(wx.Object):
                                 reportText.SetTxtStyle(parLeftIndent = 0, parSpacingBefore = 24, parSpacingAfter = 24)
                             # Add the image to the transcript
                             reportText.WriteImage(tmpImage)
-                            # Delete the temporary image, bitmap, and device contexts
+                            # Delete the temporary image
                             tmpImage.Destroy()
-                            tmpBMP.Destroy()
                             # Add some more blank space.
                             reportText.WriteText('\n')
                             # Reset the Paragraph Spacing here
@@ -2755,6 +2760,87 @@ class ReportGenerator(wx.Object):
         # Make the control read only, now that it's done
         reportText.SetReadOnly(True)
 
+    def PrefetchObjects(self, items):
+        """ Prepare to load the Quotes, Clips, and Snapshots included in the report, and the Source Transcripts of
+            the Clips, in bulk rather than one at a time.  items is the list of (objType, objNum) tuples that pass
+            the report's filters, in report order.  The objects are loaded PREFETCH_CHUNK_SIZE at a time as the
+            report reaches them, so only one chunk is held in memory. """
+        # Remember the items, and the position of each in the list
+        self.prefetchItems = items
+        self.prefetchPositions = {}
+        for index in range(len(items) - 1, -1, -1):
+            self.prefetchPositions[items[index]] = index
+        # Start with empty object caches
+        self.prefetchedObjects = {}
+        self.prefetchedTranscripts = {}
+        self.prefetchedCollections = {}
+
+    def PrefetchChunk(self, start):
+        """ Load the chunk of report objects starting at position start in the prefetch list, replacing the
+            previous chunk """
+        items = self.prefetchItems[start:start + PREFETCH_CHUNK_SIZE]
+        self.prefetchedObjects = {}
+        # Load the Quotes.  We only need the Quote Text if the report shows it.
+        for (objNum, obj) in Quote.Quote.load_many([objNum for (objType, objNum) in items if objType == 'Quote'],
+                                                   skipText = not self.showQuoteText).items():
+            self.prefetchedObjects[('Quote', objNum)] = obj
+        # Load the Clips.  We need the Clip Transcripts for Source Information, but only need their text if the
+        # report shows the Clip Transcripts.
+        clips = Clip.Clip.load_many([objNum for (objType, objNum) in items if objType == 'Clip'],
+                                    skipText = not (self.showTranscripts or self.showSourceInfo),
+                                    skipTranscriptText = not self.showTranscripts)
+        for (objNum, obj) in clips.items():
+            self.prefetchedObjects[('Clip', objNum)] = obj
+        # Load the Snapshots
+        for (objNum, obj) in Snapshot.Snapshot.load_many([objNum for (objType, objNum) in items if objType == 'Snapshot'],
+                                                         suppressEpisodeError = True).items():
+            self.prefetchedObjects[('Snapshot', objNum)] = obj
+        # If we're supposed to show Source Information ...
+        if self.showSourceInfo:
+            # ... load the Clips' Source Transcripts.  (We don't need the text for these.)
+            sourceTranscripts = []
+            for clipObj in clips.values():
+                sourceTranscripts += [tr.source_transcript for tr in clipObj.transcripts if tr.source_transcript > 0]
+            self.prefetchedTranscripts = Transcript.Transcript.load_many(sourceTranscripts, skipText=True)
+        else:
+            self.prefetchedTranscripts = {}
+
+    def GetReportObject(self, objType, objNum):
+        """ Get a Quote, Clip, or Snapshot for the report, loading it if it wasn't prefetched """
+        # If the object is in the prefetch list but its chunk isn't loaded, load the chunk that starts with it
+        if (not self.prefetchedObjects.has_key((objType, objNum))) and self.prefetchPositions.has_key((objType, objNum)):
+            self.PrefetchChunk(self.prefetchPositions[(objType, objNum)])
+        # If the object was prefetched ...
+        if self.prefetchedObjects.has_key((objType, objNum)):
+            # ... return it
+            return self.prefetchedObjects[(objType, objNum)]
+        # Otherwise, load the object, which raises RecordNotFoundError if the object doesn't exist
+        elif objType == 'Quote':
+            return Quote.Quote(num=objNum)
+        elif objType == 'Clip':
+            return Clip.Clip(objNum)
+        elif objType == 'Snapshot':
+            return Snapshot.Snapshot(objNum, suppressEpisodeError = True)
+
+    def GetSourceTranscript(self, transcriptNum):
+        """ Get a Clip's Source Transcript, without text, loading it if it wasn't prefetched """
+        # If the Transcript was prefetched ...
+        if self.prefetchedTranscripts.has_key(transcriptNum):
+            # ... return it
+            return self.prefetchedTranscripts[transcriptNum]
+        # Otherwise, load the Transcript, which raises RecordNotFoundError if the Transcript doesn't exist
+        else:
+            return Transcript.Transcript(transcriptNum, skipText=True)
+
+    def GetCollection(self, collectionNum):
+        """ Get a Collection for the report.  Each Collection is only loaded once per report. """
+        # If the Collection hasn't been loaded yet ...
+        if not self.prefetchedCollections.has_key(collectionNum):
+            # ... load it
+            self.prefetchedCollections[collectionNum] = Collection.Collection(collectionNum)
+        # Return the Collection
+        return self.prefetchedCollections[collectionNum]
+
     def OnFilter(self, event):
         """ This method, required by TextReport, implements the call to the Filter Dialog.  It needs to be
             in the report parent because the TextReport doesn't know the appropriate filter parameters. """
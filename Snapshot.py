@@ -32,6 +32,8 @@ import Collection
 import DataObject
 # Import the Transana Database Interface
 import DBInterface
+# import Transana's in-memory Keyword Index
+import KeywordIndex
 # import Transana's Dialogs
 import Dialogs
 # Import Transana's Episode Object
@@ -245,6 +247,121 @@ class Snapshot(DataObject.DataObject):
 ##        tmpDlg.ShowModal()
 ##        tmpDlg.Destroy()
 
+    @classmethod
+    def load_many(cls, nums, suppressEpisodeError=False):
+        """ Load a list of Snapshots, including their Keywords, Coding Objects, and Keyword Styles, using a constant
+            number of database queries rather than several queries per Snapshot.  Returns a dictionary of Snapshot
+            objects keyed by Snapshot Number.  Snapshots that are not found in the database are left out. """
+        # Craft a query to get the Snapshot data
+        query = """
+        SELECT *
+          FROM Snapshots2 a
+          WHERE a.SnapshotNum IN (%s)
+        """
+        # Initialize the results dictionary
+        snapshots = {}
+        # For each Snapshot record ...
+        for row in DBInterface.fetchall_named_by_nums(query, nums):
+            # ... create an empty Snapshot object ...
+            tempSnapshot = cls(suppressEpisodeError=suppressEpisodeError)
+            # ... load the data into the Snapshot object ...
+            tempSnapshot._load_row(row)
+            # ... start with an empty Keyword list ...
+            tempSnapshot._kwlist = []
+            # ... and add it to the results
+            snapshots[tempSnapshot.number] = tempSnapshot
+
+        # Get the Keywords for all the Snapshots
+        kwLists = DBInterface.dictionary_of_keyword_lists('Snapshot', snapshots.keys())
+        # Add the Keywords to each Snapshot
+        for tempSnapshot in snapshots.values():
+            for (kwg, kw, example) in kwLists[tempSnapshot.number]:
+                tempSnapshot._kwlist.append(ClipKeywordObject.ClipKeyword(kwg, kw, snapshotNum=tempSnapshot.number))
+
+        # Create a Query to get the codingObjects for all the Snapshots
+        query = """ SELECT SnapshotNum, KeywordGroup, Keyword, x1, y1, x2, y2, visible
+                      FROM SnapshotKeywords2
+                      WHERE SnapshotNum IN (%s) """
+        # Put the results into the Snapshot Objects
+        for row in DBInterface.fetchall_named_by_nums(query, snapshots.keys()):
+            tempSnapshot = snapshots[row['SnapshotNum']]
+            # The counter for each Snapshot is the number of Coding Objects loaded so far
+            tempSnapshot.codingObjects[len(tempSnapshot.codingObjects)] = \
+                {'x1'             :  row['x1'],
+                 'y1'             :  row['y1'],
+                 'x2'             :  row['x2'],
+                 'y2'             :  row['y2'],
+                 'keywordGroup'   :  DBInterface.ProcessDBDataForUTF8Encoding(row['KeywordGroup']),
+                 'keyword'        :  DBInterface.ProcessDBDataForUTF8Encoding(row['Keyword']),
+                 'visible'        :  row['visible'] == '1'}
+
+        # Create a Query to get the keywordStyles for all the Snapshots
+        query = """ SELECT SnapshotNum, KeywordGroup, Keyword, DrawMode, LineColorName, LineColorDef, LineWidth, LineStyle
+                      FROM SnapshotKeywordStyles2
+                      WHERE SnapshotNum IN (%s) """
+        # Put the results into the Snapshot Objects
+        for row in DBInterface.fetchall_named_by_nums(query, snapshots.keys()):
+            snapshots[row['SnapshotNum']].keywordStyles[(DBInterface.ProcessDBDataForUTF8Encoding(row['KeywordGroup']),
+                                                         DBInterface.ProcessDBDataForUTF8Encoding(row['Keyword']))] = \
+                { 'drawMode'       :  row['DrawMode'],
+                  'lineColorName'  :  DBInterface.ProcessDBDataForUTF8Encoding(row['LineColorName']),
+                  'lineColorDef'   :  row['LineColorDef'],
+                  'lineWidth'      :  "%d" % row['LineWidth'],
+                  'lineStyle'      :  row['LineStyle']  }
+
+        # Get the Collection IDs for all the Snapshots
+        query = "SELECT CollectNum, CollectID FROM Collections2 WHERE CollectNum IN (%s)"
+        collections = {}
+        for row in DBInterface.fetchall_named_by_nums(query, [tempSnapshot.collection_num for tempSnapshot in snapshots.values()]):
+            collections[row['CollectNum']] = DBInterface.ProcessDBDataForUTF8Encoding(row['CollectID'])
+        # Get the Episode IDs and Library information for all the Snapshots
+        query = """SELECT a.EpisodeNum, a.EpisodeID, a.SeriesNum, b.SeriesID FROM Episodes2 a, Series2 b
+                     WHERE a.EpisodeNum IN (%s) AND
+                           a.SeriesNum = b.SeriesNum"""
+        episodes = {}
+        for row in DBInterface.fetchall_named_by_nums(query, [tempSnapshot.episode_num for tempSnapshot in snapshots.values()]):
+            episodes[row['EpisodeNum']] = (DBInterface.ProcessDBDataForUTF8Encoding(row['EpisodeID']),
+                                           row['SeriesNum'],
+                                           DBInterface.ProcessDBDataForUTF8Encoding(row['SeriesID']))
+        # Get the Transcript IDs for all the Snapshots
+        query = "SELECT TranscriptNum, TranscriptID FROM Transcripts2 WHERE TranscriptNum IN (%s)"
+        transcripts = {}
+        for row in DBInterface.fetchall_named_by_nums(query, [tempSnapshot.transcript_num for tempSnapshot in snapshots.values()]):
+            transcripts[row['TranscriptNum']] = DBInterface.ProcessDBDataForUTF8Encoding(row['TranscriptID'])
+
+        # Synchronize the Collection, Episode, and Transcript properties for each Snapshot
+        for tempSnapshot in snapshots.values():
+            # If the Collection, Episode, or Transcript could not be found ...
+            if ((tempSnapshot.collection_num > 0) and (not collections.has_key(tempSnapshot.collection_num))) or \
+               ((tempSnapshot.episode_num > 0) and (not episodes.has_key(tempSnapshot.episode_num))) or \
+               ((tempSnapshot.episode_num > 0) and (tempSnapshot.transcript_num > 0) and \
+                (not transcripts.has_key(tempSnapshot.transcript_num))):
+                # ... let _sync_snapshot() handle it the usual way
+                tempSnapshot._sync_snapshot()
+                continue
+            # If there is a Collection Number, grab the Collection ID
+            if tempSnapshot.collection_num > 0:
+                tempSnapshot.collection_id = collections[tempSnapshot.collection_num]
+            # If there is an Episode Number ...
+            if tempSnapshot.episode_num > 0:
+                # ... get the Episode ID and the Library Information
+                (tempSnapshot.episode_id, tempSnapshot.series_num, tempSnapshot.series_id) = episodes[tempSnapshot.episode_num]
+                # If there's a Transcript, get the Transcript ID
+                if tempSnapshot.transcript_num > 0:
+                    tempSnapshot.transcript_id = transcripts[tempSnapshot.transcript_num]
+            # If there is no Episode Number ...
+            else:
+                # ... then there's no Episode ID ...
+                tempSnapshot.episode_id = ''
+                # ... and there's no Library number or ID
+                tempSnapshot.series_num = 0
+                tempSnapshot.series_id = ''
+                # There can't be start and duration information either
+                tempSnapshot.episode_start = 0
+                tempSnapshot.episode_duration = 0
+        # Return the results
+        return snapshots
+
     def db_load_by_name(self, name, collNum):
         """Load a record by Name and Parent Collection Number."""
         self.clear()
@@ -544,6 +661,8 @@ class Snapshot(DataObject.DataObject):
             if use_transactions:
                 # Undo the database save transaction
                 c.execute('ROLLBACK')
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
             # Close the Database Cursor
             c.close()
             # Complete the error prompt
@@ -659,6 +778,8 @@ class Snapshot(DataObject.DataObject):
                 if use_transactions:
                     # Undo the database save transaction
                     c.execute('ROLLBACK')
+                    # Undo the transaction's changes to the in-memory Keyword Index
+                    KeywordIndex.Rollback()
                 # Close the Database Cursor
                 c.close()
                 # Complete the error prompt
@@ -719,6 +840,8 @@ class Snapshot(DataObject.DataObject):
                 # c (the database cursor) only exists if the record lock was obtained!
                 # We must roll back the transaction before we unlock the record.
                 c.execute("ROLLBACK")
+                # Undo the transaction's changes to the in-memory Keyword Index
+                KeywordIndex.Rollback()
                 c.close()
                 self.unlock_record()
             raise e
@@ -762,6 +885,12 @@ class Snapshot(DataObject.DataObject):
         # ... lock the Transcript Record
         DataObject.DataObject.lock_record(self)
 
+    def _reload_if_changed(self, lastSaveTime):
+        """ Called by DataObject.LockRecords() once the record is locked.  If another user has saved the Snapshot
+            since it was loaded, reload it. """
+        if lastSaveTime != self.lastsavetime:
+            self.db_load(self.number)
+
     def clear_keywords(self):
         """Clear the keyword list."""
         self._kwlist = []
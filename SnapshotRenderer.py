@@ -0,0 +1,271 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" This module renders cropped, coded Snapshot images without opening a Snapshot Window.
+
+    RenderSnapshot() draws the part of a Snapshot's image that was visible when the Snapshot
+    was saved, at the saved scale and position, and draws the visible coding on top of it, using
+    the same geometry as the Snapshot Window's FloatCanvas.  Rendered images are kept in an
+    on-disk cache in the Visualization folder.  The cache file name is a hash of everything that
+    affects the rendered image, including the image file's modification time and the coding, so
+    a changed Snapshot or image file simply gets a new cache entry.  The Snapshot's older entries
+    at the same size are deleted when the new entry is written, and the oldest entries are deleted
+    when the cache holds more than CACHE_MAX_ENTRIES images. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import wxPython
+import wx
+# import Python's hashlib module
+import hashlib
+# import Python's math module
+import math
+# import Python's os module
+import os
+# import Transana's Exceptions
+import TransanaExceptions
+# import Transana's Globals
+import TransanaGlobal
+
+# The size of the Arrow Heads on coding arrows, in pixels, and the angle between the sides of the Arrow Head.
+# These match the values the Snapshot Window uses.
+ARROW_HEAD_SIZE = 15
+ARROW_HEAD_ANGLE = 60
+
+# The name of the cache folder, inside the Visualization folder
+CACHE_FOLDER = 'SnapshotCache'
+# The largest number of rendered images kept in the cache
+CACHE_MAX_ENTRIES = 1000
+
+
+def CodingColor(keywordStyles):
+    """ Return the wx.Colour for a Snapshot Keyword Style """
+    # If the Line Color's Name is in the defined graphics colors ...
+    if keywordStyles['lineColorName'] in TransanaGlobal.transana_colorLookup.keys():
+        # ... get the Color Definition by looking it up in the Global List.
+        #     (Thus, it will be correct even if the user changes the global color definitions!)
+        color = TransanaGlobal.transana_colorLookup[keywordStyles['lineColorName']]
+    # If the Color Name isn't in the defined graphics colors ...
+    else:
+        # ... use the Color Definition saved with the Snapshot's Keyword Styles
+        color = (int(keywordStyles['lineColorDef'][1:3], 16), int(keywordStyles['lineColorDef'][3:5], 16), int(keywordStyles['lineColorDef'][5:7], 16))
+    return wx.Colour(color[0], color[1], color[2])
+
+def PenStyle(lineStyle):
+    """ Return the wx Pen Style for a Snapshot Keyword Style's Line Style """
+    if lineStyle == 'LongDash':
+        return wx.LONG_DASH
+    elif lineStyle == 'Dot':
+        return wx.DOT
+    elif lineStyle == 'DotDash':
+        return wx.DOT_DASH
+    else:
+        return wx.SOLID
+
+def _ViewPort(snapshot, imgWidth, imgHeight):
+    """ Return the (width, height) of the Snapshot's view, its scale, and the image coordinates of its center """
+    # If the Snapshot has a defined Scale ...
+    if snapshot.image_scale > 0.0:
+        scale = snapshot.image_scale
+        # The Snapshot's image_size is the size of the Snapshot Window.  If it is not defined, show the whole image.
+        if snapshot.image_size[0] > 0:
+            (width, height) = snapshot.image_size
+        else:
+            (width, height) = (imgWidth * scale, imgHeight * scale)
+        # The Snapshot's image_coords give the center of the view, in FloatCanvas world coordinates, where
+        # the center of the image is (0, 0) and y increases upwards.  Convert that to image coordinates.
+        center = (snapshot.image_coords[0] + imgWidth / 2.0, imgHeight / 2.0 - snapshot.image_coords[1])
+    # If the Snapshot does NOT have a defined Scale, the Snapshot Window fits the whole image in the window ...
+    else:
+        # ... so show the whole image
+        scale = 1.0
+        (width, height) = (imgWidth, imgHeight)
+        center = (imgWidth / 2.0, imgHeight / 2.0)
+    return ((int(width), int(height)), scale, center)
+
+def _CacheKey(snapshot, maxSize):
+    """ Return the cache file name for rendering a Snapshot at the given maximum size """
+    # Start with the image file and its modification time and size, so changes to the file are detected
+    fileStat = os.stat(snapshot.image_filename)
+    keyParts = [snapshot.image_filename, fileStat.st_mtime, fileStat.st_size,
+                snapshot.image_scale, tuple(snapshot.image_coords), tuple(snapshot.image_size), maxSize]
+    # Add the visible coding, in drawing order, with its resolved color, since the global colors can change
+    keys = snapshot.codingObjects.keys()
+    keys.sort()
+    for key in keys:
+        obj = snapshot.codingObjects[key]
+        if obj['visible']:
+            keywordStyles = snapshot.keywordStyles[(obj['keywordGroup'], obj['keyword'])]
+            keyParts.append((obj['x1'], obj['y1'], obj['x2'], obj['y2'], keywordStyles['drawMode'],
+                             CodingColor(keywordStyles).GetAsString(wx.C2S_HTML_SYNTAX),
+                             keywordStyles['lineWidth'], keywordStyles['lineStyle']))
+    # Hash the key.  (repr() of unicode strings is ASCII, so this is safe for any file name.)  The prefix lets
+    # us find the Snapshot's other entries at this size when they go out of date.
+    return _CachePrefix(snapshot, maxSize) + hashlib.sha1(repr(keyParts)).hexdigest() + '.png'
+
+def _CachePrefix(snapshot, maxSize):
+    """ Return the start of the cache file names for rendering a Snapshot at the given maximum size """
+    return '%s_%s_' % (snapshot.number, maxSize)
+
+def _PruneCache(cachePath, cacheFile, prefix):
+    """ Delete the cache entries made obsolete by cacheFile, and the oldest entries if the cache is too big """
+    # Get the cache entries other than the new one
+    entries = [filename for filename in os.listdir(cachePath)
+               if filename.endswith('.png') and (filename != os.path.basename(cacheFile))]
+    # Earlier renderings of the same Snapshot at the same size are out of date
+    for filename in entries:
+        if filename.startswith(prefix):
+            os.remove(os.path.join(cachePath, filename))
+    entries = [filename for filename in entries if not filename.startswith(prefix)]
+    # If the cache is still too big ...
+    if len(entries) >= CACHE_MAX_ENTRIES:
+        # ... delete the least recently written entries
+        entries.sort(key=lambda filename: os.path.getmtime(os.path.join(cachePath, filename)))
+        for filename in entries[:len(entries) - CACHE_MAX_ENTRIES + 1]:
+            os.remove(os.path.join(cachePath, filename))
+
+def RenderSnapshot(snapshot, maxSize=None, useCache=True):
+    """ Return a wx.Image of the cropped, coded Snapshot, as the Snapshot Window shows it.  If maxSize is given,
+        the image is rendered to fit within maxSize x maxSize pixels. """
+    # Check to see if the image file can be found
+    if not os.path.exists(snapshot.image_filename):
+        # If not, raise an exception
+        errmsg = unicode(_("Image file not found:\n%s"), 'utf8')
+        raise TransanaExceptions.ImageLoadError(errmsg % snapshot.image_filename)
+
+    # If we're using the cache ...
+    if useCache:
+        # ... determine the cache file name
+        cachePath = os.path.join(TransanaGlobal.configData.visualizationPath, CACHE_FOLDER)
+        cacheFile = os.path.join(cachePath, _CacheKey(snapshot, maxSize))
+        # If this rendering is already in the cache ...
+        if os.path.exists(cacheFile):
+            # ... load it
+            image = wx.Image(cacheFile, wx.BITMAP_TYPE_PNG)
+            # If the cached image is okay, we're done
+            if image.IsOk():
+                return image
+
+    # Load the image
+    bgImage = wx.Image(snapshot.image_filename)
+    # Make sure the image is loaded, is not corrupt
+    if not bgImage.IsOk():
+        # If not, raise an exception
+        errmsg = unicode(_("Unable to load image file:\n%s\nThere may be a problem with the file, or you may\nhave too many Snapshots open."), 'utf8')
+        raise TransanaExceptions.ImageLoadError(errmsg % snapshot.image_filename)
+    (imgWidth, imgHeight) = bgImage.GetSize()
+
+    # Get the Snapshot's view
+    ((viewWidth, viewHeight), scale, (centerX, centerY)) = _ViewPort(snapshot, imgWidth, imgHeight)
+    # If a maximum size is given and the view is larger than that ...
+    if (maxSize != None) and (max(viewWidth, viewHeight) > maxSize):
+        # ... shrink the whole view, including the coding, to fit
+        factor = min(float(maxSize) / viewWidth, float(maxSize) / viewHeight)
+    else:
+        factor = 1.0
+    scale *= factor
+    viewWidth = max(1, int(viewWidth * factor))
+    viewHeight = max(1, int(viewHeight * factor))
+
+    def ToPixel(x, y):
+        """ Convert image coordinates to view (pixel) coordinates """
+        return (int(round((x - centerX) * scale + viewWidth / 2.0)), int(round((y - centerY) * scale + viewHeight / 2.0)))
+
+    # Create a white Bitmap the size of the view
+    bitmap = wx.EmptyBitmap(viewWidth, viewHeight)
+    dc = wx.MemoryDC(bitmap)
+    dc.SetBackground(wx.Brush("white"))
+    dc.Clear()
+
+    # Determine the part of the image that is visible in the view
+    left = max(0, int(math.floor(centerX - viewWidth / 2.0 / scale)))
+    top = max(0, int(math.floor(centerY - viewHeight / 2.0 / scale)))
+    right = min(imgWidth, int(math.ceil(centerX + viewWidth / 2.0 / scale)))
+    bottom = min(imgHeight, int(math.ceil(centerY + viewHeight / 2.0 / scale)))
+    # If any of the image is visible ...
+    if (right > left) and (bottom > top):
+        # ... crop it, BEFORE scaling, so we don't scale more of the image than we need
+        if (left, top, right, bottom) != (0, 0, imgWidth, imgHeight):
+            bgImage = bgImage.GetSubImage(wx.Rect(left, top, right - left, bottom - top))
+        # Determine where the cropped image goes and how big it is
+        (x1, y1) = ToPixel(left, top)
+        (x2, y2) = ToPixel(right, bottom)
+        # Scale the cropped image if needed.  Use slower high quality rescale.
+        if (x2 - x1, y2 - y1) != (right - left, bottom - top):
+            bgImage = bgImage.Scale(max(1, x2 - x1), max(1, y2 - y1), quality=wx.IMAGE_QUALITY_HIGH)
+        # Draw the image
+        dc.DrawBitmap(wx.BitmapFromImage(bgImage), x1, y1)
+
+    # Coding shapes are not filled
+    dc.SetBrush(wx.TRANSPARENT_BRUSH)
+    # Get the list of keys for the Coding Objects
+    keys = snapshot.codingObjects.keys()
+    # Sort the keys, since drawing order matters
+    keys.sort()
+    # For each Coding Object ...
+    for key in keys:
+        obj = snapshot.codingObjects[key]
+        # If the current object is supposed to be VISIBLE ...
+        if obj['visible']:
+            # Get the Keyword Styles for the object's Keyword Group : Keyword from the Snapshot
+            keywordStyles = snapshot.keywordStyles[(obj['keywordGroup'], obj['keyword'])]
+            # Define the Pen.  Line widths shrink with the view, just as they would if the view were rescaled.
+            dc.SetPen(wx.Pen(CodingColor(keywordStyles), max(1, int(round(int(keywordStyles['lineWidth']) * factor))),
+                             PenStyle(keywordStyles['lineStyle'])))
+            # Coding coordinates are FloatCanvas world coordinates.  Convert them to view coordinates.
+            (x1, y1) = ToPixel(obj['x1'] + imgWidth / 2.0, imgHeight / 2.0 - obj['y1'])
+            (x2, y2) = ToPixel(obj['x2'] + imgWidth / 2.0, imgHeight / 2.0 - obj['y2'])
+            # If we're drawing a Line or an Arrow ...
+            if keywordStyles['drawMode'] in ['Line', 'Arrow']:
+                # ... draw the Line
+                dc.DrawLine(x1, y1, x2, y2)
+                # If we're drawing an Arrow ...
+                if keywordStyles['drawMode'] == 'Arrow':
+                    # ... add the two sides of the Arrow Head at the end of the line, pointing back along the line
+                    theta = math.atan2(y1 - y2, x1 - x2)
+                    phi = math.radians(ARROW_HEAD_ANGLE / 2.0)
+                    headSize = ARROW_HEAD_SIZE * factor
+                    for angle in [theta - phi, theta + phi]:
+                        dc.DrawLine(x2, y2, int(round(x2 + headSize * math.cos(angle))), int(round(y2 + headSize * math.sin(angle))))
+            # If we're drawing a Rectangle ...
+            elif keywordStyles['drawMode'] == 'Rectangle':
+                dc.DrawRectangle(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+            # If we're drawing an Ellipse ...
+            elif keywordStyles['drawMode'] == 'Ellipse':
+                dc.DrawEllipse(min(x1, x2), min(y1, y2), abs(x2 - x1), abs(y2 - y1))
+
+    # Release the Bitmap from the Device Context
+    dc.SelectObject(wx.NullBitmap)
+    # Convert the Bitmap to an Image
+    image = bitmap.ConvertToImage()
+
+    # If we're using the cache ...
+    if useCache:
+        # Start Exception Handling
+        try:
+            # If the cache folder doesn't exist yet ...
+            if not os.path.exists(cachePath):
+                # ... create it
+                os.makedirs(cachePath)
+            # Save the rendered image in the cache
+            image.SaveFile(cacheFile, wx.BITMAP_TYPE_PNG)
+            # Remove the entries it replaces, and keep the cache from growing without limit
+            _PruneCache(cachePath, cacheFile, _CachePrefix(snapshot, maxSize))
+        # If the cache can't be written, we still have the image
+        except (IOError, OSError):
+            pass
+
+    return image
@@ -40,6 +40,8 @@ import KeywordObject
 import KeywordListEditForm
 # import the Transana Snapshot Object
 import Snapshot
+# import Transana's Snapshot Renderer
+import SnapshotRenderer
 # import Transana's constants
 import TransanaConstants
 # Import Transana Exceptions
@@ -1696,17 +1698,9 @@ class SnapshotWindow(wx.Frame):
                 drawObj = None
                 # Get the Keyword Styles for the selected Keyword Group : Keyword from the Snapshot
                 keywordStyles = self.obj.keywordStyles[(obj['keywordGroup'], obj['keyword'])]
-                # If the Line Color's Name is in the defined graphics colors ...
-                if keywordStyles['lineColorName'] in TransanaGlobal.transana_colorLookup.keys():
-                    # ... get the Color Definition by looking it up in the Global List.
-                    #     (Thus, it will be correct even if the user changes the global color definitions!)
-                    color = TransanaGlobal.transana_colorLookup[keywordStyles['lineColorName']]
-                # If the Color Name isn't in the defined graphics colors ...
-                else:
-                    # ... use the Color Definition saved with the Snapshot's Keyword Styles
-                    color = (int(keywordStyles['lineColorDef'][1:3], 16), int(keywordStyles['lineColorDef'][3:5], 16), int(keywordStyles['lineColorDef'][5:7], 16))
-                # Set the Coding Color to the defined color definition
-                codingColor = wx.Colour(color[0], color[1], color[2])
+                # Set the Coding Color to the defined color definition.  (The Snapshot Renderer looks it up
+                # the same way, so rendered images match the Snapshot Window.)
+                codingColor = SnapshotRenderer.CodingColor(keywordStyles)
                 # If we're drawing an Arrow ...
                 if keywordStyles['drawMode'] == 'Arrow':
                     # Add the Arrow to the canvas
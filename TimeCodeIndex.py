@@ -0,0 +1,152 @@
+# Copyright (C) 2003 - 2016 The Board of Regents of the University of Wisconsin System
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of version 2 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA 02111-1307, USA.
+#
+
+""" This module implements the Time Code index shared by the Transcript Editors.
+
+    A TimeCodeList is the list of time code values in a transcript, in document order, just as the
+    Transcript Editors have always kept it.  It also keeps a sorted copy of its values so that the
+    time codes around a media position can be found with bisect() rather than by scanning the list
+    on every media position update, and it remembers the document position where each time code
+    was last found.  The sorted copy is rebuilt the first time it is needed after the list changes. """
+
+__author__ = 'David Woods <dwoods@wcer.wisc.edu>'
+
+# import Python's bisect module
+import bisect
+
+
+class TimeCodeList(list):
+    """ The list of time codes in a transcript, in document order, with a sorted index for fast lookups """
+
+    def __init__(self, timecodes=()):
+        """ Initialize the list, optionally from an existing sequence of time codes """
+        # Initialize the list itself
+        list.__init__(self, timecodes)
+        # The sorted copy of the time codes is built when it is first needed
+        self._sorted = None
+        # The document positions of the time codes, indexed by time code value.  Positions can be made stale
+        # by editing, so they must be verified before they are used.
+        self.positions = {}
+
+    def _changed(self):
+        """ Signal that the list has changed, so the sorted index must be rebuilt """
+        self._sorted = None
+
+    def _sortedTimeCodes(self):
+        """ Return the sorted copy of the time codes, building it if needed """
+        # If the sorted copy has been invalidated ...
+        if self._sorted is None:
+            # ... rebuild it
+            self._sorted = sorted(self)
+        return self._sorted
+
+    # Every method that changes the list must invalidate the sorted index
+
+    def append(self, timecode):
+        list.append(self, timecode)
+        self._changed()
+
+    def insert(self, index, timecode):
+        list.insert(self, index, timecode)
+        self._changed()
+
+    def extend(self, timecodes):
+        list.extend(self, timecodes)
+        self._changed()
+
+    def remove(self, timecode):
+        list.remove(self, timecode)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return list.pop(self, *args)
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+    def __setitem__(self, index, timecode):
+        list.__setitem__(self, index, timecode)
+        self._changed()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._changed()
+
+    def __setslice__(self, start, end, timecodes):
+        list.__setslice__(self, start, end, timecodes)
+        self._changed()
+
+    def __delslice__(self, start, end):
+        list.__delslice__(self, start, end)
+        self._changed()
+
+    def __iadd__(self, timecodes):
+        list.extend(self, timecodes)
+        self._changed()
+        return self
+
+    def __imul__(self, count):
+        list.__imul__(self, count)
+        self._changed()
+        return self
+
+    def __contains__(self, timecode):
+        """ Membership test using the sorted index """
+        timecodes = self._sortedTimeCodes()
+        i = bisect.bisect_left(timecodes, timecode)
+        return (i < len(timecodes)) and (timecodes[i] == timecode)
+
+    def before(self, ms):
+        """ Return the highest time code that is less than ms, or -1 if there is none """
+        timecodes = self._sortedTimeCodes()
+        i = bisect.bisect_left(timecodes, ms)
+        if i > 0:
+            return timecodes[i - 1]
+        else:
+            return -1
+
+    def atOrBefore(self, ms):
+        """ Return the highest time code that is less than or equal to ms, or -1 if there is none """
+        timecodes = self._sortedTimeCodes()
+        i = bisect.bisect_right(timecodes, ms)
+        if i > 0:
+            return timecodes[i - 1]
+        else:
+            return -1
+
+    def atOrAfter(self, ms):
+        """ Return the lowest time code that is greater than or equal to ms, or -1 if there is none """
+        timecodes = self._sortedTimeCodes()
+        i = bisect.bisect_left(timecodes, ms)
+        if i < len(timecodes):
+            return timecodes[i]
+        else:
+            return -1
+
+    def after(self, ms):
+        """ Return the lowest time code that is greater than ms, or -1 if there is none """
+        timecodes = self._sortedTimeCodes()
+        i = bisect.bisect_right(timecodes, ms)
+        if i < len(timecodes):
+            return timecodes[i]
+        else:
+            return -1
@@ -309,6 +309,38 @@ class Transcript(DataObject.DataObject):
         # Close the database cursor
         c.close()
 
+    @classmethod
+    def load_many(cls, nums, skipText=False):
+        """ Load a list of Transcripts using a constant number of database queries, rather than one query per
+            Transcript.  Returns a dictionary of Transcript objects keyed by Transcript Number.  Transcripts that
+            are not found in the database are left out. """
+        # If we're skipping the RTF Text ...
+        if skipText:
+            # Define the query to load Transcripts without text
+            query = """SELECT TranscriptNum, TranscriptID, EpisodeNum, SourceTranscriptNum,
+                              ClipNum, SortOrder, Transcriber, ClipStart, ClipStop, Comment,
+                              MinTranscriptWidth, RecordLock, LockTime, LastSaveTime
+                         FROM Transcripts2 WHERE   TranscriptNum IN (%s)
+                    """
+        # If we're NOT skipping the RTF Text ...
+        else:
+            # Define the query to load Transcripts with everything
+            query = """SELECT * FROM Transcripts2 WHERE   TranscriptNum IN (%s)"""
+        # Initialize the results dictionary
+        transcripts = {}
+        # For each Transcript record ...
+        for row in DBInterface.fetchall_named_by_nums(query, nums):
+            # ... create an empty Transcript object ...
+            tempTranscript = cls(skipText=skipText)
+            # ... load the data into the Transcript object ...
+            tempTranscript._load_row(row)
+            # ... set up data structures needed for editing large paragraphs ...
+            tempTranscript.UpdateParagraphs()
+            # ... and add it to the results
+            transcripts[tempTranscript.number] = tempTranscript
+        # Return the results
+        return transcripts
+
     def UpdateParagraphs(self):
         """ This method divides XML text up into paragraphs, needed for editing LONG transcripts """
         # Initialize (or re-initialize) the paragraph pointers dictionary
@@ -685,6 +717,12 @@ class Transcript(DataObject.DataObject):
         
         # ... lock the Transcript Record
         DataObject.DataObject.lock_record(self)
+
+    def _reload_if_changed(self, lastSaveTime):
+        """ Called by DataObject.LockRecords() once the record is locked.  If another user has saved the transcript
+            since it was loaded, reload it. """
+        if lastSaveTime != self.lastsavetime:
+            self.db_load_by_num(self.number)
             
     def unlock_record(self):
         """ Override the DataObject Unlock Method """
@@ -56,6 +56,8 @@ import TransanaGlobal
 import TranscriptionUI_RTC
 # import TextReport module
 import TextReport
+# import Transana's Time Code Index
+import TimeCodeIndex
 # Import Transana's Miscellaneous functions
 import Misc
 # Import Python's Regular Expression handler
@@ -120,7 +122,7 @@ class TranscriptEditor(RichTextEditCtrl):
         # For Partial Transcript Loading, we need to track the number of lines loaded in the Text Control
         self.LinesLoaded = 0
         # Initialize the Time Codes array to empty
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         # Initialize the current time code to DOES NOT EXIST
         self.current_timecode = -1
 
@@ -570,7 +572,7 @@ class TranscriptEditor(RichTextEditCtrl):
     def load_timecodes(self):
         """Scan the document for timecodes and add to internal list."""
         # Clear the existing time codes list
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         # Get the text to scan
         txt = self.GetText()
         # Define the string to search for
@@ -587,6 +589,9 @@ class TranscriptEditor(RichTextEditCtrl):
             try:
                 # Conver the time code data to an integer and add it to the TimeCodes list
                 self.timecodes.append(int(timestr))
+                # Remember where the time code was found.  (This is a string position, which
+                # find_timecode() will verify before it is used.)
+                self.timecodes.positions.setdefault(int(timestr), i)
             # If an exception arises (because of inability to convert the time code) ...
             except:
                 # ... then just ignore that time code.  It's probably defective.
@@ -1301,25 +1306,10 @@ class TranscriptEditor(RichTextEditCtrl):
         # Temporarily halt screen updates
         self.Freeze()
         
-        # Find the timecodes that are on either side of what we want
-        # Initialize "Before" to the start of the file
-        tcBefore = -1
-        # Initializae "After" to the end of the file (-1)
-        tcAfter = -1
-
-        # Iterate through the time code list
-        for timecode in self.timecodes:
-
-            # If the entry in the time code list is less than the current media position ...
-            if timecode < ms:
-                # ... update the Before value
-                tcBefore = timecode
-            # If the entry in the time code list is greater than the current media position ...
-            else:
-                # ... then we can stop looking for our Before position and we should capture THIS as our After position
-                tcAfter = timecode
-                # We can stop iterating once we reach this point.
-                break
+        # Find the timecodes that are on either side of what we want, using the Time Code Index.
+        # "Before" is -1 if we are before the first time code, and "After" is -1 if we are after the last one.
+        tcBefore = self.timecodes.before(ms)
+        tcAfter = self.timecodes.atOrAfter(ms)
 
         # If the current position is before the first time code ...
         if tcBefore == -1:
@@ -1328,7 +1318,7 @@ class TranscriptEditor(RichTextEditCtrl):
         # Otherwise ...
         else:
             # ... let's get the character position of the Before time code
-            start = self.FindText(0, self.GetTextLength(), "%s<%d>" % (TIMECODE_CHAR, tcBefore))
+            start = self.find_timecode(tcBefore)
 
         # If the current position is after the last time code ...
         if tcAfter == -1:
@@ -1337,7 +1327,7 @@ class TranscriptEditor(RichTextEditCtrl):
         # Otherwise ...
         else:
             # ... let's get the character position of the After time code
-            end = self.FindText(0, self.GetTextLength(), "%s<%d>" % (TIMECODE_CHAR, tcAfter))
+            end = self.find_timecode(tcAfter)
 
         # Let's get the current selection position
         pos = self.GetSelection()
@@ -1370,6 +1360,24 @@ class TranscriptEditor(RichTextEditCtrl):
             # ... return False to indicate that we have not moved anything
             return False
         
+    def find_timecode(self, tc):
+        """ Return the character position of the time code with the value tc, or -1 if it is not found """
+        # Build the text of the time code
+        text = "%s<%d>" % (TIMECODE_CHAR, tc)
+        # See if we know where this time code was last found
+        pos = self.timecodes.positions.get(tc, -1)
+        # If we do, and the time code is still there ...
+        if (pos > -1) and (self.GetRange(pos, pos + len(text)) == text):
+            # ... we don't need to search the document for it
+            return pos
+        # Otherwise, search the document for the time code
+        pos = self.FindText(0, self.GetTextLength(), text)
+        # If the time code was found ...
+        if pos > -1:
+            # ... remember its position for next time
+            self.timecodes.positions[tc] = pos
+        return pos
+
     def cursor_find(self, text):
         """Move the cursor to the next occurrence of given text in the
         transcript (for word tracking)."""
@@ -1676,7 +1684,7 @@ class TranscriptEditor(RichTextEditCtrl):
         # Clear the Transcript Object
         self.TranscriptObj = None
         # Clear the time code list
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         # Clear the current time code pointer
         self.current_timecode = -1
         # Make the control read-only
@@ -1702,27 +1710,16 @@ class TranscriptEditor(RichTextEditCtrl):
             # ... then return 0 to signal to start at the beginning of the file
             return 0
 
-        # Start Exception Handling
-        try:
-            # Try to get the Index in the time codes list of the item BEFORE the current time code value (hence -1)
-            i = self.timecodes.index(tc) - 1
-            # If our index is 0 or higher ...
-            while i >= 0:
-                # If the Time Code List value is less than our original time code ...
-                if self.timecodes[i] < tc:
-                    # ... then return the value
-                    return self.timecodes[i]
-                # Otherwise, move a value earlier in the list and try again
-                i = i - 1
-            # If we exit the while loop without RETURN, then return 0 to signal to start at the beginning of the file
-            return 0
-        # If an exception is raised ...  (probably an index out of range call.)
-        except:
-            if DEBUG:
-                print sys.exc_info()[0]
-                print sys.exc_info()[1]
-            # ... return 0 to signal to start at the beginning of the file
-            return 0
+        # If the time code is in the time codes list ...
+        if tc in self.timecodes:
+            # ... use the Time Code Index to get the highest time code that is less than our original time code
+            prevTC = self.timecodes.before(tc)
+            # If there is one ...
+            if prevTC > -1:
+                # ... then return the value
+                return prevTC
+        # If there is no earlier time code, return 0 to signal to start at the beginning of the file
+        return 0
 
     def NextTimeCode(self, tc=None):
         """Return the timecode immediately after the current one."""
@@ -1737,32 +1734,21 @@ class TranscriptEditor(RichTextEditCtrl):
                 # ... then return the FIRST value in the list.
                 return self.timecodes[0]
 
-        # Start Exception Handling
-        try:
-            # Try to get the Index in the time codes list of the item AFTER the current time code value (hence +1)
-            i = self.timecodes.index(tc) + 1
-            # If our index is less than the highest value ...
-            while i < len(self.timecodes):
-                # If the Time Code List value is greater than our original time code ...
-                if self.timecodes[i] > tc:
-                    # ... then return the value
-                    return self.timecodes[i]
-                # Otherwise, move a value later in the list and try again
-                i = i + 1
-            # If we get here, we got to the end of the list.  Just return the list's highest value
+        # If the time code is in the time codes list ...
+        if tc in self.timecodes:
+            # ... use the Time Code Index to get the lowest time code that is greater than our original time code
+            nextTC = self.timecodes.after(tc)
+            # If there is one ...
+            if nextTC > -1:
+                # ... then return the value
+                return nextTC
+        # If there are time codes in the time codes list ...
+        if len(self.timecodes) > 0:
+            # ... return the last value in the list
             return self.timecodes[-1]
-        # If an exception is rasied ...  (probably an index out of range call.)
-        except:
-            if DEBUG:
-                print sys.exc_info()[0]
-                print sys.exc_info()[1]
-            # If there are time codes in the time codes list ...
-            if len(self.timecodes) > 0:
-                # ... return the highest value in the list
-                return self.timecodes[-1]
-            else:
-                # ... return -1 to signal failure
-                return -1
+        else:
+            # ... return -1 to signal failure
+            return -1
 
     def OnKeyDown(self, event):
         """ Called when a key is pressed down.  All characters are upper case.  """
@@ -2046,9 +2032,8 @@ class TranscriptEditor(RichTextEditCtrl):
                     print self.TranscriptObj.quote_dict
                 print
 
-            # This code needs to be super-efficient.  That's why it's organized the way it is.
-            #    - Iterate AFTER the conditional (IF) statements so we evalute the IFs fewer times
-            #    - In Selection section, evalute the mid-selection cases last, as they will be rarest
+            # This code needs to be super-efficient.  The Document's Quote Position Index moves all the Quotes
+            # after the change at once, and only adjusts the Quotes that overlap the change one at a time.
             # It needs to handle insertions and deletions with NO selection, as well as
             # insertions over a selection and deletions of a selection!
         
@@ -2071,57 +2056,12 @@ class TranscriptEditor(RichTextEditCtrl):
             
             # If we have NO SELECTION ...
             if self.GetSelection() == (-2, -2):
-                # Iterate through the Quote Dictionary
-                for key in self.TranscriptObj.quote_dict:
-                    # If the Quote Start is at or after the Cursor Position ...
-                    if self.TranscriptObj.quote_dict[key][0] >= position:
-                        # ... adjust the start position by the change in size
-                        self.TranscriptObj.quote_dict[key] = \
-                           (self.TranscriptObj.quote_dict[key][0] + sizeChange,
-                            self.TranscriptObj.quote_dict[key][1])
-                    # If the Quote End is at or after the Cursor Position ...
-                    # (We *MUST* maintain a quote size of at least one character!!)
-                    if (self.TranscriptObj.quote_dict[key][1] >= position) and \
-                       (self.TranscriptObj.quote_dict[key][1] - self.TranscriptObj.quote_dict[key][0] > 1):
-                        # ... adjust the end position by the change in size
-                        self.TranscriptObj.quote_dict[key] = \
-                           (self.TranscriptObj.quote_dict[key][0],
-                            self.TranscriptObj.quote_dict[key][1] + sizeChange)
+                # ... adjust the Quote positions for a change at the Cursor Position
+                self.TranscriptObj.quote_dict.AdjustPositions(position, position, sizeChange)
             # If we have a SELECTION ...
             else:
-                # Iterate through the Quote Dictionary
-                for key in self.TranscriptObj.quote_dict:
-                    # If the Quote Start is at or after the Selection End ...
-                    if self.TranscriptObj.quote_dict[key][0] >= selection[1]:
-                        # ... adjust the start position by the change in size
-                        self.TranscriptObj.quote_dict[key] = \
-                           (self.TranscriptObj.quote_dict[key][0] + sizeChange,
-                            self.TranscriptObj.quote_dict[key][1])
-                    # ELSE if the Quote Start is INSIDE the Selection ...
-                    elif (self.TranscriptObj.quote_dict[key][0] >= selection[0]) and \
-                         (self.TranscriptObj.quote_dict[key][0] < selection[1]):
-                        # ... adjust the start position by the change in size of the portion of the
-                        # selection inside the Quote's range
-                        self.TranscriptObj.quote_dict[key] = \
-                           (selection[0],
-                            self.TranscriptObj.quote_dict[key][1])
-
-                    # If the Quote End is at or after the Selection End ...
-                    # (We *MUST* maintain a quote size of at least one character!!)
-                    if (self.TranscriptObj.quote_dict[key][1] >= selection[1]) and \
-                       (self.TranscriptObj.quote_dict[key][1] - self.TranscriptObj.quote_dict[key][0] > 1):
-                        # ... adjust the end position by the change in size
-                        self.TranscriptObj.quote_dict[key] = \
-                           (self.TranscriptObj.quote_dict[key][0],
-                            self.TranscriptObj.quote_dict[key][1] + sizeChange)
-                    # ELSE if the Quote End is INSIDE the Selection ...
-                    elif (self.TranscriptObj.quote_dict[key][1] >= selection[0]) and \
-                         (self.TranscriptObj.quote_dict[key][1] < selection[1]):
-                        # ... adjust the end position by the change in size of the portion of the
-                        # selection inside the Quote's range
-                        self.TranscriptObj.quote_dict[key] = \
-                           (self.TranscriptObj.quote_dict[key][0],
-                            self.TranscriptObj.quote_dict[key][1] + sizeChange + (selection[1] - self.TranscriptObj.quote_dict[key][1]))
+                # ... adjust the Quote positions for a change to the Selection
+                self.TranscriptObj.quote_dict.AdjustPositions(selection[0], selection[1], sizeChange)
             # Restore the original cursor position
 ## Position hasn't changed(?), and this messes up no-selection font formatting!!
 ##            self.SetCurrentPos(position)
@@ -44,6 +44,8 @@ import Episode, Clip
 import TransanaConstants
 # Import Transana's Global variables
 import TransanaGlobal
+# import Transana's Time Code Index
+import TimeCodeIndex
 # Import Transana's Miscellaneous functions
 import Misc
 # Import Python's Regular Expression handler
@@ -97,7 +99,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
         # Indicate whether Time Code Data is shown, default to NOT
         self.timeCodeDataVisible = False
         self.TranscriptObj = None
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         self.current_timecode = -1
         self.set_read_only(1)
 
@@ -384,7 +386,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
     def load_timecodes(self):
         """Scan the document for timecodes and add to internal list."""
         # Clear the existing time codes list
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         # Get the text to scan
         txt = self.GetText()
         findstr = TIMECODE_CHAR + "<"
@@ -901,15 +903,12 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
         # Temporarily halt screen updates
         self.Freeze()
         
-        # Find the timecode that's closest
-        closest_time = self.timecodes[0]
-        for timecode in self.timecodes:
-            if (timecode <= ms) and (ms - timecode < ms - closest_time):
-                closest_time = timecode
+        # Find the timecode that's closest, using the Time Code Index
+        closest_time = self.timecodes.atOrBefore(ms)
         
         # Check if ALL timecodes in document are higher than given time.
         # In this case, we scroll to 0
-        if (closest_time > ms):
+        if (closest_time < 0):
             closest_time = 0
 
         # Get start and end points of current selection
@@ -1292,7 +1291,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
         # Clear the Transcript Object
         self.TranscriptObj = None
         # Clear the time code list
-        self.timecodes = []
+        self.timecodes = TimeCodeIndex.TimeCodeList()
         # Clear the current time code pointer
         self.current_timecode = -1
         # Make the control read-only
@@ -1546,7 +1545,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
                             # First we locate that entry ...
                             index = self.timecodes.index(nextTimeCode)
                             # ... then we remove it from the list.
-                            self.timecodes = self.timecodes[:index] + self.timecodes[index+1:]
+                            del self.timecodes[index]
                             # Now we reset the Text Cursor
                             self.SetCurrentPos(curpos)
                             # We better hide all the hidden text for the time code data again                           
@@ -1626,11 +1625,11 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
                                 # If the startIndex was found ...
                                 if startIndex > -1:
                                     # ... we can extract from the middle like this
-                                    self.timecodes = self.timecodes[:startIndex + 1] + self.timecodes[endIndex:]
+                                    del self.timecodes[startIndex + 1:endIndex]
                                 # If the startIndex was NOT found ...
                                 else:
                                     # ... we drop the start of the list
-                                    self.timecodes = self.timecodes[endIndex:]
+                                    del self.timecodes[:endIndex]
                             # Now we reset the Text Cursor
                             self.SetCurrentPos(selStart)
                             # We better hide all the hidden text for the time code data again                           
@@ -1720,7 +1719,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
                             # First we locate that entry ...
                             index = self.timecodes.index(prevTimeCode)
                             # ... then we remove it from the list.
-                            self.timecodes = self.timecodes[:index] + self.timecodes[index+1:]
+                            del self.timecodes[index]
                             # We better hide all the hidden text for the time codes again
                             self.hide_all_hidden()
                             # and we need to reset self.codes_vis to its original state.  (This variable gets updated
@@ -1788,7 +1787,7 @@ class TranscriptEditor(RichTextEditCtrl.RichTextEditCtrl):
                             startIndex = self.timecodes.index(prevTimeCode)
                             endIndex= self.timecodes.index(nextTimeCode)
                             # ... then we remove items from the list that fall between them.
-                            self.timecodes = self.timecodes[:startIndex + 1] + self.timecodes[endIndex:]
+                            del self.timecodes[startIndex + 1:endIndex]
                             # Now we reset the Text Cursor
                             self.SetCurrentPos(selStart)
                             # We better hide all the hidden text for the time code data again                           
@@ -36,6 +36,8 @@ if __name__ == '__main__':
 
 # Import Transana's Clip Object
 import Clip
+# Import Transana's Database Interface
+import DBInterface
 # Import Transana's Dialogs
 import Dialogs
 # Import Transana's Document Object
@@ -73,9 +75,93 @@ import os
 import string
 # Import Python's sys module
 import sys
+# Import Python's threading module
+import threading
 # Import Python's time module
 import time
 
+# Thread for composing visualizations
+class VisualizationThread(threading.Thread):
+    """ Composes the Waveform, Keyword, and Hybrid Visualizations in the background, so that reading the wave data and
+        the keyword coding doesn't freeze the interface during zooming, scrolling, and media loading.  The Keyword
+        Visualization is drawn on an off-screen Graphics Canvas using the background database connection.  No GUI
+        objects are used here.  The finished image is passed to OnVisualizationReady() in the main thread. """
+    def __init__(self, notify_window, generation, waveFilename, startPoint, mediaLength, graphicSize, kwMap=None,
+                 kwMapSetup=None, hybrid=False):
+        """ Initialize the Visualization Thread Class.  waveFilename is None if there is no waveform, and
+            kwMap is None if there is no Keyword Visualization.  kwMapSetup holds the kwMap's SetupEmbedded() arguments. """
+        threading.Thread.__init__(self)
+        self._notify_window = notify_window
+        self._generation = generation
+        self._waveFilename = waveFilename
+        self._startPoint = startPoint
+        self._mediaLength = mediaLength
+        self._graphicSize = graphicSize
+        self._kwMap = kwMap
+        self._kwMapSetup = kwMapSetup
+        self._hybrid = hybrid
+        # prevent the application from hanging on Close
+        self.setDaemon(1)
+        # Start the thread
+        self.start()
+
+    def Cancelled(self):
+        """ The visualization is no longer needed if a newer render has been started since this one """
+        try:
+            return self._notify_window.renderGeneration != self._generation
+        # If the window has been destroyed, the visualization is certainly not needed
+        except wx.PyDeadObjectError:
+            return True
+
+    def run(self):
+        """ Run the Visualization Thread. """
+        # Initialize the waveform image and the finished image.  None signals failure.
+        waveformImage = None
+        image = None
+        try:
+            # If we have a waveform ...
+            if self._waveFilename != None:
+                # Calculate the waveform graphic data, stopping early if it is no longer needed
+                graphicData = WaveformGraphic.WaveformGraphicData(self._waveFilename, self._startPoint, self._mediaLength,
+                                                                  self._graphicSize, style='waveform', cancelled=self.Cancelled)
+                # If the waveform was calculated and is still needed ...
+                if (graphicData != None) and not self.Cancelled():
+                    # ... draw the waveform graphic
+                    waveformImage = WaveformGraphic.WaveformGraphicDraw(graphicData, ':memory:', self._graphicSize, style='waveform')
+            # If we have a Keyword Visualization that is still needed ...
+            if (self._kwMap != None) and not self.Cancelled():
+                # Only one thread at a time can use the background database connection
+                DBInterface.workerDBLock.acquire()
+                try:
+                    # Get a cursor on the background database connection
+                    DBCursor = DBInterface.get_worker_db().cursor()
+                    # Load the keyword coding and draw the Keyword Visualization on the off-screen canvas
+                    self._kwMap.SetupEmbedded(DBCursor=DBCursor, **self._kwMapSetup)
+                    DBCursor.close()
+                finally:
+                    DBInterface.workerDBLock.release()
+                # If we have a Hybrid visualization with a waveform ...
+                if self._hybrid and (waveformImage != None):
+                    # Rescale the image so that it matches the size alloted for the Waveform (HYBRIDOFFSET)
+                    waveformImage.Rescale(waveformImage.GetWidth(), HYBRIDOFFSET)
+                    # Draw the offset Keyword Visualization with the waveform above it
+                    image = self._kwMap.graphic.Render(waveformImage)
+                else:
+                    image = self._kwMap.graphic.Render()
+            # If we just have a waveform ...
+            else:
+                image = waveformImage
+        # A bug in Python 2.3.5 causes a RuntimeError with some wave files if Unicode filenames are used.  Other
+        # problems with the wave files or the database are possible too.  Signal the failure with an image of None.
+        except:
+            if DEBUG:
+                import traceback
+                traceback.print_exc(file=sys.stdout)
+            image = None
+        # If the visualization is still needed, hand it to the main thread.  (NOTE:  No GUI from inside the thread.)
+        if not self.Cancelled():
+            wx.CallAfter(self._notify_window.OnVisualizationReady, self._generation, image, waveformImage, self._kwMap)
+
 class VisualizationWindow(wx.Dialog):
     """ This class creates Transana's Visualization Window, used to display waveforms (for media files) and Keyword Visualizations
         (for media and text data).  These visualizations are intended to provide the user with useful information abou their
@@ -128,6 +214,10 @@ class VisualizationWindow(wx.Dialog):
 
         # redrawWhenIdle signals that the Waveform picture needs to be drawn when the CPU has time
         self.redrawWhenIdle = False
+        # renderGeneration identifies the most recent render.  Visualizations composed for earlier renders are discarded.
+        self.renderGeneration = 0
+        # The Keyword Visualization object being composed in the background, if there is one
+        self.kwMapPending = None
         # Initialize a list structure to hold wave file information
         self.waveFilename = []
         # Let's keep track of time since last redraw too
@@ -327,6 +417,8 @@ class VisualizationWindow(wx.Dialog):
 
     def SetVisualizationObject(self, visualizationObject):
         """ Set the Object to be visualized """
+        # Any visualization being composed for the last visualization object is no longer needed
+        self.CancelRender()
         # Reset the Zoom Information, so we don't carry it over from the last visualization
         self.zoomInfo = [(0, -1)]
         if self.kwMap != None:
@@ -461,8 +553,12 @@ class VisualizationWindow(wx.Dialog):
         """ Update the Keyword Visualization based on some sort of change in the data.  If this is called based on a change
             in the TEXT of a Document or Transcript, due to editing, the Coding involved won't have changed, so we can skip
             the time-consuming step of loading all the coding that goes into the Visualization. """
+        # If a Keyword Visualization is being composed in the background, it may have missed the change ...
+        if self.kwMapPending != None:
+            # ... so it needs to be composed again.
+            self.redrawWhenIdle = True
         # Only do something if we've got the Keyword or Hybrid visualization and there is a data object currently loaded
-        if (self.VisualizationType in ['Keyword', 'Hybrid', 'Text-Keyword']) and \
+        elif (self.VisualizationType in ['Keyword', 'Hybrid', 'Text-Keyword']) and \
            (self.ControlObject.currentObj != None) and \
            (self.kwMap != None):
             # If we do NOT have a Text Change ...
@@ -487,6 +583,16 @@ class VisualizationWindow(wx.Dialog):
         if self.redrawWhenIdle  and (not self.ControlObject.shuttingDown) and \
            ((self.ControlObject.GetMediaLength() > 0) or (self.VisualizationType == 'Text-Keyword')):
 
+            # Any visualization still being composed for an earlier redraw is no longer needed
+            self.CancelRender()
+            # Initialize the wave file information, Keyword Visualization object, and Keyword Visualization setup
+            # that are passed to the background thread.  None signals there's nothing to compose.
+            waveFilename = None
+            waveStart = 0
+            waveLength = 0
+            kwMap = None
+            kwMapSetup = None
+
             if not self.VisualizationType == 'Text-Keyword':
                 # Remove old Waveform Selection and Cursor data
                 self.waveform.ClearTransanaSelection()
@@ -525,8 +631,6 @@ class VisualizationWindow(wx.Dialog):
                 # ... and exit this method.  We're done here.
                 return
 
-            # Initialize
-            waveformGraphicImage = None
             if self.VisualizationType in ['Waveform', 'Hybrid']:
                 # Create the appropriate Waveform Graphic
                 try:
@@ -570,22 +674,14 @@ class VisualizationWindow(wx.Dialog):
                         # ... add a "Show" variable to the waveform filename dictionary in the waveFilename list
                         #     that indicates if that waveform should be shown 
                         self.waveFilename[x]['Show'] = checkboxData[x][1]
-                    # Create the waveform graphic
-                    waveformGraphicImage = WaveformGraphic.WaveformGraphicCreate(self.waveFilename, ':memory:', start, length, self.waveform.canvassize, style='waveform')
-                    # If a waveform graphic was created ...
-                    if waveformGraphicImage != None:
-                        # ... clear the waveform
-                        self.waveform.Clear()
-                        # ... and set the image as the waveform background
-                        self.waveform.SetBackgroundGraphic(waveformGraphicImage)
-                        # Determine NEW Frame Size
-                        (width, height) = self.GetSize()
-                        # Draw the TimeLine values
-                        self.draw_timeline(start, length)
-                    # If we can't create the graphic ...
-                    else:
-                        # ... try to function without one.
-                        self.redrawWhenIdle = False
+                    # Clear the waveform.  The waveform graphic is added by OnVisualizationReady() once it has been calculated.
+                    self.waveform.Clear()
+                    # The waveform is calculated in the background, using a copy of the wave file information
+                    waveFilename = [flnm.copy() for flnm in self.waveFilename]
+                    waveStart = start
+                    waveLength = length
+                    # Draw the TimeLine values
+                    self.draw_timeline(start, length)
 
                 # A bug in Python 2.3.5 causes a RuntimeError with some wave files if Unicode filenames are used.
                 # This should be fixed in Python 2.4.2, but we'll leave this code here to prevent ugly errors if it
@@ -608,21 +704,14 @@ class VisualizationWindow(wx.Dialog):
                         import traceback
                         traceback.print_exc(file=sys.stdout)
 
-                # If we're building a Hybrid visualization, capture the waveform picture.
-                # But if waveforFilename has been cleared, we're waveforming and shouldn't do this yet!
-                if (self.VisualizationType == 'Hybrid'):
-                    # Get the waveform Bitmap and convert it to an Image
-                    hybridWaveform = waveformGraphicImage
-                    if hybridWaveform != None:
-                        # Rescale the image so that it matches the size alloted for the Waveform (HYBRIDOFFSET)
-                        hybridWaveform.Rescale(hybridWaveform.GetWidth(), HYBRIDOFFSET)
-
             if self.VisualizationType in ['Keyword', 'Hybrid']:
                 # Clear the Visualization
                 self.waveform.Clear()
+                # The existing Keyword Visualization's mouse-overs no longer match the graphic
+                self.waveform.Unbind(wx.EVT_MOTION)
 
-                # Enable the Filter button
-                self.filter.Enable(True)
+                # Disable the Filter button until the new Keyword Visualization is ready
+                self.filter.Enable(False)
                 # If there's an existing Keyword Visualization ...
                 if self.kwMap != None:
                     # ... remember the values for the Clip List
@@ -639,10 +728,7 @@ class VisualizationWindow(wx.Dialog):
                     keywordColorList = self.kwMap.keywordColors
                     # ... and remember the configuration name
                     configName = self.kwMap.configName
-                    # Delete the current keyword visualization object
-                    del(self.kwMap)
-                    # Set the reference to the keyword visualizatoin object to None so we don't get confused.
-                    self.kwMap = None
+                    # The current keyword visualization object is replaced by OnVisualizationReady() once the new one is ready.
                 # If we're creating a brand new Keyword Visualization ...
                 else:
                     # Initialize the Clip Lists
@@ -668,8 +754,10 @@ class VisualizationWindow(wx.Dialog):
                     # ... then we don't need a top margin
                     topOffset = 0
 
-                # Create a Keyword Visualization object as an embedded graphic, not a free-standing report.
-                self.kwMap = KeywordMapClass.KeywordMap(self, -1, "", embedded=True, topOffset=topOffset)
+                # Create a Keyword Visualization object as an embedded graphic, not a free-standing report.  It is drawn
+                # in the background on an off-screen canvas.
+                kwMap = KeywordMapClass.KeywordMap(self, -1, "", embedded=True, topOffset=topOffset,
+                                                   graphic=GraphicsControlClass.GraphicsCanvas(tuple(self.waveform.canvassize)))
 
                 # We populate the keyword visualization differently for an episode and a clip.
                 if type(self.ControlObject.currentObj) == Episode.Episode:
@@ -690,13 +778,22 @@ class VisualizationWindow(wx.Dialog):
                     else:
                         kwMapEndPoint = kwMapStartPoint + self.zoomInfo[-1][1]
 
-                    # Set up the embedded Keyword Visualization, sending it all the data it needs so it can draw or redraw itself.
-                    self.kwMap.SetupEmbedded(self.ControlObject.currentObj.number, self.ControlObject.currentObj.series_id, \
-                                             self.ControlObject.currentObj.id, kwMapStartPoint, kwMapEndPoint, \
-                                             filteredClipList = filteredClipList, unfilteredClipList = unfilteredClipList, \
-                                             filteredSnapshotList = filteredSnapshotList, unfilteredSnapshotList = unfilteredSnapshotList, \
-                                             filteredKeywordList = filteredKeywordList, unfilteredKeywordList = unfilteredKeywordList, \
-                                             keywordColors = keywordColorList, configName=configName, loadDefault=self.loadDefault)
+                    # Note all the data the embedded Keyword Visualization needs so it can draw or redraw itself.
+                    kwMapSetup = {'episodeNum' : self.ControlObject.currentObj.number,
+                                  'seriesName' : self.ControlObject.currentObj.series_id,
+                                  'episodeName' : self.ControlObject.currentObj.id,
+                                  'startTime' : kwMapStartPoint,
+                                  'endTime' : kwMapEndPoint,
+                                  'filteredClipList' : filteredClipList,
+                                  'unfilteredClipList' : unfilteredClipList,
+                                  'filteredSnapshotList' : filteredSnapshotList,
+                                  'unfilteredSnapshotList' : unfilteredSnapshotList,
+                                  'filteredKeywordList' : filteredKeywordList,
+                                  'unfilteredKeywordList' : unfilteredKeywordList,
+                                  'keywordColors' : keywordColorList,
+                                  'configName' : configName,
+                                  'loadDefault' : self.loadDefault,
+                                  'episode' : self.ControlObject.currentObj}
 
                     # Draw the TimeLine values
                     self.draw_timeline(kwMapStartPoint, kwMapEndPoint - kwMapStartPoint)
@@ -715,36 +812,42 @@ class VisualizationWindow(wx.Dialog):
                     # Set the current global video selection based on the Clip.
                     self.ControlObject.SetVideoSelection(start, self.ControlObject.currentObj.clip_stop) 
 
-                    # Set up the embedded Keyword Visualization, sending it all the data it needs so it can draw or redraw itself.
-                    self.kwMap.SetupEmbedded(self.ControlObject.currentObj.episode_num, tmpEpisode.series_id, \
-                                             tmpEpisode.id, start, start + length, \
-                                             filteredClipList = filteredClipList, unfilteredClipList = unfilteredClipList, \
-                                             filteredSnapshotList = filteredSnapshotList, unfilteredSnapshotList = unfilteredSnapshotList, \
-                                             filteredKeywordList = filteredKeywordList, unfilteredKeywordList = unfilteredKeywordList, \
-                                             keywordColors = keywordColorList, clipNum=self.ControlObject.currentObj.number,
-                                             configName=configName, loadDefault=self.loadDefault)
+                    # Note all the data the embedded Keyword Visualization needs so it can draw or redraw itself.
+                    kwMapSetup = {'episodeNum' : self.ControlObject.currentObj.episode_num,
+                                  'seriesName' : tmpEpisode.series_id,
+                                  'episodeName' : tmpEpisode.id,
+                                  'startTime' : start,
+                                  'endTime' : start + length,
+                                  'filteredClipList' : filteredClipList,
+                                  'unfilteredClipList' : unfilteredClipList,
+                                  'filteredSnapshotList' : filteredSnapshotList,
+                                  'unfilteredSnapshotList' : unfilteredSnapshotList,
+                                  'filteredKeywordList' : filteredKeywordList,
+                                  'unfilteredKeywordList' : unfilteredKeywordList,
+                                  'keywordColors' : keywordColorList,
+                                  'clipNum' : self.ControlObject.currentObj.number,
+                                  'configName' : configName,
+                                  'loadDefault' : self.loadDefault,
+                                  'episode' : tmpEpisode}
 
                     # Draw the TimeLine values
                     self.draw_timeline(start, length)
 
                 elif self.ControlObject.currentObj != None:
                     self.waveform.AddText('Keyword Visualization - %s not implemented.' % type(self.ControlObject.currentObj), 5, 5)
+                    # There's no Keyword Visualization to compose
+                    kwMap = None
 
                 # By this point, we've already loaded the default and don't need to do it again.
                 self.loadDefault = False
 
-                # The Keyword / Hybrid visualization height can be self-adjusting.  Let's call that function.
-                self.resizeKeywordVisualization()
-
-                # If we're bulding a Hybrid visualization, so far we've created and stored the waveform, then
-                # wiped it out in favor of an offset Keyword visualization.  Here, we combine the two
-                # visualizations!  If waveforFilename has been cleared, we're waveforming and shouldn't do this yet!
-                if (self.VisualizationType == 'Hybrid'):
-                    # Here's a trick.  By setting the waveform's backgroundImage but NOT setting the
-                    # backgroundGraphicName, you can add a background image to the GraphicsControlClass
-                    # that does not resize to fill the image.  The current offset Keyword visualization
-                    # with the waveform overlaid as a background image works pretty well!
-                    self.waveform.backgroundImage = hybridWaveform
+            # If there's a waveform or a Keyword Visualization to compose ...
+            if (waveFilename != None) or (kwMap != None):
+                # ... compose it in the background.  OnVisualizationReady() displays it when it's done.  For a Hybrid
+                # visualization, the waveform is drawn above the offset Keyword visualization.
+                self.kwMapPending = kwMap
+                VisualizationThread(self, self.renderGeneration, waveFilename, waveStart, waveLength,
+                                    tuple(self.waveform.canvassize), kwMap, kwMapSetup, self.VisualizationType == 'Hybrid')
 
             if self.VisualizationType == 'Text-Keyword':
                 # Clear the Visualization
@@ -915,6 +1018,58 @@ class VisualizationWindow(wx.Dialog):
                     # Make sure the Position Cursor is drawn on the Waveform
                     self.UpdatePosition(self.ControlObject.GetVideoPosition())
 
+    def OnVisualizationReady(self, generation, image, waveformImage, kwMap):
+        """ Display a visualization that has been composed in the background by a VisualizationThread """
+        # If a newer render has been started or requested since this visualization was started, or if the visualization
+        # is not wanted any more, ignore it.
+        if (generation != self.renderGeneration) or self.redrawWhenIdle or self.ControlObject.shuttingDown or \
+           (not self.VisualizationType in ['Waveform', 'Keyword', 'Hybrid']):
+            return
+        # The Keyword Visualization is no longer being composed
+        self.kwMapPending = None
+        # If the visualization could not be composed ...
+        if image == None:
+            # ... clear the visualization, as we can't show it.
+            self.ClearVisualization()
+            self.redrawWhenIdle = False
+            return
+        # If we have a Waveform visualization ...
+        if kwMap == None:
+            # ... set the image as the waveform background
+            self.waveform.SetBackgroundGraphic(image)
+        # If we have a Keyword or Hybrid visualization ...
+        else:
+            # The new Keyword Visualization object replaces the old one
+            self.kwMap = kwMap
+            # Attach the waveform to the Keyword Visualization for mouse-overs and for redrawing after filtering
+            self.kwMap.AttachGraphic(self.waveform)
+            # If we have a Hybrid visualization ...
+            if self.VisualizationType == 'Hybrid':
+                # ... show the image, remembering the waveform so the Filter can draw the Keyword Visualization over it
+                self.waveform.SetVisualizationImage(image, waveformImage)
+            else:
+                self.waveform.SetVisualizationImage(image)
+            # Enable the Filter button
+            self.filter.Enable(True)
+            # If there is a Default filter configuration to load ...
+            if self.kwMap.defaultConfigPending:
+                self.kwMap.defaultConfigPending = False
+                # We actually need to wipe out the original graphic prior to loading the Default filter!  (The Hybrid
+                # visualization's waveform is kept.)
+                self.waveform.Clear(reset=False)
+                # Trigger the load of the Default filter.  An event of None signals we're loading the Default config,
+                # and the OnFilter method will handle drawing the graph!  The Filter Dialog requires the main thread.
+                self.kwMap.OnFilter(None)
+            # The Keyword / Hybrid visualization height can be self-adjusting.  Let's call that function.
+            self.resizeKeywordVisualization()
+        # Signal the need to redraw the control, including the cursor and selection
+        self.waveform.reInitBuffer = True
+
+    def CancelRender(self):
+        """ Discard any visualization still being composed in the background, and stop composing it """
+        self.renderGeneration += 1
+        self.kwMapPending = None
+
     def resizeKeywordVisualization(self):
         """ The Keyword Visualization (and Hybrid) should auto-resize under some circumstances.  This method implements that. """
 
@@ -1065,7 +1220,8 @@ class VisualizationWindow(wx.Dialog):
                 self.ControlObject.SetVideoSelection(self.startPoint, self.endPoint)
                 # Draw the TimeLine values
                 self.draw_timeline(self.ControlObject.VideoStartPoint, self.ControlObject.GetMediaLength())
-            # Signal that the Waveform Graphic should be updated
+            # Signal that the Waveform Graphic should be updated, and that the current one is no longer needed
+            self.CancelRender()
             self.redrawWhenIdle = True
             # Remember the new visualization zoom and filter information
             self.SaveVisualizationInfo((type(self.VisualizationObject), self.VisualizationObject.number))
@@ -1085,6 +1241,8 @@ class VisualizationWindow(wx.Dialog):
             # Draw the TimeLine values
             self.draw_timeline(self.ControlObject.VideoStartPoint, self.ControlObject.GetMediaLength())
 
+            # Redraw the waveform.  The current one is no longer needed.
+            self.CancelRender()
             self.redrawWhenIdle = True
             # Clear the Start and End points of the Visualization Selection
             self.startPoint = self.ControlObject.VideoStartPoint
@@ -1110,7 +1268,8 @@ class VisualizationWindow(wx.Dialog):
 
             # Draw the TimeLine values
             self.draw_timeline(self.ControlObject.VideoStartPoint, self.ControlObject.GetMediaLength())
-            # Redraw the waveform
+            # Redraw the waveform.  The current one is no longer needed.
+            self.CancelRender()
             self.redrawWhenIdle = True
             # Remember the new visualization zoom and filter information
             self.SaveVisualizationInfo((type(self.VisualizationObject), self.VisualizationObject.number))
@@ -1153,7 +1312,8 @@ class VisualizationWindow(wx.Dialog):
                     self.startPoint = 0
                     self.endPoint = currWidth
                     self.zoomInfo[-1] = (0, self.zoomInfo[-1][1])
-                # Signal that we need to re-draw the visualization
+                # Signal that we need to re-draw the visualization, and that the current one is no longer needed
+                self.CancelRender()
                 self.redrawWhenIdle = True
                 
             # If a Scroll Right has been requested...
@@ -1172,7 +1332,8 @@ class VisualizationWindow(wx.Dialog):
                     self.endPoint = totalWidth
                     self.zoomInfo[-1] = (self.startPoint, self.zoomInfo[-1][1])
 
-                # Signal that we need to re-draw the visualization
+                # Signal that we need to re-draw the visualization, and that the current one is no longer needed
+                self.CancelRender()
                 self.redrawWhenIdle = True
 
     def OnLoop(self, event):
@@ -1231,6 +1392,8 @@ class VisualizationWindow(wx.Dialog):
     # Public methods
     def ClearVisualization(self):
         """Clear the display."""
+        # Any visualization being composed is no longer needed
+        self.CancelRender()
         # Clear zoom level information
         self.zoomInfo = [self.zoomInfo[0]]
         self.startPoint = self.zoomInfo[0][0]
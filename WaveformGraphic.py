@@ -25,16 +25,456 @@ if DEBUG:
 import wx
 # Import Transana's Dialogs
 import Dialogs
+# Import numpy
+import numpy
+# Import Python's os module
+import os
+# Import Python's struct module for reading the Wave file header
+import struct
 # Import Python's sys module
 import sys
+# Import Python's tempfile module
+import tempfile
+# Import Python's threading module
+import threading
 # Import Python's wave module for processing Wave files
 import wave
 
+# The maximum number of samples converted in a single pass when processing wave data.
+# This limits memory use for very long media files.
+BLOCK_SIZE = 2 ** 20
 
-# import numpy
+# Sample formats for the sample widths we can process:  (numpy data type, value of silence, scaling factor)
+SAMPLE_FORMATS = {1 : (numpy.uint8, 128.0, 128.0),
+                  2 : (numpy.dtype('<i2'), 0.0, 32768.0),
+                  4 : (numpy.dtype('<i4'), 0.0, 2147483648.0)}
 
 
-def WaveformGraphicCreate(waveFilename, waveformFilename, startPoint, mediaLength, graphicSize, colors = (wx.CYAN, wx.GREEN, wx.BLUE, wx.RED), style='waveform'):
+def WaveDataChunk(waveFilename):
+    """ Locate the sample data in a RIFF Wave file.  Returns (offset, length) for the 'data' chunk, in bytes. """
+    # Open the file in binary mode
+    f = open(waveFilename, 'rb')
+    try:
+        # Read the RIFF header
+        (riffID, riffSize, waveID) = struct.unpack('<4sI4s', f.read(12))
+        if (riffID != 'RIFF') or (waveID != 'WAVE'):
+            raise wave.Error, 'file does not start with RIFF id'
+        # Iterate through the file's chunks until we find the data
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise wave.Error, 'data chunk missing'
+            (chunkID, chunkSize) = struct.unpack('<4sI', header)
+            if chunkID == 'data':
+                return (f.tell(), chunkSize)
+            # Skip this chunk.  Chunks are padded to an even number of bytes.
+            f.seek(chunkSize + (chunkSize % 2), 1)
+    finally:
+        f.close()
+
+class WaveSamples(object):
+    """ Memory-mapped access to the samples of a Wave file, so only the parts of the file needed are read """
+    def __init__(self, waveFilename):
+        # Get the Wave file's parameters
+        waveFile = wave.open(waveFilename, 'r')
+        (self.channels, self.sampleWidth, self.frameRate) = (waveFile.getnchannels(), waveFile.getsampwidth(), waveFile.getframerate())
+        frameCount = waveFile.getnframes()
+        waveFile.close()
+        # If we don't know how to process this sample width, signal the problem
+        if not SAMPLE_FORMATS.has_key(self.sampleWidth):
+            raise wave.Error, 'unsupported sample width: %d' % self.sampleWidth
+        (dataType, self.silence, self.scale) = SAMPLE_FORMATS[self.sampleWidth]
+        # Find the sample data.  Don't trust the header's frame count beyond the data actually present.
+        (dataOffset, dataLength) = WaveDataChunk(waveFilename)
+        self.frameCount = min(frameCount, dataLength / (self.sampleWidth * self.channels))
+        # Memory-map the sample data, if there is any
+        if self.frameCount > 0:
+            self.samples = numpy.memmap(waveFilename, dtype=dataType, mode='r', offset=dataOffset,
+                                        shape=(self.frameCount * self.channels,))
+        else:
+            self.samples = numpy.zeros(0, dtype=dataType)
+
+    def ColumnCount(self, startFrame, framesPerColumn, numColumns):
+        """ Determine how many of numColumns columns of framesPerColumn frames, starting at startFrame, have data """
+        framesAvailable = max(self.frameCount - startFrame, 0)
+        return max(min(numColumns, (framesAvailable + framesPerColumn - 1) / framesPerColumn), 0)
+
+    def Blocks(self, startFrame, framesPerColumn, numColumns):
+        """ Generator that yields (firstColumn, samples) for groups of whole columns, with samples converted to the
+            -1.0 to 1.0 range.  The final column may be short if the file ends first. """
+        samplesPerColumn = framesPerColumn * self.channels
+        columnsPerBlock = max(BLOCK_SIZE / samplesPerColumn, 1)
+        for blockStart in range(0, numColumns, columnsPerBlock):
+            blockEnd = min(blockStart + columnsPerBlock, numColumns)
+            block = self.samples[(startFrame + blockStart * framesPerColumn) * self.channels :
+                                 (startFrame + blockEnd * framesPerColumn) * self.channels]
+            yield (blockStart, (block.astype(numpy.float32) - self.silence) / self.scale)
+
+    def Close(self):
+        """ Release the memory map """
+        self.samples = None
+
+def WaveformEnvelope(waveFilename, startFrame, framesPerColumn, numColumns):
+    """ Calculate the waveform envelope of a Wave file for drawing.  Beginning at startFrame, each of numColumns
+        columns summarizes framesPerColumn frames across all channels.  Returns a tuple of numpy arrays
+        (minimums, maximums) with values from -1.0 to 1.0.  The arrays are shorter than numColumns if the
+        Wave file ends first. """
+    waveSamples = WaveSamples(waveFilename)
+    framesPerColumn = max(int(framesPerColumn), 1)
+    startFrame = max(int(startFrame), 0)
+    numColumns = waveSamples.ColumnCount(startFrame, framesPerColumn, int(numColumns))
+    samplesPerColumn = framesPerColumn * waveSamples.channels
+    # Initialize the result arrays
+    minimums = numpy.zeros(numColumns)
+    maximums = numpy.zeros(numColumns)
+    # Process the data a block at a time, calculating the values for all of a block's columns at once
+    for (blockStart, block) in waveSamples.Blocks(startFrame, framesPerColumn, numColumns):
+        # Determine where each column starts within the block
+        indexes = numpy.arange(0, len(block), samplesPerColumn)
+        blockEnd = blockStart + len(indexes)
+        minimums[blockStart : blockEnd] = numpy.minimum.reduceat(block, indexes)
+        maximums[blockStart : blockEnd] = numpy.maximum.reduceat(block, indexes)
+    waveSamples.Close()
+    return (minimums, maximums)
+
+def WaveformSpectrum(waveFilename, startFrame, framesPerColumn, numColumns, numRows):
+    """ Calculate a spectrogram of a Wave file.  Returns a 2-dimensional numpy array of intensities from
+        0 to 255, with one row for each of up to numRows frequency bands and one column per whole column of data. """
+    waveSamples = WaveSamples(waveFilename)
+    framesPerColumn = max(int(framesPerColumn), 1)
+    startFrame = max(int(startFrame), 0)
+    # Only whole columns can be included in the spectrogram
+    numColumns = max(min(int(numColumns), (waveSamples.frameCount - startFrame) / framesPerColumn), 0)
+    samplesPerColumn = framesPerColumn * waveSamples.channels
+    results = numpy.zeros((min(numRows, samplesPerColumn / 2 + 1), numColumns), dtype=numpy.int32)
+    for (blockStart, block) in waveSamples.Blocks(startFrame, framesPerColumn, numColumns):
+        # Arrange the block's samples with one column's data per row, using the magnitude of the signal
+        columns = numpy.abs(block.reshape((-1, samplesPerColumn)))
+        # Calculate the spectrum of all the block's columns at once, ignoring log(0) warnings
+        oldSettings = numpy.seterr(divide='ignore')
+        spectrum = 10 * numpy.log10(numpy.abs(numpy.fft.rfft(columns, axis=1)))
+        numpy.seterr(**oldSettings)
+        spectrum[numpy.isinf(spectrum)] = 0
+        results[:, blockStart : blockStart + len(columns)] = numpy.clip(5 * spectrum[:, :results.shape[0]].T, 0, 255).astype(numpy.int32)
+    waveSamples.Close()
+    return results
+
+# Peak Files hold the waveform envelope of an extracted Wave file at several resolutions, so that
+# zooming and scrolling the waveform don't require reading the whole Wave file.
+# The Peak File extension
+PEAK_FILE_EXTENSION = '.pk'
+# The Peak File identifier and format version
+PEAK_FILE_ID = 'TPK1'
+PEAK_FILE_VERSION = 1
+# The Peak File header:  ID, version, frame count, base decimation, number of levels, Wave file size, Wave file modification time
+PEAK_FILE_HEADER = '<4sIQIIQd'
+# The number of frames summarized by each min/max pair at the finest level of the peak pyramid.
+# Each following level summarizes twice as many frames as the one before it.
+PEAK_BASE_DECIMATION = 16
+# Peak values are stored as 16-bit integers
+PEAK_SCALE = 32767.0
+
+# The errors that mean a Peak File can't be created or used
+PEAK_FILE_ERRORS = (wave.Error, EnvironmentError, ValueError)
+# The number of times to try creating a Peak File before giving up on it
+PEAK_FILE_ATTEMPTS = 2
+
+# Wave files for which a Peak File could not be created, with the Wave file's size and modification time when
+# it failed, so we don't keep trying unless the Wave file changes
+_peakFileFailures = {}
+# A lock for each Wave file, so only one thread at a time creates or replaces its Peak File
+_peakFileLocks = {}
+_peakFileLocksLock = threading.Lock()
+
+
+def PeakFilename(waveFilename):
+    """ Get the name of the Peak File for a Wave file """
+    return os.path.splitext(waveFilename)[0] + PEAK_FILE_EXTENSION
+
+def PeakFileLock(waveFilename):
+    """ Get the lock that must be held while the Peak File for a Wave file is created """
+    _peakFileLocksLock.acquire()
+    try:
+        key = os.path.normcase(os.path.abspath(waveFilename))
+        if not _peakFileLocks.has_key(key):
+            _peakFileLocks[key] = threading.RLock()
+        return _peakFileLocks[key]
+    finally:
+        _peakFileLocksLock.release()
+
+def CreatePeakFile(waveFilename):
+    """ Create the Peak File for a Wave file, holding min/max pairs at power-of-two decimation levels """
+    lock = PeakFileLock(waveFilename)
+    lock.acquire()
+    try:
+        _CreatePeakFile(waveFilename)
+    finally:
+        lock.release()
+    # A new Peak File clears any earlier failure
+    if _peakFileFailures.has_key(waveFilename):
+        del(_peakFileFailures[waveFilename])
+
+def _CreatePeakFile(waveFilename):
+    """ Create the Peak File for a Wave file.  The caller must hold the Wave file's Peak File lock. """
+    # Calculate the finest level of the peak pyramid from the Wave file in a single pass
+    (minimums, maximums) = WaveformEnvelope(waveFilename, 0, PEAK_BASE_DECIMATION, sys.maxint)
+    frameCount = WaveSamples(waveFilename).frameCount
+    # Convert the values to 16-bit integers
+    minimums = numpy.round(minimums * PEAK_SCALE).astype('<i2')
+    maximums = numpy.round(maximums * PEAK_SCALE).astype('<i2')
+    levels = []
+    # Build each level of the pyramid from the one before it until a level has a single value
+    while True:
+        levels.append(numpy.column_stack((minimums, maximums)))
+        if len(minimums) <= 1:
+            break
+        # If a level has an odd number of values, repeat the last one so values can be paired
+        if len(minimums) % 2 == 1:
+            minimums = numpy.append(minimums, minimums[-1])
+            maximums = numpy.append(maximums, maximums[-1])
+        minimums = minimums.reshape((-1, 2)).min(axis=1)
+        maximums = maximums.reshape((-1, 2)).max(axis=1)
+    # Note the Wave file's size and modification time so we can tell if the Peak File is out of date
+    waveStat = os.stat(waveFilename)
+    # Write the Peak File to a uniquely named temporary file in the same folder first, so a partial Peak File
+    # is never used and another process creating the same Peak File can't write to the same temporary file
+    peakFilename = PeakFilename(waveFilename)
+    (handle, tempFilename) = tempfile.mkstemp(suffix=PEAK_FILE_EXTENSION + '.tmp', dir=os.path.dirname(os.path.abspath(peakFilename)))
+    try:
+        f = os.fdopen(handle, 'wb')
+        try:
+            f.write(struct.pack(PEAK_FILE_HEADER, PEAK_FILE_ID, PEAK_FILE_VERSION, frameCount, PEAK_BASE_DECIMATION,
+                                len(levels), waveStat.st_size, waveStat.st_mtime))
+            for level in levels:
+                f.write(level.tostring())
+        finally:
+            f.close()
+        # Replace any existing Peak File with the new one.  (Windows can't rename over an existing file.)
+        if ('wxMSW' in wx.PlatformInfo) and os.path.exists(peakFilename):
+            os.remove(peakFilename)
+        os.rename(tempFilename, peakFilename)
+    except:
+        # Don't leave the temporary file behind
+        if os.path.exists(tempFilename):
+            os.remove(tempFilename)
+        raise
+
+class PeakFile(object):
+    """ Memory-mapped access to a Peak File.  Raises wave.Error if the Peak File is missing, invalid, or
+        out of date with respect to its Wave file. """
+    def __init__(self, waveFilename):
+        peakFilename = PeakFilename(waveFilename)
+        if not os.path.exists(peakFilename):
+            raise wave.Error, 'peak file missing'
+        # Read the header
+        headerSize = struct.calcsize(PEAK_FILE_HEADER)
+        f = open(peakFilename, 'rb')
+        header = f.read(headerSize)
+        f.close()
+        if len(header) < headerSize:
+            raise wave.Error, 'peak file header invalid'
+        (peakID, version, self.frameCount, self.baseDecimation, levelCount, waveSize, waveMTime) = struct.unpack(PEAK_FILE_HEADER, header)
+        # Make sure the Peak File matches the current Wave file
+        waveStat = os.stat(waveFilename)
+        if (peakID != PEAK_FILE_ID) or (version != PEAK_FILE_VERSION) or (waveSize != waveStat.st_size) or (waveMTime != waveStat.st_mtime):
+            raise wave.Error, 'peak file out of date'
+        # Memory-map each level of the pyramid
+        self.levels = []
+        offset = headerSize
+        bucketCount = (self.frameCount + self.baseDecimation - 1) / self.baseDecimation
+        # (An empty Wave file has no levels to map.)
+        if bucketCount > 0:
+            for level in range(levelCount):
+                self.levels.append(numpy.memmap(peakFilename, dtype='<i2', mode='r', offset=offset, shape=(bucketCount, 2)))
+                offset += bucketCount * 4
+                bucketCount = (bucketCount + 1) / 2
+
+    def Envelope(self, startFrame, framesPerColumn, numColumns):
+        """ Calculate the waveform envelope, like WaveformEnvelope(), from the coarsest level of the pyramid that
+            has enough detail.  Returns (minimums, maximums), or None if the Peak File is not detailed enough. """
+        if (framesPerColumn < self.baseDecimation) or (len(self.levels) == 0):
+            return None
+        # Select the pyramid level with the largest buckets that are no bigger than a column
+        level = min(int(numpy.log2(framesPerColumn / self.baseDecimation)), len(self.levels) - 1)
+        bucketSize = self.baseDecimation * (2 ** level)
+        peaks = self.levels[level]
+        # Determine which bucket each column starts in, dropping columns past the end of the data
+        firstFrames = startFrame + numpy.arange(numColumns) * framesPerColumn
+        indexes = firstFrames[firstFrames < self.frameCount] / bucketSize
+        if len(indexes) == 0:
+            return (numpy.zeros(0), numpy.zeros(0))
+        # Read only the buckets needed for the columns requested
+        firstBucket = indexes[0]
+        lastBucket = min((startFrame + numColumns * framesPerColumn + bucketSize - 1) / bucketSize, len(peaks))
+        block = numpy.array(peaks[firstBucket : lastBucket])
+        indexes = indexes - firstBucket
+        # Combine each column's buckets
+        minimums = numpy.minimum.reduceat(block[:, 0], indexes) / PEAK_SCALE
+        maximums = numpy.maximum.reduceat(block[:, 1], indexes) / PEAK_SCALE
+        return (minimums, maximums)
+
+def PeakEnvelope(waveFilename, startFrame, framesPerColumn, numColumns):
+    """ Calculate the waveform envelope for a Wave file from its Peak File, creating the Peak File if needed.
+        Returns (minimums, maximums), or None if the Peak File can't be used. """
+    try:
+        peakFile = PeakFile(waveFilename)
+    except PEAK_FILE_ERRORS:
+        # If the envelope wouldn't use the Peak File anyway, don't create it
+        if framesPerColumn < PEAK_BASE_DECIMATION:
+            return None
+        # If we've already failed to create a Peak File for this version of the Wave file, give up
+        try:
+            waveStat = os.stat(waveFilename)
+        except EnvironmentError:
+            return None
+        if _peakFileFailures.get(waveFilename) == (waveStat.st_size, waveStat.st_mtime):
+            return None
+        # Otherwise, create the Peak File, holding the Wave file's lock so only one thread creates it
+        lock = PeakFileLock(waveFilename)
+        lock.acquire()
+        try:
+            for attempt in range(PEAK_FILE_ATTEMPTS):
+                try:
+                    # Another thread may have created the Peak File while we waited for the lock
+                    try:
+                        peakFile = PeakFile(waveFilename)
+                    except PEAK_FILE_ERRORS:
+                        CreatePeakFile(waveFilename)
+                        peakFile = PeakFile(waveFilename)
+                    break
+                except PEAK_FILE_ERRORS:
+                    if DEBUG:
+                        import traceback
+                        traceback.print_exc(file=sys.stdout)
+                    # If that was the last attempt, remember the failure until the Wave file changes
+                    if attempt == PEAK_FILE_ATTEMPTS - 1:
+                        _peakFileFailures[waveFilename] = (waveStat.st_size, waveStat.st_mtime)
+                        return None
+        finally:
+            lock.release()
+    return peakFile.Envelope(max(int(startFrame), 0), max(int(framesPerColumn), 1), int(numColumns))
+
+
+def WaveformGraphicData(waveFilename, startPoint, mediaLength, graphicSize, style='waveform', cancelled=None):
+    """ Calculate the lines (for a waveform) or points (for a spectrogram) that WaveformGraphicCreate() draws.
+        This reads the wave data but does no drawing, so it can be done in a background thread.  Returns a list of
+        (colorIndex, data) entries in drawing order, where colorIndex is the index of the waveform's color counted
+        from the end of the color list and data is a list of lines or a (points, intensities) tuple.  If cancelled
+        is passed, it is checked before each wave file is read, and None is returned if it returns True. """
+    # Initialize the list of graphic data
+    graphicData = []
+    # Initialize the Color Index
+    colorIndex = 0
+    # Iterate through the wave files to be processed, in reverse order
+    for wavFileIndex in range(len(waveFilename) - 1, -1, -1):
+        # If the waveFilename entry doesn't HAVE a "Show" value, or if it has one that is set to True,
+        # then draw this waveform.  ie default to show, only don't show if SHOW exists and is False.
+        if (not waveFilename[wavFileIndex].has_key('Show')) or waveFilename[wavFileIndex]['Show']:
+            # If the graphic is no longer needed, stop here
+            if (cancelled != None) and cancelled():
+                return None
+            # Get the wave file name
+            wavFile = waveFilename[wavFileIndex]
+
+            # Open the Wave File  (NOTE:  Python 2.4.2 can take a Unicode filename here.  Python 2.3.5 can't.)
+            waveFile = wave.open(wavFile['filename'], 'r')            
+              
+            # Added for Batch Waveform Generation, when we don't know the media file length
+            if mediaLength <= 0:
+                # Calculate it from the length of the wave file
+                mediaLength = waveFile.getnframes() * 1000
+
+            # Read the appropriate number of frames to position properly in the wave file
+            # Number of seconds into the file * Frame Rate
+
+            # The frame in the wave file where drawing starts
+            startFrame = 0
+
+            # If we are at the beginning of the virtual media file ...
+            if startPoint == 0:
+                # ... the start point for THIS media file needs to be adjusted for its offset
+                sp = int((float(wavFile['offset']) / float(mediaLength)) * (graphicSize[0] - 1))
+                # ... and the end point for THIS media file needs to be determined based on offset and length
+                ep = int((float(wavFile['offset'] + wavFile['length']) / float(mediaLength)) * (graphicSize[0] - 1)) + 2
+            # If we are NOT at the beginning of the virtual media file ...
+            else:
+                # ... Adjust the offset for THIS media file by the value of the Clip starting point
+
+                # Hmmmm.  I don't understand this.  If the offset is negative, we need to ignore it, as it shifts the
+                # waveform, but if it's positive, we need to compensate for it.
+
+#                if wavFile['offset'] < 0:
+#                    print "***********     ALERT     WaveformGraphic.OnIdle() change     ALERT     ****************"
+                    
+#                indent = max(0, wavFile['offset']) - startPoint
+                indent = wavFile['offset'] - startPoint
+
+                # If we have a positive value ...
+                if indent >= 0:
+                    # ... then we can use that.
+                    sp = int((float(indent) / float(mediaLength)) * (graphicSize[0] - 1))
+                # If we have a negative value (clip starts before this media file's start) ...
+                else:
+                    # ... then set the media to the beginning.  It'll join in later.
+                    sp = 0
+
+                    if DEBUG:
+                        print "read to ",float(abs(indent)) / 1000.0 * waveFile.getframerate(),"frames"
+
+                    # Indent the wave file the appropriate number of frames to get to the right part of the wave file
+                    startFrame = int(float(abs(indent)) / 1000.0 * waveFile.getframerate())
+
+#                    print "**", startPoint, indent, float(abs(indent)) / 1000.0 * waveFile.getframerate(), float(indent) / 1000.0 * waveFile.getframerate()
+
+                # If we're in a clip, the ending point can be determined by looking at the waveform's WIDTH!!
+                ep = graphicSize[0] - 1
+
+            # Calculate the total number of frames in the wave file
+            totalFramesToRead = float(mediaLength)/1000.0 * waveFile.getframerate()
+
+            # Calculate the number of WAVE data chunks to be read per line displayed in the graphic,
+            # This value must be at least 1.
+            ChunkSize = max(int(round(totalFramesToRead / graphicSize[0])), 1)
+
+            if DEBUG and (totalFramesToRead / graphicSize[0] < 1):
+                print "\n\nTODO:  Zoomed in so that Number of Lines is less than Graphic Width!!\n\n"
+
+
+            # If we're drawing a waveform ...
+            if style == 'waveform':
+                # ... get the minimum and maximum values for every pixel column from the Peak File if possible
+                envelope = PeakEnvelope(wavFile['filename'], startFrame, ChunkSize, ep - sp)
+                # If the Peak File can't be used ...
+                if envelope == None:
+                    # ... calculate the values in a single pass through the wave data
+                    (minimums, maximums) = WaveformEnvelope(wavFile['filename'], startFrame, ChunkSize, ep - sp)
+                else:
+                    (minimums, maximums) = envelope
+                # The horizontal values are the pixel columns
+                x = numpy.arange(sp, sp + len(minimums))
+                # The vertical values represent the divergence of the signal from the center of the graphic
+                center = graphicSize[1] / 2.0
+                y1 = numpy.round(center - maximums * center).astype(int)
+                y2 = numpy.round(center - minimums * center).astype(int)
+                # Remember the lines to be drawn
+                graphicData.append((colorIndex - len(waveFilename), numpy.column_stack((x, y1, x, y2)).tolist()))
+            # If we're drawing a spectrogram ...
+            elif style == 'spectrogram':
+                # ... calculate the spectrum intensities for every pixel column
+                spectrum = WaveformSpectrum(wavFile['filename'], startFrame, ChunkSize, ep - sp, graphicSize[1])
+                # Remember the points to be drawn and their intensities
+                (rows, columns) = [indexes.ravel() for indexes in numpy.indices(spectrum.shape)]
+                graphicData.append((colorIndex - len(waveFilename),
+                                    (numpy.column_stack((columns + sp, rows)).tolist(), spectrum[rows, columns])))
+
+            # Close the Wave File   
+            waveFile.close()
+        # Iterate the color index, so the next waveform will be in the next color
+        colorIndex += 1
+    return graphicData
+
+def WaveformGraphicDraw(graphicData, waveformFilename, graphicSize, colors = (wx.CYAN, wx.GREEN, wx.BLUE, wx.RED), style='waveform'):
+    """ Draw the graphic data calculated by WaveformGraphicData().  This must be done in the main thread. """
     try:
         # Create an Empty Bitmap
         theBitmap = wx.EmptyBitmap(graphicSize[0], graphicSize[1])
@@ -52,181 +492,28 @@ def WaveformGraphicCreate(waveFilename, waveformFilename, startPoint, mediaLengt
         # Begin drawing to the Device Context
         dc.BeginDrawing()
 
-        # Define the waveform colors, selecting just the number needed from the list, right-justified
-        waveformColors = colors[-len(waveFilename):]
-        # Initialize the Color Index
-        colorIndex = 0
-
 #        print "START"
         
-        # Iterate through the wave files to be processed, in reverse order
-        for wavFileIndex in range(len(waveFilename) - 1, -1, -1):
-            # If the waveFilename entry doesn't HAVE a "Show" value, or if it has one that is set to True,
-            # then draw this waveform.  ie default to show, only don't show if SHOW exists and is False.
-            if (not waveFilename[wavFileIndex].has_key('Show')) or waveFilename[wavFileIndex]['Show']:
-                # Get the wave file name
-                wavFile = waveFilename[wavFileIndex]
-                # Create a pen in the color this waveform should appear in
-                pen = wx.Pen(waveformColors[colorIndex], 1, wx.SOLID)
-                # Set the pen in the device context
-                dc.SetPen(pen)
-                
-                # Open the Wave File  (NOTE:  Python 2.4.2 can take a Unicode filename here.  Python 2.3.5 can't.)
-                waveFile = wave.open(wavFile['filename'], 'r')            
-                  
-                # Added for Batch Waveform Generation, when we don't know the media file length
-                if mediaLength <= 0:
-                    # Calculate it from the length of the wave file
-                    mediaLength = waveFile.getnframes() * 1000
-
-                # Read the appropriate number of frames to position properly in the wave file
-                # Number of seconds into the file * Frame Rate
-
-                # If we are at the beginning of the virtual media file ...
-                if startPoint == 0:
-                    # ... the start point for THIS media file needs to be adjusted for its offset
-                    sp = int((float(wavFile['offset']) / float(mediaLength)) * (graphicSize[0] - 1))
-                    # ... and the end point for THIS media file needs to be determined based on offset and length
-                    ep = int((float(wavFile['offset'] + wavFile['length']) / float(mediaLength)) * (graphicSize[0] - 1)) + 2
-                # If we are NOT at the beginning of the virtual media file ...
-                else:
-                    # ... Adjust the offset for THIS media file by the value of the Clip starting point
-
-                    # Hmmmm.  I don't understand this.  If the offset is negative, we need to ignore it, as it shifts the
-                    # waveform, but if it's positive, we need to compensate for it.
-
-#                    if wavFile['offset'] < 0:
-#                        print "***********     ALERT     WaveformGraphic.OnIdle() change     ALERT     ****************"
-                        
-#                    indent = max(0, wavFile['offset']) - startPoint
-                    indent = wavFile['offset'] - startPoint
-
-                    # If we have a positive value ...
-                    if indent >= 0:
-                        # ... then we can use that.
-                        sp = int((float(indent) / float(mediaLength)) * (graphicSize[0] - 1))
-                    # If we have a negative value (clip starts before this media file's start) ...
-                    else:
-                        # ... then set the media to the beginning.  It'll join in later.
-                        sp = 0
-
-                        if DEBUG:
-                            print "read to ",float(abs(indent)) / 1000.0 * waveFile.getframerate(),"frames"
-
-                        # Indent the wave file the appropriate number of frames to get to the right part of the wave file
-                        frames = waveFile.readframes(int(float(abs(indent)) / 1000.0 * waveFile.getframerate()))
-
-#                        print "**", startPoint, indent, float(abs(indent)) / 1000.0 * waveFile.getframerate(), float(indent) / 1000.0 * waveFile.getframerate()
-
-                    # If we're in a clip, the ending point can be determined by looking at the waveform's WIDTH!!
-                    ep = graphicSize[0] - 1
-
-                # Calculate the total number of frames in the wave file
-                totalFramesToRead = float(mediaLength)/1000.0 * waveFile.getframerate()
-
-                # Calculate the number of WAVE data chunks to be read per line displayed in the graphic,
-                # This value must be at least 1.
-                ChunkSize = max(int(round(totalFramesToRead / graphicSize[0])), 1)
-
-                if DEBUG and (totalFramesToRead / graphicSize[0] < 1):
-                    print "\n\nTODO:  Zoomed in so that Number of Lines is less than Graphic Width!!\n\n"
-
-
-                max1 = min1 = 0
-                
-                # Draw the actual WaveForm
-                # for each pixel position in the graphic's width ...
-                for loop in range(sp, ep):
-                    # Read the appropriate number of chunks from the wave file
-                    frames = waveFile.readframes(ChunkSize)
-
-                    # Don't break all of Transana if we couldn't extract the wave
-                    if len(frames) == 0:
-                        break
-
-                    # Determine the largest value in the data read (this produces the best-looking graph!)
-                    frame = max(frames)
-                    # Process the data differently based on the Bytes Per Sample value of the Wave File
-                    if waveFile.getsampwidth() == 1:
-                        if style == 'waveform':
-                            #This is for the 8-bit Bytes per Sample setting
-                            # The byte value represents sound, with 128 being silence and deviation from it being louder.
-                            # Therefore, determine the distance the Byte Value (frame) differs from silence.
-                            if ord(frame) > 128:
-                               amplitude = ord(frame) - 128
-                            else:
-                               amplitude = 128 - ord(frame)
-                            # Adjust the raw amplitude (0 .. 255 range) for the size of the graphic canvas
-                            amplitude = round(amplitude * graphicSize[1] / 256.0)
-                            # Determine the coordinates for drawing the amplitude line on the Device Context
-                            # The horizontal value equals the value of the loop
-                            x = loop
-                            # The vertical values represent the divergence of amplitude from the center of the graphic
-                            y1 = round((graphicSize[1]/2.0 - amplitude))
-                            y2 = round((graphicSize[1]/2.0 + amplitude))
-
-                            # draw the line on the Device Context
-                            dc.DrawLine(int(x), int(y1), int(x), int(y2))
-                        elif style == 'spectrogram':
-
-#                            print "Waveform style = spectrogram", sp, ep, ep-sp
-
-#                            print frames, type(frames), len(frames)
-#                            print
-
-                            sigList = []
-                            for loop2 in range(len(frames)):
-
-                                val = ord(frames[loop2])
-                                if val > 128:
-                                    sigList.append(val - 128)
-                                else:
-                                    sigList.append(128 - val)
-
-#                            print sigList
-#                            print
-
-                            max1 = max(max1, max(sigList))
-                            min1 = min(min1, min(sigList))
-
-                            sig = numpy.array(sigList)
-                            
-#                            print sig
-#                            print
-
-                            spectrum = 10*numpy.log10(abs(numpy.fft.rfft(sig)))
-
-#                            print spectrum, len(spectrum)
-
-#                            print "Max =", max1, "Min =", min1
-
-                            x = loop
-                            for loop2 in range(len(spectrum)):
-
-#                                print loop2, spectrum[loop2], type(spectrum[loop2]),
-
-                                if spectrum[loop2] in [numpy.inf, -numpy.inf]:
-                                    n = 0
-                                else:
-                                    n = max(0, int(5 * spectrum[loop2]))
-
-#                                    print 5 * spectrum[loop2], n
-
-                                    n = max(0, int(5 * spectrum[loop2]))
-                                
-                                pen.SetColour(wx.Colour(255-n, 255-n, 255-n))
-                                dc.SetPen(pen)
-                                dc.DrawPoint(x, loop2)
-                                              
-                        
-                    else:
-                        #This is for the 16-bit Bytes per Sample setting
-                        print "Waveform for 16-bit wave files not yet implemented."
-
-                # Close the Wave File   
-                waveFile.close()
-            # Iterate the color index, so the next waveform will be in the next color
-            colorIndex += 1
+        # Iterate through the waveforms to be drawn
+        for (colorIndex, data) in graphicData:
+            # Create a pen in the color this waveform should appear in
+            pen = wx.Pen(colors[colorIndex], 1, wx.SOLID)
+            # Set the pen in the device context
+            dc.SetPen(pen)
+
+            # If we're drawing a waveform ...
+            if style == 'waveform':
+                # Draw all the lines on the Device Context at once
+                dc.DrawLineList(data)
+            # If we're drawing a spectrogram ...
+            elif style == 'spectrogram':
+                (points, intensities) = data
+                # Create a gray pen for each intensity that is used
+                pens = {}
+                for n in numpy.unique(intensities):
+                    pens[n] = wx.Pen(wx.Colour(255 - int(n), 255 - int(n), 255 - int(n)), 1, wx.SOLID)
+                # Draw all the points on the Device Context at once
+                dc.DrawPointList(points, [pens[n] for n in intensities])
 
         # Draw a black line down the center of the Waveform to show the true center
         # Create the pen for making the drawing.  We want to draw in RED, 1 pixel width line, solid line.
@@ -273,3 +560,8 @@ def WaveformGraphicCreate(waveFilename, waveformFilename, startPoint, mediaLengt
         # We need to just pass the exception on up.  This routine is called from an IDLE event, and that event needs to know
         # to stop trying to create this file!!
         raise
+
+def WaveformGraphicCreate(waveFilename, waveformFilename, startPoint, mediaLength, graphicSize, colors = (wx.CYAN, wx.GREEN, wx.BLUE, wx.RED), style='waveform'):
+    # Calculate the graphic data from the wave files and draw it
+    return WaveformGraphicDraw(WaveformGraphicData(waveFilename, startPoint, mediaLength, graphicSize, style=style),
+                               waveformFilename, graphicSize, colors=colors, style=style)
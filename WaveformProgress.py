@@ -36,6 +36,8 @@ if __name__ == '__main__':
 import Misc
 # Import Transana's Global Variables
 import TransanaGlobal
+# Import Transana's Waveform Graphic module
+import WaveformGraphic
 
 ID_BTNCANCEL    =  wx.NewId()
 
@@ -360,6 +362,16 @@ class WaveformProgress(wx.Dialog):
             # De-reference the process
             self.process = None
             wx.YieldIfNeeded()
+            # If we've extracted audio for a waveform ...
+            if (self.mode in ['AudioExtraction', 'AudioExtraction-OLD']) and os.path.exists(self.destFile):
+                # ... create the waveform's Peak File now, so drawing the waveform doesn't need to read the whole wave file
+                try:
+                    WaveformGraphic.CreatePeakFile(self.destFile)
+                # If the Peak File can't be created, the waveform will be drawn from the wave file itself
+                except WaveformGraphic.PEAK_FILE_ERRORS:
+                    if DEBUG:
+                        import traceback
+                        traceback.print_exc(file=sys.stdout)
             # If we're allowing multiple threads ...
             if not self.showModally:
                 # ... inform the PARENT that this thread is complete for cleanup
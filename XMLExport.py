@@ -35,6 +35,8 @@ if TransanaConstants.USESRTC:
 import RichTextEditCtrl
 import cPickle
 import datetime
+# import Python's gzip module
+import gzip
 import pickle
 import os
 # import Python's Regular Expresions
@@ -45,6 +47,10 @@ import sys
 # Use UTF-8 regardless of the current encoding for consistency in the Transana XML files
 EXPORT_ENCODING = 'utf8'
 ENCODE_PROPERLY = True
+# The number of records to fetch from the database at a time
+EXPORT_FETCH_SIZE = 100
+# The size of the buffer used when writing the export file
+EXPORT_BUFFER_SIZE = 1048576
 
 class XMLExport(Dialogs.GenForm):
     """ This window displays a variety of GUI Widgets. """
@@ -197,10 +203,84 @@ class XMLExport(Dialogs.GenForm):
             # ... switch the text_factory from string to unicode here so we don't have to mess with decoding.
             db.text_factory = unicode
 
+        # Define the tables to export, in order.  For each table, we need the Progress Dialog prompt, the table name,
+        # the query, the XML tag for the table, the method that writes a record, and the number of records to fetch
+        # from the database at a time.  Documents and Transcripts can be very large, so we fetch those one at a time.
+        tables = [(_('Writing Library Records'), 'Series2',
+                   'SELECT SeriesNum, SeriesID, SeriesComment, SeriesOwner, DefaultKeywordGroup FROM Series2',
+                   'SeriesFile', self.WriteSeriesRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Document Records  (This will seem slow because of the size of the Document Records.)'), 'Documents2',
+                   'SELECT DocumentNum, DocumentID, LibraryNum, Author, Comment, ImportedFile, ImportDate, DocumentLength, XMLText FROM Documents2',
+                   'DocumentFile', lambda f, documentRec: self.WriteDocumentRec(f, progress, documentRec), 1),
+                  (_('Writing Episode Records'), 'Episodes2',
+                   'SELECT EpisodeNum, EpisodeID, SeriesNum, TapingDate, MediaFile, EpLength, EpComment FROM Episodes2',
+                   'EpisodeFile', self.WriteEpisodeRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Core Data Records'), 'CoreData2',
+                   """SELECT CoreDataNum, Identifier, Title, Creator, Subject, Description, Publisher,
+                             Contributor, DCDate, DCType, Format, Source, Language, Relation, Coverage, Rights
+                             FROM CoreData2""",
+                   'CoreDataFile', self.WriteCoreDataRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Collection Records'), 'Collections2',
+                   'SELECT CollectNum, CollectID, ParentCollectNum, CollectComment, CollectOwner, DefaultKeywordGroup FROM Collections2',
+                   'CollectionFile', self.WriteCollectionRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Quote Records'), 'Quotes2',
+                   'SELECT QuoteNum, QuoteID, CollectNum, SourceDocumentNum, SortOrder, Comment, XMLText FROM Quotes2',
+                   'QuoteFile', self.WriteQuoteRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Quote Position Records'), 'QuotePositions2',
+                   'SELECT QuoteNum, DocumentNum, StartChar, EndChar FROM QuotePositions2',
+                   'QuotePositionFile', self.WriteQuotePosRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Clip Records'), 'Clips2',
+                   'SELECT ClipNum, ClipID, CollectNum, EpisodeNum, MediaFile, ClipStart, ClipStop, ClipOffset, Audio, ' + \
+                   'ClipComment, SortOrder FROM Clips2',
+                   'ClipFile', self.WriteClipRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Additional Media File Records'), 'AdditionalVids2',
+                   'SELECT AddVidNum, EpisodeNum, ClipNum, MediaFile, VidLength, Offset, Audio FROM AdditionalVids2',
+                   'AdditionalVidsFile', self.WriteAdditionalMediaFileRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Transcript Records  (This will seem slow because of the size of the Transcript Records.)'), 'Transcripts2',
+                   'SELECT TranscriptNum, TranscriptID, EpisodeNum, SourceTranscriptNum, ClipNum, SortOrder, Transcriber, ' + \
+                   'ClipStart, ClipStop, Comment, MinTranscriptWidth, RTFText FROM Transcripts2',
+                   'TranscriptFile', lambda f, transcriptRec: self.WriteTranscriptRec(f, progress, transcriptRec), 1),
+                  (_('Writing Snapshot Records'), 'Snapshots2',
+                   'SELECT SnapshotNum, SnapshotID, CollectNum, ImageFile, ImageScale, ImageCoordsX, ImageCoordsY, ' + \
+                   'ImageSizeW, ImageSizeH, EpisodeNum, TranscriptNum, SnapshotTimeCode, SnapshotDuration, ' + \
+                   'SnapshotComment, SortOrder FROM Snapshots2',
+                   'SnapshotFile', self.WriteSnapshotRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Keyword Records'), 'Keywords2',
+                   'SELECT KeywordGroup, Keyword, Definition, LineColorName, LineColorDef, DrawMode, LineWidth, LineStyle FROM Keywords2',
+                   'KeywordFile', self.WriteKeywordRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Clip Keyword Records'), 'ClipKeywords2',
+                   'SELECT EpisodeNum, DocumentNum, ClipNum, QuoteNum, SnapshotNum, KeywordGroup, Keyword, Example FROM ClipKeywords2',
+                   'ClipKeywordFile', self.WriteClipKeywordRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Snapshot Keywords Records'), 'SnapshotKeywords2',
+                   'SELECT SnapshotNum, KeywordGroup, Keyword, x1, y1, x2, y2, visible FROM SnapshotKeywords2',
+                   'SnapshotKeywordFile', self.WriteSnapshotKeywordRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Snapshot Coding Style Records'), 'SnapshotKeywordStyles2',
+                   'SELECT SnapshotNum, KeywordGroup, Keyword, DrawMode, LineColorName, LineColorDef, LineWidth, LineStyle ' + \
+                   'FROM SnapshotKeywordStyles2',
+                   'SnapshotKeywordStyleFile', self.WriteSnapshotKeywordStyleRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Note Records'), 'Notes2',
+                   'SELECT NoteNum, NoteID, SeriesNum, EpisodeNum, CollectNum, ClipNum, SnapshotNum, DocumentNum, ' + \
+                   'QuoteNum, TranscriptNum, NoteTaker, NoteText FROM Notes2',
+                   'NoteFile', self.WriteNoteRec, EXPORT_FETCH_SIZE),
+                  (_('Writing Filter Records'), 'Filters2',
+                   'SELECT ReportType, ReportScope, ConfigName, FilterDataType, FilterData FROM Filters2',
+                   'FilterFile', self.WriteFilterRec, None)]
+
+        # Initialize the Progress Dialog values, which are based on the number of records written
+        self.progressValue = 0
+        self.recordsWritten = 0
+        self.recordCount = 0
+
         try:
             fs = self.XMLFile.GetValue()
+            # If the file name ends with ".gz", the export file should be compressed
+            compress = (fs[-3:].lower() == '.gz')
+            if compress:
+                fs = fs[:-3]
             if (fs[-4:].lower() != '.xml') and (fs[-4:].lower() != '.tra'):
                 fs = fs + '.tra'
+            if compress:
+                fs = fs + '.gz'
             # On the Mac, if no path is specified, the data is exported to a file INSIDE the application bundle, 
             # where no one will be able to find it.  Let's put it in the user's HOME directory instead.
             # I'm okay with not handling this on Windows, where it will be placed in the Program's folder
@@ -211,7 +291,14 @@ class XMLExport(Dialogs.GenForm):
                 if fs.find(os.sep) == -1:
                     # ... then prepend the HOME folder
                     fs = os.getenv("HOME") + os.sep + fs
-            f = file(fs, 'w')
+            # If we're compressing the export file ...
+            if compress:
+                # ... open a gzip file
+                f = gzip.open(fs, 'wb')
+            # If not ...
+            else:
+                # ... open the file with a large write buffer
+                f = file(fs, 'w', EXPORT_BUFFER_SIZE)
             progress.Update(0, _('Writing Headers'))
             self.WriteXMLDTD(f)
 
@@ -235,251 +322,21 @@ class XMLExport(Dialogs.GenForm):
                 f.write('    1.7\n')
             f.write('  </TransanaXMLVersion>\n')
 
-            progress.Update(5, _('Writing Library Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT SeriesNum, SeriesID, SeriesComment, SeriesOwner, DefaultKeywordGroup FROM Series2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <SeriesFile>\n')
-                    for seriesRec in data:
-                        self.WriteSeriesRec(f, seriesRec)
-                    f.write('  </SeriesFile>\n')
-                dbCursor.close()
-
-            progress.Update(11, _('Writing Document Records  (This will seem slow because of the size of the Document Records.)'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT DocumentNum, DocumentID, LibraryNum, Author, Comment, ImportedFile, ImportDate, DocumentLength, XMLText FROM Documents2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <DocumentFile>\n')
-                    for documentRec in data:
-                        self.WriteDocumentRec(f, progress, documentRec)
-                    f.write('  </DocumentFile>\n')
-                dbCursor.close()
-
-            progress.Update(17, _('Writing Episode Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT EpisodeNum, EpisodeID, SeriesNum, TapingDate, MediaFile, EpLength, EpComment FROM Episodes2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <EpisodeFile>\n')
-                    for episodeRec in data:
-                        self.WriteEpisodeRec(f, episodeRec)
-                    f.write('  </EpisodeFile>\n')
-                dbCursor.close()
-
-            progress.Update(23, _('Writing Core Data Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = """SELECT CoreDataNum, Identifier, Title, Creator, Subject, Description, Publisher,
-                                    Contributor, DCDate, DCType, Format, Source, Language, Relation, Coverage, Rights
-                                    FROM CoreData2"""
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <CoreDataFile>\n')
-                    for coreDataRec in data:
-                        self.WriteCoreDataRec(f, coreDataRec)
-                    f.write('  </CoreDataFile>\n')
-                dbCursor.close()
-
-            progress.Update(28, _('Writing Collection Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT CollectNum, CollectID, ParentCollectNum, CollectComment, CollectOwner, DefaultKeywordGroup FROM Collections2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <CollectionFile>\n')
-                    for collectionRec in data:
-                        self.WriteCollectionRec(f, collectionRec)
-                    f.write('  </CollectionFile>\n')
-                dbCursor.close()
-
-            progress.Update(34, _('Writing Quote Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT QuoteNum, QuoteID, CollectNum, SourceDocumentNum, SortOrder, Comment, XMLText FROM Quotes2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <QuoteFile>\n')
-                    for quoteRec in data:
-                        self.WriteQuoteRec(f, quoteRec)
-                    f.write('  </QuoteFile>\n')
-                dbCursor.close()
-
-            progress.Update(39, _('Writing Quote Position Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT QuoteNum, DocumentNum, StartChar, EndChar FROM QuotePositions2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <QuotePositionFile>\n')
-                    for quotePosRec in data:
-                        self.WriteQuotePosRec(f, quotePosRec)
-                    f.write('  </QuotePositionFile>\n')
-                dbCursor.close()
-
-            progress.Update(45, _('Writing Clip Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT ClipNum, ClipID, CollectNum, EpisodeNum, MediaFile, ClipStart, ClipStop, ClipOffset, Audio, '
-                SQLText += 'ClipComment, SortOrder FROM Clips2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <ClipFile>\n')
-                    for clipRec in data:
-                        self.WriteClipRec(f, clipRec)
-                    f.write('  </ClipFile>\n')
-                dbCursor.close()
-
-            progress.Update(50, _('Writing Additional Media File Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT AddVidNum, EpisodeNum, ClipNum, MediaFile, VidLength, Offset, Audio FROM AdditionalVids2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <AdditionalVidsFile>\n')
-                    for additionalMediaFileRec in data:
-                        self.WriteAdditionalMediaFileRec(f, additionalMediaFileRec)
-                    f.write('  </AdditionalVidsFile>\n')
-                dbCursor.close()
-
-            progress.Update(56, _('Writing Transcript Records  (This will seem slow because of the size of the Transcript Records.)'))
-            if db != None:
-                dbCursor = db.cursor()
-                dbCursor2 = db.cursor()
-                # Load Transcript Information WITHOUT RTFText content, which requires too much memory in some large database
-                # NOTE:  This will probably be a bit slower, but won't crash on databases with many, many images.
-                SQLText = 'SELECT TranscriptNum, TranscriptID, EpisodeNum, SourceTranscriptNum, ClipNum, SortOrder, Transcriber, '
-                SQLText += 'ClipStart, ClipStop, Comment, MinTranscriptWidth FROM Transcripts2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <TranscriptFile>\n')
-                    for transcriptRec in data:
-                        # Now load the RTFText on a Transcript by Transcript basis (to use less memory)
-                        SQLText2 = 'SELECT RTFText FROM Transcripts2 WHERE TranscriptNum = %s'
-                        SQLText2 = DBInterface.FixQuery(SQLText2)
-                        dbCursor2.execute(SQLText2, (transcriptRec[0],))
-                        rtfText = dbCursor2.fetchone()
-                        # Add the RTFText to the Transcript Record
-                        transcriptRec = transcriptRec + rtfText
-                        # Write the Transcript Record to the Export File
-                        self.WriteTranscriptRec(f, progress, transcriptRec)
-                    f.write('  </TranscriptFile>\n')
-                dbCursor.close()
-
-            progress.Update(62, _('Writing Snapshot Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT SnapshotNum, SnapshotID, CollectNum, ImageFile, ImageScale, ImageCoordsX, ImageCoordsY, '
-                SQLText += 'ImageSizeW, ImageSizeH, EpisodeNum, TranscriptNum, SnapshotTimeCode, SnapshotDuration, '
-                SQLText += 'SnapshotComment, SortOrder FROM Snapshots2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <SnapshotFile>\n')
-                    for snapshotRec in data:
-                        self.WriteSnapshotRec(f, snapshotRec)
-                    f.write('  </SnapshotFile>\n')
-                dbCursor.close()
-
-            progress.Update(68, _('Writing Keyword Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT KeywordGroup, Keyword, Definition, LineColorName, LineColorDef, DrawMode, LineWidth, LineStyle FROM Keywords2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <KeywordFile>\n')
-                    for keywordRec in data:
-                        self.WriteKeywordRec(f, keywordRec)
-                    f.write('  </KeywordFile>\n')
-                dbCursor.close()
-
-            progress.Update(73, _('Writing Clip Keyword Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT EpisodeNum, DocumentNum, ClipNum, QuoteNum, SnapshotNum, KeywordGroup, Keyword, Example FROM ClipKeywords2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <ClipKeywordFile>\n')
-                    for clipKeywordRec in data:
-                        self.WriteClipKeywordRec(f, clipKeywordRec)
-                    f.write('  </ClipKeywordFile>\n')
-                dbCursor.close()
-
-            progress.Update(79, _('Writing Snapshot Keywords Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT SnapshotNum, KeywordGroup, Keyword, x1, y1, x2, y2, visible FROM SnapshotKeywords2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <SnapshotKeywordFile>\n')
-                    for snapshotKeywordRec in data:
-                        self.WriteSnapshotKeywordRec(f, snapshotKeywordRec)
-                    f.write('  </SnapshotKeywordFile>\n')
-                dbCursor.close()
-
-            progress.Update(84, _('Writing Snapshot Coding Style Records'))
             if db != None:
+                # Count the records to be exported, so we can show accurate progress
                 dbCursor = db.cursor()
-                SQLText = 'SELECT SnapshotNum, KeywordGroup, Keyword, DrawMode, LineColorName, LineColorDef, LineWidth, LineStyle '
-                SQLText += 'FROM SnapshotKeywordStyles2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <SnapshotKeywordStyleFile>\n')
-                    for snapshotKeywordStyleRec in data:
-                        self.WriteSnapshotKeywordStyleRec(f, snapshotKeywordStyleRec)
-                    f.write('  </SnapshotKeywordStyleFile>\n')
+                for (prompt, tableName, SQLText, tag, writeRecord, fetchSize) in tables:
+                    dbCursor.execute('SELECT COUNT(*) FROM %s' % tableName)
+                    self.recordCount += dbCursor.fetchone()[0]
                 dbCursor.close()
 
-            progress.Update(90, _('Writing Note Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT NoteNum, NoteID, SeriesNum, EpisodeNum, CollectNum, ClipNum, SnapshotNum, DocumentNum, '
-                SQLText += 'QuoteNum, TranscriptNum, NoteTaker, NoteText FROM Notes2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <NoteFile>\n')
-                    for noteRec in data:
-                        self.WriteNoteRec(f, noteRec)
-                    f.write('  </NoteFile>\n')
-                dbCursor.close()
-
-            progress.Update(95, _('Writing Filter Records'))
-            if db != None:
-                dbCursor = db.cursor()
-                SQLText = 'SELECT ReportType, ReportScope, ConfigName, FilterDataType, FilterData FROM Filters2'
-                dbCursor.execute(SQLText)
-                data = dbCursor.fetchall()
-                if len(data) > 0:
-                    f.write('  <FilterFile>\n')
-                    for filterRec in data:
-                        self.WriteFilterRec(f, filterRec)
-                    f.write('  </FilterFile>\n')
-                dbCursor.close()
+                # Export the tables
+                for (prompt, tableName, SQLText, tag, writeRecord, fetchSize) in tables:
+                    self.WriteTable(f, progress, prompt, SQLText, tag, writeRecord, fetchSize)
 
             f.write('</Transana>\n');
 
             f.flush()
-
-            dbCursor.close()
             
         except:
             if 'unicode' in wx.PlatformInfo:
@@ -494,7 +351,6 @@ class XMLExport(Dialogs.GenForm):
             if DEBUG or DEBUG2:
                 import traceback
                 traceback.print_exc(file=sys.stdout)
-            dbCursor.close()
         finally:
             # If we're using sqlite ...
             if TransanaConstants.DBInstalled in ['sqlite3']:
@@ -505,6 +361,54 @@ class XMLExport(Dialogs.GenForm):
         progress.Update(100)
         progress.Destroy()
 
+    def WriteTable(self, f, progress, prompt, SQLText, tag, writeRecord, fetchSize):
+        """ Write the records returned by SQLText to the export file inside the XML tag.  Records are fetched from
+            the database fetchSize at a time and written by writeRecord(f, record), so memory use doesn't depend on
+            the size of the table.  If writeRecord runs database queries of its own, fetchSize must be None.  Then
+            all the records are fetched before any are written. """
+        # Update the Progress Dialog
+        progress.Update(self.progressValue, prompt)
+        # If writeRecord runs queries of its own, we need a regular cursor.  (With MySQL, no other query can be run
+        # while a streaming cursor has results waiting.)
+        if fetchSize == None:
+            dbCursor = DBInterface.get_db().cursor()
+        # Otherwise, get a database cursor that retrieves records from the database as we fetch them
+        else:
+            dbCursor = DBInterface.get_streaming_cursor()
+        try:
+            dbCursor.execute(SQLText)
+            # The table tag is only written if the table has records
+            tableStarted = False
+            # Fetch the first records, or all the records if we're not using a streaming cursor
+            if fetchSize == None:
+                data = dbCursor.fetchall()
+            else:
+                data = dbCursor.fetchmany(fetchSize)
+            # As long as there are records ...
+            while len(data) > 0:
+                # If this is the first record, start the table
+                if not tableStarted:
+                    f.write('  <%s>\n' % tag)
+                    tableStarted = True
+                # Write the records
+                for record in data:
+                    writeRecord(f, record)
+                # Update the Progress Dialog based on the number of records written so far
+                self.recordsWritten += len(data)
+                self.progressValue = min(99, int(100.0 * self.recordsWritten / max(self.recordCount, 1)))
+                progress.Update(self.progressValue)
+                # Fetch the next records, if there are any left to fetch
+                if fetchSize == None:
+                    data = []
+                else:
+                    data = dbCursor.fetchmany(fetchSize)
+            # If the table was started, end it
+            if tableStarted:
+                f.write('  </%s>\n' % tag)
+        finally:
+            # Close the database cursor
+            dbCursor.close()
+
     def WriteXMLDTD(self, f):
         f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
         f.write('<!DOCTYPE TransanaData [\n')
@@ -776,7 +680,7 @@ class XMLExport(Dialogs.GenForm):
                 prompt1 = unicode(_('Writing Document Records  (This will seem slow because of the size of the Document Records.)'), 'utf8')
                 prompt2 = '\n' + unicode(_('Exporting %s'), 'utf8')
 
-                progress.Update(11, prompt1 + prompt2 % DocumentID)
+                progress.Update(self.progressValue, prompt1 + prompt2 % DocumentID)
                 progress.Refresh()
 
                 # If XML, we can just use it as is after we strip off the XML Header Line, which breaks XML.
@@ -1321,7 +1225,7 @@ class XMLExport(Dialogs.GenForm):
                 prompt1 = unicode(_('Writing Transcript Records  (This will seem slow because of the size of the Transcript Records.)'), 'utf8')
                 prompt2 = '\n' + unicode(_('Exporting %s'), 'utf8')
 
-                progress.Update(56, prompt1 + prompt2 % TranscriptID)
+                progress.Update(self.progressValue, prompt1 + prompt2 % TranscriptID)
                 progress.Refresh()
 
                 # If XML, we can just use it as is after we strip off the XML Header Line, which breaks XML.
@@ -1343,7 +1247,7 @@ class XMLExport(Dialogs.GenForm):
                 prompt1 = unicode(_('Writing Transcript Records  (This will seem slow because of the size of the Transcript Records.)'), 'utf8')
                 prompt2 = unicode(_('\nConverting %s'), 'utf8')
 
-                progress.Update(56, prompt1 + prompt2 % TranscriptID)
+                progress.Update(self.progressValue, prompt1 + prompt2 % TranscriptID)
 
                 # If RTF  ...
                 # If we're using the RichTextCtrl ...
@@ -1381,7 +1285,7 @@ class XMLExport(Dialogs.GenForm):
                 prompt1 = unicode(_('Writing Transcript Records  (This will seem slow because of the size of the Transcript Records.)'), 'utf8')
                 prompt2 = unicode(_('\nConverting %s'), 'utf8')
 
-                progress.Update(56, prompt1 + prompt2 % TranscriptID)
+                progress.Update(self.progressValue, prompt1 + prompt2 % TranscriptID)
 
                 # unpickle the text and style info
                 (bufferContents, specs, attrs) = pickle.loads(RTFText)
@@ -1941,7 +1845,7 @@ class XMLExport(Dialogs.GenForm):
                         TransanaGlobal.configData.videoPath,
                         "",
                         "", 
-                        _("Transana-XML Files (*.tra)|*.tra|XML Files (*.xml)|*.xml|All files (*.*)|*.*"), 
+                        _("Transana-XML Files (*.tra)|*.tra|Compressed Transana-XML Files (*.tra.gz)|*.tra.gz|XML Files (*.xml)|*.xml|All files (*.*)|*.*"), 
                         wx.SAVE)
         # If user didn't cancel ..
         if fs != "":
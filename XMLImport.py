@@ -24,6 +24,9 @@ DEBUG_Exceptions = False
 if DEBUG or DEBUG_Exceptions:
     print "XMLImport DEBUG is ON!"
 
+# The number of records of a type to accumulate before saving them to the database all at once
+IMPORT_BATCH_SIZE = 500
+
 # import wxPython
 import wx
 # Import the mx DateTime module
@@ -40,6 +43,7 @@ import DBInterface
 import Dialogs
 import Document
 import Episode
+import KeywordIndex
 import KeywordObject as Keyword
 import Misc
 import Note
@@ -57,9 +61,27 @@ import sys
 import re
 # import Python's cPickle module
 import cPickle
+# import Python's gzip module
+import gzip
 
 MENU_FILE_EXIT = wx.NewId()
 
+def OpenXMLFile(filename):
+    """ Open a Transana-XML file for reading.  Files compressed by the XML Export are recognized by their
+        gzip header rather than their file extension, so they can be imported no matter what they are named. """
+    # Read the first two bytes of the file
+    f = file(filename, 'rb')
+    header = f.read(2)
+    f.close()
+    # If the file starts with the gzip header ...
+    if header == '\x1f\x8b':
+        # ... open it as a compressed file
+        return gzip.open(filename, 'rb')
+    # Otherwise ...
+    else:
+        # ... open it as a plain text file
+        return file(filename, 'r')
+
 class XMLImport(Dialogs.GenForm):
     """ This window displays a variety of GUI Widgets. """
     def __init__(self, parent, id, title, importData=None):
@@ -217,32 +239,10 @@ class XMLImport(Dialogs.GenForm):
     def UnEscape(self, inpStr):
         """ Replaces "&amp;", "&gt;", and "&lt;" with "&", ">", and "<" 
             >, <, and & all need to be replaced, but &amp;, &gt;, and &lt; needs to survive!"""
-        # Find the first Greater Than in the document
-        chrPos = inpStr.find('&gt;')
-        # While there are more Greater Thans ...
-        while (chrPos > -1):
-            # ... replace the Greater Than with the escape string ...
-            inpStr = inpStr[:chrPos] + '>' + inpStr[chrPos + 4:]
-            # ... and look for the NEXT Greater Than after the replacement
-            chrPos = inpStr.find('&gt;', chrPos + 1)
-        # Find the first Less Than in the document
-        chrPos = inpStr.find('&lt;')
-        # While there are more Less Thans ...
-        while (chrPos > -1):
-            # ... replace the Less Than with the escape string ...
-            inpStr = inpStr[:chrPos] + '<' + inpStr[chrPos + 4:]
-            # ... and look for the NEXT Less Than after the replacement
-            chrPos = inpStr.find('&lt;', chrPos + 1)
-        # Find the first Ampersand in the document
-        chrPos = inpStr.find('&amp;')
-        # While there are more Ampersands ...
-        while (chrPos > -1):
-            # ... replace the Ampersand with the escape string ...
-            inpStr = inpStr[:chrPos] + '&' + inpStr[chrPos + 5:]
-            # ... and look for the NEXT Ampersand after the replacement
-            chrPos = inpStr.find('&amp;', chrPos + 1)
-        # Return the modified string
-        return inpStr
+        # Replace the Greater Thans and Less Thans first, and the Ampersands last, so that escaped
+        # escape strings such as "&amp;gt;" become "&gt;" rather than ">".
+        # (replace() does not re-examine its own replacements.)
+        return inpStr.replace('&gt;', '>').replace('&lt;', '<').replace('&amp;', '&')
 
     def Import(self):
        """ Handle the Import request """
@@ -271,6 +271,18 @@ class XMLImport(Dialogs.GenForm):
        quotePosition = {}
        clipTranscripts = {}
        clipStartStop = {}
+       # Records in tables whose new record numbers are never needed during import are saved in batches.
+       # stagedRecords holds the data values waiting to be saved, keyed by the query that saves them.
+       stagedRecords = {}
+       # Clip Keyword records are also saved in batches
+       stagedClipKeywords = []
+       # stagedErrors holds (objectType, lineNumber, errorType, errorValue) for staged records that could not be saved
+       stagedErrors = []
+       # Lines of XMLText and RTFText are collected in a list and joined when the text is complete
+       textLines = []
+       # Track the number of records imported and how long the import takes
+       recordCount = 0
+       startTime = time.time()
 
        # Get the database connection
        db = DBInterface.get_db()
@@ -454,7 +466,7 @@ class XMLImport(Dialogs.GenForm):
            # Assume we're good to continue unless informed otherwise
            contin = True
            # Open the XML file
-           f = file(self.XMLFile.GetValue(), 'r')
+           f = OpenXMLFile(self.XMLFile.GetValue())
 
            # Initialize objectType and dataType, which are used to parse the file
            objectType = None 
@@ -497,15 +509,22 @@ class XMLImport(Dialogs.GenForm):
                   ((dataType == 'NoteText') and (lineUpper.lstrip() == '</NOTETEXT>')):
 
                    # Code for updating the Progress Bar
-                   if lineUpper in MainHeads.keys():
+                   if lineUpper in MainHeads:
+                       # Save any records remaining from the previous section
+                       self.FlushRecords(dbCursor, stagedRecords, stagedClipKeywords, stagedErrors)
+                       # Report any of them that could not be saved, using the previous section's error settings
+                       (contin, skipValue) = self.ReportStagedErrors(stagedErrors, contin, skipCheck, skipValue)
                        if (self.importData == None) or not ('wxMac' in wx.PlatformInfo):
                            progress.Update(MainHeads[lineUpper]['progPct'], MainHeads[lineUpper]['progPrompt'])
                        # These records should NEVER skip error messages
                        skipCheck = MainHeads[lineUpper]['skipCheck']
                        skipValue = MainHeads[lineUpper]['skipValue']
 
-                   elif lineUpper.lstrip() in DataTypes.keys():
+                   elif lineUpper.lstrip() in DataTypes:
                        dataType = DataTypes[lineUpper.lstrip()]
+                       # If we're starting XMLText or RTFText, start a new list of text lines
+                       if dataType in ['XMLText', 'RTFText']:
+                           textLines = []
 
                    # When we finish the Collections import section ...
                    elif lineUpper == '</COLLECTIONFILE>':
@@ -704,6 +723,8 @@ class XMLImport(Dialogs.GenForm):
                         lineUpper == '</NOTE>' or \
                         lineUpper == '</FILTER>':
                        dataType = None
+                       # Count the record
+                       recordCount += 1
 
                        # Saves are one area where problems will arise if the data's not clean.
                        # We can trap some of these problems here.
@@ -803,8 +824,8 @@ class XMLImport(Dialogs.GenForm):
                                query = DBInterface.FixQuery(query)
                                # Get the data for each insert query
                                data = (quotePosition['DocumentNum'], quotePosition['StartChar'], quotePosition['EndChar'], quotePosition['QuoteNum'])
-                               # Execute the query
-                               dbCursor.execute(query, data)
+                               # Stage the record to be saved
+                               self.StageRecord(dbCursor, stagedRecords, query, data, lineCount, objectType, stagedErrors)
 
                            elif objectType == 'AddVid':
                                # Additional Video records don't have a proper object type, so we have to do the saves the hard way.
@@ -829,8 +850,8 @@ class XMLImport(Dialogs.GenForm):
                                tmpFilename = tmpFilename.encode(TransanaGlobal.encoding)
                                # Get the data for each insert query
                                data = (currentObj['EpisodeNum'], currentObj['ClipNum'], tmpFilename, currentObj['VidLength'], currentObj['Offset'], currentObj['Audio'])
-                               # Execute the query
-                               dbCursor.execute(query, data)
+                               # Stage the record to be saved
+                               self.StageRecord(dbCursor, stagedRecords, query, data, lineCount, objectType, stagedErrors)
 
                            elif  objectType == 'CoreData':
                                currentObj.number = 0
@@ -860,7 +881,13 @@ class XMLImport(Dialogs.GenForm):
                                        print "XMLImport 5:  Saving ", type(currentObj), objCountNumber
                                        objCountNumber += 1;
 
-                                   currentObj.db_save()
+                                   # Stage the Clip Keyword to be saved, remembering where it is in the XML file
+                                   stagedClipKeywords.append((currentObj, lineCount, objectType))
+                                   # If we have a full batch of Clip Keywords ...
+                                   if len(stagedClipKeywords) >= IMPORT_BATCH_SIZE:
+                                       # ... save them
+                                       self.SaveBatch(dbCursor, ClipKeywordObject.ClipKeyword.db_save_many, stagedClipKeywords, stagedErrors)
+                                       del stagedClipKeywords[:]
 
                            elif objectType == 'SnapshotKeyword':
                                if self.snapshotKeyword['SnapshotNum'] > 0:
@@ -879,9 +906,9 @@ class XMLImport(Dialogs.GenForm):
                                              self.snapshotKeyword['X2'],
                                              self.snapshotKeyword['Y2'],
                                              self.snapshotKeyword['Visible'])
-                                   # Save the Snapshot Keyword data
+                                   # Stage the Snapshot Keyword data to be saved
                                    if db != None:
-                                       dbCursor.execute(query, values)
+                                       self.StageRecord(dbCursor, stagedRecords, query, values, lineCount, objectType, stagedErrors)
                                    
                            elif objectType == 'SnapshotKeywordStyle':
                                if self.snapshotKeywordStyle['SnapshotNum'] > 0:
@@ -900,9 +927,9 @@ class XMLImport(Dialogs.GenForm):
                                              self.snapshotKeywordStyle['ColorDef'],
                                              self.snapshotKeywordStyle['LineWidth'],
                                              self.snapshotKeywordStyle['LineStyle'])
-                                   # Save the Snapshot Keyword Style data
+                                   # Stage the Snapshot Keyword Style data to be saved
                                    if db != None:
-                                       dbCursor.execute(query, values)
+                                       self.StageRecord(dbCursor, stagedRecords, query, values, lineCount, objectType, stagedErrors)
                                    
                            elif objectType == 'Filter':
                                # Starting with XML Version 1.3, we have to deal with encoding issues for the Filter data
@@ -1121,6 +1148,9 @@ class XMLImport(Dialogs.GenForm):
                                    skipValue = errordlg.GetSkipCheck()
                                errordlg.Destroy()
 
+                       # Report any staged records that could not be saved when a batch was saved for this record
+                       (contin, skipValue) = self.ReportStagedErrors(stagedErrors, contin, skipCheck, skipValue)
+
                        currentObj = None
                        objectType = None
 
@@ -1134,23 +1164,25 @@ class XMLImport(Dialogs.GenForm):
                    # the closing XML tag is found.  Since left stripping is skipped during XMLText reads, we need
                    # to add the lstrip() call here.
                    if lineUpper.lstrip() in ['</XMLTEXT>', '</RTFTEXT>']:
-                       dataType = None
-
-                   elif dataType in ['XMLText', 'RTFText']:
                        # Add Line Breaks to the text to match the incoming lines.
                        # Otherwise, the transcript might be messed up, with the first word of the next line
                        # being truncated.
+                       currentObj.text = '\n'.join(textLines)
+                       textLines = []
+                       dataType = None
 
+                   elif dataType in ['XMLText', 'RTFText']:
                        # If this is the FIRST LINE ...
-                       if currentObj.text == '':
+                       if len(textLines) == 0:
                            # If we have an XML richtext specification ...
                            if line[:10] == '<richtext ':
                                # ... add the XML Header, which was stripped out during export because it breaks XML
-                               currentObj.text = '<?xml version="1.0" encoding="UTF-8"?>\n'
+                               textLines.append('<?xml version="1.0" encoding="UTF-8"?>\n' + line)
+                           # Leading blank lines are dropped
+                           elif line != '':
+                               textLines.append(line)
                        else:
-                           currentObj.text = currentObj.text + '\n'
-
-                       currentObj.text = currentObj.text + line
+                           textLines.append(line)
                        # We DO NOT reset DataType here, as RTFText may be many lines long!
                        # dataType = None
 
@@ -1821,6 +1853,17 @@ class XMLImport(Dialogs.GenForm):
                    break
 
            if contin: 
+               # Save any records that are still waiting to be saved
+               self.FlushRecords(dbCursor, stagedRecords, stagedClipKeywords, stagedErrors)
+               # Report any of them that could not be saved
+               (contin, skipValue) = self.ReportStagedErrors(stagedErrors, contin, skipCheck, skipValue)
+
+           if contin: 
+               if DEBUG:
+                   elapsed = time.time() - startTime
+                   print "XMLImport: %d records imported in %0.2f seconds (%0.0f records per second)" % \
+                         (recordCount, elapsed, recordCount / max(elapsed, 0.001))
+
                # Since Clips were imported before Transcripts, the Originating Transcript Numbers in the Clip Records
                # are incorrect.  We must update them now.
                if (self.importData == None) or not ('wxMac' in wx.PlatformInfo):
@@ -1857,10 +1900,10 @@ class XMLImport(Dialogs.GenForm):
                    
                    if (self.importData == None) or not ('wxMac' in wx.PlatformInfo):
                        progress.Update(86, _('Updating HyperLinks in Documents'))
-                   # Get all Document records
-                   SQLText = 'SELECT DocumentNum, XMLText FROM Documents2'
+                   # Get all Document records that contain Transana hyperlinks.  (UpdateHyperlinks() doesn't change the others.)
+                   SQLText = 'SELECT DocumentNum, XMLText FROM Documents2 WHERE XMLText LIKE %s'
                    SQLText = DBInterface.FixQuery(SQLText)
-                   dbCursor.execute(SQLText)
+                   dbCursor.execute(SQLText, ('%url="transana:%', ))
                    # create the SQL for updating the XMLText of the Document
                    SQLText = """ UPDATE Documents2
                                  SET XMLText = %s
@@ -1872,10 +1915,10 @@ class XMLImport(Dialogs.GenForm):
 
                    if (self.importData == None) or not ('wxMac' in wx.PlatformInfo):
                        progress.Update(90, _('Updating HyperLinks in Quotes'))
-                   # Get all Quote records
-                   SQLText = 'SELECT QuoteNum, XMLText FROM Quotes2'
+                   # Get all Quote records that contain Transana hyperlinks
+                   SQLText = 'SELECT QuoteNum, XMLText FROM Quotes2 WHERE XMLText LIKE %s'
                    SQLText = DBInterface.FixQuery(SQLText)
-                   dbCursor.execute(SQLText)
+                   dbCursor.execute(SQLText, ('%url="transana:%', ))
                    # create the SQL for updating the XMLText of the Quote
                    SQLText = """ UPDATE Quotes2
                                  SET XMLText = %s
@@ -1887,10 +1930,10 @@ class XMLImport(Dialogs.GenForm):
 
                    if (self.importData == None) or not ('wxMac' in wx.PlatformInfo):
                        progress.Update(95, _('Updating HyperLinks in Transcripts'))
-                   # Get all Transcript records
-                   SQLText = 'SELECT TranscriptNum, RTFText FROM Transcripts2'
+                   # Get all Transcript records that contain Transana hyperlinks
+                   SQLText = 'SELECT TranscriptNum, RTFText FROM Transcripts2 WHERE RTFText LIKE %s'
                    SQLText = DBInterface.FixQuery(SQLText)
-                   dbCursor.execute(SQLText)
+                   dbCursor.execute(SQLText, ('%url="transana:%', ))
                    # create the SQL for updating the RTFText of the Transcript
                    SQLText = """ UPDATE Transcripts2
                                  SET RTFText = %s
@@ -1951,6 +1994,10 @@ class XMLImport(Dialogs.GenForm):
            dbCursor.execute(SQLText)
            dbCursor.close()
 
+       # The import adds Keyword codings in bulk (and may have been rolled back), so the in-memory
+       # Keyword Index needs to be re-loaded
+       KeywordIndex.Invalidate()
+
        try:
            f.close()
        except:
@@ -1976,6 +2023,107 @@ class XMLImport(Dialogs.GenForm):
        # db.close()
 
 
+    def StageRecord(self, dbCursor, stagedRecords, query, values, lineNumber, objectType, stagedErrors):
+        """ Add a record's values to the records waiting to be saved by query.  When a full batch of records
+            is waiting, save them all at once.  lineNumber is the line of the XML file where the record ends.
+            Records that cannot be saved are added to stagedErrors. """
+        # If this is the first record for this query, start a list for it
+        if not stagedRecords.has_key(query):
+            stagedRecords[query] = []
+        # Add the record's values to the list, remembering where the record is in the XML file
+        stagedRecords[query].append((values, lineNumber, objectType))
+        # If we have a full batch of records ...
+        if len(stagedRecords[query]) >= IMPORT_BATCH_SIZE:
+            # ... save them ...
+            self.SaveBatch(dbCursor, lambda data: dbCursor.executemany(query, data), stagedRecords[query], stagedErrors)
+            # ... and start a new batch
+            stagedRecords[query] = []
+
+    def FlushRecords(self, dbCursor, stagedRecords, stagedClipKeywords, stagedErrors):
+        """ Save all records that are waiting to be saved.  Records that cannot be saved are added to stagedErrors. """
+        # For each query that has records waiting ...
+        for query in stagedRecords.keys():
+            if len(stagedRecords[query]) > 0:
+                # ... save the records
+                self.SaveBatch(dbCursor, lambda data: dbCursor.executemany(query, data), stagedRecords[query], stagedErrors)
+        stagedRecords.clear()
+        # Save any Clip Keywords that are waiting
+        if len(stagedClipKeywords) > 0:
+            self.SaveBatch(dbCursor, ClipKeywordObject.ClipKeyword.db_save_many, stagedClipKeywords, stagedErrors)
+        del stagedClipKeywords[:]
+
+    def SaveBatch(self, dbCursor, saveFunction, records, stagedErrors):
+        """ Save a batch of staged records, a list of (data, lineNumber, objectType) tuples, by passing a list
+            of their data to saveFunction.  If the batch cannot be saved, save the records one at a time so that
+            the good records are kept and each bad record is added to stagedErrors with its own line number. """
+        # Without InnoDB, MySQL tables can't roll back part of a failed batch, and retrying the batch one record at
+        # a time could save some records twice.  Save the records one at a time to start with.
+        if not TransanaGlobal.hasInnoDB:
+            self.SaveRecords(saveFunction, records, stagedErrors)
+            return
+        # Mark the position in the transaction so a failed batch can be undone without losing earlier work
+        dbCursor.execute('SAVEPOINT XMLImportBatch')
+        try:
+            # Try to save the whole batch at once
+            saveFunction([data for (data, lineNumber, objectType) in records])
+        except:
+            # Undo whatever part of the batch was saved
+            dbCursor.execute('ROLLBACK TO SAVEPOINT XMLImportBatch')
+            # Save the records one at a time
+            self.SaveRecords(saveFunction, records, stagedErrors)
+        dbCursor.execute('RELEASE SAVEPOINT XMLImportBatch')
+
+    def SaveRecords(self, saveFunction, records, stagedErrors):
+        """ Save staged records one at a time, adding each record that can't be saved to stagedErrors """
+        for (data, lineNumber, objectType) in records:
+            try:
+                saveFunction([data])
+            except:
+                # Remember which record failed, and why
+                stagedErrors.append((objectType, lineNumber, sys.exc_info()[0], sys.exc_info()[1]))
+
+    def ReportStagedErrors(self, stagedErrors, contin, skipCheck, skipValue):
+        """ Report staged records that could not be saved the way other import errors are reported, and clear
+            stagedErrors.  Returns the updated (contin, skipValue) values. """
+        # For each record that could not be saved ...
+        for (objectType, lineNumber, errorType, errorValue) in stagedErrors:
+
+            if DEBUG or DEBUG_Exceptions:
+                print
+                print objectType, lineNumber, errorType, errorValue
+                print
+
+            # If we've been told to skip error messages of this type, skip this record
+            if skipValue:
+                continue
+            # Otherwise, we interrupt the import process
+            contin = False
+            # Build the error message, telling the user where to intervene
+            if 'unicode' in wx.PlatformInfo:
+                # Encode with UTF-8 rather than TransanaGlobal.encoding because this is a prompt, not DB Data.
+                prompt = unicode(_('A problem has been detected importing a %s record'), 'utf8')
+                prompt2 = unicode(_('You need to correct this record in XML file %s.'), 'utf8')
+                prompt3 = unicode(_('The %s record ends at line %d.'), 'utf8')
+            else:
+                prompt = _('A problem has been detected importing a %s record')
+                prompt2 = _('You need to correct this record in XML file %s.')
+                prompt3 = _('The %s record ends at line %d.')
+            msg = prompt % objectType + '.\n' + prompt2 % self.XMLFile.GetValue() + '\n' + prompt3 % (objectType, lineNumber)
+            msg += u"\n\n%s\n%s" % (errorType, errorValue)
+            # Display the error message to the user.
+            errordlg = Dialogs.ErrorDialog(None, msg, includeSkipCheck=skipCheck)
+            errordlg.ShowModal()
+            # if skipping error messages is an option ...
+            if skipCheck:
+                # ... see if the Skip Error Messages checkbox has been checked
+                skipValue = errordlg.GetSkipCheck()
+            errordlg.Destroy()
+            # Since the import is being interrupted, we only report the first problem
+            break
+        # The errors have been reported
+        del stagedErrors[:]
+        return (contin, skipValue)
+
     def ProcessLine(self, txt):
         """ Process most lines read from the XML file to apply the proper encoding, if needed. """
         if 'unicode' in wx.PlatformInfo:
@@ -1991,10 +2139,9 @@ class XMLImport(Dialogs.GenForm):
                 #        In essence, we need txt.decode('utf8').decode(self.importEncoding), but that 
 
                 if self.importEncoding != 'latin1':
-                    # For each character in the unicode TXT string ...
-                    for x in txt.decode('utf8'):
-                        # ... add the appropriate character to the string S variable
-                        s += chr(ord(x))
+                    # Each character in the unicode TXT string becomes the character with the same ordinal value
+                    # in the string S variable, which is exactly what Latin-1 encoding does.
+                    s = txt.decode('utf8').encode('latin1')
                 else:
                     s = txt
 
@@ -2094,7 +2241,7 @@ class XMLImport(Dialogs.GenForm):
                              TransanaGlobal.configData.videoPath,
                              "",
                              "", 
-                             _("Transana-XML Files (*.tra)|*.tra|XML Files (*.xml)|*.xml|All files (*.*)|*.*"), 
+                             _("Transana-XML Files (*.tra)|*.tra|Compressed Transana-XML Files (*.tra.gz)|*.tra.gz|XML Files (*.xml)|*.xml|All files (*.*)|*.*"), 
                              wx.OPEN | wx.FILE_MUST_EXIST)
         # If user didn't cancel ..
         if fs != "":